@@ -4,17 +4,24 @@ Flask Web应用 - 反馈收集界面
 升级版：支持WebSocket实时通信和客户端活跃度检测
 """
 
+import hmac
 import os
 import secrets
 import time
 import threading
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, List, Optional
 from flask import Flask
 from flask_socketio import SocketIO, emit
+from backend.config import get_server_config
+from backend.feedback_handler import normalize_submitted_image
 from backend.security.csrf_handler import CSRFProtection, SecurityConfig
 from backend.routes.feedback_routes import feedback_bp, init_feedback_routes
 from backend.utils.logging_utils import log_message
 from backend.utils.static_cache import setup_static_cache_middleware
+from backend.utils.client_tracker import ClientTracker
+from backend.utils.admission import SubmitRateLimiter
+from backend.utils.metrics import SUBMIT_REJECTIONS
+from backend.utils.tracing import start_span
 
 
 class FeedbackApp:
@@ -26,21 +33,37 @@ class FeedbackApp:
         work_summary: str = "",
         suggest_json: str = "",
         timeout_seconds: int = 300,
+        batch_items: Optional[List[Dict]] = None,
+        session_id: str = "default",
         **kwargs,
     ):
         self.feedback_handler = feedback_handler
+        # 服务器池中的会话ID，页面关闭通知据此释放本会话
+        self.session_id = session_id
         self.work_summary = work_summary
         self.suggest_json = suggest_json
         self.timeout_seconds = timeout_seconds
+        self.batch_items = batch_items or []
         self.csrf_protection = CSRFProtection()
         
         # WebSocket相关属性
         self.socketio: Optional[SocketIO] = None
-        self.active_clients: Dict[str, Dict[str, Any]] = {}
-        self.heartbeat_interval = 30  # 30秒心跳间隔
-        self.client_timeout = 60  # 60秒客户端超时
-        self.cleanup_thread: Optional[threading.Thread] = None
+        # 已连接客户端（存活由 Engine.IO ping/pong 检测，超时即触发 disconnect）
+        self.client_tracker = ClientTracker()
+        self.ping_interval = 25  # Engine.IO ping 间隔（秒）
+        self.ping_timeout = 60  # 未收到 pong 的断开时间（秒）
         self.shutdown_flag = threading.Event()
+        # 会话恢复令牌：页面断线重连时携带，服务器据此确认页面仍属于当前会话
+        self.resume_token = secrets.token_urlsafe(16)
+        self.reconnect_grace_seconds = get_server_config().reconnect_grace_seconds
+        # 每个客户端的提交限速（WebSocket 和 HTTP 表单共用）
+        self.submit_limiter = SubmitRateLimiter.from_config()
+        # 等待反馈的截止时间（时间戳），进入等待阶段后设置，重连的页面据此恢复倒计时
+        self.session_deadline: Optional[float] = None
+        
+        self._client_listeners: List[Callable[[], None]] = []
+        # 会话同时在收件箱中列出时，收件箱页面的连接也视为本会话的客户端
+        self.inbox = None
         
         # 记录真正意外的参数（排除已知的可选参数）
         known_optional_params = {'server_manager_instance'}  # 已知但不使用的参数
@@ -98,8 +121,8 @@ class FeedbackApp:
             async_mode='eventlet',
             logger=False,
             engineio_logger=False,
-            ping_timeout=60,
-            ping_interval=25
+            ping_timeout=self.ping_timeout,
+            ping_interval=self.ping_interval
         )
 
         # 注册WebSocket事件处理器
@@ -107,11 +130,15 @@ class FeedbackApp:
 
         # 初始化路由依赖
         init_feedback_routes(
+            app,
             self.feedback_handler,
             self.csrf_protection,
             self.work_summary,
             self.suggest_json,
             self.timeout_seconds,
+            self.batch_items,
+            self.submit_limiter,
+            self.session_id,
         )
 
         # 注册蓝图
@@ -126,46 +153,107 @@ class FeedbackApp:
         """注册WebSocket事件处理器"""
         
         @self.socketio.on('connect')
-        def handle_connect():
-            """客户端连接事件"""
+        def handle_connect(auth=None):
+            """客户端连接事件，重连的页面在 auth 中携带会话恢复令牌"""
             client_id = self._get_client_id()
-            self.active_clients[client_id] = {
-                'connect_time': time.time(),
-                'last_heartbeat': time.time(),
-                'session_id': None
-            }
-            log_message(f"[WebSocket] 客户端连接: {client_id}")
+            resumed = self._is_resume(auth)
+            self.client_tracker.connect(client_id)
+            log_message(f"[WebSocket] 客户端{'重新' if resumed else ''}连接: {client_id}")
+            self._add_trace_event("websocket.resume" if resumed else "websocket.connect", client_id)
+            self._notify_client_listeners()
             
-            # 发送连接确认
+            # 发送连接确认（heartbeat_interval 为0表示不需要应用层心跳，存活由 ping/pong 检测）
+            remaining_seconds = None
+            if self.session_deadline is not None:
+                remaining_seconds = max(0, int(self.session_deadline - time.time()))
             emit('connection_established', {
                 'client_id': client_id,
                 'server_time': time.time(),
-                'heartbeat_interval': self.heartbeat_interval
+                'heartbeat_interval': 0,
+                'ping_interval': self.ping_interval,
+                'ping_timeout': self.ping_timeout,
+                'resume_token': self.resume_token,
+                'resumed': resumed,
+                'reconnect_grace_seconds': self.reconnect_grace_seconds,
+                'remaining_seconds': remaining_seconds,
             })
+            # 发送服务器端草稿版本，页面据此恢复或重新同步（不含图片数据）
+            emit('draft_state', self.feedback_handler.get_draft_state())
 
         @self.socketio.on('disconnect')
         def handle_disconnect():
-            """客户端断开事件"""
+            """客户端断开事件（包括 ping 超时）"""
             client_id = self._get_client_id()
-            if client_id in self.active_clients:
-                del self.active_clients[client_id]
+            if self._remove_client(client_id):
                 log_message(f"[WebSocket] 客户端断开: {client_id}")
+                self._add_trace_event("websocket.disconnect", client_id)
 
         @self.socketio.on('heartbeat')
         def handle_heartbeat(data):
-            """心跳事件"""
+            """应用层心跳（兼容旧页面，存活检测不依赖此事件）"""
             client_id = self._get_client_id()
-            log_message(f"[WebSocket] 心跳接收: client_id={client_id}, 时间={time.strftime('%Y-%m-%d %H:%M:%S')}")
-            if client_id in self.active_clients:
-                self.active_clients[client_id]['last_heartbeat'] = time.time()
-                log_message(f"[WebSocket] 更新 last_heartbeat: {client_id} -> {self.active_clients[client_id]['last_heartbeat']}")
-                
-                # 发送心跳响应
+            if self.client_tracker.touch(client_id):
                 emit('heartbeat_response', {
                     'client_id': client_id,
                     'server_time': time.time()
                 })
 
+        @self.socketio.on('draft_update')
+        def handle_draft_update(data):
+            """页面增量同步草稿（防抖合并后的文本增量和图片增删）"""
+            client_id = self._get_client_id()
+            self.client_tracker.touch(client_id)
+            try:
+                ack = self.feedback_handler.apply_draft_update(data or {})
+            except ValueError as e:
+                emit('draft_ack', {'error': str(e), **self.feedback_handler.get_draft_state()})
+                return
+            emit('draft_ack', ack)
+
+        @self.socketio.on('draft_restore')
+        def handle_draft_restore(data=None):
+            """页面重新加载后请求完整草稿（包含图片）"""
+            emit('draft_state', self.feedback_handler.get_draft_state(include_images=True))
+
+        @self.socketio.on('upload_begin')
+        def handle_upload_begin(data):
+            """开始或恢复附件分块上传，回复已接收的偏移量"""
+            upload_id = str(data.get('upload_id', ''))
+            try:
+                offset = self.feedback_handler.attachments.begin(
+                    upload_id, data.get('size'), data.get('mime', ''), data.get('filename', '')
+                )
+            except ValueError as e:
+                emit('upload_ready', {'upload_id': upload_id, 'error': str(e)})
+                return
+            emit('upload_ready', {'upload_id': upload_id, 'offset': offset})
+
+        @self.socketio.on('upload_chunk')
+        def handle_upload_chunk(data):
+            """
+            接收二进制分块，每个分块回复一次确认
+
+            偏移量与服务器不一致或校验失败时 rewind 为 True，页面等待在途分块确认后从 offset 重发
+            """
+            upload_id = str(data.get('upload_id', ''))
+            attachments = self.feedback_handler.attachments
+            try:
+                offset = attachments.append(upload_id, data.get('offset'), data.get('data'), data.get('crc32'))
+            except ValueError as e:
+                emit('upload_ack', {
+                    'upload_id': upload_id,
+                    'offset': attachments.offset(upload_id),
+                    'rewind': True,
+                    'error': str(e)
+                })
+                return
+            emit('upload_ack', {
+                'upload_id': upload_id,
+                'offset': offset,
+                'rewind': offset != data.get('offset') + len(data.get('data')),
+                'complete': attachments.get(upload_id) is not None
+            })
+
         @self.socketio.on('submit_feedback')
         def handle_submit_feedback(data):
             """处理反馈提交"""
@@ -173,21 +261,48 @@ class FeedbackApp:
             log_message(f"[WebSocket] 收到反馈提交: {client_id}")
             
             # 更新客户端活跃时间
-            if client_id in self.active_clients:
-                self.active_clients[client_id]['last_heartbeat'] = time.time()
+            self.client_tracker.touch(client_id)
+            if self._reject_rate_limited(client_id):
+                return
+            
+            if data.get('draft_version') is not None:
+                # 确认式提交：内容已通过草稿同步到服务器，版本不一致时要求页面完整提交
+                content = self.feedback_handler.get_draft_content(data['draft_version'])
+                if content is None:
+                    emit('submit_rejected', {
+                        'reason': 'draft_version_mismatch',
+                        **self.feedback_handler.get_draft_state()
+                    })
+                    return
+            else:
+                images = [normalize_submitted_image(image) for image in data.get('images', [])]
+                try:
+                    images += [self.feedback_handler.resolve_attachment(ref) for ref in data.get('attachments', [])]
+                except ValueError as e:
+                    emit('submit_rejected', {'reason': 'attachment_missing', 'error': str(e)})
+                    return
+                content = {'text': data.get('text', ''), 'images': images}
             
             # 处理反馈数据
             feedback_data = {
-                'text': data.get('text', ''),
-                'images': data.get('images', []),
+                'text': content['text'],
+                'images': content['images'],
                 'source_event': 'websocket_submit',
-                'is_timeout_capture': False,
+                'is_timeout_capture': bool(data.get('is_timeout', False)),
                 'user_agent': data.get('user_agent', ''),
                 'ip_address': self._get_client_ip()
             }
             
             # 提交到反馈处理器
-            self.feedback_handler.submit_feedback(feedback_data)
+            with start_span(
+                "websocket.submit_feedback",
+                {"client_id": client_id},
+                parent=self.feedback_handler.trace_parent,
+            ):
+                accepted = self.feedback_handler.submit_feedback(feedback_data)
+            if not accepted:
+                emit('submit_rejected', {'reason': 'queue_full', 'retry_after': 1})
+                return
             
             # 发送确认
             emit('feedback_received', {
@@ -195,103 +310,181 @@ class FeedbackApp:
                 'message': '反馈已成功提交'
             })
 
+        @self.socketio.on('submit_batch_feedback')
+        def handle_submit_batch_feedback(data):
+            """处理批量反馈提交（每个问题的选中选项、文字和图片附件ID）"""
+            client_id = self._get_client_id()
+            log_message(f"[WebSocket] 收到批量反馈提交: {client_id}")
+            self.client_tracker.touch(client_id)
+            if self._reject_rate_limited(client_id):
+                return
+            
+            try:
+                answers = [
+                    {
+                        'index': int(answer['index']),
+                        'selected': [str(option) for option in answer.get('selected', [])],
+                        'text': str(answer.get('text', '')),
+                        'images': [
+                            self.feedback_handler.resolve_attachment(ref)
+                            for ref in answer.get('attachments', [])
+                        ]
+                    }
+                    for answer in data.get('answers', [])
+                ]
+            except (KeyError, TypeError, ValueError) as e:
+                emit('submit_rejected', {'reason': 'invalid_answers', 'error': str(e)})
+                return
+            
+            feedback_data = {
+                'answers': answers,
+                'source_event': 'websocket_batch_submit',
+                'is_timeout_capture': bool(data.get('is_timeout', False)),
+                'user_agent': data.get('user_agent', ''),
+                'ip_address': self._get_client_ip()
+            }
+            with start_span(
+                "websocket.submit_batch_feedback",
+                {"client_id": client_id, "batch_size": len(answers)},
+                parent=self.feedback_handler.trace_parent,
+            ):
+                accepted = self.feedback_handler.submit_batch_feedback(feedback_data)
+            if not accepted:
+                emit('submit_rejected', {'reason': 'queue_full', 'retry_after': 1})
+                return
+            
+            emit('feedback_received', {
+                'success': True,
+                'message': '反馈已成功提交'
+            })
+
     def _get_client_id(self) -> str:
         """获取客户端ID"""
         from flask import request
         return request.sid
 
+    def _reject_rate_limited(self, client_id: str) -> bool:
+        """超出提交速率时通知页面重试等待时间，返回是否已拒绝"""
+        retry_after = self.submit_limiter.check(f"ws:{client_id}")
+        if not retry_after:
+            return False
+        SUBMIT_REJECTIONS.inc(reason="rate_limited")
+        emit('submit_rejected', {'reason': 'rate_limited', 'retry_after': round(retry_after, 2)})
+        return True
+
+    def _is_resume(self, auth) -> bool:
+        """客户端是否携带了当前会话的恢复令牌"""
+        if not isinstance(auth, dict):
+            return False
+        token = auth.get('resume_token')
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self.resume_token.encode())
+
+    def _add_trace_event(self, name: str, client_id: str) -> None:
+        """在等待反馈的跟踪跨度上记录客户端事件"""
+        span = self.feedback_handler.trace_parent
+        if span is not None:
+            span.add_event(name, {"client_id": client_id})
+
     def _get_client_ip(self) -> str:
         """获取客户端IP"""
         from flask import request
         return request.environ.get('REMOTE_ADDR', 'unknown')
 
-    def start_client_monitor(self):
-        """启动客户端监控线程"""
-        if self.cleanup_thread and self.cleanup_thread.is_alive():
-            return
-            
-        self.cleanup_thread = threading.Thread(
-            target=self._monitor_clients,
-            daemon=True
-        )
-        self.cleanup_thread.start()
-        log_message("[WebSocket] 客户端监控线程已启动")
+    def add_client_listener(self, listener: Callable[[], None]) -> None:
+        """注册客户端变化监听器，客户端连接、断开或超时后被调用"""
+        self._client_listeners.append(listener)
 
-    def _monitor_clients(self):
-        """监控客户端活跃度 - 简化版本，仅负责清理不活跃连接"""
-        log_message("[WebSocket] 客户端监控开始（简化版）")
-        
-        while not self.shutdown_flag.is_set():
+    def remove_client_listener(self, listener: Callable[[], None]) -> None:
+        """移除客户端变化监听器"""
+        if listener in self._client_listeners:
+            self._client_listeners.remove(listener)
+
+    def _notify_client_listeners(self) -> None:
+        """通知所有客户端变化监听器"""
+        for listener in list(self._client_listeners):
             try:
-                current_time = time.time()
-                inactive_clients = []
-                
-                # 查找不活跃的客户端
-                for client_id, client_info in self.active_clients.items():
-                    last_heartbeat = client_info['last_heartbeat']
-                    if current_time - last_heartbeat > self.client_timeout:
-                        inactive_clients.append(client_id)
-                
-                # 清理不活跃的客户端
-                for client_id in inactive_clients:
-                    if client_id in self.active_clients:
-                        del self.active_clients[client_id]
-                        log_message(f"[WebSocket] 清理不活跃客户端: {client_id}")
-                        
+                listener()
             except Exception as e:
-                log_message(f"[WebSocket] 客户端监控错误: {e}")
-            
-            # 等待下一次检查
-            self.shutdown_flag.wait(10)  # 每10秒检查一次
+                log_message(f"[WebSocket] 客户端监听器执行错误: {e}")
 
+    def _remove_client(self, client_id: str) -> bool:
+        """移除客户端，返回是否确实移除"""
+        removed = self.client_tracker.disconnect(client_id)
+        if removed:
+            self._notify_client_listeners()
+        return removed
 
     def has_active_clients(self) -> bool:
-        """检查是否有活跃客户端"""
-        current_time = time.time()
-        active = False
-        for client_id, client_info in self.active_clients.items():
-            diff = current_time - client_info['last_heartbeat']
-            log_message(f"[WebSocket] has_active_clients check: client_id={client_id}, now={current_time}, last_heartbeat={client_info['last_heartbeat']}, timeout={self.client_timeout}, diff={diff}")
-            if diff <= self.client_timeout:
-                log_message(f"[WebSocket] has_active_clients -> True")
-                active = True
-                break
-        if not active:
-            log_message(f"[WebSocket] has_active_clients -> False")
-        return active
+        """检查是否有活跃客户端（本会话页面或收件箱页面，O(1)）"""
+        return self.client_tracker.has_active() or (self.inbox is not None and self.inbox.has_clients())
+
+    def attach_inbox(self, inbox) -> None:
+        """在收件箱中列出本会话，收件箱页面连接或断开时通知客户端监听器"""
+        self.inbox = inbox
+        inbox.add_client_listener(self._notify_client_listeners)
+
+    def detach_inbox(self) -> None:
+        """会话结束后从收件箱解除关联"""
+        if self.inbox is not None:
+            self.inbox.remove_client_listener(self._notify_client_listeners)
+            self.inbox = None
 
     def get_active_client_count(self) -> int:
         """获取活跃客户端数量"""
-        current_time = time.time()
-        count = 0
-        for client_info in self.active_clients.values():
-            if current_time - client_info['last_heartbeat'] <= self.client_timeout:
-                count += 1
-        return count
-
-    def run(self, host="127.0.0.1", port=5000, debug=False, **kwargs):
-        """运行Flask应用 - WebSocket增强版"""
+        return self.client_tracker.count
+
+    def run(
+        self,
+        host="127.0.0.1",
+        port=5000,
+        debug=False,
+        use_reloader=False,
+        on_listening: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ):
+        """运行Flask应用 - WebSocket增强版
+
+        Args:
+            on_listening: 监听套接字已开始接受连接时在服务器线程中调用，
+                之后的连接会进入监听队列，不会被拒绝
+        """
         # 检查是否已创建应用实例，如果没有则创建
         if not hasattr(self, '_flask_app') or self._flask_app is None:
             self._flask_app = self.create_app()
-        
-        # 启动客户端监控
-        self.start_client_monitor()
-        
-        # 使用SocketIO运行应用
-        self.socketio.run(
+
+        if use_reloader:
+            # 重载模式由 Flask-SocketIO 在子进程中运行服务器，无法得知监听时刻
+            self.socketio.run(
+                self._flask_app,
+                host=host,
+                port=port,
+                debug=debug,
+                use_reloader=True,
+                **kwargs
+            )
+            return
+
+        # 自行创建监听套接字（与 SocketIO.run 的 eventlet 分支一致），
+        # 绑定失败时异常直接抛给调用方，绑定成功后立即通知就绪
+        import eventlet
+        import eventlet.wsgi
+
+        listener = eventlet.listen((host, port))
+        self._flask_app.debug = debug
+        if on_listening is not None:
+            on_listening()
+        eventlet.wsgi.server(
+            listener,
             self._flask_app,
-            host=host,
-            port=port,
-            debug=debug,
+            log_output=kwargs.pop('log_output', debug),
             **kwargs
         )
 
     def stop(self):
         """停止应用和清理资源"""
         self.shutdown_flag.set()
-        if self.cleanup_thread and self.cleanup_thread.is_alive():
-            self.cleanup_thread.join(timeout=5)
+        if self.client_tracker.clear():
+            self._notify_client_listeners()
         log_message("[WebSocket] 应用已停止")
 
     def _check_memory_safety(self, data: dict, max_depth: int = 100) -> bool:
@@ -30,6 +30,10 @@ class SecurityConfig:
             self.allowed_extensions = {"png", "jpg", "jpeg", "gif", "bmp", "webp"}
 
 
+# 存活会话数达到上限时的处理方式
+SESSION_ADMISSION_MODES = ("queue", "reject")
+
+
 @dataclass
 class ServerConfig:
     """
@@ -40,14 +44,14 @@ class ServerConfig:
         port_range_end (int): 可用端口范围的结束值。
         max_port_attempts (int): 尝试查找可用端口的最大次数。
         default_timeout (int): 默认超时时间（秒）。
-        server_startup_timeout (int): 服务器启动的超时时间（秒）。
+        server_startup_timeout (int): 等待服务器线程开始监听的超时时间（秒）。启动失败时立即返回，不等到超时。
         shutdown_timeout (int): 服务器关闭的超时时间（秒）。
         daemon_threads (bool): 是否将服务器线程设置为守护线程。
-        cleanup_interval (int): 清理任务的执行间隔（秒）。
+        cleanup_interval (int): 清理任务的执行间隔（秒）。保留用于兼容，清理现由截止时间调度器按需触发。
         idle_timeout (int): 服务器实例在无活动后被清理的超时时间（秒）。
-        server_ready_max_attempts (int): 检查服务器是否就绪的最大尝试次数。
-        server_ready_check_interval (float): 检查服务器就绪状态的间隔时间（秒）。
-        server_ready_fallback_wait (float): 在服务器就绪检查失败后的回退等待时间（秒）。
+        server_ready_max_attempts (int): 保留用于兼容。服务器线程开始监听时直接通知就绪，不再轮询端口。
+        server_ready_check_interval (float): 保留用于兼容，同上。
+        server_ready_fallback_wait (float): 保留用于兼容，同上。
         connection_check_max_retries (int): 检查连接状态的最大重试次数。
         connection_check_retry_interval (float): 检查连接状态的重试间隔时间（秒）。
         connection_check_timeout (float): 检查连接状态的超时时间（秒）。
@@ -56,6 +60,23 @@ class ServerConfig:
         feedback_result_timeout (float): 等待反馈结果的超时时间（秒）。
         preferred_web_port (int): Web界面推荐使用的端口号。
         recommended_local_forward_port (int): 进行本地端口转发时推荐使用的本地端口号。
+        pool_start_concurrency (int): create_server_pool 并发启动服务器的线程数上限（默认每个会话一个线程，超过上限时分批启动）。
+        pool_start_timeout (float): create_server_pool 等待全部服务器启动的超时时间（秒）。
+        resource_notify_interval (float): 资源变更通知的最小间隔（秒），间隔内的多次变更合并为一次通知。
+        trace_enabled (bool): 是否将每次工具调用的阶段跨度写入本地 JSONL 跟踪文件。
+        trace_max_bytes (int): 跟踪文件轮转前的最大字节数。
+        trace_backup_count (int): 保留的已轮转跟踪文件数量。
+        import_warmup (bool): MCP握手完成后是否在后台线程预先导入Web服务器和图片处理模块。
+        history_enabled (bool): 是否把每次反馈记录到状态目录下的反馈历史数据库。
+        reconnect_grace_seconds (float): 浏览器断开后保留会话、等待其重新连接的时间（秒），0 表示断开即结束等待。
+        max_live_sessions (int): 同时存活的会话数上限，0 表示不限制（create_server_pool 预先启动的服务器不计入）。
+        session_admission (str): 达到上限时的处理方式：queue 按到达顺序排队，reject 立即拒绝。
+        session_queue_size (int): 排队等待准入的会话数上限，超出时立即拒绝。
+        session_queue_timeout (float): 排队等待准入的最长时间（秒），超时后拒绝。
+        submit_rate_per_second (float): 每个客户端的反馈提交速率上限（次/秒），0 表示不限制。
+        submit_burst (int): 每个客户端可连续提交的次数（令牌桶容量）。
+        inbox_enabled (bool): 是否启用反馈收件箱：所有会话（包括同一主机上其他MCP服务器进程的会话）在同一个常驻页面中列出，只有没有收件箱页面连接时才打开浏览器。
+        inbox_port (int): 收件箱服务器端口（固定使用，SSH转发提示中的端口始终有效；被其他程序占用时不启用收件箱）。
     """
 
     # 端口配置
@@ -99,6 +120,37 @@ class ServerConfig:
 
     # 连接检测配置
     browser_grace_period: float = 15.0  # 浏览器连接宽限期（秒）
+    reconnect_grace_seconds: float = 30.0  # 断线重连宽限期（秒），期间会话、草稿和截止时间保持不变
+
+    # 服务器池批量启动配置
+    pool_start_concurrency: int = 64  # 并发启动的线程数上限
+    pool_start_timeout: float = 30.0  # 批量启动整体超时（秒）
+
+    # 资源订阅配置
+    resource_notify_interval: float = 1.0  # 资源变更通知最小间隔（秒）
+
+    # 调用跟踪配置
+    trace_enabled: bool = True  # 是否写入跟踪文件
+    trace_max_bytes: int = 10 * 1024 * 1024  # 单个跟踪文件最大10MB
+    trace_backup_count: int = 3  # 保留3个轮转文件
+
+    # 启动配置
+    import_warmup: bool = True  # 握手后后台预热Web栈，首次工具调用无需等待导入
+
+    # 反馈历史配置
+    history_enabled: bool = True  # 是否记录反馈历史
+
+    # 准入控制与背压配置
+    max_live_sessions: int = 16  # 同时存活的会话数上限
+    session_admission: str = "queue"  # 达到上限时排队（queue）或立即拒绝（reject）
+    session_queue_size: int = 32  # 排队会话数上限
+    session_queue_timeout: float = 120.0  # 排队等待上限（秒）
+    submit_rate_per_second: float = 1.0  # 每个客户端的提交速率
+    submit_burst: int = 5  # 每个客户端可连续提交的次数
+
+    # 反馈收件箱配置
+    inbox_enabled: bool = True  # 是否启用单标签页收件箱
+    inbox_port: int = 8764  # 收件箱端口
 
 
 @dataclass
@@ -145,6 +197,10 @@ class WebConfig:
             }
 
 
+# 工具结果中图片的返回方式
+IMAGE_DELIVERY_MODES = ("inline", "reference")
+
+
 @dataclass
 class FeedbackConfig:
     """反馈处理相关配置"""
@@ -156,6 +212,14 @@ class FeedbackConfig:
     max_images_count: int = 10
     max_image_size: int = 5 * 1024 * 1024  # 5MB
 
+    # 页面图片处理（下发给浏览器端的图片处理 Worker）
+    image_target_bytes: int = 1024 * 1024  # 单张图片编码后的目标大小
+    image_max_dimension: int = 2560  # 长边超过该像素时缩小
+
+    # 工具结果中的图片返回方式：inline 内联图片数据，reference 返回 mcp://feedback-server/attachment/ 资源链接
+    image_delivery: str = "inline"
+    image_resource_retention: float = 3600.0  # 资源链接的有效期（秒）
+
     # 处理配置
     include_metadata: bool = True
     include_timestamp: bool = True
@@ -225,6 +289,120 @@ class ConfigManager:
                     f"将使用默认值 {self.server.browser_grace_period}。"
                 )
 
+        # 处理 MCP_RECONNECT_GRACE_SECONDS 环境变量
+        reconnect_grace_env = os.getenv("MCP_RECONNECT_GRACE_SECONDS")
+        if reconnect_grace_env:
+            try:
+                self.server.reconnect_grace_seconds = max(0.0, float(reconnect_grace_env))
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_RECONNECT_GRACE_SECONDS 的值 '{reconnect_grace_env}' 不是有效数字，"
+                    f"将使用默认值 {self.server.reconnect_grace_seconds}。"
+                )
+
+        # 处理 MCP_POOL_START_CONCURRENCY 环境变量
+        pool_concurrency_env = os.getenv("MCP_POOL_START_CONCURRENCY")
+        if pool_concurrency_env:
+            try:
+                self.server.pool_start_concurrency = max(1, int(pool_concurrency_env))
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_POOL_START_CONCURRENCY 的值 '{pool_concurrency_env}' 不是有效整数，"
+                    f"将使用默认值 {self.server.pool_start_concurrency}。"
+                )
+
+        # 处理 MCP_POOL_START_TIMEOUT 环境变量
+        pool_timeout_env = os.getenv("MCP_POOL_START_TIMEOUT")
+        if pool_timeout_env:
+            try:
+                pool_timeout = float(pool_timeout_env)
+                if pool_timeout <= 0:
+                    raise ValueError(pool_timeout_env)
+                self.server.pool_start_timeout = pool_timeout
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_POOL_START_TIMEOUT 的值 '{pool_timeout_env}' 不是有效正数，"
+                    f"将使用默认值 {self.server.pool_start_timeout}。"
+                )
+
+        # 处理 MCP_RESOURCE_NOTIFY_INTERVAL 环境变量
+        notify_interval_env = os.getenv("MCP_RESOURCE_NOTIFY_INTERVAL")
+        if notify_interval_env:
+            try:
+                self.server.resource_notify_interval = max(0.0, float(notify_interval_env))
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_RESOURCE_NOTIFY_INTERVAL 的值 '{notify_interval_env}' 不是有效数字，"
+                    f"将使用默认值 {self.server.resource_notify_interval}。"
+                )
+
+        # 处理调用跟踪相关环境变量
+        if os.getenv("MCP_TRACE_ENABLED"):
+            self.server.trace_enabled = os.getenv("MCP_TRACE_ENABLED").lower() in ("true", "1", "yes")
+
+        for env_name, attr_name in (
+            ("MCP_TRACE_MAX_BYTES", "trace_max_bytes"),
+            ("MCP_TRACE_BACKUP_COUNT", "trace_backup_count"),
+        ):
+            env_value = os.getenv(env_name)
+            if env_value:
+                try:
+                    setattr(self.server, attr_name, max(0, int(env_value)))
+                except ValueError:
+                    logging.warning(
+                        f"环境变量 {env_name} 的值 '{env_value}' 不是有效整数，"
+                        f"将使用默认值 {getattr(self.server, attr_name)}。"
+                    )
+
+        # 处理 MCP_IMPORT_WARMUP 环境变量
+        if os.getenv("MCP_IMPORT_WARMUP"):
+            self.server.import_warmup = os.getenv("MCP_IMPORT_WARMUP").lower() in ("true", "1", "yes")
+
+        # 处理 MCP_HISTORY_ENABLED 环境变量
+        if os.getenv("MCP_HISTORY_ENABLED"):
+            self.server.history_enabled = os.getenv("MCP_HISTORY_ENABLED").lower() in ("true", "1", "yes")
+
+        # 处理反馈收件箱相关环境变量
+        if os.getenv("MCP_INBOX_ENABLED"):
+            self.server.inbox_enabled = os.getenv("MCP_INBOX_ENABLED").lower() in ("true", "1", "yes")
+        inbox_port_env = os.getenv("MCP_INBOX_PORT")
+        if inbox_port_env:
+            try:
+                self.server.inbox_port = int(inbox_port_env)
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_INBOX_PORT 的值 '{inbox_port_env}' 不是有效数字，"
+                    f"将使用默认值 {self.server.inbox_port}。"
+                )
+
+        # 处理准入控制与背压相关环境变量
+        session_admission_env = os.getenv("MCP_SESSION_ADMISSION")
+        if session_admission_env:
+            if session_admission_env.lower() in SESSION_ADMISSION_MODES:
+                self.server.session_admission = session_admission_env.lower()
+            else:
+                logging.warning(
+                    f"环境变量 MCP_SESSION_ADMISSION 的值 '{session_admission_env}' 无效（可选 {'/'.join(SESSION_ADMISSION_MODES)}），"
+                    f"将使用默认值 {self.server.session_admission}。"
+                )
+
+        for env_name, attr_name, parse in (
+            ("MCP_MAX_LIVE_SESSIONS", "max_live_sessions", int),
+            ("MCP_SESSION_QUEUE_SIZE", "session_queue_size", int),
+            ("MCP_SESSION_QUEUE_TIMEOUT", "session_queue_timeout", float),
+            ("MCP_SUBMIT_RATE", "submit_rate_per_second", float),
+            ("MCP_SUBMIT_BURST", "submit_burst", int),
+        ):
+            env_value = os.getenv(env_name)
+            if env_value:
+                try:
+                    setattr(self.server, attr_name, max(parse(0), parse(env_value)))
+                except ValueError:
+                    logging.warning(
+                        f"环境变量 {env_name} 的值 '{env_value}' 不是有效数字，"
+                        f"将使用默认值 {getattr(self.server, attr_name)}。"
+                    )
+
         # Web配置
         if os.getenv("MCP_DEBUG"):
             self.web.debug_mode = os.getenv("MCP_DEBUG").lower() in ("true", "1", "yes")
@@ -236,6 +414,44 @@ class ConfigManager:
         if os.getenv("MCP_MAX_IMAGES"):
             self.feedback.max_images_count = int(os.getenv("MCP_MAX_IMAGES"))
 
+        for env_name, attr_name in (
+            ("MCP_IMAGE_TARGET_BYTES", "image_target_bytes"),
+            ("MCP_IMAGE_MAX_DIMENSION", "image_max_dimension"),
+        ):
+            env_value = os.getenv(env_name)
+            if env_value:
+                try:
+                    value = int(env_value)
+                    if value <= 0:
+                        raise ValueError(env_value)
+                    setattr(self.feedback, attr_name, value)
+                except ValueError:
+                    logging.warning(
+                        f"环境变量 {env_name} 的值 '{env_value}' 不是有效正整数，"
+                        f"将使用默认值 {getattr(self.feedback, attr_name)}。"
+                    )
+
+        # 处理图片返回方式相关环境变量
+        image_delivery_env = os.getenv("MCP_IMAGE_DELIVERY")
+        if image_delivery_env:
+            if image_delivery_env.lower() in IMAGE_DELIVERY_MODES:
+                self.feedback.image_delivery = image_delivery_env.lower()
+            else:
+                logging.warning(
+                    f"环境变量 MCP_IMAGE_DELIVERY 的值 '{image_delivery_env}' 无效（可选 {'/'.join(IMAGE_DELIVERY_MODES)}），"
+                    f"将使用默认值 {self.feedback.image_delivery}。"
+                )
+
+        retention_env = os.getenv("MCP_IMAGE_RESOURCE_RETENTION")
+        if retention_env:
+            try:
+                self.feedback.image_resource_retention = max(0.0, float(retention_env))
+            except ValueError:
+                logging.warning(
+                    f"环境变量 MCP_IMAGE_RESOURCE_RETENTION 的值 '{retention_env}' 不是有效数字，"
+                    f"将使用默认值 {self.feedback.image_resource_retention}。"
+                )
+
     def get_flask_config(self) -> Dict[str, Any]:
         """获取Flask应用配置"""
         return {
@@ -302,6 +518,23 @@ class ConfigManager:
                 "feedback_result_timeout": self.server.feedback_result_timeout,
                 "preferred_web_port": self.server.preferred_web_port,
                 "recommended_local_forward_port": self.server.recommended_local_forward_port,
+                "pool_start_concurrency": self.server.pool_start_concurrency,
+                "pool_start_timeout": self.server.pool_start_timeout,
+                "resource_notify_interval": self.server.resource_notify_interval,
+                "trace_enabled": self.server.trace_enabled,
+                "trace_max_bytes": self.server.trace_max_bytes,
+                "trace_backup_count": self.server.trace_backup_count,
+                "import_warmup": self.server.import_warmup,
+                "history_enabled": self.server.history_enabled,
+                "reconnect_grace_seconds": self.server.reconnect_grace_seconds,
+                "max_live_sessions": self.server.max_live_sessions,
+                "session_admission": self.server.session_admission,
+                "session_queue_size": self.server.session_queue_size,
+                "session_queue_timeout": self.server.session_queue_timeout,
+                "submit_rate_per_second": self.server.submit_rate_per_second,
+                "submit_burst": self.server.submit_burst,
+                "inbox_enabled": self.server.inbox_enabled,
+                "inbox_port": self.server.inbox_port,
             },
             "web": {
                 "template_folder": self.web.template_folder,
@@ -321,6 +554,10 @@ class ConfigManager:
                 "max_text_length": self.feedback.max_text_length,
                 "max_images_count": self.feedback.max_images_count,
                 "max_image_size": self.feedback.max_image_size,
+                "image_target_bytes": self.feedback.image_target_bytes,
+                "image_max_dimension": self.feedback.image_max_dimension,
+                "image_delivery": self.feedback.image_delivery,
+                "image_resource_retention": self.feedback.image_resource_retention,
                 "include_metadata": self.feedback.include_metadata,
                 "include_timestamp": self.feedback.include_timestamp,
             },
@@ -4,15 +4,124 @@
 """
 
 import base64
+import binascii
+import json
 import logging
 import queue
 import threading
-from typing import Dict, List, Optional
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 
 from mcp.server.fastmcp.utilities.types import Image as MCPImage
 from mcp.types import TextContent
 
+from backend.config import get_feedback_config
+from backend.security.csrf_handler import SecurityConfig
+from backend.utils.attachment_store import AttachmentStore
+from backend.utils.metrics import IMAGE_DELIVERIES, SUBMIT_IMAGE_COUNT, SUBMIT_PAYLOAD_BYTES, SUBMIT_REJECTIONS
+from backend.utils.tracing import Span, get_current_span, start_span, traced
+
+# 草稿图片数量上限（与页面一致）
+MAX_DRAFT_IMAGES = 5
+# 草稿文本长度上限（字符）
+MAX_DRAFT_TEXT_LENGTH = 1_000_000
+
+
+@dataclass
+class FeedbackDraft:
+    """页面增量同步的最新草稿"""
+
+    version: int = 0
+    text: str = ""
+    # 图片ID -> {"id", "data"(原始字节), "mime", "filename", "attachment_id"}，按添加顺序
+    images: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    updated_at: Optional[float] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.text.strip() and not self.images
+
+
+def _apply_text_patch(text: str, patch: Any) -> Optional[str]:
+    """应用 {"pos", "delete", "insert"} 文本增量，增量无效时返回None"""
+    if not isinstance(patch, dict):
+        return None
+    pos, delete, insert = patch.get("pos"), patch.get("delete", 0), patch.get("insert", "")
+    if not isinstance(pos, int) or not isinstance(delete, int) or not isinstance(insert, str):
+        return None
+    if pos < 0 or delete < 0 or pos + delete > len(text):
+        return None
+    return text[:pos] + insert + text[pos + delete:]
+
+
+def _parse_draft_image(image: Any) -> Dict[str, Any]:
+    """校验并规范化内联的草稿图片（data 可以是 data URL 或 base64）"""
+    if not isinstance(image, dict) or not image.get("id") or not isinstance(image.get("data"), str):
+        raise ValueError("草稿图片格式无效")
+    data = image["data"]
+    mime = image.get("mime") or "image/png"
+    if data.startswith("data:"):
+        header, _, data = data.partition(",")
+        mime = header[5:].split(";", 1)[0] or mime
+    if len(data) * 3 // 4 > SecurityConfig.MAX_CONTENT_LENGTH:
+        raise ValueError("草稿图片过大")
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("草稿图片数据无效")
+    return {
+        "id": str(image["id"]),
+        "data": raw,
+        "mime": mime,
+        "filename": str(image.get("filename") or ""),
+        "attachment_id": None,
+    }
+
+
+def normalize_submitted_image(image: Any) -> Dict[str, Any]:
+    """
+    规范化WebSocket提交的图片
+
+    页面提交的图片可能是 data URL 字符串，转换为 {"data"(base64), "filename", "mime"} 格式
+    """
+    if isinstance(image, str):
+        if image.startswith("data:"):
+            header, _, data = image.partition(",")
+            return {"data": data, "filename": "", "mime": header[5:].split(";", 1)[0]}
+        return {"data": image, "filename": ""}
+    return image
+
+
+def _image_format(image: Dict[str, Any]) -> str:
+    """根据图片的 MIME 类型确定MCP图片格式（未知时为png）"""
+    mime = image.get("mime") or ""
+    if mime.startswith("image/"):
+        return mime[len("image/"):]
+    return "png"
+
+
+def image_to_mcp(data: bytes, image_format: str = "png", mime: str = "", filename: str = "") -> Any:
+    """
+    把一张图片转换为MCP内容
+
+    默认内联为图片数据；image_delivery 配置为 reference 时保存到图片资源存储，
+    返回包含 mcp://feedback-server/attachment/ 资源链接的 JSON 文本，客户端按需读取。
+    """
+    if get_feedback_config().image_delivery == "reference":
+        from backend.utils.image_resources import get_image_resource_store
+
+        try:
+            link = get_image_resource_store().add(data, mime, filename)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"保存图片资源失败，改为内联返回: {e}")
+        else:
+            IMAGE_DELIVERIES.inc(mode="reference")
+            return TextContent(type="text", text=json.dumps({"type": "image_resource", **link}, ensure_ascii=False))
+    IMAGE_DELIVERIES.inc(mode="inline")
+    return MCPImage(data=data, format=image_format)
+
 
 class FeedbackHandler:
     """反馈数据处理器"""
@@ -22,14 +131,55 @@ class FeedbackHandler:
         self.result_queue = queue.Queue(maxsize=max_queue_size)
         self._lock = threading.Lock()
         self.max_queue_size = max_queue_size
+        # 队列已满而被拒绝的提交数
+        self.overflow_count = 0
+        self._result_listeners: List[Callable[[], None]] = []
+        # 等待反馈期间的跟踪跨度，Web端线程中的提交跨度挂在其下
+        self.trace_parent: Optional[Span] = None
+        # 页面增量同步的草稿（超时捕获和重连时直接读取）
+        self._draft = FeedbackDraft()
+        self._draft_lock = threading.Lock()
+        # 页面分块上传的附件，草稿和提交按附件ID引用
+        self.attachments = AttachmentStore()
 
-    def put_result(self, result: Dict) -> None:
-        """将结果放入队列"""
+    def add_result_listener(self, listener: Callable[[], None]) -> None:
+        """注册结果到达监听器，结果入队后被调用（用于事件驱动的等待）"""
         with self._lock:
-            self.result_queue.put(result)
+            self._result_listeners.append(listener)
 
-    def submit_feedback(self, feedback_data: Dict) -> None:
-        """提交反馈数据（用于Web表单）"""
+    def remove_result_listener(self, listener: Callable[[], None]) -> None:
+        """移除结果到达监听器"""
+        with self._lock:
+            if listener in self._result_listeners:
+                self._result_listeners.remove(listener)
+
+    def put_result(self, result: Dict) -> bool:
+        """
+        将结果放入队列
+
+        队列已满时立即拒绝（不阻塞提交线程），由调用方告知页面稍后重试
+
+        Returns:
+            是否已入队
+        """
+        with self._lock:
+            try:
+                self.result_queue.put_nowait(result)
+            except queue.Full:
+                self.overflow_count += 1
+                SUBMIT_REJECTIONS.inc(reason="queue_full")
+                return False
+            listeners = list(self._result_listeners)
+
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"结果监听器执行出错: {e}")
+        return True
+
+    def submit_feedback(self, feedback_data: Dict) -> bool:
+        """提交反馈数据（用于Web表单），返回是否已入队"""
         # 从传入的 feedback_data 字典中获取 is_timeout_capture 标记
         is_timeout_capture = feedback_data.get("is_timeout_capture", False)
 
@@ -48,7 +198,256 @@ class FeedbackHandler:
                 "ip_address": feedback_data.get("ip_address", "unknown"),
             },
         }
-        self.put_result(result)
+        with start_span(
+            "feedback.submit",
+            {"source_event": result["source_event"] or "", "image_count": len(result["images"])},
+            parent=get_current_span() or self.trace_parent,
+        ):
+            self._record_submit_metrics(result)
+            accepted = self.put_result(result)
+        # 已提交的内容不再作为草稿（被拒绝时保留，页面重试时仍可确认式提交）
+        if accepted:
+            self.clear_draft()
+        return accepted
+
+    def submit_batch_feedback(self, feedback_data: Dict) -> bool:
+        """
+        提交批量反馈（一个页面回答多个问题）
+
+        Args:
+            feedback_data: answers 为每个问题的回答
+                [{"index", "selected": [选项], "text", "images": [{"data"(base64), "filename", "mime"}]}]，
+                其余字段与 submit_feedback 相同
+
+        Returns:
+            是否已入队
+        """
+        answers = feedback_data.get("answers", [])
+        texts = [answer["text"].strip() for answer in answers if answer.get("text", "").strip()]
+        images = [image for answer in answers for image in answer.get("images", [])]
+        result = {
+            "success": True,
+            "is_batch": True,
+            "answers": answers,
+            "has_text": bool(texts),
+            "text_feedback": "\n".join(texts),
+            "has_images": bool(images),
+            "images": images,
+            "timestamp": datetime.now().isoformat(),
+            "source_event": feedback_data.get("source_event"),
+            "is_timeout_capture": feedback_data.get("is_timeout_capture", False),
+            "metadata": {
+                "user_agent": feedback_data.get("user_agent", ""),
+                "ip_address": feedback_data.get("ip_address", "unknown"),
+            },
+        }
+        with start_span(
+            "feedback.submit",
+            {"source_event": result["source_event"] or "", "image_count": len(images), "batch_size": len(answers)},
+            parent=get_current_span() or self.trace_parent,
+        ):
+            self._record_submit_metrics(result)
+            return self.put_result(result)
+
+    # =========================================================================
+    # 草稿增量同步
+    # =========================================================================
+
+    def apply_draft_update(self, update: Dict) -> Dict:
+        """
+        应用页面发来的草稿更新
+
+        Args:
+            update: 页面更新，字段：
+                base_version: 页面认为服务器当前的草稿版本
+                text: 完整文本（重新同步时使用，不要求版本一致）
+                text_patch: {"pos", "delete", "insert"} 相对 base_version 文本的增量
+                add_images: [{"id", "attachment_id", "filename"}]，引用已上传完成的附件；
+                    兼容旧页面的 [{"id", "data", "filename"}]，data 为 data URL 或 base64
+                remove_images: [图片ID]
+
+        Returns:
+            {"version", "resync", "image_ids"}。增量的基础版本与服务器不一致时
+            整个更新不应用，resync 为 True，页面应以完整文本和图片差异重新同步。
+
+        Raises:
+            ValueError: 更新格式无效或超出草稿限制
+        """
+        add_images = [self._resolve_draft_image(image) for image in update.get("add_images") or []]
+        remove_images = [str(image_id) for image_id in update.get("remove_images") or []]
+
+        with self._draft_lock:
+            draft = self._draft
+            text = draft.text
+            if "text" in update:
+                if not isinstance(update["text"], str):
+                    raise ValueError("草稿文本格式无效")
+                text = update["text"]
+            elif "text_patch" in update:
+                patched = None
+                if update.get("base_version") == draft.version:
+                    patched = _apply_text_patch(text, update["text_patch"])
+                if patched is None:
+                    return {"version": draft.version, "resync": True, "image_ids": list(draft.images)}
+                text = patched
+
+            images = dict(draft.images)
+            for image_id in remove_images:
+                images.pop(image_id, None)
+            for image in add_images:
+                images[image["id"]] = image
+
+            if len(text) > MAX_DRAFT_TEXT_LENGTH:
+                raise ValueError("草稿文本过长")
+            if len(images) > MAX_DRAFT_IMAGES:
+                raise ValueError(f"草稿图片最多 {MAX_DRAFT_IMAGES} 张")
+
+            draft.text = text
+            draft.images = images
+            draft.version += 1
+            draft.updated_at = time.time()
+            return {"version": draft.version, "resync": False, "image_ids": list(images)}
+
+    def get_draft_state(self, include_images: bool = False) -> Dict:
+        """
+        获取草稿状态（页面连接或重连时发送）
+
+        Args:
+            include_images: 是否包含图片数据（页面重新加载后恢复时需要，
+                图片以二进制发送，页面直接构造 Blob）
+        """
+        with self._draft_lock:
+            draft = self._draft
+            state = {
+                "version": draft.version,
+                "text": draft.text,
+                "image_ids": list(draft.images),
+            }
+            if include_images:
+                state["images"] = [
+                    {
+                        "id": image["id"],
+                        "data": bytes(image["data"]),
+                        "mime": image["mime"],
+                        "filename": image["filename"],
+                        "attachment_id": image["attachment_id"],
+                    }
+                    for image in draft.images.values()
+                ]
+            return state
+
+    def _resolve_draft_image(self, image: Any) -> Dict[str, Any]:
+        """把草稿图片引用的附件解析为草稿图片条目"""
+        if not isinstance(image, dict) or not image.get("attachment_id"):
+            return _parse_draft_image(image)
+        if not image.get("id"):
+            raise ValueError("草稿图片格式无效")
+        attachment = self.attachments.get(str(image["attachment_id"]))
+        if attachment is None:
+            raise ValueError("附件不存在或未上传完成")
+        # 已完成的附件不再写入，草稿直接引用其字节
+        return {
+            "id": str(image["id"]),
+            "data": attachment.data,
+            "mime": attachment.mime,
+            "filename": str(image.get("filename") or attachment.filename),
+            "attachment_id": attachment.attachment_id,
+        }
+
+    def resolve_attachment(self, reference: Dict) -> Dict[str, Any]:
+        """
+        把附件引用 {"attachment_id", "filename"} 解析为提交图片格式
+
+        Raises:
+            ValueError: 附件不存在或未上传完成
+        """
+        attachment = self.attachments.get(str(reference.get("attachment_id")))
+        if attachment is None:
+            raise ValueError("附件不存在或未上传完成")
+        return {
+            "data": base64.b64encode(attachment.data).decode("ascii"),
+            "mime": attachment.mime,
+            "filename": str(reference.get("filename") or attachment.filename),
+        }
+
+    def get_draft_content(self, version: Optional[int] = None) -> Optional[Dict]:
+        """
+        获取草稿的文本和图片，用于确认式提交
+
+        Args:
+            version: 页面确认的版本，与服务器草稿版本不一致时返回None
+
+        Returns:
+            {"text", "images"}，images 的格式与提交的图片一致
+        """
+        with self._draft_lock:
+            draft = self._draft
+            if version is not None and version != draft.version:
+                return None
+            text = draft.text
+            images = list(draft.images.values())
+        # 只在生成提交结果时编码一次
+        return {
+            "text": text,
+            "images": [
+                {
+                    "data": base64.b64encode(image["data"]).decode("ascii"),
+                    "filename": image["filename"],
+                    "mime": image["mime"],
+                }
+                for image in images
+            ],
+        }
+
+    def build_draft_result(self, timeout_reason: str) -> Optional[Dict]:
+        """
+        用草稿构建超时捕获结果，草稿为空时返回None
+
+        用户没有提交时（超时或页面断开），直接读取服务器端草稿，
+        不依赖页面在最后时刻上传。
+        """
+        with self._draft_lock:
+            if self._draft.is_empty:
+                return None
+        content = self.get_draft_content()
+        text = content["text"].strip()
+        return {
+            "success": True,
+            "has_text": bool(text),
+            "text_feedback": text,
+            "has_images": bool(content["images"]),
+            "images": content["images"],
+            "timestamp": datetime.now().isoformat(),
+            "source_event": "draft_timeout_capture",
+            "is_timeout_capture": True,
+            "is_timeout": True,
+            "timeout_reason": timeout_reason,
+            "metadata": {},
+        }
+
+    def clear_draft(self) -> None:
+        """清空草稿（版本号继续递增，旧页面的增量会触发重新同步）"""
+        with self._draft_lock:
+            draft = self._draft
+            if draft.is_empty:
+                return
+            draft.text = ""
+            draft.images = {}
+            draft.version += 1
+            draft.updated_at = time.time()
+
+    @staticmethod
+    def _record_submit_metrics(result: Dict) -> None:
+        """记录提交负载大小和图片数量"""
+        # source_event 可由表单提交，只区分两类来源以限制标签基数
+        source = "websocket" if (result.get("source_event") or "").startswith("websocket") else "http"
+        images = result["images"]
+        payload_bytes = len(result["text_feedback"].encode("utf-8"))
+        for image in images:
+            if isinstance(image, dict):
+                payload_bytes += len(image.get("data") or "")
+        SUBMIT_PAYLOAD_BYTES.observe(payload_bytes, source=source)
+        SUBMIT_IMAGE_COUNT.observe(len(images), source=source)
 
     def get_result(self, timeout: int = 300) -> Optional[Dict]:
         """从队列获取结果"""
@@ -62,6 +461,14 @@ class FeedbackHandler:
             logger.warning("结果队列为空，未获取到反馈数据")
             return None
 
+    def get_result_nowait(self) -> Optional[Dict]:
+        """非阻塞地获取结果，队列为空时返回None"""
+        try:
+            return self.result_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    @traced("feedback.convert")
     def process_feedback_to_mcp(self, result: Dict) -> List:
         """将反馈结果转换为MCP格式"""
         # 检查 result 本身是否为 None
@@ -95,13 +502,18 @@ class FeedbackHandler:
                 )
                 feedback_items.append(no_data_notice)
 
-        # 解决方案：先添加图片反馈 (MCPImage with format='png')
+        # 解决方案：先添加图片反馈（内联图片，或 reference 模式下的资源链接）
         if result.get("has_images"):
             for i, img_data in enumerate(result["images"]):
                 decoded_image_data = base64.b64decode(img_data["data"])
                 feedback_items.append(
-                    MCPImage(data=decoded_image_data, format="png")
-                )  # Use format='png'
+                    image_to_mcp(
+                        decoded_image_data,
+                        _image_format(img_data),
+                        mime=img_data.get("mime") or "",
+                        filename=img_data.get("filename") or "",
+                    )
+                )
 
         # 解决方案：后添加文本反馈 (使用TextContent对象)
         if result.get("has_text"):
@@ -118,6 +530,46 @@ class FeedbackHandler:
 
         return feedback_items
 
+    @traced("feedback.convert_batch")
+    def process_batch_to_mcp(self, result: Optional[Dict], items: List[Dict]) -> List:
+        """
+        将批量反馈结果转换为MCP格式：每个问题一段 JSON 文本，随后是该问题的图片
+
+        超时或页面未提交时不抛出异常，未回答的问题标记 answered 为 False。
+        """
+        result = result or {}
+        answers = {answer.get("index"): answer for answer in result.get("answers", [])}
+        timed_out = bool(result.get("is_timeout") or result.get("is_timeout_capture"))
+
+        feedback_items = []
+        for index, item in enumerate(items):
+            answer = answers.get(index, {})
+            selected = list(answer.get("selected") or [])
+            text = (answer.get("text") or "").strip()
+            images = answer.get("images") or []
+            summary = {
+                "index": index,
+                "id": item["id"],
+                "question": item["summary"],
+                "answered": bool(selected or text or images),
+                "selected": selected,
+                "text": text,
+                "image_count": len(images),
+            }
+            if timed_out:
+                summary["timed_out"] = True
+            feedback_items.append(TextContent(type="text", text=json.dumps(summary, ensure_ascii=False)))
+            for image in images:
+                feedback_items.append(
+                    image_to_mcp(
+                        base64.b64decode(image["data"]),
+                        _image_format(image),
+                        mime=image.get("mime") or "",
+                        filename=image.get("filename") or "",
+                    )
+                )
+        return feedback_items
+
     def clear_queue(self) -> None:
         """清空队列"""
         with self._lock:
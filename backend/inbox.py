@@ -0,0 +1,587 @@
+"""
+反馈收件箱模块
+一个常驻的浏览器标签页列出所有等待反馈的会话（按截止时间排序），
+新的反馈请求通过收件箱的 WebSocket 推送，用户在同一页面中依次回答，无需打开新标签页。
+收件箱只提交文字；需要图片的会话（pick_image）和批量反馈会话不在收件箱中列出。
+
+同一主机上的多个MCP服务器进程共用一个收件箱：第一个需要收件箱的进程监听收件箱端口，
+并在跨进程会话注册表中登记为所有者；其他进程通过收件箱的HTTP接口注册自己的会话，
+收件箱中的回答转发到会话页面的提交接口。只有没有收件箱页面连接时才打开浏览器。
+"""
+
+import json
+import logging
+import os
+import queue
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from flask import Flask, jsonify, render_template, request
+from flask_socketio import SocketIO, emit
+
+from backend.utils.admission import SubmitRateLimiter
+from backend.utils.logging_utils import log_message
+from backend.utils.metrics import SUBMIT_REJECTIONS
+from backend.utils.session_registry import get_session_registry
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 为收件箱打开浏览器后，页面连接前的这段时间内不再重复打开
+BROWSER_LAUNCH_WINDOW = 10.0
+# 其他进程注册会话时携带的令牌请求头（令牌登记在会话注册表中）
+INBOX_TOKEN_HEADER = "X-Inbox-Token"
+# 进程间HTTP请求的超时时间（秒）
+REMOTE_REQUEST_TIMEOUT = 5.0
+# 其他进程轮询收件箱页面连接状态的间隔（秒）
+CLIENT_POLL_INTERVAL = 1.0
+
+
+def parse_suggest_options(suggest_json: str) -> List[str]:
+    """解析建议选项JSON，无效时返回空列表"""
+    try:
+        options = json.loads(suggest_json) if suggest_json else []
+    except (TypeError, ValueError):
+        return []
+    return [str(option) for option in options] if isinstance(options, list) else []
+
+
+@dataclass
+class InboxSession:
+    """收件箱中等待反馈的会话
+
+    feedback_handler 为本进程会话的 FeedbackHandler，或其他进程会话的 RemoteSessionTarget。
+    """
+
+    session_id: str
+    work_summary: str
+    deadline: float
+    url: str
+    feedback_handler: Any = field(repr=False)
+    suggest: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """推送给收件箱页面的会话描述"""
+        return {
+            "session_id": self.session_id,
+            "work_summary": self.work_summary,
+            "suggest": self.suggest,
+            "deadline": self.deadline,
+            "url": self.url,
+            "created_at": self.created_at,
+        }
+
+
+class RemoteSessionTarget:
+    """其他进程中的会话：收件箱中的回答转发到会话页面的提交接口"""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def submit_feedback(self, feedback_data: Dict[str, Any]) -> bool:
+        """
+        转发回答
+
+        Returns:
+            会话页面接受时返回True，限速或队列已满时返回False
+
+        Raises:
+            OSError: 会话页面不可达或拒绝（会话已结束）
+        """
+        # 在收件箱的事件循环中执行，使用协作式的 urllib，不阻塞其他页面
+        from eventlet.green.urllib import request as green_request
+
+        forward = green_request.Request(
+            self.url.rstrip("/") + "/submit_feedback",
+            data=json.dumps({"textFeedback": feedback_data.get("text", "")}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "User-Agent": feedback_data.get("user_agent") or "inbox"},
+            method="POST",
+        )
+        try:
+            with green_request.urlopen(forward, timeout=REMOTE_REQUEST_TIMEOUT) as response:
+                return response.status == 200
+        except OSError as e:
+            if getattr(e, "code", None) in (429, 503):
+                return False
+            raise
+
+
+class BaseInbox:
+    """收件箱的公共部分：收件箱页面连接变化的监听器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client_listeners: List[Callable[[], None]] = []
+        self.port: Optional[int] = None
+        # 其他进程的收件箱不可达时为False，get_inbox 重新选择收件箱
+        self.available = True
+
+    def add_client_listener(self, listener: Callable[[], None]) -> None:
+        """注册收件箱页面连接变化监听器"""
+        with self._lock:
+            self._client_listeners.append(listener)
+
+    def remove_client_listener(self, listener: Callable[[], None]) -> None:
+        """移除收件箱页面连接变化监听器"""
+        with self._lock:
+            if listener in self._client_listeners:
+                self._client_listeners.remove(listener)
+
+    def _notify_client_listeners(self) -> None:
+        with self._lock:
+            listeners = list(self._client_listeners)
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"收件箱监听器执行出错: {e}")
+
+
+class InboxApp(BaseInbox):
+    """
+    反馈收件箱应用（本进程监听收件箱端口）
+
+    会话的注册、更新和移除来自工具调用线程，推送由收件箱服务器的事件循环执行：
+    事件放入线程安全的队列后通过自唤醒套接字通知事件循环，不在其他线程中直接操作 WebSocket。
+    其他进程通过 /api/ 下的HTTP接口注册会话，请求需携带登记在会话注册表中的令牌。
+    收件箱端口固定且众所周知，WebSocket 只接受收件箱自身来源的页面，
+    连接时需携带同一令牌（由收件箱页面内嵌，其他来源的网页无法读取）。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._sessions: Dict[str, InboxSession] = {}
+        self._clients: Set[str] = set()
+        self.token = secrets.token_urlsafe(32)
+        self._browser_opened_at: Optional[float] = None
+        self._outbox: "queue.Queue[tuple]" = queue.Queue()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_writer.setblocking(False)
+        self.submit_limiter = SubmitRateLimiter.from_config()
+        self.socketio: Optional[SocketIO] = None
+        self._flask_app: Optional[Flask] = None
+
+    def create_app(self) -> Flask:
+        """创建收件箱的Flask应用"""
+        project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        app = Flask(
+            __name__,
+            template_folder=os.path.join(project_root, "frontend", "templates"),
+            static_folder=os.path.join(project_root, "frontend", "static"),
+        )
+        app.config["SECRET_KEY"] = secrets.token_urlsafe(32)
+
+        self.socketio = SocketIO(
+            app,
+            cors_allowed_origins=self._is_allowed_origin,
+            async_mode='eventlet',
+            logger=False,
+            engineio_logger=False,
+        )
+        app.add_url_rule("/", "inbox", lambda: render_template("inbox.html", inbox_token=self.token))
+        self._register_remote_api(app)
+        self._register_socketio_events()
+        self._flask_app = app
+        return app
+
+    def _is_allowed_origin(self, origin: str) -> bool:
+        """WebSocket 连接只接受收件箱自身的来源（本机地址和收件箱端口，与SSH转发提示一致）"""
+        if self.port is None:
+            return False
+        return origin in (f"http://127.0.0.1:{self.port}", f"http://localhost:{self.port}")
+
+    def _register_remote_api(self, app: Flask) -> None:
+        """注册其他进程使用的会话接口"""
+
+        @app.before_request
+        def check_token():
+            if request.path.startswith("/api/") and not secrets.compare_digest(
+                request.headers.get(INBOX_TOKEN_HEADER, ""), self.token
+            ):
+                return jsonify({"success": False, "message": "收件箱令牌无效"}), 403
+            return None
+
+        @app.route("/api/sessions", methods=["POST"])
+        def register_session():
+            data = request.get_json(silent=True) or {}
+            url = str(data.get("url", ""))
+            # 回答只转发到本机的会话页面
+            if not url.startswith("http://127.0.0.1:"):
+                return jsonify({"success": False, "message": "会话地址无效"}), 400
+            try:
+                session = InboxSession(
+                    session_id=str(data["session_id"]),
+                    work_summary=str(data.get("work_summary", "")),
+                    deadline=float(data["deadline"]),
+                    url=url,
+                    feedback_handler=RemoteSessionTarget(url),
+                    suggest=[str(option) for option in data.get("suggest") or []],
+                    created_at=float(data.get("created_at") or time.time()),
+                )
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"success": False, "message": "会话格式无效"}), 400
+            self.add_session(session)
+            return jsonify({"success": True, "has_clients": self.has_clients()})
+
+        @app.route("/api/sessions/<session_id>", methods=["POST"])
+        def update_session(session_id):
+            try:
+                deadline = float((request.get_json(silent=True) or {})["deadline"])
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"success": False, "message": "截止时间无效"}), 400
+            self.update_deadline(session_id, deadline)
+            return jsonify({"success": True})
+
+        @app.route("/api/sessions/<session_id>", methods=["DELETE"])
+        def delete_session(session_id):
+            self.remove_session(session_id)
+            return jsonify({"success": True})
+
+        @app.route("/api/clients")
+        def clients():
+            return jsonify({"has_clients": self.has_clients()})
+
+        @app.route("/api/browser_claim", methods=["POST"])
+        def browser_claim():
+            return jsonify({"open_browser": self.claim_browser_launch()})
+
+    def _register_socketio_events(self):
+        """注册收件箱的WebSocket事件处理器"""
+
+        @self.socketio.on('connect')
+        def handle_connect(auth=None):
+            """收件箱页面连接，发送当前所有待反馈的会话（未携带收件箱令牌的连接被拒绝）"""
+            token = auth.get('token') if isinstance(auth, dict) else None
+            if not isinstance(token, str) or not secrets.compare_digest(token, self.token):
+                log_message(f"[Inbox] 拒绝未携带有效令牌的连接: {request.sid}")
+                return False
+            with self._lock:
+                self._clients.add(request.sid)
+            log_message(f"[Inbox] 收件箱页面连接: {request.sid}")
+            emit('connection_established', {
+                'client_id': request.sid,
+                'server_time': time.time(),
+                'heartbeat_interval': 0,
+            })
+            emit('inbox_state', {'sessions': self.list_sessions()})
+            self._notify_client_listeners()
+
+        @self.socketio.on('disconnect')
+        def handle_disconnect():
+            with self._lock:
+                removed = request.sid in self._clients
+                self._clients.discard(request.sid)
+            if removed:
+                log_message(f"[Inbox] 收件箱页面断开: {request.sid}")
+                self._notify_client_listeners()
+
+        @self.socketio.on('inbox_submit')
+        def handle_inbox_submit(data):
+            """回答收件箱中的一个会话"""
+            session_id = str(data.get('session_id', ''))
+            with self._lock:
+                session = self._sessions.get(session_id)
+            if session is None:
+                emit('submit_rejected', {'session_id': session_id, 'reason': 'session_closed'})
+                return
+
+            retry_after = self.submit_limiter.check(f"inbox:{request.sid}")
+            if retry_after:
+                SUBMIT_REJECTIONS.inc(reason="rate_limited")
+                emit('submit_rejected', {
+                    'session_id': session_id,
+                    'reason': 'rate_limited',
+                    'retry_after': round(retry_after, 2)
+                })
+                return
+
+            try:
+                accepted = session.feedback_handler.submit_feedback({
+                    'text': str(data.get('text', '')),
+                    'images': [],
+                    'source_event': 'websocket_inbox_submit',
+                    'user_agent': data.get('user_agent', ''),
+                    'ip_address': request.environ.get('REMOTE_ADDR', 'unknown'),
+                })
+            except OSError as e:
+                # 其他进程的会话已经结束
+                logger.info(f"收件箱会话 {session_id} 的页面不可达，移除: {e}")
+                self.remove_session(session_id)
+                emit('submit_rejected', {'session_id': session_id, 'reason': 'session_closed'})
+                return
+            if not accepted:
+                emit('submit_rejected', {'session_id': session_id, 'reason': 'queue_full', 'retry_after': 1})
+                return
+            emit('feedback_received', {'session_id': session_id, 'success': True})
+
+    def add_session(self, session: InboxSession) -> None:
+        """注册等待反馈的会话，推送给已连接的收件箱页面"""
+        with self._lock:
+            self._sessions[session.session_id] = session
+        self._post('session_added', session.to_dict())
+
+    def update_deadline(self, session_id: str, deadline: float) -> None:
+        """更新会话的截止时间（开始等待反馈时确定）"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.deadline = deadline
+            data = session.to_dict()
+        self._post('session_updated', data)
+
+    def remove_session(self, session_id: str) -> None:
+        """会话结束（已回答、超时或被清理），从收件箱页面中移除"""
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                return
+        self._post('session_removed', {'session_id': session_id})
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """待反馈的会话，按截止时间排序"""
+        with self._lock:
+            sessions = sorted(self._sessions.values(), key=lambda s: (s.deadline, s.created_at))
+            return [session.to_dict() for session in sessions]
+
+    def has_clients(self) -> bool:
+        """是否有收件箱页面连接"""
+        return bool(self._clients)
+
+    def claim_browser_launch(self) -> bool:
+        """
+        是否需要为新请求打开浏览器
+
+        没有收件箱页面连接、且最近 BROWSER_LAUNCH_WINDOW 秒内没有打开过时返回True并记录本次打开，
+        并发到达的请求只打开一个标签页。
+        """
+        with self._lock:
+            if self._clients:
+                return False
+            now = time.monotonic()
+            if self._browser_opened_at is not None and now - self._browser_opened_at < BROWSER_LAUNCH_WINDOW:
+                return False
+            self._browser_opened_at = now
+            return True
+
+    def _post(self, event: str, data: Dict[str, Any]) -> None:
+        """从任意线程提交推送，由事件循环发送"""
+        self._outbox.put((event, data))
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            # 缓冲区已满说明事件循环已有待处理的唤醒
+            pass
+
+    def flush_outbox(self) -> None:
+        """发送所有待推送的事件（在收件箱服务器的事件循环中调用）"""
+        while True:
+            try:
+                event, data = self._outbox.get_nowait()
+            except queue.Empty:
+                return
+            if self.socketio is not None:
+                self.socketio.emit(event, data)
+
+    def _pump(self) -> None:
+        """事件循环中的推送任务：等待自唤醒套接字可读后发送队列中的事件"""
+        from eventlet.hubs import trampoline
+
+        while True:
+            trampoline(self._wake_reader, read=True)
+            try:
+                self._wake_reader.recv(4096)
+            except BlockingIOError:
+                pass
+            self.flush_outbox()
+
+    def start(self, port: int) -> int:
+        """
+        启动收件箱服务器
+
+        监听套接字在调用线程中创建（不等待），请求由后台线程的事件循环处理；
+        事件循环开始前到达的连接在监听队列中等待，因此调用方无需等待服务器就绪。
+        收件箱固定使用配置的端口（不顺延），SSH转发提示中的端口始终有效。
+
+        Returns:
+            收件箱端口
+
+        Raises:
+            OSError: 无法监听端口
+        """
+        import eventlet
+
+        if self._flask_app is None:
+            self.create_app()
+        listener = eventlet.listen(("127.0.0.1", port), reuse_port=False)
+        self.port = port
+
+        def run_server() -> None:
+            import eventlet.wsgi
+
+            self._wake_reader.setblocking(False)
+            eventlet.spawn(self._pump)
+            eventlet.wsgi.server(listener, self._flask_app, log_output=False)
+
+        threading.Thread(target=run_server, name="Inbox-Server", daemon=True).start()
+        logger.info(f"反馈收件箱已在端口 {self.port} 启动")
+        return self.port
+
+
+
+class RemoteInbox(BaseInbox):
+    """
+    其他进程的收件箱（本进程不监听收件箱端口时使用）
+
+    会话通过收件箱的HTTP接口注册和移除，收件箱页面的连接状态由后台线程
+    按 CLIENT_POLL_INTERVAL 轮询，变化时通知监听器。收件箱不可达时标记为不可用，
+    之后的会话由 get_inbox 重新选择收件箱（通常由本进程接管端口）。
+    """
+
+    def __init__(self, port: int, token: str):
+        super().__init__()
+        self.port = port
+        self._token = token
+        self._session_ids: Set[str] = set()
+        self._has_clients = False
+        self._poll_thread: Optional[threading.Thread] = None
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        调用收件箱接口
+
+        Raises:
+            OSError: 收件箱不可达或拒绝请求（同时标记为不可用）
+        """
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        remote_request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}",
+            data=data,
+            headers={"Content-Type": "application/json", INBOX_TOKEN_HEADER: self._token},
+            method=method,
+        )
+        try:
+            with urllib.request.urlopen(remote_request, timeout=REMOTE_REQUEST_TIMEOUT) as response:
+                return json.loads(response.read().decode("utf-8") or "{}")
+        except OSError:
+            self.available = False
+            raise
+
+    def add_session(self, session: InboxSession) -> None:
+        """
+        把本进程的会话注册到收件箱
+
+        Raises:
+            OSError: 收件箱不可达，调用方回退为单独打开会话页面
+        """
+        response = self._request("POST", "/api/sessions", session.to_dict())
+        with self._lock:
+            self._session_ids.add(session.session_id)
+            start_polling = self._poll_thread is None
+            if start_polling:
+                self._poll_thread = threading.Thread(target=self._poll_clients, name="Inbox-ClientPoll", daemon=True)
+        self._set_has_clients(bool(response.get("has_clients")))
+        if start_polling:
+            self._poll_thread.start()
+
+    def update_deadline(self, session_id: str, deadline: float) -> None:
+        """更新会话的截止时间"""
+        try:
+            self._request("POST", f"/api/sessions/{session_id}", {"deadline": deadline})
+        except OSError as e:
+            logger.warning(f"更新收件箱会话 {session_id} 的截止时间失败: {e}")
+
+    def remove_session(self, session_id: str) -> None:
+        """会话结束后从收件箱中移除"""
+        with self._lock:
+            self._session_ids.discard(session_id)
+        try:
+            self._request("DELETE", f"/api/sessions/{session_id}")
+        except OSError as e:
+            logger.warning(f"从收件箱移除会话 {session_id} 失败: {e}")
+
+    def has_clients(self) -> bool:
+        """是否有收件箱页面连接（最近一次轮询的结果）"""
+        return self._has_clients
+
+    def claim_browser_launch(self) -> bool:
+        """由收件箱决定是否需要打开浏览器，收件箱不可达时打开"""
+        try:
+            return bool(self._request("POST", "/api/browser_claim").get("open_browser"))
+        except OSError:
+            return True
+
+    def _set_has_clients(self, has_clients: bool) -> None:
+        if has_clients != self._has_clients:
+            self._has_clients = has_clients
+            self._notify_client_listeners()
+
+    def _poll_clients(self) -> None:
+        """本进程有会话在收件箱中时轮询收件箱页面的连接状态"""
+        while True:
+            with self._lock:
+                if not self._session_ids:
+                    self._poll_thread = None
+                    return
+            try:
+                has_clients = bool(self._request("GET", "/api/clients").get("has_clients"))
+            except OSError:
+                # 收件箱所在进程已退出，等待中的会话按断线处理
+                has_clients = False
+            self._set_has_clients(has_clients)
+            time.sleep(CLIENT_POLL_INTERVAL)
+
+
+_inbox: Optional[BaseInbox] = None
+_inbox_lock = threading.Lock()
+
+
+def _elect_inbox(port: int) -> Optional[BaseInbox]:
+    """选择本进程使用的收件箱：已有其他进程监听收件箱端口时注册到它，否则由本进程监听"""
+    registry = None
+    owner = None
+    try:
+        registry = get_session_registry()
+        owner = registry.get_inbox_owner(port)
+    except sqlite3.Error as e:
+        logger.warning(f"会话注册表不可用，收件箱只在本进程内共享: {e}")
+    if owner is not None and owner["pid"] != os.getpid():
+        logger.info(f"使用进程 {owner['pid']} 的反馈收件箱（端口 {port}）")
+        return RemoteInbox(port, owner["token"])
+
+    inbox = InboxApp()
+    try:
+        inbox.start(port)
+    except OSError as e:
+        logger.warning(f"反馈收件箱端口 {port} 不可用，将为每个会话单独打开页面: {e}")
+        return None
+    if registry is not None:
+        try:
+            registry.claim_inbox(os.getpid(), port, inbox.token)
+        except sqlite3.Error as e:
+            logger.warning(f"登记收件箱所有者失败，其他进程将单独打开页面: {e}")
+    return inbox
+
+
+def get_inbox() -> Optional[BaseInbox]:
+    """
+    获取本进程使用的收件箱（第一个列入收件箱的会话启动时才选择和启动）
+
+    收件箱被禁用或无法启动时返回None，调用方回退为每个会话单独打开页面。
+    """
+    global _inbox
+    from backend.config import get_server_config
+
+    config = get_server_config()
+    if not config.inbox_enabled:
+        return None
+    with _inbox_lock:
+        if _inbox is None or not _inbox.available:
+            _inbox = _elect_inbox(config.inbox_port)
+        return _inbox
@@ -3,41 +3,149 @@
 专门用于快速获取MCP服务器端口信息，不影响现有服务器运行
 """
 
-import subprocess
-import re
-import json
 import os
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 
-def get_mcp_server_ports() -> List[int]:
-    """快速获取当前运行的MCP服务器端口列表"""
+from backend.config import get_server_config
+from backend.utils.network_utils import list_listening_ports
+from backend.utils.persistence import get_registry_file_path
+from backend.utils.session_registry import get_session_registry
+
+# 端口发现结果缓存时间（秒）
+PORT_CACHE_TTL: float = 2.0
+# 回退探测参数：短超时、并发、复用连接
+PROBE_TIMEOUT: float = 0.5
+PROBE_MAX_WORKERS: int = 16
+
+_port_cache_lock = threading.Lock()
+_port_cache: Optional[tuple] = None  # (缓存时间, 端口列表)
+
+
+def get_mcp_server_ports(use_cache: bool = True) -> List[int]:
+    """
+    快速获取当前运行的MCP服务器端口列表
+
+    优先使用会话注册表（本进程的服务器池、跨进程共享的 SQLite 注册表），
+    注册表不可用时才回退到 /proc/net/tcp 监听端口并发探测 /ping。
+    结果按 PORT_CACHE_TTL 缓存。
+
+    Args:
+        use_cache: 是否允许使用缓存结果
+    """
+    global _port_cache
+    now = time.monotonic()
+    with _port_cache_lock:
+        if use_cache and _port_cache and now - _port_cache[0] < PORT_CACHE_TTL:
+            return list(_port_cache[1])
+
     try:
-        result = subprocess.run(['lsof', '-i', '-P', '-n'], 
-                              capture_output=True, text=True, timeout=5)
-        
-        lines = result.stdout.split('\n')
+        ports = _get_registry_ports()
+        if ports is None:
+            ports = probe_feedback_ports(_list_candidate_ports())
+    except Exception:
         ports = []
-        
-        for line in lines:
-            if 'python' in line and 'LISTEN' in line and '127.0.0.1:' in line:
-                # 提取端口号
-                port_match = re.search(r'127\.0\.0\.1:(\d+)', line)
-                if port_match:
-                    port = int(port_match.group(1))
-                    # 快速检查是否是我们的服务（不等待太久）
-                    try:
-                        import requests
-                        response = requests.get(f"http://127.0.0.1:{port}/ping", timeout=1)
-                        if response.status_code == 200:
-                            ports.append(port)
-                    except:
-                        continue
-        
-        return sorted(ports)
-        
+
+    ports = sorted(set(ports))
+    with _port_cache_lock:
+        _port_cache = (time.monotonic(), ports)
+    return list(ports)
+
+
+def invalidate_port_cache() -> None:
+    """清除端口发现缓存（服务器启动或停止后调用）"""
+    global _port_cache
+    with _port_cache_lock:
+        _port_cache = None
+
+
+def _get_registry_ports() -> Optional[List[int]]:
+    """
+    从会话注册表获取运行中的端口
+
+    Returns:
+        Optional[List[int]]: 端口列表；没有可信的注册表来源时返回None
+    """
+    ports = set()
+    has_source = False
+
+    # 1. 本进程已创建的服务器池（不主动创建，避免查询时产生副作用）
+    server_pool_module = sys.modules.get("backend.server_pool")
+    pool = getattr(server_pool_module, "_server_pool", None)
+    if pool is not None:
+        has_source = True
+        for server in pool.get_pool_status().get("servers", []):
+            if server.get("status") == "running" and server.get("port"):
+                ports.add(server["port"])
+
+    # 2. 跨进程会话注册表：一次索引查询覆盖本机全部MCP进程
+    if os.path.exists(get_registry_file_path()):
+        try:
+            sessions = get_session_registry().list_sessions(status="running")
+        except sqlite3.Error:
+            sessions = None
+        if sessions is not None:
+            has_source = True
+            ports.update(session["port"] for session in sessions if session["port"])
+
+    return sorted(ports) if has_source else None
+
+
+def _list_candidate_ports() -> List[int]:
+    """获取本机回环地址上的监听端口，优先读取 /proc，其次使用 lsof"""
+    ports = list_listening_ports()
+    if ports is not None:
+        return ports
+
+    try:
+        result = subprocess.run(['lsof', '-nP', '-iTCP', '-sTCP:LISTEN', '-a', '-u', str(os.getuid())],
+                                capture_output=True, text=True, timeout=5)
     except Exception:
         return []
 
+    candidates = set()
+    for line in result.stdout.split('\n'):
+        port_match = re.search(r'(?:127\.0\.0\.1|\*|\[::1\]|localhost):(\d+) \(LISTEN\)', line)
+        if port_match:
+            candidates.add(int(port_match.group(1)))
+    return sorted(candidates)
+
+
+def probe_feedback_ports(ports: List[int]) -> List[int]:
+    """并发探测候选端口的 /ping 接口，复用连接池，返回确认为反馈服务器的端口"""
+    if not ports:
+        return []
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+    except ImportError:
+        return []
+
+    max_workers = min(PROBE_MAX_WORKERS, len(ports))
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        # 不经过系统代理，只访问本机
+        session.trust_env = False
+
+        def probe(port: int) -> Optional[int]:
+            try:
+                response = session.get(f"http://127.0.0.1:{port}/ping", timeout=PROBE_TIMEOUT)
+                if response.status_code == 200 and response.json().get("status") == "ok":
+                    return port
+            except Exception:
+                pass
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="PortProbe") as executor:
+            return [port for port in executor.map(probe, ports) if port is not None]
+
 def get_port_info_summary() -> str:
     """获取端口信息摘要，适合在MCP对话中显示"""
     ports = get_mcp_server_ports()
@@ -77,16 +185,13 @@ def get_detailed_port_info() -> Dict:
     # 快速获取运行中的端口
     running_ports = get_mcp_server_ports()
     
-    # 尝试读取状态文件
-    status_file = os.path.join(os.getcwd(), ".mcp_server_pool_status.json")
+    # 读取跨进程会话注册表汇总
     saved_info = None
-    
-    try:
-        if os.path.exists(status_file):
-            with open(status_file, 'r', encoding='utf-8') as f:
-                saved_info = json.load(f)
-    except:
-        pass
+    if os.path.exists(get_registry_file_path()):
+        try:
+            saved_info = get_session_registry().build_status_summary()
+        except sqlite3.Error:
+            saved_info = None
     
     return {
         'running_ports': running_ports,
@@ -100,4 +205,23 @@ def format_ssh_commands(ports: List[int], base_local_port: int = 8888) -> List[s
     for i, port in enumerate(ports):
         local_port = base_local_port + i
         commands.append(f"ssh -L {local_port}:127.0.0.1:{port} your_user@your_server")
-    return commands 
\ No newline at end of file
+    return commands 
+
+
+def get_inbox_ssh_hint() -> Optional[Dict]:
+    """
+    反馈收件箱的SSH端口转发提示，收件箱被禁用时返回None
+
+    本地端口与远程端口相同，收件箱页面中的地址在本地同样有效。
+    """
+    config = get_server_config()
+    if not config.inbox_enabled:
+        return None
+    port = config.inbox_port
+    return {
+        "remote_port": port,
+        "local_port": port,
+        "command": f"ssh -L {port}:127.0.0.1:{port} your_user@your_server",
+        "access_url": f"http://127.0.0.1:{port}/",
+        "purpose": "inbox",
+    }
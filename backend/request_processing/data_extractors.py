@@ -7,7 +7,7 @@ import base64
 import time
 from typing import Dict, Any, List
 from werkzeug.utils import secure_filename
-from backend.utils.image_utils import is_allowed_file, validate_image_data
+from backend.utils.image_utils import guess_image_mime, is_allowed_file, validate_image_data
 from backend.utils.logging_utils import log_message
 
 
@@ -97,6 +97,7 @@ def process_form_images(flask_request) -> List[Dict[str, Any]]:
                         "filename": filename,
                         "data": base64.b64encode(image_data).decode("utf-8"),
                         "size": len(image_data),
+                        "mime": guess_image_mime(image_data, file.mimetype or "", filename),
                     }
                 )
         except Exception as e:
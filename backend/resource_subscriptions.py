@@ -0,0 +1,149 @@
+"""
+MCP资源订阅管理模块
+实现 resources/subscribe 与 resources/unsubscribe，
+在状态迁移时向订阅者发送 notifications/resources/updated。
+多次变更按最小间隔合并为一次通知，没有订阅者时变更通知不产生任何开销。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from pydantic import AnyUrl
+
+from backend.utils.deadline_scheduler import TimerHandle, get_scheduler
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 可订阅的资源URI
+STATUS_RESOURCE_URI = "mcp://feedback-server/status"
+STATUS_COMPACT_RESOURCE_URI = "mcp://feedback-server/status/compact"
+PORTS_RESOURCE_URI = "mcp://feedback-server/ports"
+POOL_STATE_RESOURCE_URIS = (
+    STATUS_RESOURCE_URI,
+    STATUS_COMPACT_RESOURCE_URI,
+    PORTS_RESOURCE_URI,
+)
+
+
+class ResourceSubscriptionManager:
+    """资源订阅管理器"""
+
+    def __init__(self, server: Any, min_interval: float = 1.0):
+        """
+        Args:
+            server: MCP底层服务器实例（FastMCP._mcp_server）
+            min_interval: 同一资源两次通知之间的最小间隔（秒）
+        """
+        self._server = server
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        # {uri: {session: 事件循环}}
+        self._subscribers: Dict[str, Dict[Any, asyncio.AbstractEventLoop]] = {}
+        self._pending: Set[str] = set()
+        self._flush_handle: Optional[TimerHandle] = None
+        self._last_flush = 0.0
+        self.sent_count = 0
+
+        self._register_handlers()
+
+    def _register_handlers(self) -> None:
+        """注册订阅请求处理器并声明 subscribe 能力"""
+        server = self._server
+
+        @server.subscribe_resource()
+        async def handle_subscribe(uri: AnyUrl) -> None:
+            session = server.request_context.session
+            self.subscribe(str(uri), session, asyncio.get_running_loop())
+
+        @server.unsubscribe_resource()
+        async def handle_unsubscribe(uri: AnyUrl) -> None:
+            session = server.request_context.session
+            self.unsubscribe(str(uri), session)
+
+        # 底层服务器固定声明 subscribe=False，注册处理器后需要修正能力声明
+        original_get_capabilities = server.get_capabilities
+
+        def get_capabilities(notification_options, experimental_capabilities):
+            capabilities = original_get_capabilities(notification_options, experimental_capabilities)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+
+        server.get_capabilities = get_capabilities
+
+    def subscribe(self, uri: str, session: Any, loop: asyncio.AbstractEventLoop) -> None:
+        """添加订阅"""
+        with self._lock:
+            self._subscribers.setdefault(uri, {})[session] = loop
+        logger.info(f"资源订阅: {uri}")
+
+    def unsubscribe(self, uri: str, session: Any) -> None:
+        """取消订阅"""
+        with self._lock:
+            sessions = self._subscribers.get(uri)
+            if sessions is not None:
+                sessions.pop(session, None)
+                if not sessions:
+                    del self._subscribers[uri]
+        logger.info(f"取消资源订阅: {uri}")
+
+    def subscriber_count(self, uri: Optional[str] = None) -> int:
+        """订阅数量（指定uri时仅统计该资源）"""
+        with self._lock:
+            if uri is not None:
+                return len(self._subscribers.get(uri, {}))
+            return sum(len(sessions) for sessions in self._subscribers.values())
+
+    def notify_changed(self, *uris: str) -> None:
+        """
+        标记资源已变化（线程安全，可在任意线程和锁内调用）
+
+        没有订阅者的资源直接忽略；有订阅者时在最小间隔后合并发送一次通知。
+        """
+        with self._lock:
+            changed = [uri for uri in uris if uri in self._subscribers]
+            if not changed:
+                return
+            self._pending.update(changed)
+            if self._flush_handle is not None:
+                return
+            delay = max(0.0, self._last_flush + self._min_interval - time.monotonic())
+            self._flush_handle = get_scheduler().call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        """发送合并后的通知（在调度线程中执行）"""
+        with self._lock:
+            self._flush_handle = None
+            self._last_flush = time.monotonic()
+            pending, self._pending = self._pending, set()
+            targets = [
+                (uri, session, loop)
+                for uri in pending
+                for session, loop in self._subscribers.get(uri, {}).items()
+            ]
+
+        for uri, session, loop in targets:
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    session.send_resource_updated(AnyUrl(uri)), loop
+                )
+            except RuntimeError:
+                # 事件循环已关闭，会话已结束
+                self.unsubscribe(uri, session)
+                continue
+            future.add_done_callback(
+                lambda f, uri=uri, session=session: self._on_sent(f, uri, session)
+            )
+
+    def _on_sent(self, future, uri: str, session: Any) -> None:
+        """通知发送完成回调，发送失败的会话视为已断开"""
+        if future.cancelled() or future.exception() is not None:
+            logger.debug(f"资源更新通知发送失败，移除订阅: {uri}")
+            self.unsubscribe(uri, session)
+        else:
+            with self._lock:
+                self.sent_count += 1
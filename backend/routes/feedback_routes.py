@@ -3,21 +3,28 @@
 包含所有反馈相关的路由定义
 """
 
+import math
 import os
 import time
-from typing import Optional, Any
+from dataclasses import dataclass, field
+from typing import Optional, Any, List, Dict
 from flask import (
     Blueprint,
+    Flask,
+    Response,
+    current_app,
     render_template,
     request,
     jsonify,
 )
+from backend.config import get_feedback_config
 from backend.request_processing import (
     validate_request_origin_and_respond,
     validate_data_safety_and_respond,
     extract_feedback_data,
 )
 from backend.utils.logging_utils import log_message
+from backend.utils.metrics import METRICS_CONTENT_TYPE, SUBMIT_REJECTIONS, get_metrics_registry
 
 # 计算模板文件夹路径，确保蓝图能够找到模板
 _current_file_dir = os.path.dirname(os.path.abspath(__file__))
@@ -39,53 +46,108 @@ log_message(f"[DEBUG] Blueprint template folder: {_template_folder}")
 log_message(f"[DEBUG] Blueprint static folder: {_static_folder}")
 log_message(f"[DEBUG] Blueprint template folder exists: {os.path.exists(_template_folder)}")
 
-# 全局变量用于存储应用依赖
-_feedback_handler = None
-_csrf_protection = None
-_work_summary = ""
-_suggest_json = ""
-_timeout_seconds = 300
+# 路由依赖保存在各应用的 extensions 中，蓝图本身不持有会话状态
+ROUTE_STATE_KEY = "mcp_feedback_routes"
+
+
+@dataclass
+class FeedbackRouteState:
+    """
+    单个应用实例的路由依赖
+
+    同一进程中的多个会话各自拥有独立的 Flask 应用，
+    请求处理时按 current_app 查找，避免会话之间互相覆盖。
+    """
+
+    feedback_handler: Any
+    csrf_protection: Any
+    work_summary: str = ""
+    suggest_json: str = ""
+    timeout_seconds: int = 300
+    batch_items: List[Dict[str, Any]] = field(default_factory=list)
+    submit_limiter: Any = None
+    session_id: str = "default"
 
 
 def init_feedback_routes(
+    app: Flask,
     feedback_handler,
     csrf_protection,
     work_summary="",
     suggest_json="",
     timeout_seconds=300,
-):
+    batch_items=None,
+    submit_limiter=None,
+    session_id="default",
+) -> FeedbackRouteState:
     """
     初始化反馈路由的依赖
 
     Args:
+        app: 要绑定依赖的Flask应用
         feedback_handler: 反馈处理器实例
         csrf_protection: CSRF保护实例
         work_summary: 工作摘要
         suggest_json: 建议JSON
         timeout_seconds: 超时秒数
+        batch_items: 批量反馈的问题列表，非空时主页面以批量模式呈现
+        submit_limiter: 提交限速器（与WebSocket提交共用），None 表示不限速
+        session_id: 服务器池中的会话ID，页面关闭通知据此释放本会话
+
+    Returns:
+        FeedbackRouteState: 绑定到该应用的路由依赖
     """
-    global _feedback_handler, _csrf_protection, _work_summary, _suggest_json, _timeout_seconds
-    _feedback_handler = feedback_handler
-    _csrf_protection = csrf_protection
-    _work_summary = work_summary
-    _suggest_json = suggest_json
-    _timeout_seconds = timeout_seconds
+    state = FeedbackRouteState(
+        feedback_handler=feedback_handler,
+        csrf_protection=csrf_protection,
+        work_summary=work_summary,
+        suggest_json=suggest_json,
+        timeout_seconds=timeout_seconds,
+        batch_items=batch_items or [],
+        submit_limiter=submit_limiter,
+        session_id=session_id,
+    )
+    app.extensions[ROUTE_STATE_KEY] = state
+    return state
+
+
+def _route_state() -> FeedbackRouteState:
+    """获取当前请求所属应用的路由依赖"""
+    try:
+        return current_app.extensions[ROUTE_STATE_KEY]
+    except KeyError:
+        raise RuntimeError("反馈路由未初始化，请先调用 init_feedback_routes") from None
 
 
 @feedback_bp.route("/")
 def index():
     """主页面"""
-    csrf_token = _csrf_protection.generate_token()
+    state = _route_state()
+    csrf_token = state.csrf_protection.generate_token()
     
     log_message(f"[DEBUG] 开始渲染反馈页面模板")
+    feedback_config = get_feedback_config()
+    
+    if state.batch_items:
+        return render_template(
+            "batch_feedback.html",
+            work_summary=state.work_summary,
+            items=state.batch_items,
+            timeout_seconds=state.timeout_seconds,
+            csrf_token=csrf_token,
+            image_target_bytes=feedback_config.image_target_bytes,
+            image_max_dimension=feedback_config.image_max_dimension,
+        )
     
     # 直接使用Flask标准模板渲染 - 路径配置已在应用创建时正确设置
     return render_template(
         "feedback.html",
-        work_summary=_work_summary,
-        suggest_json=_suggest_json,
-        timeout_seconds=_timeout_seconds,
+        work_summary=state.work_summary,
+        suggest_json=state.suggest_json,
+        timeout_seconds=state.timeout_seconds,
         csrf_token=csrf_token,
+        image_target_bytes=feedback_config.image_target_bytes,
+        image_max_dimension=feedback_config.image_max_dimension,
     )
 
 
@@ -103,6 +165,16 @@ def submit_feedback():
         if session_close_result:
             return session_close_result
 
+        # 按来源地址限速（在解析和校验数据之前，超限的请求不再消耗解码开销）
+        state = _route_state()
+        if state.submit_limiter is not None:
+            retry_after = state.submit_limiter.check(f"http:{request.remote_addr}")
+            if retry_after:
+                SUBMIT_REJECTIONS.inc(reason="rate_limited")
+                response = jsonify({"success": False, "reason": "rate_limited", "message": "提交过于频繁，请稍后重试"})
+                response.headers["Retry-After"] = str(math.ceil(retry_after))
+                return response, 429
+
         # 处理反馈数据
         feedback_data = extract_feedback_data(request)
 
@@ -111,8 +183,11 @@ def submit_feedback():
         if safety_check_result:
             return safety_check_result
 
-        # 提交反馈到处理队列
-        _feedback_handler.submit_feedback(feedback_data)
+        # 提交反馈到处理队列（队列已满时不阻塞，告知稍后重试）
+        if not state.feedback_handler.submit_feedback(feedback_data):
+            response = jsonify({"success": False, "reason": "queue_full", "message": "服务器繁忙，请稍后重试"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
 
         return jsonify({"success": True, "message": "反馈提交成功！感谢您的反馈。"})
 
@@ -126,6 +201,12 @@ def ping():
     return jsonify({"status": "ok", "timestamp": time.time()})
 
 
+@feedback_bp.route("/metrics")
+def metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(get_metrics_registry().render(), content_type=METRICS_CONTENT_TYPE)
+
+
 def _handle_session_close_notification(flask_request) -> Optional[Any]:
     """
     处理会话关闭通知
@@ -143,13 +224,14 @@ def _handle_session_close_notification(flask_request) -> Optional[Any]:
     if not json_data or json_data.get("status") != "session_closed":
         return None
 
-    log_message("[INFO] 收到窗口关闭通知，立即释放服务器资源")
+    session_id = _route_state().session_id
+    log_message(f"[INFO] 收到窗口关闭通知，立即释放会话 {session_id} 的服务器资源")
     try:
-        # 获取服务器池实例并立即释放资源
+        # 获取服务器池实例并立即释放本应用所属的会话
         from backend.server_pool import get_server_pool
 
         server_pool = get_server_pool()
-        server_pool.release_server(immediate=True)
+        server_pool.release_server(session_id, immediate=True)
         log_message("[INFO] 服务器资源释放成功")
     except Exception as e:
         log_message(f"[ERROR] 释放服务器资源时出错: {e}")
@@ -6,10 +6,18 @@ MCP反馈通道服务器 v3.0
 import argparse
 import base64
 import codecs
+import contextvars
 import json
 import os
+import sqlite3
 import sys
-from typing import List
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
 
 # 确保项目根目录在模块搜索路径中
 import pathlib
@@ -20,13 +28,26 @@ if str(_project_root) not in sys.path:
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.utilities.types import Image as MCPImage
+from mcp.types import InitializedNotification, TextContent
 
 # 使用绝对导入，以backend为顶级包
-from backend.server_pool import get_managed_server, release_managed_server
+from backend.server_pool import add_state_listener, get_server_pool, make_session_key, release_managed_server
+from backend.resource_subscriptions import POOL_STATE_RESOURCE_URIS, ResourceSubscriptionManager
+from backend.feedback_handler import _image_format, image_to_mcp
+from backend.port_info import get_inbox_ssh_hint
+from backend.utils.history_store import get_history_store
+from backend.utils.image_resources import (
+    ATTACHMENT_RESOURCE_TYPES,
+    ATTACHMENT_URI_PREFIX,
+    get_image_resource_store,
+)
 from backend.utils.image_utils import get_image_info
+from backend.utils.metrics import get_metrics_registry
+from backend.utils.tracing import get_current_span, traced
 from backend.utils.custom_exceptions import FeedbackTimeoutError, ImageSelectionError
 from backend.version import __version__
 from backend.config import get_server_config
+from backend.warmup import start_warmup
 
 
 # 编码配置：确保在Windows环境下正确处理Unicode字符
@@ -52,166 +73,204 @@ _configure_encoding()
 # 创建MCP服务器
 mcp = FastMCP("MCP反馈通道 v3.0", dependencies=["flask", "pillow"])
 
+# 资源订阅：池状态迁移时（会话启动/释放、客户端连接、收到反馈）通知订阅者
+resource_subscriptions = ResourceSubscriptionManager(
+    mcp._mcp_server,
+    min_interval=get_server_config().resource_notify_interval,
+)
+add_state_listener(lambda: resource_subscriptions.notify_changed(*POOL_STATE_RESOURCE_URIS))
+
+
+async def _on_initialized(notification: InitializedNotification) -> None:
+    """握手完成后在后台预热Web服务器和图片处理模块（本模块导入时不加载它们）"""
+    if get_server_config().import_warmup:
+        start_warmup()
+
+
+mcp._mcp_server.notification_handlers[InitializedNotification] = _on_initialized
+
 
 # =============================================================================
 # MCP资源定义 - Resources
 # 将服务器状态信息作为标准MCP资源暴露
 # =============================================================================
 
-@mcp.resource("mcp://feedback-server/status")
-def get_server_status_resource() -> str:
-    """
-    MCP标准资源：服务器池状态信息
+# 状态资源缓存：{compact: (版本键, 序列化后的JSON)}
+# 版本键由本进程服务器池的状态版本和会话注册表的数据版本组成，
+# 没有状态迁移时重复读取只需一次字典查找
+_status_resource_cache: Dict[bool, Tuple[Tuple[int, int], str]] = {}
+_status_resource_lock = threading.Lock()
+
+# 会话注册表数据版本的检查间隔（秒）：间隔内的读取沿用上次查询的版本号，
+# 其他进程的变更最多延迟该时长反映到状态资源中，本进程的变更立即反映
+REGISTRY_VERSION_CHECK_INTERVAL: float = 1.0
+# 最近一次查询的注册表数据版本：(查询时间 time.monotonic(), 版本号)
+_registry_version: Tuple[float, int] = (float("-inf"), -1)
+
+
+def _dump_resource(data: Dict, compact: bool = False) -> str:
+    """序列化资源数据，compact=True 时输出紧凑JSON"""
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def _get_status_version_key(server_pool) -> Tuple[int, int]:
+    """获取状态资源的版本键（注册表数据版本按 REGISTRY_VERSION_CHECK_INTERVAL 限频查询）"""
+    global _registry_version
+    from backend.utils.session_registry import get_session_registry
     
-    提供持久化的服务器池状态，支持：
-    - 跨会话访问
-    - 多客户端共享 
-    - 离线查询
-    - 状态验证
+    checked_at, registry_version = _registry_version
+    now = time.monotonic()
+    if now - checked_at >= REGISTRY_VERSION_CHECK_INTERVAL:
+        try:
+            registry_version = get_session_registry().data_version()
+        except sqlite3.Error:
+            registry_version = -1
+        _registry_version = (now, registry_version)
+    return server_pool.get_status_version(), registry_version
+
+
+def _build_status_resource_data(server_pool, version_key: Tuple[int, int]) -> Dict:
+    """根据池快照和会话注册表构建状态资源数据"""
+    from backend.server_pool import REGISTRY_FILE
+    from backend.utils.session_registry import get_session_registry
     
-    Returns:
-        JSON格式的服务器状态信息
-    """
+    snapshot = server_pool.get_status_snapshot()
     try:
-        from backend.server_pool import get_server_pool, load_server_status_from_file
-        from backend.port_info import get_detailed_port_info
-        import json
-        import time
-        
-        # 1. 从持久化文件获取状态
-        saved_status = load_server_status_from_file()
-        
-        # 2. 获取实时端口信息
-        detailed_info = get_detailed_port_info()
-        
-        # 3. 尝试获取当前服务器池状态（如果可用）
-        try:
-            server_pool = get_server_pool()
-            current_status = server_pool.get_pool_status()
-        except:
-            current_status = None
-        
-        # 4. 构建标准MCP资源格式
-        resource_data = {
-            "mcp_resource": {
-                "uri": "mcp://feedback-server/status",
-                "name": "服务器池状态",
-                "description": "MCP反馈服务器池的完整状态信息",
-                "mimeType": "application/json",
-                "generated_at": time.time(),
-                "generated_at_readable": time.strftime('%Y-%m-%d %H:%M:%S')
-            },
-            "persistence": {
-                "enabled": saved_status is not None,
-                "last_saved": saved_status.get('last_updated_readable') if saved_status else None,
-                "file_path": ".mcp_server_pool_status.json",
-                "auto_save": True
-            },
-            "data_sources": {
-                "persistent": {
-                    "available": saved_status is not None,
-                    "servers_count": len(saved_status.get('servers', [])) if saved_status else 0,
-                    "ports": saved_status.get('ports_in_use', []) if saved_status else []
-                },
-                "runtime": {
-                    "available": current_status is not None,
-                    "servers_count": current_status.get('total_servers', 0) if current_status else 0,
-                    "active_count": current_status.get('active_servers', 0) if current_status else 0,
-                    "ports": detailed_info.get('running_ports', [])
-                }
+        registry_sessions = get_session_registry().list_sessions()
+    except sqlite3.Error:
+        registry_sessions = None
+    
+    resource_data = {
+        "mcp_resource": {
+            "uri": "mcp://feedback-server/status",
+            "name": "服务器池状态",
+            "description": "MCP反馈服务器池的完整状态信息",
+            "mimeType": "application/json",
+            "version": list(version_key),
+            "generated_at": time.time(),
+            "generated_at_readable": time.strftime('%Y-%m-%d %H:%M:%S')
+        },
+        "persistence": {
+            "enabled": registry_sessions is not None,
+            "last_saved": None,
+            "registry_path": REGISTRY_FILE,
+            "auto_save": True
+        },
+        "data_sources": {
+            "persistent": {
+                "available": registry_sessions is not None,
+                "servers_count": len(registry_sessions) if registry_sessions else 0,
+                "ports": [s['port'] for s in registry_sessions or [] if s['port']]
             },
-            "servers": [],
-            "ssh_commands": [],
-            "access_urls": []
+            "runtime": {
+                "available": True,
+                "servers_count": snapshot['total_servers'],
+                "active_count": snapshot['active_servers'],
+                "ports": snapshot['ports_in_use']
+            }
+        },
+        "admission": snapshot.get('admission'),
+        "servers": [],
+        "ssh_commands": [],
+        "access_urls": []
+    }
+    
+    # 合并服务器信息：按 (pid, session_id) 建立索引，单次遍历
+    own_pid = snapshot['pid']
+    merged: Dict[Tuple[int, str], Dict] = {}
+    
+    for entry in snapshot['servers']:
+        merged[(own_pid, entry['session_id'])] = dict(
+            entry,
+            pid=own_pid,
+            data_source="runtime",
+            verified_running=entry['status'] == "running"
+        )
+    
+    last_heartbeat = None
+    for session in registry_sessions or []:
+        key = (session['pid'], session['session_id'])
+        last_heartbeat = max(last_heartbeat or 0, session['heartbeat'])
+        if key in merged:
+            merged[key]['data_source'] = "persistent+runtime"
+            continue
+        if session['pid'] == own_pid:
+            # 本进程已移除但尚未同步到注册表的会话
+            continue
+        work_summary = session['work_summary'] or ""
+        merged[key] = {
+            "session_id": session['session_id'],
+            "pid": session['pid'],
+            "port": session['port'],
+            "status": session['status'],
+            "work_summary": work_summary[:50] + "..." if len(work_summary) > 50 else work_summary,
+            "timeout_seconds": session['timeout_seconds'],
+            "created_at": session['created_at'],
+            "last_activity": session['last_activity'],
+            "url": f"http://127.0.0.1:{session['port']}" if session['port'] else None,
+            "data_source": "persistent",
+            # 心跳未超时即说明所属进程存活
+            "verified_running": session['status'] == "running"
         }
+    
+    if last_heartbeat:
+        resource_data['persistence']['last_saved'] = time.strftime(
+            '%Y-%m-%d %H:%M:%S', time.localtime(last_heartbeat)
+        )
+    
+    all_servers = list(merged.values())
+    resource_data['servers'] = all_servers
+    resource_data['access_urls'] = [s['url'] for s in all_servers if s['verified_running'] and s['url']]
+    
+    # 生成SSH转发命令
+    running_ports = [s['port'] for s in all_servers if s['verified_running'] and s['port']]
+    base_port = 8888
+    
+    for i, port in enumerate(sorted(running_ports)):
+        local_port = base_port + i
+        resource_data['ssh_commands'].append({
+            "remote_port": port,
+            "local_port": local_port,
+            "command": f"ssh -L {local_port}:127.0.0.1:{port} your_user@your_server",
+            "access_url": f"http://127.0.0.1:{local_port}/"
+        })
+    # 收件箱页面集中回答所有会话，同样需要转发
+    inbox_hint = get_inbox_ssh_hint()
+    if inbox_hint:
+        resource_data['ssh_commands'].append(inbox_hint)
+    
+    # 添加资源元数据
+    resource_data['statistics'] = {
+        "total_known_servers": len(all_servers),
+        "running_servers": len(running_ports),
+        "persistent_servers": sum(1 for s in all_servers if 'persistent' in s['data_source']),
+        "runtime_only_servers": sum(1 for s in all_servers if s['data_source'] == 'runtime'),
+        "accessible_urls_count": len(resource_data['access_urls']),
+        "ssh_commands_count": len(resource_data['ssh_commands'])
+    }
+    
+    return resource_data
+
+
+def _render_status_resource(compact: bool = False) -> str:
+    """渲染状态资源，同一版本内直接返回缓存的JSON"""
+    try:
+        server_pool = get_server_pool()
+        version_key = _get_status_version_key(server_pool)
         
-        # 5. 合并服务器信息
-        all_servers = []
-        verified_ports = detailed_info.get('running_ports', [])
-        
-        # 从持久化数据获取服务器
-        if saved_status and saved_status.get('servers'):
-            for server in saved_status['servers']:
-                server_info = {
-                    "session_id": server.get('session_id'),
-                    "port": server.get('port'),
-                    "work_summary": server.get('work_summary'),
-                    "timeout_seconds": server.get('timeout_seconds'),
-                    "status": server.get('status'),
-                    "data_source": "persistent",
-                    "verified_running": server.get('port') in verified_ports if server.get('port') else False,
-                    "url": f"http://127.0.0.1:{server.get('port')}" if server.get('port') else None,
-                    "created_at": server.get('created_at'),
-                    "uptime": server.get('uptime'),
-                    "idle_time": server.get('idle_time')
-                }
-                
-                # 如果服务器仍在运行，添加到访问URL列表
-                if server_info['verified_running']:
-                    resource_data['access_urls'].append(server_info['url'])
-                
-                all_servers.append(server_info)
-        
-        # 从运行时数据补充服务器
-        if current_status and current_status.get('servers'):
-            for server in current_status['servers']:
-                # 检查是否已经在持久化数据中
-                existing = next((s for s in all_servers if s['session_id'] == server.get('session_id')), None)
-                
-                if existing:
-                    # 更新运行时数据
-                    existing.update({
-                        "data_source": "persistent+runtime",
-                        "verified_running": True,
-                        "uptime": server.get('uptime'),
-                        "idle_time": server.get('idle_time')
-                    })
-                else:
-                    # 新的运行时服务器
-                    server_info = {
-                        "session_id": server.get('session_id'),
-                        "port": server.get('port'),
-                        "work_summary": server.get('work_summary'),
-                        "timeout_seconds": server.get('timeout_seconds'),
-                        "status": server.get('status'),
-                        "data_source": "runtime",
-                        "verified_running": True,
-                        "url": server.get('url'),
-                        "uptime": server.get('uptime'),
-                        "idle_time": server.get('idle_time')
-                    }
-                    
-                    if server_info['url']:
-                        resource_data['access_urls'].append(server_info['url'])
-                    
-                    all_servers.append(server_info)
-        
-        resource_data['servers'] = all_servers
-        
-        # 6. 生成SSH转发命令
-        running_ports = [s['port'] for s in all_servers if s['verified_running'] and s['port']]
-        base_port = 8888
-        
-        for i, port in enumerate(sorted(running_ports)):
-            local_port = base_port + i
-            resource_data['ssh_commands'].append({
-                "remote_port": port,
-                "local_port": local_port,
-                "command": f"ssh -L {local_port}:127.0.0.1:{port} your_user@your_server",
-                "access_url": f"http://127.0.0.1:{local_port}/"
-            })
-        
-        # 7. 添加资源元数据
-        resource_data['statistics'] = {
-            "total_known_servers": len(all_servers),
-            "running_servers": len([s for s in all_servers if s['verified_running']]),
-            "persistent_servers": len([s for s in all_servers if 'persistent' in s['data_source']]),
-            "runtime_only_servers": len([s for s in all_servers if s['data_source'] == 'runtime']),
-            "accessible_urls_count": len(resource_data['access_urls']),
-            "ssh_commands_count": len(resource_data['ssh_commands'])
-        }
+        cached = _status_resource_cache.get(compact)
+        if cached is not None and cached[0] == version_key:
+            return cached[1]
         
-        return json.dumps(resource_data, ensure_ascii=False, indent=2)
+        with _status_resource_lock:
+            cached = _status_resource_cache.get(compact)
+            if cached is not None and cached[0] == version_key:
+                return cached[1]
+            payload = _dump_resource(_build_status_resource_data(server_pool, version_key), compact)
+            _status_resource_cache[compact] = (version_key, payload)
+            return payload
         
     except Exception as e:
         import traceback
@@ -228,7 +287,39 @@ def get_server_status_resource() -> str:
                 "traceback": traceback.format_exc()
             }
         }
-        return json.dumps(error_data, ensure_ascii=False, indent=2)
+        return _dump_resource(error_data, compact)
+
+
+@mcp.resource("mcp://feedback-server/status")
+def get_server_status_resource() -> str:
+    """
+    MCP标准资源：服务器池状态信息
+    
+    提供持久化的服务器池状态，支持：
+    - 跨会话访问
+    - 多客户端共享 
+    - 离线查询
+    - 状态验证
+    
+    状态快照随状态迁移增量维护，序列化结果按版本缓存。
+    
+    Returns:
+        JSON格式的服务器状态信息
+    """
+    return _render_status_resource(compact=False)
+
+
+@mcp.resource("mcp://feedback-server/status/compact")
+def get_server_status_compact_resource() -> str:
+    """
+    MCP标准资源：服务器池状态信息（紧凑JSON）
+    
+    内容与 mcp://feedback-server/status 相同，不含缩进和多余空白。
+    
+    Returns:
+        紧凑JSON格式的服务器状态信息
+    """
+    return _render_status_resource(compact=True)
 
 
 @mcp.resource("mcp://feedback-server/ports")
@@ -272,6 +363,9 @@ def get_ports_resource() -> str:
                 "local_port": local_port,
                 "command": f"ssh -L {local_port}:127.0.0.1:{port} your_user@your_server"
             })
+        inbox_hint = get_inbox_ssh_hint()
+        if inbox_hint:
+            resource_data['ssh_commands'].append(inbox_hint)
         
         return json.dumps(resource_data, ensure_ascii=False, indent=2)
         
@@ -290,6 +384,112 @@ def get_ports_resource() -> str:
         return json.dumps(error_data, ensure_ascii=False, indent=2)
 
 
+@mcp.resource("mcp://feedback-server/metrics", mime_type="text/plain")
+def get_metrics_resource() -> str:
+    """
+    MCP标准资源：反馈管道运行指标
+    
+    与Web服务器 /metrics 端点内容相同（Prometheus 文本格式），
+    包括启动各阶段耗时、等待连接耗时、用户思考时间、提交负载、
+    结果队列深度、活跃WebSocket客户端、CSRF令牌数量和清理延迟。
+    
+    Returns:
+        Prometheus 文本格式的指标
+    """
+    return get_metrics_registry().render()
+
+
+def _parse_history_time(value: str) -> Optional[float]:
+    """解析历史查询的时间参数：ISO 8601 字符串或 Unix 时间戳，空值返回None"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"无效的时间: {value!r}，应为 ISO 8601 格式或 Unix 时间戳")
+
+
+def _render_history_page(uri: str, cursor: str = "") -> str:
+    """渲染反馈历史资源（一页），包含下一页的资源URI"""
+    store = get_history_store()
+    if store is None:
+        page = {"items": [], "next_cursor": None, "enabled": False}
+    else:
+        page = store.query(cursor=cursor)
+    resource_data = {
+        "mcp_resource": {
+            "uri": uri,
+            "name": "反馈历史",
+            "description": "按提交时间倒序的反馈历史",
+            "mimeType": "application/json",
+            "generated_at": time.time(),
+        },
+        **page,
+        "next_uri": (
+            f"mcp://feedback-server/history/{page['next_cursor']}" if page["next_cursor"] else None
+        ),
+    }
+    return _dump_resource(resource_data)
+
+
+@mcp.resource("mcp://feedback-server/history")
+def get_history_resource() -> str:
+    """
+    MCP标准资源：最近的反馈历史
+    
+    返回最新一页记录，next_uri 指向下一页。
+    需要按文字、会话或时间筛选时使用 query_feedback_history 工具。
+    
+    Returns:
+        JSON格式的反馈历史
+    """
+    return _render_history_page("mcp://feedback-server/history")
+
+
+@mcp.resource("mcp://feedback-server/history/{cursor}")
+def get_history_page_resource(cursor: str) -> str:
+    """
+    MCP动态资源模板：反馈历史分页
+    
+    cursor 为上一页返回的 next_cursor。
+    
+    Returns:
+        JSON格式的反馈历史
+    """
+    return _render_history_page(f"mcp://feedback-server/history/{cursor}", cursor)
+
+
+def _register_attachment_resource(extension: str, mime_type: str) -> None:
+    """为一种图片类型注册附件资源模板（资源模板的 mimeType 固定，因此每种类型一个模板）"""
+
+    @mcp.resource(
+        f"{ATTACHMENT_URI_PREFIX}{{ref}}.{extension}",
+        name=f"attachment_{extension}",
+        description="反馈图片（reference 模式下工具结果中的资源链接）",
+        mime_type=mime_type,
+    )
+    def get_attachment_resource(ref: str) -> bytes:
+        """
+        MCP动态资源模板：反馈图片
+        
+        ref 为图片的 SHA-256，尺寸变体为 SHA-256-长边像素。
+        链接在 MCP_IMAGE_RESOURCE_RETENTION 秒内有效。
+        
+        Returns:
+            图片数据
+        """
+        data, _ = get_image_resource_store().read(ref, extension)
+        return data
+
+
+for _extension, _mime_type in ATTACHMENT_RESOURCE_TYPES.items():
+    _register_attachment_resource(_extension, _mime_type)
+
+
 @mcp.resource("mcp://feedback-server/config/{config_type}")
 def get_config_resource(config_type: str) -> str:
     """
@@ -310,7 +510,7 @@ def get_config_resource(config_type: str) -> str:
         import time
         import json
         from backend.config import get_server_config
-        from backend.server_pool import load_server_status_from_file
+        from backend.server_pool import load_server_status_from_file, REGISTRY_FILE
         
         base_resource = {
             "mcp_resource": {
@@ -333,6 +533,9 @@ def get_config_resource(config_type: str) -> str:
                     "idle_timeout": getattr(server_config, 'idle_timeout', 1800),
                     "cleanup_interval": getattr(server_config, 'cleanup_interval', 60),
                     "browser_grace_period": getattr(server_config, 'browser_grace_period', 15),
+                    "reconnect_grace_seconds": getattr(server_config, 'reconnect_grace_seconds', 30),
+                    "inbox_enabled": getattr(server_config, 'inbox_enabled', True),
+                    "inbox_port": getattr(server_config, 'inbox_port', 8764),
                     "recommended_local_forward_port": getattr(server_config, 'recommended_local_forward_port', 8888)
                 },
                 "description": "MCP反馈服务器的核心配置参数"
@@ -356,6 +559,9 @@ def get_config_resource(config_type: str) -> str:
                             "access_url": f"http://127.0.0.1:{local_port}/",
                             "work_summary": server.get('work_summary', '')
                         })
+            inbox_hint = get_inbox_ssh_hint()
+            if inbox_hint:
+                ssh_configs.append(inbox_hint)
             
             base_resource.update({
                 "ssh_forwards": ssh_configs,
@@ -395,9 +601,9 @@ def get_config_resource(config_type: str) -> str:
             
             base_resource.update({
                 "backup_files": backup_info,
-                "status_file": {
-                    "path": ".mcp_server_pool_status.json",
-                    "exists": os.path.exists(".mcp_server_pool_status.json")
+                "registry_file": {
+                    "path": REGISTRY_FILE,
+                    "exists": os.path.exists(REGISTRY_FILE)
                 },
                 "description": "备份和导出文件的管理信息"
             })
@@ -430,8 +636,12 @@ def get_config_resource(config_type: str) -> str:
 # =============================================================================
 
 @mcp.tool()
+@traced("tool.collect_feedback")
 def collect_feedback(
-    work_summary: str = "", timeout_seconds: int = 300, suggest: List[str] = None
+    work_summary: str = "",
+    timeout_seconds: int = 300,
+    suggest: List[str] = None,
+    idempotency_key: str = "",
 ) -> List:
     """
     收集用户反馈的交互式工具（Web版本）
@@ -443,22 +653,30 @@ def collect_feedback(
         work_summary: AI完成的工作内容汇报
         timeout_seconds: 对话框超时时间（秒），默认300秒（5分钟）
         suggest: 建议选项列表，格式如：["选项1", "选项2", "选项3"]
+        idempotency_key: 幂等键（可选）。参数相同的重试挂接到原会话并返回同一结果；
+            需要同时发起内容相同但彼此独立的调用时，为每个调用传入不同的值
 
     Returns:
         包含用户反馈内容的列表，可能包含文本和图片
     """
-    # 使用服务器池获取托管的服务器实例
-    session_id = f"feedback_{id(work_summary)}_{timeout_seconds}"
-    server_manager = get_managed_server(session_id)
+    # 将建议列表转换为JSON字符串
+    suggest_json = ""
+    if suggest and isinstance(suggest, list):
+        suggest_json = json.dumps(suggest, ensure_ascii=False)
 
-    try:
-        # 将建议列表转换为JSON字符串
-        suggest_json = ""
-        if suggest and isinstance(suggest, list):
-            suggest_json = json.dumps(suggest, ensure_ascii=False)
+    # 会话ID由调用内容和幂等键确定，重试的调用复用原会话
+    session_id = make_session_key(
+        "feedback",
+        {"work_summary": work_summary, "timeout_seconds": timeout_seconds, "suggest": suggest_json},
+        idempotency_key,
+    )
+    get_current_span().set_attribute("session_id", session_id)
 
-        # 启动Web服务器
-        port = server_manager.start_server(work_summary, timeout_seconds, suggest_json)
+    try:
+        # 在池中启动Web服务器并等待反馈（会话标记为运行中，等待期间不会被空闲过期清理）
+        server_manager, result = get_server_pool().run_session(
+            session_id, work_summary, timeout_seconds, suggest_json
+        )
 
         server_config = get_server_config()
         # 8888 是 recommended_local_forward_port 的临时默认值，最终将由 config.py 定义
@@ -472,11 +690,10 @@ def collect_feedback(
         # print(f"➡️ 设置转发后，请在您本地的浏览器中打开: http://127.0.0.1:{recommended_local_port}/")
         # print(f"⏰ 等待用户反馈... (远程服务超时: {timeout_seconds}秒)")
 
-        # 等待用户反馈
-        result = server_manager.wait_for_feedback(timeout_seconds)
-
         if result is None:
             raise FeedbackTimeoutError(timeout_seconds)
+        if result.get("timeout_reason"):
+            get_current_span().set_attribute("timeout_reason", result["timeout_reason"])
 
         # 转换为MCP格式
         mcp_result = server_manager.feedback_handler.process_feedback_to_mcp(result)
@@ -494,27 +711,188 @@ def collect_feedback(
         raise Exception(f"启动反馈通道失败: {str(e)}")
 
 
+# 单次批量反馈的问题数量上限
+MAX_BATCH_ITEMS = 20
+
+
+def _validate_batch_items(items: List[dict]) -> List[Dict]:
+    """
+    校验并规范化批量反馈的问题列表
+
+    Returns:
+        规范化后的问题列表 [{"id", "summary", "suggest", "request_image"}]
+
+    Raises:
+        ValueError: 列表为空、超过上限或条目格式错误（汇总所有错误）
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("items必须是非空列表")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"items最多 {MAX_BATCH_ITEMS} 项，实际 {len(items)} 项")
+
+    normalized, errors, seen_ids = [], [], set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not str(item.get('summary', '')).strip():
+            errors.append(f"第{index + 1}项: 必须包含非空的summary字段")
+            continue
+        suggest = item.get('suggest') or []
+        if not isinstance(suggest, list) or not all(isinstance(option, str) for option in suggest):
+            errors.append(f"第{index + 1}项: suggest必须是字符串列表")
+            continue
+        item_id = str(item.get('id') or f"item_{index + 1}")
+        if item_id in seen_ids:
+            errors.append(f"第{index + 1}项: id重复 ({item_id})")
+            continue
+        seen_ids.add(item_id)
+        normalized.append({
+            'id': item_id,
+            'summary': str(item['summary']),
+            'suggest': suggest,
+            'request_image': bool(item.get('request_image', False)),
+        })
+
+    if errors:
+        raise ValueError("；".join(errors))
+    return normalized
+
+
 @mcp.tool()
-def pick_image() -> MCPImage:
+@traced("tool.collect_batch_feedback")
+def collect_batch_feedback(
+    items: List[dict],
+    work_summary: str = "",
+    timeout_seconds: int = 300,
+    idempotency_key: str = "",
+) -> List:
+    """
+    批量收集反馈的交互式工具（Web版本）
+
+    在一个页面中同时呈现多个问题，用户一次作答后统一返回，
+    N 个问题只需一次服务器启动和一次浏览器往返。
+
+    Args:
+        items: 问题列表，每项包含：
+            - summary: 问题或需要确认的内容 (必需，支持Markdown)
+            - suggest: 建议选项列表 (可选)，如 ["同意", "不同意"]
+            - request_image: 是否请用户为该问题提供图片 (可选，默认False)
+            - id: 问题标识 (可选，默认 item_1、item_2 ...)
+        work_summary: 整体工作汇报 (可选)
+        timeout_seconds: 对话框超时时间（秒），默认300秒（5分钟）
+        idempotency_key: 幂等键（可选），语义与 collect_feedback 相同
+
+    Returns:
+        每个问题一段 JSON 文本（index、id、question、answered、selected、text、image_count，
+        超时时带 timed_out），随后是该问题的图片
+    """
+    batch_items = _validate_batch_items(items)
+
+    session_id = make_session_key(
+        "batch_feedback",
+        {"items": batch_items, "work_summary": work_summary, "timeout_seconds": timeout_seconds},
+        idempotency_key,
+    )
+    span = get_current_span()
+    span.set_attribute("session_id", session_id)
+    span.set_attribute("batch_size", len(batch_items))
+
+    try:
+        # 等待用户反馈（超时时仍按问题返回未回答的结果）
+        server_manager, result = get_server_pool().run_session(
+            session_id, work_summary, timeout_seconds, "", batch_items=batch_items
+        )
+        if result and result.get("timeout_reason"):
+            span.set_attribute("timeout_reason", result["timeout_reason"])
+
+        mcp_result = server_manager.feedback_handler.process_batch_to_mcp(result, batch_items)
+
+        # 标记服务器可以被清理（但不立即清理）
+        release_managed_server(session_id, immediate=False)
+
+        return mcp_result
+
+    except ImportError as e:
+        release_managed_server(session_id, immediate=True)
+        raise Exception(f"依赖缺失: {str(e)}")
+    except Exception as e:
+        release_managed_server(session_id, immediate=True)
+        raise Exception(f"启动反馈通道失败: {str(e)}")
+
+
+@mcp.tool()
+def query_feedback_history(
+    query: str = "",
+    session_id: str = "",
+    since: str = "",
+    until: str = "",
+    limit: int = 20,
+    cursor: str = "",
+) -> str:
+    """
+    查询反馈历史
+
+    每次反馈（文字、建议选项与选择、超时标记、图片）都会记录到本地历史，
+    MCP服务重启后仍可查询。结果按提交时间倒序分页。
+
+    Args:
+        query: 全文检索文本（可选），按空白拆分，所有词都需出现在反馈文字或工作汇报中
+        session_id: 仅查询指定会话（可选）
+        since: 起始时间（可选），ISO 8601 格式（如 "2025-06-11T10:00:00"）或 Unix 时间戳
+        until: 截止时间（可选），格式同 since
+        limit: 每页条数，默认20，最多100
+        cursor: 上一页返回的 next_cursor（可选）
+
+    Returns:
+        JSON格式的查询结果：items 为反馈记录（图片给出本地文件路径），
+        next_cursor 为下一页游标，没有更多记录时为 null
+    """
+    store = get_history_store()
+    if store is None:
+        return "⚠️ 反馈历史未启用（MCP_HISTORY_ENABLED=false 或数据库不可用）"
+
+    page = store.query(
+        text=query,
+        session_id=session_id,
+        since=_parse_history_time(since),
+        until=_parse_history_time(until),
+        limit=limit,
+        cursor=cursor,
+    )
+    return _dump_resource(page)
+
+
+@mcp.tool()
+@traced("tool.pick_image")
+def pick_image(idempotency_key: str = "") -> Union[MCPImage, TextContent]:
     """
     快速图片选择工具（Web版本）
 
     启动简化的Web界面，用户可以选择图片文件或从剪贴板粘贴图片。
     完美支持SSH远程环境。
 
+    Args:
+        idempotency_key: 幂等键（可选）。提供时重试的调用挂接到原会话并返回同一图片；
+            未提供时每次调用都打开新的图片选择
+
     Returns:
-        选择的图片数据
+        选择的图片数据；MCP_IMAGE_DELIVERY=reference 时为图片资源链接
     """
-    # 使用服务器池获取托管的服务器实例
-    session_id = f"image_picker_{id('pick_image')}"
-    server_manager = get_managed_server(session_id)
+    server_config = get_server_config()
+    image_timeout = server_config.image_picker_timeout
+
+    # 只有提供幂等键时重试的调用才复用原会话；
+    # 图片选择没有区分调用的内容，未提供幂等键时每次调用使用独立的会话，等待新的选择
+    content = {"timeout_seconds": image_timeout}
+    if not idempotency_key:
+        content["nonce"] = uuid.uuid4().hex
+    session_id = make_session_key("image_picker", content, idempotency_key)
+    get_current_span().set_attribute("session_id", session_id)
 
     try:
-        server_config = get_server_config()
-        image_timeout = server_config.image_picker_timeout
-        
-        # 启动图片选择界面
-        port = server_manager.start_server("请选择一张图片", image_timeout)
+        # 在池中启动图片选择界面并等待选择
+        # 收件箱只能回答文字，图片选择始终打开完整页面
+        _, result = get_server_pool().run_session(
+            session_id, "请选择一张图片", image_timeout, use_inbox=False
+        )
 
         # 8888 是 recommended_local_forward_port 的临时默认值，最终将由 config.py 定义
         recommended_local_port = getattr(server_config, 'recommended_local_forward_port', 8888)
@@ -528,8 +906,6 @@ def pick_image() -> MCPImage:
         # print(f"💡 支持文件选择、拖拽上传、剪贴板粘贴")
         # print(f"⏰ 等待用户选择... (远程服务超时: {image_timeout}秒)")
 
-        result = server_manager.wait_for_feedback(image_timeout)
-
         if not result or not result.get("success") or not result.get("has_images"):
             raise ImageSelectionError()
 
@@ -537,7 +913,12 @@ def pick_image() -> MCPImage:
         first_image = result["images"][0]
         # 将Base64字符串解码为字节数据
         decoded_image_data = base64.b64decode(first_image["data"])
-        mcp_image = MCPImage(data=decoded_image_data, format="png")
+        mcp_image = image_to_mcp(
+            decoded_image_data,
+            _image_format(first_image),
+            mime=first_image.get("mime") or "",
+            filename=first_image.get("filename") or "",
+        )
 
         # 标记服务器可以被清理（但不立即清理）
         release_managed_server(session_id, immediate=False)
@@ -563,17 +944,90 @@ def get_image_info_tool(image_path: str) -> str:
     return get_image_info(image_path)
 
 
+def _validate_pool_configs(server_configs: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    预先校验服务器池配置，在启动任何服务器之前剔除无效条目
+
+    Args:
+        server_configs: 原始服务器配置列表
+
+    Returns:
+        (有效配置列表, 失败条目列表)。有效配置已规范化，
+        并带有原始序号 index，用于按输入顺序生成报告。
+    """
+    valid_configs = []
+    failed_servers = []
+    seen_session_ids = set()
+
+    if not isinstance(server_configs, list):
+        return [], [{'index': 0, 'config': server_configs, 'error': 'server_configs必须是列表'}]
+
+    for index, config in enumerate(server_configs):
+        if not isinstance(config, dict) or not config.get('session_id'):
+            failed_servers.append({
+                'index': index,
+                'config': config,
+                'error': '配置格式错误，必须包含session_id字段'
+            })
+            continue
+
+        session_id = str(config['session_id'])
+        if session_id in seen_session_ids:
+            failed_servers.append({
+                'index': index,
+                'session_id': session_id,
+                'error': 'session_id重复'
+            })
+            continue
+
+        timeout_seconds = config.get('timeout_seconds', 300)
+        if isinstance(timeout_seconds, bool) or not isinstance(timeout_seconds, int) or timeout_seconds <= 0:
+            failed_servers.append({
+                'index': index,
+                'session_id': session_id,
+                'error': f'timeout_seconds必须是正整数: {timeout_seconds!r}'
+            })
+            continue
+
+        suggest = config.get('suggest', '')
+        if isinstance(suggest, list):
+            suggest = json.dumps(suggest, ensure_ascii=False)
+        elif not isinstance(suggest, str):
+            failed_servers.append({
+                'index': index,
+                'session_id': session_id,
+                'error': 'suggest必须是字符串或字符串列表'
+            })
+            continue
+
+        seen_session_ids.add(session_id)
+        valid_configs.append({
+            'index': index,
+            'session_id': session_id,
+            'work_summary': str(config.get('work_summary', f'反馈收集任务 - {session_id}')),
+            'timeout_seconds': timeout_seconds,
+            'suggest': suggest,
+        })
+
+    return valid_configs, failed_servers
+
+
 @mcp.tool()
-def create_server_pool(server_configs: List[dict]) -> str:
+@traced("tool.create_server_pool")
+def create_server_pool(server_configs: List[dict], max_concurrency: int = 0) -> str:
     """
     创建多个并发的反馈服务器池
     
+    配置会先统一校验，随后各服务器并发启动，
+    每个条目独立报告成功、失败或超时。
+    
     Args:
         server_configs: 服务器配置列表，每个配置包含：
             - session_id: 会话ID (必需)
             - work_summary: 工作汇报 (可选)
             - timeout_seconds: 超时时间 (可选，默认300)
             - suggest: 建议选项 (可选)
+        max_concurrency: 最大并发启动数，0 表示每个会话同时启动；均不超过配置 pool_start_concurrency
     
     Returns:
         创建结果的详细信息
@@ -581,46 +1035,90 @@ def create_server_pool(server_configs: List[dict]) -> str:
     try:
         from backend.server_pool import get_server_pool
         server_pool = get_server_pool()
+        server_config = get_server_config()
         
+        valid_configs, failed_servers = _validate_pool_configs(server_configs)
         results = []
-        failed_servers = []
         
-        for config in server_configs:
-            if not isinstance(config, dict) or 'session_id' not in config:
-                failed_servers.append({
-                    'config': config,
-                    'error': '配置格式错误，必须包含session_id字段'
-                })
-                continue
-            
-            session_id = config['session_id']
-            work_summary = config.get('work_summary', f'反馈收集任务 - {session_id}')
-            timeout_seconds = config.get('timeout_seconds', 300)
-            suggest = config.get('suggest', '')
+        if valid_configs:
+            # 启动主要是等待端口就绪，默认所有会话同时启动，总耗时接近单个会话的启动时间
+            fan_out = max_concurrency if max_concurrency and max_concurrency > 0 else len(valid_configs)
+            fan_out = max(1, min(fan_out, len(valid_configs), server_config.pool_start_concurrency))
+            start_timeout = server_config.pool_start_timeout
             
-            try:
-                # 在服务器池中启动服务器
-                server_manager, port = server_pool.start_server_in_pool(
-                    session_id=session_id,
-                    work_summary=work_summary,
-                    timeout_seconds=timeout_seconds,
-                    suggest=suggest
+            def _start_one(config: dict) -> dict:
+                started_at = time.perf_counter()
+                _, port = server_pool.start_server_in_pool(
+                    session_id=config['session_id'],
+                    work_summary=config['work_summary'],
+                    timeout_seconds=config['timeout_seconds'],
+                    suggest=config['suggest'],
+                    admit=False
                 )
-                
-                results.append({
-                    'session_id': session_id,
+                return {
+                    'index': config['index'],
+                    'session_id': config['session_id'],
                     'port': port,
                     'url': f'http://127.0.0.1:{port}',
                     'status': 'success',
-                    'work_summary': work_summary,
-                    'timeout_seconds': timeout_seconds
-                })
-                
-            except Exception as e:
-                failed_servers.append({
-                    'session_id': session_id,
-                    'error': str(e)
-                })
+                    'work_summary': config['work_summary'],
+                    'timeout_seconds': config['timeout_seconds'],
+                    'elapsed': time.perf_counter() - started_at
+                }
+            
+            executor = ThreadPoolExecutor(max_workers=fan_out, thread_name_prefix="ServerPool-Start")
+            # 每个启动线程复制调用方上下文，使其跨度挂在本次工具调用的跟踪下
+            futures = {
+                executor.submit(contextvars.copy_context().run, _start_one, config): config
+                for config in valid_configs
+            }
+            collected = set()
+            
+            def _collect(future, config: dict):
+                collected.add(future)
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failed_servers.append({
+                        'index': config['index'],
+                        'session_id': config['session_id'],
+                        'error': str(e)
+                    })
+            
+            def _release_late_start(future, session_id: str):
+                # 已报告为超时的启动稍后完成时立即释放，避免遗留无人使用的运行中会话
+                if not future.cancelled() and future.exception() is None:
+                    server_pool.release_server(session_id, immediate=True)
+            
+            try:
+                # 按完成顺序收集每个会话的结果
+                for future in as_completed(futures, timeout=start_timeout):
+                    _collect(future, futures[future])
+            except FuturesTimeoutError:
+                for future, config in futures.items():
+                    if future in collected:
+                        continue
+                    if future.done():
+                        # 超时与此处检查之间完成的启动照常报告
+                        _collect(future, config)
+                        continue
+                    if not future.cancel():
+                        future.add_done_callback(
+                            lambda f, session_id=config['session_id']: _release_late_start(f, session_id)
+                        )
+                    failed_servers.append({
+                        'index': config['index'],
+                        'session_id': config['session_id'],
+                        'error': f'启动超时（{start_timeout:g}秒）',
+                        'timed_out': True
+                    })
+            finally:
+                # 不等待超时的启动线程，它们完成后由回调释放
+                executor.shutdown(wait=False)
+        
+        # 报告按输入顺序排列，保证本地转发端口分配稳定
+        results.sort(key=lambda item: item['index'])
+        failed_servers.sort(key=lambda item: item.get('index', 0))
         
         # 生成结果报告
         report_lines = []
@@ -631,7 +1129,6 @@ def create_server_pool(server_configs: List[dict]) -> str:
                 ""
             ])
             
-            server_config = get_server_config()
             base_local_port = getattr(server_config, 'recommended_local_forward_port', 8888)
             
             for i, result in enumerate(results):
@@ -641,6 +1138,7 @@ def create_server_pool(server_configs: List[dict]) -> str:
                     f"    端口: {result['port']}",
                     f"    任务: {result['work_summary']}",
                     f"    超时: {result['timeout_seconds']}秒", 
+                    f"    启动耗时: {result['elapsed']:.3f}秒",
                     f"    远程地址: {result['url']}",
                     f"    SSH转发: ssh -L {local_port}:127.0.0.1:{result['port']} your_user@your_server",
                     f"    本地访问: http://127.0.0.1:{local_port}/",
@@ -648,8 +1146,12 @@ def create_server_pool(server_configs: List[dict]) -> str:
                 ])
         
         if failed_servers:
+            timed_out_count = len([f for f in failed_servers if f.get('timed_out')])
+            header = f"❌ 失败的服务器 ({len(failed_servers)} 个"
+            if timed_out_count:
+                header += f"，其中 {timed_out_count} 个超时"
             report_lines.extend([
-                f"❌ 失败的服务器 ({len(failed_servers)} 个):",
+                header + "):",
                 ""
             ])
             
@@ -657,7 +1159,7 @@ def create_server_pool(server_configs: List[dict]) -> str:
                 session_id = failed.get('session_id', '未知')
                 error = failed.get('error', '未知错误')
                 report_lines.extend([
-                    f"  🔴 {session_id}",
+                    f"  {'⏱️' if failed.get('timed_out') else '🔴'} {session_id}",
                     f"    错误: {error}",
                     ""
                 ])
@@ -674,6 +1176,9 @@ def create_server_pool(server_configs: List[dict]) -> str:
                 "  3. 可以同时在多个浏览器标签页中访问不同的反馈界面",
                 "  4. 使用 get_server_status 查看所有服务器状态"
             ])
+            inbox_hint = get_inbox_ssh_hint()
+            if inbox_hint:
+                report_lines.append(f"  5. 在收件箱中集中回答所有会话: {inbox_hint['command']}")
         
         return "\n".join(report_lines)
         
@@ -6,7 +6,9 @@ Web服务器管理模块
 import logging
 import threading
 import time
-from typing import Optional, Dict, Any, Union
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, List, Union
 
 try:
     import requests
@@ -16,8 +18,18 @@ except ImportError:
 
 from backend.app import FeedbackApp
 from backend.feedback_handler import FeedbackHandler
+from backend.inbox import BaseInbox, InboxSession, get_inbox, parse_suggest_options
 from backend.utils.network_utils import find_free_port
 from backend.utils.browser_utils import open_feedback_browser
+from backend.utils.metrics import (
+    CONNECT_WAIT_SECONDS,
+    INBOX_DELIVERIES,
+    SESSION_RESUMES,
+    STARTUP_PHASE_SECONDS,
+    THINK_TIME_SECONDS,
+    WAIT_OUTCOMES,
+)
+from backend.utils.tracing import get_current_span, start_span, traced
 from backend.config import get_server_config, ServerConfig
 from urllib.parse import quote
 import webbrowser
@@ -34,14 +46,15 @@ class ServerManager:
         self.app: Optional["FeedbackApp"] = None
         self.server_thread: Optional[threading.Thread] = None
         self.current_port: Optional[int] = None
+        # 会话在收件箱中列出时的收件箱和会话ID
+        self.inbox: Optional[BaseInbox] = None
+        self.inbox_session_id: Optional[str] = None
 
         # 从配置加载常量值
         self._config: ServerConfig = get_server_config()
 
-        # 服务器就绪检查相关配置
-        self.server_ready_max_attempts = self._config.server_ready_max_attempts
-        self.server_ready_check_interval = self._config.server_ready_check_interval
-        self.server_ready_fallback_wait = self._config.server_ready_fallback_wait
+        # 服务器就绪等待上限（服务器线程开始监听或启动失败时立即返回）
+        self.server_startup_timeout = self._config.server_startup_timeout
 
         # 连接检测相关配置
         self.connection_check_max_retries = self._config.connection_check_max_retries
@@ -55,6 +68,7 @@ class ServerManager:
         self.feedback_log_interval = self._config.feedback_log_interval
         self.feedback_result_timeout = self._config.feedback_result_timeout
 
+    @traced("server.start")
     def start_server(
         self,
         work_summary: str = "",
@@ -62,8 +76,21 @@ class ServerManager:
         suggest: str = "",
         debug: bool = True,
         use_reloader: bool = False,
+        preferred_port: Optional[int] = None,
+        batch_items: Optional[List[Dict[str, Any]]] = None,
+        use_inbox: bool = True,
+        session_id: str = "default",
     ) -> int:
-        """启动Web服务器 - TURBO模式（终极性能优化）"""
+        """启动Web服务器 - TURBO模式（终极性能优化）
+
+        Args:
+            preferred_port: 首选端口，未指定时使用配置中的 preferred_web_port。
+                服务器池并发启动时通过此参数分配端口，避免修改共享配置。
+            batch_items: 批量反馈的问题列表，非空时页面以批量模式呈现
+            use_inbox: 是否在收件箱中列出本会话。收件箱只能回答文字，
+                需要图片的会话（pick_image）和批量反馈会话不列出，始终打开完整页面
+            session_id: 服务器池中的会话ID，页面关闭通知据此释放本会话
+        """
         # 性能监控: 服务器启动总时间开始计时
         server_startup_start_time = time.perf_counter()
         
@@ -77,73 +104,103 @@ class ServerManager:
         logger.info("[SERVER_MANAGER_DEBUG] About to create FeedbackApp instance...")
         app_creation_start_time = time.perf_counter()
         
-        try:
-            self.app = FeedbackApp(
-                feedback_handler=self.feedback_handler,
-                work_summary=work_summary,
-                suggest_json=suggest,
-                timeout_seconds=timeout_seconds,
-            )
-            app_creation_duration = time.perf_counter() - app_creation_start_time
-            logger.info(f"[SERVER_MANAGER_DEBUG] FeedbackApp instance created successfully in {app_creation_duration:.3f} seconds")
-            logger.info(f"性能监控: 应用实例创建耗时 {app_creation_duration:.3f} 秒")
-        except Exception as e:
-            app_creation_duration = time.perf_counter() - app_creation_start_time
-            logger.error(f"[SERVER_MANAGER_DEBUG] Failed to create FeedbackApp instance after {app_creation_duration:.3f} seconds: {e}")
-            raise
+        with start_span("server.app_create"):
+            try:
+                self.app = FeedbackApp(
+                    feedback_handler=self.feedback_handler,
+                    work_summary=work_summary,
+                    suggest_json=suggest,
+                    timeout_seconds=timeout_seconds,
+                    batch_items=batch_items,
+                    session_id=session_id,
+                )
+                app_creation_duration = time.perf_counter() - app_creation_start_time
+                logger.info(f"[SERVER_MANAGER_DEBUG] FeedbackApp instance created successfully in {app_creation_duration:.3f} seconds")
+                logger.info(f"性能监控: 应用实例创建耗时 {app_creation_duration:.3f} 秒")
+                STARTUP_PHASE_SECONDS.observe(app_creation_duration, phase="app_creation")
+            except Exception as e:
+                app_creation_duration = time.perf_counter() - app_creation_start_time
+                logger.error(f"[SERVER_MANAGER_DEBUG] Failed to create FeedbackApp instance after {app_creation_duration:.3f} seconds: {e}")
+                raise
 
         logger.info("[SERVER_MANAGER_DEBUG] About to allocate port...")
         port_allocation_start_time = time.perf_counter()
         
         # 获取首选Web端口
-        preferred_port_to_use = getattr(self._config, 'preferred_web_port', None)
+        preferred_port_to_use = (
+            preferred_port
+            if preferred_port is not None
+            else getattr(self._config, 'preferred_web_port', None)
+        )
         logger.info(f"[SERVER_MANAGER_DEBUG] Preferred port from config: {preferred_port_to_use}")
         logger.info(f"[SERVER_MANAGER_DEBUG] About to call find_free_port with preferred_port: {preferred_port_to_use}")
         
-        try:
-            self.current_port = find_free_port(preferred_port=preferred_port_to_use)
-            port_allocation_duration = time.perf_counter() - port_allocation_start_time
-            logger.info(f"[SERVER_MANAGER_DEBUG] find_free_port returned: {self.current_port} in {port_allocation_duration:.3f} seconds")
-            logger.info(f"性能监控: 端口分配耗时 {port_allocation_duration:.3f} 秒")
-        except Exception as e:
-            port_allocation_duration = time.perf_counter() - port_allocation_start_time
-            logger.error(f"[SERVER_MANAGER_DEBUG] find_free_port failed after {port_allocation_duration:.3f} seconds: {e}")
-            raise
+        with start_span("server.port_allocate", {"preferred_port": preferred_port_to_use or 0}) as span:
+            try:
+                self.current_port = find_free_port(preferred_port=preferred_port_to_use)
+                port_allocation_duration = time.perf_counter() - port_allocation_start_time
+                logger.info(f"[SERVER_MANAGER_DEBUG] find_free_port returned: {self.current_port} in {port_allocation_duration:.3f} seconds")
+                logger.info(f"性能监控: 端口分配耗时 {port_allocation_duration:.3f} 秒")
+                STARTUP_PHASE_SECONDS.observe(port_allocation_duration, phase="port_allocation")
+                span.set_attribute("port", self.current_port)
+            except Exception as e:
+                port_allocation_duration = time.perf_counter() - port_allocation_start_time
+                logger.error(f"[SERVER_MANAGER_DEBUG] find_free_port failed after {port_allocation_duration:.3f} seconds: {e}")
+                raise
+
+        # 启动服务器线程：开始监听时完成 ready，启动失败时把异常交给 ready
+        ready: "Future[None]" = Future()
+        port = self.current_port
+
+        def signal_ready() -> None:
+            if not ready.done():
+                ready.set_result(None)
+
+        def signal_failure(error: Exception) -> None:
+            if not ready.done():
+                ready.set_exception(error)
 
-        # 启动服务器线程
         def run_server() -> None:
             try:
                 self.app.run(
                     host="127.0.0.1",
-                    port=self.current_port,
+                    port=port,
                     debug=debug,
                     use_reloader=use_reloader,
+                    on_listening=signal_ready,
                 )
                 # If app.run() returns, it means the server was shut down gracefully (e.g., by a signal)
                 # Log this normal shutdown.
-                logger.info(f"Flask server on port {self.current_port} shut down gracefully.")
+                logger.info(f"Flask server on port {port} shut down gracefully.")
             except OSError as e:
                 logger.error(f"服务器启动失败 - 网络或端口错误: {e}")
+                signal_failure(e)
             except ImportError as e:
                 logger.error(f"服务器启动失败 - 缺少依赖模块: {e}")
+                signal_failure(e)
             except Exception as e:
                 logger.error(f"服务器启动失败 - 未知错误: {e}")
+                signal_failure(e)
+            finally:
+                signal_failure(RuntimeError(f"服务器线程在端口 {port} 开始监听前退出"))
 
         logger.info("[SERVER_MANAGER_DEBUG] About to create and start server thread...")
         thread_creation_start_time = time.perf_counter()
         
-        try:
-            self.server_thread = threading.Thread(target=run_server, daemon=True)
-            logger.info(f"[SERVER_MANAGER_DEBUG] Server thread created successfully")
+        with start_span("server.thread_start"):
+            try:
+                self.server_thread = threading.Thread(target=run_server, daemon=True)
+                logger.info(f"[SERVER_MANAGER_DEBUG] Server thread created successfully")
             
-            self.server_thread.start()
-            thread_creation_duration = time.perf_counter() - thread_creation_start_time
-            logger.info(f"[SERVER_MANAGER_DEBUG] Server thread started successfully in {thread_creation_duration:.3f} seconds")
-            logger.info(f"性能监控: 服务器线程创建与启动耗时 {thread_creation_duration:.3f} 秒")
-        except Exception as e:
-            thread_creation_duration = time.perf_counter() - thread_creation_start_time
-            logger.error(f"[SERVER_MANAGER_DEBUG] Failed to create/start server thread after {thread_creation_duration:.3f} seconds: {e}")
-            raise
+                self.server_thread.start()
+                thread_creation_duration = time.perf_counter() - thread_creation_start_time
+                logger.info(f"[SERVER_MANAGER_DEBUG] Server thread started successfully in {thread_creation_duration:.3f} seconds")
+                logger.info(f"性能监控: 服务器线程创建与启动耗时 {thread_creation_duration:.3f} 秒")
+                STARTUP_PHASE_SECONDS.observe(thread_creation_duration, phase="thread_start")
+            except Exception as e:
+                thread_creation_duration = time.perf_counter() - thread_creation_start_time
+                logger.error(f"[SERVER_MANAGER_DEBUG] Failed to create/start server thread after {thread_creation_duration:.3f} seconds: {e}")
+                raise
 
         # TURBO模式：跳过所有检查，信任启动，绝对最速
         parallel_start_time = time.perf_counter()
@@ -153,27 +210,50 @@ class ServerManager:
         logger.info("[SERVER_MANAGER_DEBUG] About to call _wait_for_server_ready...")
         wait_ready_start = time.perf_counter()
         
-        try:
-            server_ready_result = self._wait_for_server_ready()
-            wait_ready_duration = time.perf_counter() - wait_ready_start
-            logger.info(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready completed in {wait_ready_duration:.3f} seconds")
-            logger.info(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready returned: {server_ready_result}")
-        except Exception as e:
-            wait_ready_duration = time.perf_counter() - wait_ready_start
-            logger.error(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready failed after {wait_ready_duration:.3f} seconds: {e}")
-            raise
+        with start_span("server.wait_ready"):
+            try:
+                server_ready_result = self._wait_for_server_ready(ready)
+                wait_ready_duration = time.perf_counter() - wait_ready_start
+                logger.info(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready completed in {wait_ready_duration:.3f} seconds")
+                STARTUP_PHASE_SECONDS.observe(wait_ready_duration, phase="server_ready")
+                logger.info(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready returned: {server_ready_result}")
+            except Exception as e:
+                wait_ready_duration = time.perf_counter() - wait_ready_start
+                logger.error(f"[SERVER_MANAGER_DEBUG] _wait_for_server_ready failed after {wait_ready_duration:.3f} seconds: {e}")
+                # 不返回无人监听的端口
+                self.stop_server()
+                raise
         
-        # 异步启动浏览器，不等待结果
-        try:
-            browser_thread = threading.Thread(
-                target=open_feedback_browser,
-                args=(self.current_port, work_summary, suggest),
-                daemon=True
-            )
-            browser_thread.start()
-            logger.debug("TURBO模式：浏览器异步启动完成")
-        except Exception as e:
-            logger.debug(f"TURBO模式浏览器启动异常: {e}")
+        # 在收件箱中列出本会话：已有收件箱页面连接时新请求只是一条推送，不再打开浏览器
+        inbox = self._join_inbox(work_summary, timeout_seconds, suggest) if use_inbox and not batch_items else None
+        inbox_session_id = self.inbox_session_id
+        
+        # 异步启动浏览器，不等待结果（跨度挂在当前调用的跟踪下）
+        parent_span = get_current_span()
+        
+        def launch_browser(port: int) -> None:
+            with start_span("server.browser_launch", {"port": port}, parent=parent_span):
+                if inbox is None:
+                    open_feedback_browser(port, work_summary, suggest)
+                else:
+                    open_feedback_browser(inbox.port, work_summary, suggest, inbox_session=inbox_session_id)
+        
+        if inbox is not None and not inbox.claim_browser_launch():
+            INBOX_DELIVERIES.inc(delivery="socket")
+            logger.info(f"新的反馈请求已推送到收件箱（端口 {inbox.port}）")
+        else:
+            if inbox is not None:
+                INBOX_DELIVERIES.inc(delivery="browser")
+            try:
+                browser_thread = threading.Thread(
+                    target=launch_browser,
+                    args=(self.current_port,),
+                    daemon=True
+                )
+                browser_thread.start()
+                logger.debug("TURBO模式：浏览器异步启动完成")
+            except Exception as e:
+                logger.debug(f"TURBO模式浏览器启动异常: {e}")
         
         parallel_duration = time.perf_counter() - parallel_start_time
         logger.info(f"性能监控: TURBO启动总耗时 {parallel_duration:.3f} 秒")
@@ -181,98 +261,78 @@ class ServerManager:
         # 性能监控: 服务器启动总时间结束计时
         total_startup_duration = time.perf_counter() - server_startup_start_time
         logger.info(f"性能监控: 服务器启动总耗时 {total_startup_duration:.3f} 秒")
+        STARTUP_PHASE_SECONDS.observe(total_startup_duration, phase="total")
         
         logger.info(f"[SERVER_MANAGER_DEBUG] start_server method completed successfully")
         logger.info(f"[SERVER_MANAGER_DEBUG] Returning port: {self.current_port}")
 
         return self.current_port
 
-    def _wait_for_server_ready(self, skip_check: bool = False) -> bool:
-        """等待服务器就绪 - 增加了基本的端口检查"""
-        logger.info(f"[WAIT_SERVER_READY_DEBUG] _wait_for_server_ready method called with skip_check: {skip_check}")
-        
-        if skip_check:  # Still allow explicit skipping if ever needed
-            logger.info("[WAIT_SERVER_READY_DEBUG] 服务器就绪检查被跳过 (skip_check=True)")
-            logger.info("服务器就绪检查被跳过 (skip_check=True)")
-            time.sleep(0.01)
-            return True
+    def _join_inbox(
+        self,
+        work_summary: str,
+        timeout_seconds: int,
+        suggest: str,
+    ) -> Optional[BaseInbox]:
+        """在收件箱中列出本会话（收件箱可能属于其他进程），收件箱被禁用或不可用时返回None"""
+        inbox = get_inbox()
+        if inbox is None:
+            return None
+        inbox_session_id = uuid.uuid4().hex[:12]
+        try:
+            inbox.add_session(InboxSession(
+                session_id=inbox_session_id,
+                work_summary=work_summary,
+                deadline=time.time() + timeout_seconds,
+                url=f"http://127.0.0.1:{self.current_port}/",
+                feedback_handler=self.feedback_handler,
+                suggest=parse_suggest_options(suggest),
+            ))
+        except OSError as e:
+            logger.warning(f"无法注册到反馈收件箱，将单独打开会话页面: {e}")
+            return None
+        self.inbox_session_id = inbox_session_id
+        self.app.attach_inbox(inbox)
+        self.inbox = inbox
+        return inbox
+
+    def _leave_inbox(self) -> None:
+        """会话结束后从收件箱中移除"""
+        inbox, self.inbox = self.inbox, None
+        if inbox is None:
+            return
+        inbox.remove_session(self.inbox_session_id)
+        if self.app is not None:
+            self.app.detach_inbox()
+
+    def _wait_for_server_ready(self, ready: "Future[None]") -> bool:
+        """
+        等待服务器线程通知监听就绪
 
-        if not self.current_port:
-            logger.error("[WAIT_SERVER_READY_DEBUG] 无法检查服务器就绪状态：当前端口未设置。")
-            logger.error("无法检查服务器就绪状态：当前端口未设置。")
-            return False
+        Args:
+            ready: 服务器线程开始监听时完成；启动失败时携带异常
 
-        logger.info(f"[WAIT_SERVER_READY_DEBUG] 开始检查服务器端口 {self.current_port} 是否就绪...")
-        logger.info(f"[WAIT_SERVER_READY_DEBUG] Configuration - max_attempts: {self.server_ready_max_attempts}, check_interval: {self.server_ready_check_interval}")
-        logger.info(f"开始检查服务器端口 {self.current_port} 是否就绪...")
-        logger.info(f"[WAIT_SERVER_READY_DEBUG] About to enter attempt loop...")
-        
-        for attempt in range(self.server_ready_max_attempts):
-            logger.info(f"[WAIT_SERVER_READY_DEBUG] Attempt {attempt + 1}/{self.server_ready_max_attempts} - trying socket connection to 127.0.0.1:{self.current_port}")
-            try:
-                # 尝试创建一个到服务器端口的套接字连接
-                import socket
-                connection_start = time.time()
-                logger.debug(f"[WAIT_SERVER_READY_DEBUG] Creating socket connection to 127.0.0.1:{self.current_port} with 0.5s timeout...")
-                
-                with socket.create_connection(("127.0.0.1", self.current_port), timeout=0.5):
-                    connection_duration = time.time() - connection_start
-                    logger.info(f"[WAIT_SERVER_READY_DEBUG] 服务器端口 {self.current_port} 已成功连接 (尝试 {attempt + 1})，连接耗时 {connection_duration:.3f}秒")
-                    logger.info(f"服务器端口 {self.current_port} 已成功连接 (尝试 {attempt + 1})。")
-                    return True
-                    
-            except (socket.error, socket.timeout) as e:
-                connection_duration = time.time() - connection_start
-                logger.info(f"[WAIT_SERVER_READY_DEBUG] Socket connection failed on attempt {attempt + 1}, duration: {connection_duration:.3f}s, error: {type(e).__name__}: {e}")
-                logger.debug(
-                    f"等待服务器端口 {self.current_port} 就绪... "
-                    f"(尝试 {attempt + 1}/{self.server_ready_max_attempts}) - 错误: {e}"
-                )
-                
-                if attempt < self.server_ready_max_attempts - 1:
-                    logger.debug(f"[WAIT_SERVER_READY_DEBUG] Sleeping {self.server_ready_check_interval}s before next attempt...")
-                    time.sleep(self.server_ready_check_interval)
-                else:  # Last attempt
-                    logger.error(f"[WAIT_SERVER_READY_DEBUG] All {self.server_ready_max_attempts} attempts failed")
-                    logger.error(
-                        f"服务器端口 {self.current_port} 在 "
-                        f"{self.server_ready_max_attempts} 次尝试后仍未就绪。"
-                    )
-                    # Fallback: wait a bit longer as a last resort, then assume failure.
-                    # This matches original fallback logic if requests was None.
-                    logger.info(f"[WAIT_SERVER_READY_DEBUG] 执行最后的回退等待 {self.server_ready_fallback_wait} 秒...")
-                    logger.info(f"执行最后的等待 {self.server_ready_fallback_wait} 秒...")
-                    
-                    fallback_start = time.time()
-                    time.sleep(self.server_ready_fallback_wait)
-                    fallback_duration = time.time() - fallback_start
-                    logger.info(f"[WAIT_SERVER_READY_DEBUG] 回退等待完成，实际耗时 {fallback_duration:.3f}秒")
-                    
-                    # Re-check one last time after fallback wait
-                    logger.info(f"[WAIT_SERVER_READY_DEBUG] 执行回退等待后的最终连接尝试...")
-                    try:
-                        final_connection_start = time.time()
-                        with socket.create_connection(("127.0.0.1", self.current_port), timeout=1.0):
-                            final_connection_duration = time.time() - final_connection_start
-                            logger.info(f"[WAIT_SERVER_READY_DEBUG] 服务器端口 {self.current_port} 在回退等待后成功连接，连接耗时 {final_connection_duration:.3f}秒")
-                            logger.info(f"服务器端口 {self.current_port} 在回退等待后成功连接。")
-                            return True
-                    except (socket.error, socket.timeout) as final_e:
-                        final_connection_duration = time.time() - final_connection_start
-                        logger.error(f"[WAIT_SERVER_READY_DEBUG] 回退等待后的最终连接尝试失败，耗时 {final_connection_duration:.3f}秒, 错误: {type(final_e).__name__}: {final_e}")
-                        logger.error(f"服务器端口 {self.current_port} 在回退等待后仍然无法连接。")
-                        return False
-        
-        logger.error(f"[WAIT_SERVER_READY_DEBUG] _wait_for_server_ready returning False - should not reach this point")
-        return False  # Should not be reached if logic is correct
+        Raises:
+            服务器线程中的启动异常（例如端口被占用的 OSError），
+            或在 server_startup_timeout 内未就绪时的 TimeoutError
+        """
+        try:
+            ready.result(timeout=self.server_startup_timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(
+                f"服务器端口 {self.current_port} 在 {self.server_startup_timeout} 秒内未开始监听"
+            ) from None
+        logger.info(f"服务器端口 {self.current_port} 已开始监听")
+        return True
 
+    @traced("feedback.wait")
     def wait_for_feedback(
         self, timeout_seconds: Optional[int] = None
     ) -> Optional[Dict[str, Any]]:
         """
         简化版超时控制：宽容期 + 连接依赖模式
         1. 60秒宽容期：等待WebSocket连接
-        2. 连接依赖模式：持续等待直到WebSocket断开或收到结果
+        2. 连接依赖模式：持续等待直到收到结果、总超时，或WebSocket断开且重连宽限期内未重新连接
 
         Args:
             timeout_seconds: 最大等待时间（秒），如果未指定则使用默认值
@@ -289,74 +349,122 @@ class ServerManager:
         else:
             logger.info(f"[WAIT_FEEDBACK_DEBUG] Using provided timeout_seconds: {timeout_seconds}")
         
-        # 阶段1：60秒宽容期 - 等待WebSocket连接
-        grace_period = 60
-        logger.info(f"[WAIT_FEEDBACK_DEBUG] 开始等待反馈：{grace_period}秒宽容期，总超时 {timeout_seconds} 秒")
-        logger.info(f"开始等待反馈：{grace_period}秒宽容期，总超时 {timeout_seconds} 秒")
-        
-        logger.info(f"[WAIT_FEEDBACK_DEBUG] About to call _wait_for_websocket_connection with grace_period: {grace_period}")
-        websocket_wait_start = time.time()
-        
-        if not self._wait_for_websocket_connection(grace_period):
-            websocket_wait_duration = time.time() - websocket_wait_start
-            logger.warning(f"[WAIT_FEEDBACK_DEBUG] _wait_for_websocket_connection failed after {websocket_wait_duration:.3f} seconds")
-            logger.warning(f"[WAIT_FEEDBACK_DEBUG] Returning connection_timeout result")
-            return self._create_timeout_result("connection_timeout")
-        
-        websocket_wait_duration = time.time() - websocket_wait_start
-        logger.info(f"[WAIT_FEEDBACK_DEBUG] _wait_for_websocket_connection succeeded in {websocket_wait_duration:.3f} seconds")
+        # 事件驱动等待：结果到达、客户端连接/断开/超时时被唤醒，不再轮询
+        wakeup = threading.Event()
+        app = self.app
+        self.feedback_handler.add_result_listener(wakeup.set)
+        if app:
+            app.add_client_listener(wakeup.set)
+        # Web端事件（连接、提交）记录到当前调用的跟踪中
+        self.feedback_handler.trace_parent = get_current_span()
         
-        # 阶段2：连接依赖模式 - 纯粹等待结果
-        logger.info("[WAIT_FEEDBACK_DEBUG] WebSocket连接已建立，进入连接依赖模式")
-        logger.info("WebSocket连接已建立，进入连接依赖模式")
-        start_time = time.time()
-        logger.info(f"[WAIT_FEEDBACK_DEBUG] Starting feedback polling loop at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        loop_iteration = 0
-        while True:
-            loop_iteration += 1
-            logger.debug(f"[WAIT_FEEDBACK_DEBUG] Loop iteration {loop_iteration} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            logger.debug(f"[DEBUG wait_for_feedback] {time.strftime('%Y-%m-%d %H:%M:%S')} - has_active_clients: {self.app.has_active_clients()}")
-            current_time = time.time()
-            elapsed_time = current_time - start_time
-            
-            # 检查总超时
-            if elapsed_time >= timeout_seconds:
-                logger.warning(f"[WAIT_FEEDBACK_DEBUG] 总超时触发，已等待 {elapsed_time:.1f} 秒")
-                logger.warning(f"总超时触发，已等待 {elapsed_time:.1f} 秒")
-                return self._create_timeout_result("total_timeout")
+        try:
+            # 阶段1：60秒宽容期 - 等待WebSocket连接
+            grace_period = 60
+            logger.info(f"开始等待反馈：{grace_period}秒宽容期，总超时 {timeout_seconds} 秒")
+            websocket_wait_start = time.time()
             
-            # 尝试获取结果
-            logger.debug(f"[WAIT_FEEDBACK_DEBUG] Attempting to get result from feedback_handler (timeout=1)...")
-            get_result_start = time.time()
-            result = self.feedback_handler.get_result(timeout=1)
-            get_result_duration = time.time() - get_result_start
-            logger.debug(f"[WAIT_FEEDBACK_DEBUG] feedback_handler.get_result took {get_result_duration:.3f}s, result: {result is not None}")
+            with start_span("feedback.wait_connect", {"grace_period": grace_period}) as span:
+                connected = self._wait_for_websocket_connection(grace_period, wakeup)
+                span.set_attribute("connected", connected)
+            if not connected:
+                websocket_wait_duration = time.time() - websocket_wait_start
+                logger.warning(f"[WAIT_FEEDBACK_DEBUG] _wait_for_websocket_connection failed after {websocket_wait_duration:.3f} seconds")
+                return self._create_timeout_result("connection_timeout")
             
-            if result is not None:
-                logger.info(f"[WAIT_FEEDBACK_DEBUG] 收到反馈结果，总等待时间 {elapsed_time:.1f} 秒")
-                logger.info(f"收到反馈结果，总等待时间 {elapsed_time:.1f} 秒")
-                logger.info(f"[WAIT_FEEDBACK_DEBUG] Result type: {type(result)}, keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-                return result
+            websocket_wait_duration = time.time() - websocket_wait_start
+            logger.info(f"[WAIT_FEEDBACK_DEBUG] _wait_for_websocket_connection succeeded in {websocket_wait_duration:.3f} seconds")
+            CONNECT_WAIT_SECONDS.observe(websocket_wait_duration)
             
-            # 检查WebSocket连接状态
-            has_active_clients = self.app.has_active_clients() if self.app else False
-            logger.debug(f"[WAIT_FEEDBACK_DEBUG] has_active_clients: {has_active_clients}")
+            # 阶段2：连接依赖模式 - 等待结果、断开或总超时
+            logger.info("WebSocket连接已建立，进入连接依赖模式")
+            start_time = time.monotonic()
+            deadline = start_time + timeout_seconds
+            # 截止时间下发给重新连接的页面，刷新或重连后倒计时从剩余时间继续
+            if app:
+                app.session_deadline = time.time() + timeout_seconds
+                if self.inbox is not None:
+                    self.inbox.update_deadline(self.inbox_session_id, app.session_deadline)
+            # 断线重连宽限期：浏览器断开后会话、草稿和截止时间保持不变，宽限期内重新连接即继续等待
+            reconnect_grace = self._config.reconnect_grace_seconds
+            disconnected_at = None
             
-            if not has_active_clients:
-                logger.debug(f"[DEBUG wait_for_feedback] {time.strftime('%Y-%m-%d %H:%M:%S')} - active_clients: {self.app.active_clients if self.app else 'No app'}")
-                logger.info(f"[WAIT_FEEDBACK_DEBUG] WebSocket连接已断开")
-                logger.info("WebSocket连接已断开")
-                return self._create_timeout_result("websocket_disconnected")
-
-    def _wait_for_websocket_connection(self, grace_period: int) -> bool:
-        """等待WebSocket连接建立"""
-        start_time = time.time()
+            with start_span("feedback.wait_user", {"timeout_seconds": timeout_seconds}) as span:
+                while True:
+                    # 先清除再检查，避免检查与等待之间的通知丢失
+                    wakeup.clear()
+                    now = time.monotonic()
+                    elapsed_time = now - start_time
+                
+                    result = self.feedback_handler.get_result_nowait()
+                    if result is not None:
+                        logger.info(f"收到反馈结果，总等待时间 {elapsed_time:.1f} 秒")
+                        THINK_TIME_SECONDS.observe(elapsed_time)
+                        WAIT_OUTCOMES.inc(outcome="feedback")
+                        return result
+                
+                    # 检查WebSocket连接状态
+                    wait_limit = deadline - now
+                    if self.app and self.app.has_active_clients():
+                        if disconnected_at is not None:
+                            logger.info(f"WebSocket已重新连接，断开 {now - disconnected_at:.1f} 秒")
+                            span.add_event("websocket.resumed", {"gap_seconds": now - disconnected_at})
+                            SESSION_RESUMES.inc(outcome="resumed")
+                            disconnected_at = None
+                    else:
+                        if disconnected_at is None:
+                            disconnected_at = now
+                            logger.info(f"WebSocket连接已断开，等待 {reconnect_grace:.0f} 秒内重新连接")
+                        grace_remaining = disconnected_at + reconnect_grace - now
+                        if grace_remaining <= 0:
+                            logger.info("重连宽限期已过，结束等待")
+                            if reconnect_grace > 0:
+                                SESSION_RESUMES.inc(outcome="expired")
+                            return self._create_timeout_result("websocket_disconnected")
+                        wait_limit = min(wait_limit, grace_remaining)
+                
+                    # 检查总超时
+                    if deadline - now <= 0:
+                        logger.warning(f"总超时触发，已等待 {elapsed_time:.1f} 秒")
+                        return self._create_timeout_result("total_timeout")
+                
+                    wakeup.wait(wait_limit)
+        finally:
+            self.feedback_handler.trace_parent = None
+            self.feedback_handler.remove_result_listener(wakeup.set)
+            if app:
+                app.remove_client_listener(wakeup.set)
+            # 等待结束（已回答或超时）后不再在收件箱中列出
+            self._leave_inbox()
+
+    def _wait_for_websocket_connection(
+        self, grace_period: int, wakeup: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        等待WebSocket连接建立
+
+        Args:
+            grace_period: 宽容期（秒）
+            wakeup: 客户端或结果变化时被设置的事件，未提供时仅按宽容期等待
+
+        Returns:
+            bool: 宽容期内是否建立了连接（或已通过HTTP提交了结果）
+        """
+        wakeup = wakeup or threading.Event()
+        deadline = time.monotonic() + grace_period
         
-        while time.time() - start_time < grace_period:
+        while True:
+            wakeup.clear()
             if self.app and self.app.has_active_clients():
                 return True
-            time.sleep(1)
+            # 宽容期内已通过HTTP表单提交的结果同样视为就绪
+            if not self.feedback_handler.result_queue.empty():
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wakeup.wait(remaining)
         
         logger.warning(f"WebSocket连接未在{grace_period}秒内建立")
         return False
@@ -365,6 +473,13 @@ class ServerManager:
         """创建统一格式的超时结果"""
         from datetime import datetime
         
+        WAIT_OUTCOMES.inc(outcome=reason)
+        
+        # 页面已增量同步的草稿直接作为超时捕获结果，不依赖最后时刻的上传
+        draft_result = self.feedback_handler.build_draft_result(reason)
+        if draft_result is not None:
+            return draft_result
+        
         return {
             'text': '',
             'images': [],
@@ -380,7 +495,10 @@ class ServerManager:
             # 因为服务器线程是daemon线程，会在主程序结束时自动清理
 
             # 清理资源
+            self._leave_inbox()
             self.feedback_handler.clear_queue()
+            self.feedback_handler.clear_draft()
+            self.feedback_handler.attachments.clear()
             self.current_port = None
             self.app = None
 
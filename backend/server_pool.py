@@ -2,24 +2,113 @@
 全局服务器池管理器 v2.0
 提供多端口并发的MCP工具资源管理方案
 支持服务器池状态查询、端口管理和自动清理
+自动清理由进程级截止时间调度器驱动，每个会话只在其过期时间点被检查一次
+会话状态同步到跨进程共享的 SQLite 会话注册表，多个MCP进程互不覆盖
+会话ID由调用内容哈希和可选的幂等键生成，重试的工具调用挂接到原会话而不是重新启动
 """
 
+import hashlib
+import json
 import threading
 import time
 import logging
-import json
 import os
-from typing import Dict, List, Optional, Tuple
+import sqlite3
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple, Type
 from dataclasses import dataclass, asdict
 from enum import Enum
 
-from backend.server_manager import ServerManager
 from backend.config import get_server_config
+from backend.port_info import get_inbox_ssh_hint, invalidate_port_cache
+from backend.utils.admission import AdmissionController
+from backend.utils.deadline_scheduler import TimerHandle, get_scheduler
+from backend.utils.history_store import record_feedback
+from backend.utils.metrics import CLEANUP_LAG_SECONDS, SESSION_REATTACHES, get_metrics_registry
+from backend.utils.tracing import get_current_span, traced
+from backend.utils.persistence import DebouncedStateWriter, get_registry_file_path
+from backend.utils.session_registry import (
+    REGISTRY_HEARTBEAT_INTERVAL,
+    SessionRegistry,
+    get_session_registry,
+)
+
+if TYPE_CHECKING:
+    from backend.server_manager import ServerManager
 
 logger = logging.getLogger(__name__)
 
-# 状态文件路径
-STATUS_FILE = os.path.join(os.getcwd(), ".mcp_server_pool_status.json")
+# 会话注册表路径：位于用户状态目录下、所有MCP进程共享
+REGISTRY_FILE = get_registry_file_path()
+
+# 错误状态的服务器保留时间（秒），便于查询失败原因
+ERROR_RETENTION_SECONDS: float = 300.0
+
+# 用户反馈结果的保留时间（秒），期间相同会话的重试直接返回同一结果
+RESULT_RETENTION_SECONDS: float = 300.0
+
+# 抓取时由服务器池计算的仪表盘
+POOL_METRIC_NAMES = {
+    "mcp_feedback_sessions": "服务器池中各状态的会话数量",
+    "mcp_feedback_result_queue_depth": "会话结果队列中待取的反馈数量",
+    "mcp_feedback_websocket_clients": "会话的活跃WebSocket客户端数量",
+    "mcp_feedback_csrf_tokens": "会话中未使用的CSRF令牌数量",
+    "mcp_feedback_scheduler_pending_deadlines": "截止时间调度器中待触发的截止时间数量",
+}
+
+
+def _server_manager_class() -> Type["ServerManager"]:
+    """
+    获取 ServerManager 类
+
+    server_manager 依赖 Flask、Flask-SocketIO、eventlet 等较重的 Web 栈，
+    首次创建服务器时才导入，MCP 握手不必等待这些模块加载。
+    """
+    manager_class = globals().get("ServerManager")
+    if manager_class is None:
+        from backend.server_manager import ServerManager as manager_class
+
+        globals()["ServerManager"] = manager_class
+    return manager_class
+
+
+def __getattr__(name: str):
+    # 兼容 backend.server_pool.ServerManager 的访问方式
+    if name == "ServerManager":
+        return _server_manager_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 状态迁移监听器（进程级，例如MCP资源订阅通知）
+_state_listeners: List[Callable[[], None]] = []
+
+
+def make_session_key(kind: str, content: Any, idempotency_key: Optional[str] = None) -> str:
+    """
+    由调用内容和可选的幂等键生成稳定的会话ID
+
+    内容相同（且幂等键相同）的重试得到同一会话ID；
+    内容不同或幂等键不同的调用互相隔离。
+
+    Args:
+        kind: 会话类型前缀，如 "feedback"、"batch_feedback"
+        content: 可JSON序列化的调用内容
+        idempotency_key: 客户端提供的幂等键（可选）
+    """
+    payload = json.dumps([content, idempotency_key or ""], ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    return f"{kind}_{digest}"
+
+
+def add_state_listener(listener: Callable[[], None]) -> None:
+    """注册状态迁移监听器，每次池状态变化后被调用（监听器应快速返回）"""
+    _state_listeners.append(listener)
+
+
+def remove_state_listener(listener: Callable[[], None]) -> None:
+    """移除状态迁移监听器"""
+    if listener in _state_listeners:
+        _state_listeners.remove(listener)
 
 
 class ServerStatus(Enum):
@@ -42,40 +131,70 @@ class ServerInfo:
     work_summary: str = ""
     timeout_seconds: int = 300
     error_message: str = ""
+    connected_clients: int = 0
+    last_feedback_at: Optional[float] = None
 
 
 class EnhancedServerPool:
     """增强的服务器池管理器"""
 
     def __init__(self):
-        self._servers: Dict[str, ServerManager] = {}
+        self._servers: Dict[str, "ServerManager"] = {}
         self._server_info: Dict[str, ServerInfo] = {}
         self._port_map: Dict[int, str] = {}  # 端口到session_id的映射
+        self._reserved_ports: Set[int] = set()  # 启动中已预留的端口
+        self._expiry_handles: Dict[str, TimerHandle] = {}  # 会话的过期截止时间
+        self._calls: Dict[str, Future] = {}  # 会话ID到等待中或已完成调用的结果
+        self._call_retention_handles: Dict[str, TimerHandle] = {}  # 已完成调用结果的保留截止时间
         self._lock = threading.RLock()
+        
+        # 版本化状态快照：状态迁移时增量更新对应条目并递增版本号
+        self._status_version = 0
+        self._snapshot_entries: Dict[str, Dict] = {}
+        self._snapshot_cache: Optional[Dict] = None
         self._config = get_server_config()
+        self._scheduler = get_scheduler()
+        self._pid = os.getpid()
+        
+        # 跨进程会话注册表（不可用时仅影响状态共享，不影响池本身）
+        self._registry: Optional[SessionRegistry] = None
+        try:
+            self._registry = get_session_registry()
+        except sqlite3.Error as e:
+            logger.warning(f"会话注册表不可用，状态将不会跨进程共享: {e}")
         
-        # 启动清理线程
-        self._cleanup_thread = threading.Thread(
-            target=self._cleanup_worker,
-            daemon=True,
-            name="ServerPool-Cleanup"
+        # 后台状态写入器：合并突发变更，在锁外以单个事务同步本进程的注册表行
+        self._status_writer = DebouncedStateWriter(
+            self._build_registry_rows,
+            self._write_registry_rows,
+            name="ServerPool-StatusWriter"
         )
-        self._cleanup_running = True
-        self._cleanup_thread.start()
+        self._heartbeat_handle: Optional[TimerHandle] = None
+        
+        # 存活会话数上限（排队和拒绝在池锁外进行，名额变化时更新状态快照）
+        self._admission = AdmissionController.from_config(on_change=self._on_admission_change)
+        
+        # 瞬时指标仅在被抓取时计算
+        get_metrics_registry().register_collector(POOL_METRIC_NAMES, self._collect_metrics)
         
         logger.info("增强服务器池已启动，支持多端口并发管理")
         
-        # 加载持久化状态
-        self._load_status_from_file()
+        # 清理已退出进程遗留的注册表记录，并开始定期心跳
+        self._load_registry_state()
+        self._schedule_registry_heartbeat()
 
-    def get_server(self, session_id: str = "default") -> ServerManager:
+    def get_server(self, session_id: str = "default") -> "ServerManager":
         """获取或创建服务器实例"""
         with self._lock:
             current_time = time.time()
             
             if session_id not in self._servers:
                 # 创建新的服务器实例
-                self._servers[session_id] = ServerManager()
+                server = _server_manager_class()()
+                server.feedback_handler.add_result_listener(
+                    lambda: self._on_session_event(session_id, feedback_received=True)
+                )
+                self._servers[session_id] = server
                 self._server_info[session_id] = ServerInfo(
                     session_id=session_id,
                     port=None,
@@ -84,20 +203,42 @@ class EnhancedServerPool:
                     last_activity=current_time
                 )
                 logger.info(f"创建新服务器实例: {session_id}")
+                self._mark_state_changed(session_id)
             else:
                 # 更新活动时间
                 self._server_info[session_id].last_activity = current_time
             
+            # 空闲会话的过期时间随活动时间顺延
+            self._schedule_expiry(session_id)
+            
             return self._servers[session_id]
 
+    @traced("pool.start_server")
     def start_server_in_pool(
         self, 
         session_id: str,
         work_summary: str = "",
         timeout_seconds: int = 300,
-        suggest: str = ""
-    ) -> Tuple[ServerManager, int]:
-        """在池中启动服务器并返回实例和端口"""
+        suggest: str = "",
+        batch_items: Optional[List[Dict]] = None,
+        admit: bool = True,
+        use_inbox: bool = True
+    ) -> Tuple["ServerManager", int]:
+        """在池中启动服务器并返回实例和端口
+
+        batch_items 非空时页面以批量模式呈现多个问题。
+
+        端口在锁内预留，耗时的服务器启动在锁外执行，
+        因此多个会话可以并发启动而不会互相阻塞。
+        存活会话数达到上限时先在锁外排队等待名额，无法准入时抛出 SessionAdmissionError。
+        admit 为False时不占用名额（create_server_pool 预先启动的服务器没有等待反馈的调用，
+        不会释放名额，计入上限会让后续的反馈调用一直排队）。
+        use_inbox 为False时会话不在收件箱中列出（需要图片的会话）。
+        """
+        span = get_current_span()
+        span.set_attribute("session_id", session_id)
+        if admit:
+            span.set_attribute("admission_wait_seconds", self._admission.acquire(session_id))
         with self._lock:
             server = self.get_server(session_id)
             
@@ -106,58 +247,141 @@ class EnhancedServerPool:
             info.status = ServerStatus.STARTING
             info.work_summary = work_summary
             info.timeout_seconds = timeout_seconds
+            info.error_message = ""
             info.last_activity = time.time()
+            self._schedule_expiry(session_id)
+            self._mark_state_changed(session_id)
             
-            try:
-                # 确定要使用的端口（避免与已占用端口冲突）
-                used_ports = set(self._port_map.keys())
-                preferred_port = self._config.preferred_web_port
-                
-                # 如果首选端口已被占用，寻找下一个可用端口
-                target_port = preferred_port
-                while target_port in used_ports:
-                    target_port += 1
-                    if target_port > 65535:  # 端口溢出保护
-                        # 从1024开始重新查找
-                        target_port = 1024
-                        break
-                
-                # 临时修改服务器管理器的首选端口
-                original_preferred = server._config.preferred_web_port
-                server._config.preferred_web_port = target_port
-                
-                try:
-                    # 启动服务器
-                    port = server.start_server(
-                        work_summary=work_summary,
-                        timeout_seconds=timeout_seconds,
-                        suggest=suggest
-                    )
-                finally:
-                    # 恢复原始配置
-                    server._config.preferred_web_port = original_preferred
-                
-                # 验证返回的端口
-                if port != target_port:
-                    logger.info(f"服务器 {session_id} 分配的端口 {port} 与目标端口 {target_port} 不同")
-                
-                # 更新端口映射和状态
-                info.port = port
-                info.status = ServerStatus.RUNNING
-                self._port_map[port] = session_id
-                
-                logger.info(f"服务器 {session_id} 在端口 {port} 启动成功")
-                
-                # 保存状态到文件
-                self._save_status_to_file()
-                
-                return server, port
-                
-            except Exception as e:
+            # 确定要使用的端口（避免与已占用或已预留的端口冲突）
+            used_ports = set(self._port_map.keys()) | self._reserved_ports
+            preferred_port = self._config.preferred_web_port
+            
+            # 如果首选端口已被占用，寻找下一个可用端口
+            target_port = preferred_port
+            while target_port in used_ports:
+                target_port += 1
+                if target_port > 65535:  # 端口溢出保护
+                    # 从1024开始重新查找
+                    target_port = 1024
+                    break
+            
+            self._reserved_ports.add(target_port)
+            span.set_attribute("reserved_port", target_port)
+        
+        try:
+            # 启动服务器（锁外执行，不阻塞其他会话）
+            port = server.start_server(
+                work_summary=work_summary,
+                timeout_seconds=timeout_seconds,
+                suggest=suggest,
+                preferred_port=target_port,
+                batch_items=batch_items,
+                use_inbox=use_inbox,
+                session_id=session_id
+            )
+        except Exception as e:
+            if admit:
+                self._admission.release(session_id)
+            with self._lock:
+                self._reserved_ports.discard(target_port)
                 info.status = ServerStatus.ERROR
                 info.error_message = str(e)
-                logger.error(f"服务器 {session_id} 启动失败: {e}")
-                raise
+                info.last_activity = time.time()
+                self._schedule_expiry(session_id)
+                self._mark_state_changed(session_id)
+            logger.error(f"服务器 {session_id} 启动失败: {e}")
+            raise
+        
+        with self._lock:
+            self._reserved_ports.discard(target_port)
+            
+            # 验证返回的端口
+            if port != target_port:
+                logger.info(f"服务器 {session_id} 分配的端口 {port} 与目标端口 {target_port} 不同")
+            
+            # 更新端口映射和状态
+            info.port = port
+            info.status = ServerStatus.RUNNING
+            info.last_activity = time.time()
+            self._port_map[port] = session_id
+            self._schedule_expiry(session_id)
+            
+            # 跟踪客户端连接变化
+            if server.app is not None:
+                server.app.add_client_listener(lambda: self._on_session_event(session_id))
+            
+            logger.info(f"服务器 {session_id} 在端口 {port} 启动成功")
+            
+            # 更新快照并持久化
+            self._mark_state_changed(session_id)
+            
+            return server, port
+
+    @traced("pool.run_session")
+    def run_session(
+        self,
+        session_id: str,
+        work_summary: str = "",
+        timeout_seconds: int = 300,
+        suggest: str = "",
+        batch_items: Optional[List[Dict]] = None,
+        use_inbox: bool = True
+    ) -> Tuple["ServerManager", Optional[Dict]]:
+        """启动会话并等待反馈，同一会话ID的调用是幂等的
+
+        - 会话仍在等待时，重试的调用挂接到原会话并共享其结果，不会启动第二个服务器和页面
+        - 用户反馈提交后 RESULT_RETENTION_SECONDS 内的重试直接返回同一结果
+        超时等没有用户反馈的结果不保留，之后的调用重新启动会话。
+
+        Returns:
+            (服务器实例, wait_for_feedback 的结果)
+        """
+        with self._lock:
+            call = self._calls.get(session_id)
+            owner = call is None
+            if owner:
+                call = Future()
+                self._calls[session_id] = call
+        
+        span = get_current_span()
+        span.set_attribute("session_id", session_id)
+        span.set_attribute("reattached", not owner)
+        if not owner:
+            state = "completed" if call.done() else "pending"
+            SESSION_REATTACHES.inc(state=state)
+            logger.info(f"会话 {session_id} 已存在（{state}），挂接到原会话")
+            return call.result()
+        
+        try:
+            server, _ = self.start_server_in_pool(
+                session_id, work_summary, timeout_seconds, suggest, batch_items=batch_items, use_inbox=use_inbox
+            )
+            result = server.wait_for_feedback(timeout_seconds)
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(session_id, None)
+            call.set_exception(e)
+            raise
+        
+        # 反馈写入历史（后台批量写入，不阻塞返回）
+        record_feedback(result, session_id, work_summary, suggest, batch_items)
+        
+        with self._lock:
+            if result is not None and not result.get("is_timeout"):
+                self._call_retention_handles[session_id] = self._scheduler.call_later(
+                    RESULT_RETENTION_SECONDS, self._forget_call, session_id, call
+                )
+            else:
+                self._calls.pop(session_id, None)
+        call.set_result((server, result))
+        return server, result
+
+    def _forget_call(self, session_id: str, call: Future):
+        """已完成调用的保留期结束（在调度线程中执行）"""
+        with self._lock:
+            if self._calls.get(session_id) is call:
+                del self._calls[session_id]
+                self._call_retention_handles.pop(session_id, None)
 
     def get_pool_status(self) -> Dict:
         """获取服务器池状态"""
@@ -168,6 +392,7 @@ class EnhancedServerPool:
                 "total_servers": len(self._servers),
                 "active_servers": 0,
                 "ports_in_use": list(self._port_map.keys()),
+                "admission": self._admission.snapshot(),
                 "servers": []
             }
             
@@ -182,6 +407,13 @@ class EnhancedServerPool:
                     "idle_time": current_time - info.last_activity,
                     "url": f"http://127.0.0.1:{info.port}" if info.port else None
                 }
+                server = self._servers.get(session_id)
+                if server is not None:
+                    handler = server.feedback_handler
+                    server_data["queue_depth"] = handler.result_queue.qsize()
+                    server_data["rejected_submissions"] = handler.overflow_count + (
+                        server.app.submit_limiter.rejected_count if server.app is not None else 0
+                    )
                 
                 if info.status == ServerStatus.RUNNING:
                     status["active_servers"] += 1
@@ -207,7 +439,9 @@ class EnhancedServerPool:
             return self._port_map.get(port)
 
     def release_server(self, session_id: str = "default", immediate: bool = False):
-        """释放服务器实例"""
+        """释放服务器实例（会话结束，立即归还存活会话名额）"""
+        self._admission.release(session_id)
+        server = None
         with self._lock:
             if session_id not in self._servers:
                 return
@@ -215,96 +449,138 @@ class EnhancedServerPool:
             info = self._server_info[session_id]
             
             if immediate:
-                # 立即清理
-                self._cleanup_server(session_id)
+                # 立即清理，停止服务器在锁外进行
+                server = self._detach_server(session_id)
             else:
-                # 标记为停止中，由清理线程处理
+                # 标记为停止中，由调度器尽快清理
                 info.status = ServerStatus.STOPPING
-                logger.info(f"服务器 {session_id} 标记为停止中，将由清理线程处理")
+                self._schedule_expiry(session_id)
+                self._mark_state_changed(session_id)
+                logger.info(f"服务器 {session_id} 标记为停止中，将由调度器清理")
+        if server:
+            self._stop_server(session_id, server)
+
+    def _detach_server(self, session_id: str) -> Optional["ServerManager"]:
+        """从池中移除服务器并返回，由调用方在锁外停止（需在锁内调用）"""
+        server = self._servers.pop(session_id, None)
+        if server is None:
+            return None
+        info = self._server_info.pop(session_id, None)
+        self._admission.release(session_id)
+        
+        handle = self._expiry_handles.pop(session_id, None)
+        if handle:
+            handle.cancel()
+        
+        # 清理端口映射
+        if info and info.port:
+            self._port_map.pop(info.port, None)
+        
+        # 移除后更新快照并持久化
+        self._mark_state_changed(session_id)
+        return server
 
-    def _cleanup_server(self, session_id: str):
-        """清理指定服务器"""
+    def _stop_server(self, session_id: str, server: "ServerManager"):
+        """停止已从池中移除的服务器（可能阻塞，不能持有池锁或在调度线程中调用）"""
         try:
-            if session_id in self._servers:
-                server = self._servers.pop(session_id)
-                info = self._server_info.pop(session_id, None)
-                
-                # 清理端口映射
-                if info and info.port:
-                    self._port_map.pop(info.port, None)
-                
-                # 停止服务器
-                try:
-                    server.stop_server()
-                except Exception as e:
-                    logger.warning(f"停止服务器 {session_id} 时出错: {e}")
-                
-                logger.info(f"服务器 {session_id} 已清理")
-                
-                # 清理后保存状态
-                self._save_status_to_file()
-                
+            server.stop_server()
+            logger.info(f"服务器 {session_id} 已清理")
         except Exception as e:
-            logger.error(f"清理服务器 {session_id} 时出错: {e}")
-
-    def _cleanup_worker(self):
-        """清理工作线程"""
-        while self._cleanup_running:
-            try:
-                current_time = time.time()
-                cleanup_list = []
-                
-                with self._lock:
-                    for session_id, info in self._server_info.items():
-                        # 清理条件：
-                        # 1. 状态为STOPPING
-                        # 2. 空闲时间超过配置阈值
-                        # 3. 错误状态超过一定时间
-                        should_cleanup = False
-                        
-                        if info.status == ServerStatus.STOPPING:
-                            should_cleanup = True
-                        elif info.status == ServerStatus.IDLE:
-                            idle_time = current_time - info.last_activity
-                            if idle_time > self._config.idle_timeout:
-                                should_cleanup = True
-                        elif info.status == ServerStatus.ERROR:
-                            error_time = current_time - info.last_activity
-                            if error_time > 300:  # 错误状态5分钟后清理
-                                should_cleanup = True
-                        
-                        if should_cleanup:
-                            cleanup_list.append(session_id)
-                
-                # 执行清理（在锁外执行避免死锁）
-                for session_id in cleanup_list:
-                    with self._lock:
-                        self._cleanup_server(session_id)
-                
-                # 休眠
-                time.sleep(self._config.cleanup_interval)
-                
-            except Exception as e:
-                logger.error(f"清理工作线程出错: {e}")
-                time.sleep(10)  # 出错时等待更长时间
+            logger.warning(f"停止服务器 {session_id} 时出错: {e}")
+
+    def _get_expiry_delay(self, info: ServerInfo) -> Optional[float]:
+        """
+        计算会话距离过期的秒数
+
+        清理条件：
+        1. 状态为STOPPING：立即清理
+        2. 状态为IDLE：空闲时间超过配置阈值
+        3. 状态为ERROR：保留一段时间后清理
+        STARTING/RUNNING 状态不会过期，返回None。
+        """
+        idle_time = time.time() - info.last_activity
+        if info.status == ServerStatus.STOPPING:
+            return 0.0
+        if info.status == ServerStatus.IDLE:
+            return max(0.0, self._config.idle_timeout - idle_time)
+        if info.status == ServerStatus.ERROR:
+            return max(0.0, ERROR_RETENTION_SECONDS - idle_time)
+        return None
+
+    def _schedule_expiry(self, session_id: str):
+        """根据当前状态重新安排会话的过期截止时间（需在锁内调用）"""
+        old_handle = self._expiry_handles.pop(session_id, None)
+        if old_handle:
+            old_handle.cancel()
+        
+        info = self._server_info.get(session_id)
+        if info is None:
+            return
+        
+        delay = self._get_expiry_delay(info)
+        if delay is not None:
+            self._expiry_handles[session_id] = self._scheduler.call_later(
+                delay, self._on_session_expired, session_id
+            )
+
+    def _on_session_expired(self, session_id: str):
+        """会话过期回调（在调度线程中执行）：从池中移除会话，停止服务器交给工作线程"""
+        with self._lock:
+            info = self._server_info.get(session_id)
+            if info is None:
+                return
+            
+            # 截止时间触发后状态可能已变化，重新核对
+            delay = self._get_expiry_delay(info)
+            if delay is None:
+                self._expiry_handles.pop(session_id, None)
+                return
+            if delay > 0:
+                self._schedule_expiry(session_id)
+                return
+            
+            CLEANUP_LAG_SECONDS.observe(-delay)
+            server = self._detach_server(session_id)
+        # 停止服务器可能阻塞（等待线程退出等），交给工作线程，调度线程只负责派发
+        self._scheduler.run_in_worker(self._stop_server, session_id, server)
 
     def shutdown(self):
         """关闭服务器池"""
         logger.info("开始关闭服务器池...")
         
-        # 停止清理线程
-        self._cleanup_running = False
-        if self._cleanup_thread.is_alive():
-            self._cleanup_thread.join(timeout=5)
+        if self._heartbeat_handle:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+        get_metrics_registry().unregister_collector(self._collect_metrics)
         
         with self._lock:
-            # 清理所有服务器
-            for session_id in list(self._servers.keys()):
-                self._cleanup_server(session_id)
+            # 移除所有服务器，随后在锁外逐个停止
+            detached = [(session_id, self._detach_server(session_id)) for session_id in list(self._servers.keys())]
+            
+            for handle in self._expiry_handles.values():
+                handle.cancel()
+            for handle in self._call_retention_handles.values():
+                handle.cancel()
             
             self._servers.clear()
             self._server_info.clear()
             self._port_map.clear()
+            self._expiry_handles.clear()
+            self._calls.clear()
+            self._call_retention_handles.clear()
+            self._snapshot_entries.clear()
+            self._mark_state_changed()
+        
+        for session_id, server in detached:
+            self._stop_server(session_id, server)
+        
+        # 停止写入器并写入最终状态，随后移除本进程的注册表行
+        self._status_writer.stop(flush=True)
+        if self._registry:
+            try:
+                self._registry.remove_process(self._pid)
+            except sqlite3.Error as e:
+                logger.warning(f"移除会话注册表记录失败: {e}")
         
         logger.info("服务器池已关闭")
 
@@ -325,60 +601,197 @@ class EnhancedServerPool:
                     )
                     local_port += 1  # 为下一个分配不同的本地端口
             
+            inbox_hint = get_inbox_ssh_hint()
+            if inbox_hint:
+                commands.append(f"# 反馈收件箱\n{inbox_hint['command']}")
+            
             return commands
 
-    def _save_status_to_file(self):
-        """保存状态到文件"""
-        try:
-            status = self.get_pool_status()
-            # 添加时间戳
-            status['last_updated'] = time.time()
-            status['last_updated_readable'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    def _on_session_event(self, session_id: str, feedback_received: bool = False):
+        """会话内事件（客户端连接/断开、收到反馈）"""
+        with self._lock:
+            info = self._server_info.get(session_id)
+            server = self._servers.get(session_id)
+            if info is None or server is None:
+                return
             
-            with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(status, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            logger.warning(f"保存状态文件失败: {e}")
+            app = server.app
+            info.connected_clients = app.get_active_client_count() if app is not None else 0
+            if feedback_received:
+                info.last_feedback_at = time.time()
+            self._mark_state_changed(session_id)
+
+    def _on_admission_change(self):
+        """存活会话名额或排队变化（在申请或释放名额的线程中执行）"""
+        with self._lock:
+            self._mark_state_changed()
 
-    def _load_status_from_file(self):
-        """从文件加载状态（仅用于验证服务器是否仍在运行）"""
-        try:
-            if os.path.exists(STATUS_FILE):
-                with open(STATUS_FILE, 'r', encoding='utf-8') as f:
-                    saved_status = json.load(f)
-                
-                # 验证保存的服务器是否仍在运行
-                for server_info in saved_status.get('servers', []):
-                    port = server_info.get('port')
-                    if port:
-                        self._verify_server_running(port, server_info['session_id'])
-                        
-        except Exception as e:
-            logger.warning(f"加载状态文件失败: {e}")
+    def get_status_version(self) -> int:
+        """当前状态版本号，每次状态迁移递增"""
+        return self._status_version
 
-    def _verify_server_running(self, port: int, session_id: str):
-        """验证服务器是否仍在运行"""
+    def _collect_metrics(self):
+        """计算瞬时指标样本（仅在指标被抓取时调用）"""
+        with self._lock:
+            servers = list(self._servers.items())
+            status_counts = {status.value: 0 for status in ServerStatus}
+            for info in self._server_info.values():
+                status_counts[info.status.value] += 1
+
+        for status, count in status_counts.items():
+            yield "mcp_feedback_sessions", {"status": status}, count
+        for session_id, server in servers:
+            labels = {"session_id": session_id}
+            yield "mcp_feedback_result_queue_depth", labels, server.feedback_handler.result_queue.qsize()
+            app = server.app
+            if app is not None:
+                yield "mcp_feedback_websocket_clients", labels, app.get_active_client_count()
+                yield "mcp_feedback_csrf_tokens", labels, app.csrf_protection.get_active_token_count()
+        yield "mcp_feedback_scheduler_pending_deadlines", {}, self._scheduler.pending_count()
+
+    def get_status_snapshot(self) -> Dict:
+        """
+        获取版本化的状态快照
+
+        快照只包含不随时间变化的字段（时间戳而非运行时长），
+        同一版本内重复调用直接返回缓存对象，调用方不应修改返回值。
+        """
+        with self._lock:
+            cache = self._snapshot_cache
+            if cache is not None and cache["version"] == self._status_version:
+                return cache
+            
+            servers = sorted(
+                self._snapshot_entries.values(),
+                key=lambda entry: (entry["port"] is None, entry["port"] or 0, entry["session_id"])
+            )
+            self._snapshot_cache = {
+                "version": self._status_version,
+                "pid": self._pid,
+                "total_servers": len(servers),
+                "active_servers": sum(1 for entry in servers if entry["status"] == ServerStatus.RUNNING.value),
+                "ports_in_use": sorted(self._port_map.keys()),
+                "admission": self._admission.snapshot(),
+                "servers": servers,
+            }
+            return self._snapshot_cache
+
+    def _build_snapshot_entry(self, info: ServerInfo) -> Dict:
+        """构建单个会话的快照条目"""
+        entry = {
+            "session_id": info.session_id,
+            "port": info.port,
+            "status": info.status.value,
+            "work_summary": info.work_summary[:50] + "..." if len(info.work_summary) > 50 else info.work_summary,
+            "timeout_seconds": info.timeout_seconds,
+            "created_at": info.created_at,
+            "last_activity": info.last_activity,
+            "url": f"http://127.0.0.1:{info.port}" if info.port else None,
+            "connected_clients": info.connected_clients,
+            "last_feedback_at": info.last_feedback_at,
+        }
+        if info.error_message:
+            entry["error"] = info.error_message
+        return entry
+
+    def _mark_state_changed(self, session_id: Optional[str] = None):
+        """
+        记录一次状态迁移（需在锁内调用）
+
+        增量更新该会话的快照条目并递增版本号，
+        随后由后台写入器异步持久化。
+        """
+        if session_id is not None:
+            info = self._server_info.get(session_id)
+            if info is None:
+                self._snapshot_entries.pop(session_id, None)
+            else:
+                self._snapshot_entries[session_id] = self._build_snapshot_entry(info)
+        
+        self._status_version += 1
+        self._status_writer.mark_dirty()
+        invalidate_port_cache()
+        
+        for listener in list(_state_listeners):
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"状态监听器执行出错: {e}")
+
+    def _build_registry_rows(self) -> List[Dict]:
+        """构建本进程的注册表行快照（由后台写入器在池锁外调用）"""
+        with self._lock:
+            rows = []
+            for info in self._server_info.values():
+                row = asdict(info)
+                row['status'] = info.status.value
+                rows.append(row)
+            return rows
+
+    def _write_registry_rows(self, rows: List[Dict]):
+        """将快照同步到会话注册表"""
+        if self._registry:
+            self._registry.sync_process(self._pid, rows)
+
+    def _schedule_registry_heartbeat(self):
+        """安排下一次注册表心跳（调度线程只负责派发，数据库读写在工作线程中执行）"""
+        if self._registry:
+            self._heartbeat_handle = self._scheduler.call_later_in_worker(
+                REGISTRY_HEARTBEAT_INTERVAL, self._on_registry_heartbeat
+            )
+
+    def _on_registry_heartbeat(self):
+        """注册表心跳（在调度器的工作线程中执行）：刷新本进程行并清理失效进程"""
         try:
-            import requests
-            response = requests.get(f"http://127.0.0.1:{port}/ping", timeout=2)
-            if response.status_code == 200:
-                logger.info(f"检测到运行中的服务器: {session_id} (端口 {port})")
-                # 注意：这里不重新创建ServerManager实例，只是记录发现的服务器
-        except:
-            # 服务器已不存在，忽略
-            pass
+            refreshed = self._registry.heartbeat(self._pid)
+            with self._lock:
+                has_sessions = bool(self._server_info)
+            if refreshed == 0 and has_sessions:
+                # 本进程的行已被当作失效清理（例如长时间挂起），重新同步
+                self._status_writer.mark_dirty()
+            self._reap_stale_sessions()
+        except sqlite3.Error as e:
+            logger.warning(f"会话注册表心跳失败: {e}")
+        finally:
+            self._schedule_registry_heartbeat()
+
+    def _reap_stale_sessions(self):
+        """
+        清理失效进程的注册表记录
+
+        本连接自身的删除不会改变注册表的数据版本（PRAGMA data_version），
+        有记录被清理时递增本进程的状态版本，使状态资源缓存失效并通知订阅者。
+        """
+        if self._registry.reap_stale() > 0:
+            with self._lock:
+                self._mark_state_changed()
+
+    def _load_registry_state(self):
+        """清理已退出进程遗留的注册表记录，并记录其他进程中运行的会话"""
+        if not self._registry:
+            return
+        try:
+            self._reap_stale_sessions()
+            for session in self._registry.list_sessions(status="running"):
+                if session["pid"] != self._pid:
+                    logger.info(
+                        f"检测到其他进程中运行的服务器: {session['session_id']} "
+                        f"(端口 {session['port']}, PID {session['pid']})"
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"加载会话注册表失败: {e}")
 
 
 def load_server_status_from_file() -> Optional[Dict]:
-    """从文件加载服务器状态（独立函数，供外部调用）"""
+    """从会话注册表加载所有进程的服务器状态（独立函数，供外部调用）
+
+    汇总本机全部MCP进程心跳未超时的会话，注册表不可用时返回None。
+    """
     try:
-        if os.path.exists(STATUS_FILE):
-            with open(STATUS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.warning(f"读取状态文件失败: {e}")
-    return None
+        return get_session_registry().build_status_summary()
+    except sqlite3.Error as e:
+        logger.warning(f"读取会话注册表失败: {e}")
+        return None
 
 
 # 全局服务器池实例
@@ -396,7 +809,7 @@ def get_server_pool() -> EnhancedServerPool:
     return _server_pool
 
 
-def get_managed_server(session_id: str = "default") -> ServerManager:
+def get_managed_server(session_id: str = "default") -> "ServerManager":
     """获取托管的服务器实例"""
     return get_server_pool().get_server(session_id)
 
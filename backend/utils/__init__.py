@@ -18,11 +18,16 @@ from .image_utils import (
 from .logging_utils import log_message
 from .format_utils import format_feedback_summary
 
-# 导入PIL的Image用于测试兼容性
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
+
+def __getattr__(name):
+    # 导入PIL的Image用于测试兼容性（按需导入，避免拖慢启动）
+    if name == "Image":
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        return Image
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     "find_free_port",
@@ -0,0 +1,212 @@
+"""
+准入控制与背压
+- AdmissionController：限制同时存活的会话数，达到上限时按到达顺序排队，或立即拒绝
+- SubmitRateLimiter：按客户端的令牌桶限制反馈提交速率
+
+被拒绝的请求得到明确的原因，而不是无限制地启动服务器或阻塞在已满的队列上。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional, Set
+
+from backend.utils.custom_exceptions import SessionAdmissionError
+from backend.utils.metrics import SESSION_ADMISSIONS
+
+class AdmissionController:
+    """
+    会话准入控制器
+
+    同时存活的会话数达到 max_live 后：queue 模式下新会话按到达顺序排队等待空位，
+    队列已满或等待超过 queue_timeout 秒时拒绝；reject 模式下立即拒绝。
+    max_live 为0表示不限制。已准入的会话再次申请时直接通过，不占用新名额。
+    """
+
+    def __init__(
+        self,
+        max_live: int = 0,
+        mode: str = "queue",
+        queue_size: int = 32,
+        queue_timeout: float = 120.0,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self.max_live = max_live
+        self.mode = mode
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._on_change = on_change
+        self._cond = threading.Condition()
+        self._live: Set[str] = set()
+        # 排队中的申请（每次申请一个独立的票据，按到达顺序准入）
+        self._waiting: Deque[object] = deque()
+        self._admitted_total = 0
+        self._rejected: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, on_change: Optional[Callable[[], None]] = None) -> "AdmissionController":
+        """按服务器配置创建"""
+        from backend.config import get_server_config
+
+        config = get_server_config()
+        return cls(
+            max_live=config.max_live_sessions,
+            mode=config.session_admission,
+            queue_size=config.session_queue_size,
+            queue_timeout=config.session_queue_timeout,
+            on_change=on_change,
+        )
+
+    def _has_room(self) -> bool:
+        return self.max_live <= 0 or len(self._live) < self.max_live
+
+    def _notify_change(self) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def acquire(self, key: str) -> float:
+        """
+        申请一个存活会话名额
+
+        Returns:
+            排队等待的秒数（直接准入时为0）
+
+        Raises:
+            SessionAdmissionError: 达到上限且不排队、队列已满或排队超时
+        """
+        started = time.monotonic()
+        with self._cond:
+            if key in self._live:
+                return 0.0
+            if self._has_room() and not self._waiting:
+                self._live.add(key)
+                self._admitted_total += 1
+                outcome = "admitted"
+            elif self.mode == "reject" or len(self._waiting) >= self.queue_size:
+                outcome = "capacity" if self.mode == "reject" else "queue_full"
+                self._rejected[outcome] = self._rejected.get(outcome, 0) + 1
+            else:
+                outcome = None
+        if outcome is not None:
+            SESSION_ADMISSIONS.inc(outcome=outcome)
+            self._notify_change()
+            if outcome != "admitted":
+                raise SessionAdmissionError(outcome, len(self._live), self.max_live)
+            return 0.0
+
+        ticket = object()
+        deadline = started + self.queue_timeout
+        with self._cond:
+            self._waiting.append(ticket)
+        self._notify_change()
+
+        with self._cond:
+            while not (self._waiting[0] is ticket and (key in self._live or self._has_room())):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self._rejected["queue_timeout"] = self._rejected.get("queue_timeout", 0) + 1
+                    # 队首可能变化，唤醒其余等待者重新检查
+                    self._cond.notify_all()
+                    outcome = "queue_timeout"
+                    break
+                self._cond.wait(remaining)
+            else:
+                self._waiting.popleft()
+                if key not in self._live:
+                    self._live.add(key)
+                    self._admitted_total += 1
+                self._cond.notify_all()
+                outcome = "queued"
+
+        SESSION_ADMISSIONS.inc(outcome=outcome)
+        self._notify_change()
+        if outcome == "queue_timeout":
+            raise SessionAdmissionError(outcome, len(self._live), self.max_live)
+        return time.monotonic() - started
+
+    def release(self, key: str) -> bool:
+        """释放名额，返回该会话是否持有名额"""
+        with self._cond:
+            if key not in self._live:
+                return False
+            self._live.discard(key)
+            self._cond.notify_all()
+        self._notify_change()
+        return True
+
+    def snapshot(self) -> Dict:
+        """准入状态（用于池状态和状态资源）"""
+        with self._cond:
+            return {
+                "max_live_sessions": self.max_live,
+                "mode": self.mode,
+                "live_sessions": len(self._live),
+                "queued_sessions": len(self._waiting),
+                "queue_size": self.queue_size,
+                "queue_timeout": self.queue_timeout,
+                "admitted_total": self._admitted_total,
+                "rejected": dict(self._rejected),
+            }
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充，最多积累 burst 个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """取一个令牌，成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class SubmitRateLimiter:
+    """
+    按客户端的提交限速器
+
+    每个客户端（WebSocket 连接或 HTTP 来源地址）一个令牌桶，
+    只保留最近活动的 max_clients 个客户端。rate 不大于0表示不限制。
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 5, max_clients: int = 1024):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected_count = 0
+
+    @classmethod
+    def from_config(cls) -> "SubmitRateLimiter":
+        """按服务器配置创建"""
+        from backend.config import get_server_config
+
+        config = get_server_config()
+        return cls(rate=config.submit_rate_per_second, burst=config.submit_burst)
+
+    def check(self, client_key: str) -> float:
+        """记录一次提交，允许时返回0，超出速率时返回建议的重试等待秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(client_key)
+            if bucket is None:
+                bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_key)
+            retry_after = bucket.take()
+            if retry_after:
+                self.rejected_count += 1
+            return retry_after
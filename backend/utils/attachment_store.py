@@ -0,0 +1,151 @@
+"""
+附件分块上传存储模块
+页面通过 WebSocket 以二进制分块上传图片，每个分块带 CRC32 校验，到达后立即写入存储。
+
+上传以客户端生成的附件ID标识：重复开始同一上传时返回已接收的偏移量，
+页面断线重连后从最后确认的偏移量继续，无需从头上传。
+"""
+
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from backend.security.csrf_handler import SecurityConfig
+
+# 单个分块的最大字节数（页面默认 64KB）
+MAX_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass
+class Attachment:
+    """上传中或已完成的附件"""
+
+    attachment_id: str
+    size: int
+    mime: str
+    filename: str
+    data: bytearray = field(default_factory=bytearray)
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def received(self) -> int:
+        return len(self.data)
+
+    @property
+    def complete(self) -> bool:
+        return len(self.data) == self.size
+
+
+class AttachmentStore:
+    """
+    线程安全的附件存储
+
+    Socket.IO 事件处理器写入，提交和超时捕获读取。
+    总字节数按上传开始时声明的大小预留，超出限制的上传在开始时即被拒绝。
+    """
+
+    def __init__(
+        self,
+        max_attachment_bytes: int = SecurityConfig.MAX_CONTENT_LENGTH,
+        max_total_bytes: int = SecurityConfig.MAX_MEMORY_PER_REQUEST,
+    ):
+        self.max_attachment_bytes = max_attachment_bytes
+        self.max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+        self._attachments: Dict[str, Attachment] = {}
+        self._reserved_bytes = 0
+
+    def begin(self, attachment_id: str, size: int, mime: str = "", filename: str = "") -> int:
+        """
+        开始（或恢复）上传
+
+        Returns:
+            已接收的偏移量，页面从该位置继续发送
+
+        Raises:
+            ValueError: 参数无效、超出大小限制或与已有上传的大小不一致
+        """
+        if not attachment_id or not isinstance(size, int) or size <= 0:
+            raise ValueError("附件参数无效")
+        if size > self.max_attachment_bytes:
+            raise ValueError("附件过大")
+
+        with self._lock:
+            attachment = self._attachments.get(attachment_id)
+            if attachment is not None:
+                if attachment.size != size:
+                    raise ValueError("附件大小与已有上传不一致")
+                return attachment.received
+            if self._reserved_bytes + size > self.max_total_bytes:
+                raise ValueError("附件总大小超出限制")
+            self._attachments[attachment_id] = Attachment(
+                attachment_id=attachment_id,
+                size=size,
+                mime=mime or "application/octet-stream",
+                filename=filename,
+            )
+            self._reserved_bytes += size
+            return 0
+
+    def append(self, attachment_id: str, offset: int, chunk: bytes, checksum: int) -> int:
+        """
+        写入分块
+
+        偏移量与已接收的字节数不一致时（重连后的过期分块）不写入，
+        直接返回已接收的偏移量，页面据此回退。
+
+        Returns:
+            写入后已接收的偏移量
+
+        Raises:
+            ValueError: 上传不存在、分块过大、越界或校验失败
+        """
+        if not isinstance(offset, int) or not isinstance(chunk, (bytes, bytearray)) or len(chunk) > MAX_CHUNK_BYTES:
+            raise ValueError("分块格式无效")
+        if zlib.crc32(chunk) != checksum:
+            raise ValueError("分块校验失败")
+
+        with self._lock:
+            attachment = self._attachments.get(attachment_id)
+            if attachment is None:
+                raise ValueError("上传不存在")
+            if offset != attachment.received:
+                return attachment.received
+            if attachment.received + len(chunk) > attachment.size:
+                raise ValueError("分块超出附件大小")
+            attachment.data += chunk
+            return attachment.received
+
+    def offset(self, attachment_id: str) -> int:
+        """已接收的偏移量（上传不存在时为0）"""
+        with self._lock:
+            attachment = self._attachments.get(attachment_id)
+            return attachment.received if attachment else 0
+
+    def get(self, attachment_id: str) -> Optional[Attachment]:
+        """获取已完成的附件，未完成或不存在时返回None"""
+        with self._lock:
+            attachment = self._attachments.get(attachment_id)
+            return attachment if attachment is not None and attachment.complete else None
+
+    def remove(self, attachment_id: str) -> bool:
+        """删除附件，返回是否确实删除"""
+        with self._lock:
+            attachment = self._attachments.pop(attachment_id, None)
+            if attachment is None:
+                return False
+            self._reserved_bytes -= attachment.size
+            return True
+
+    def clear(self) -> None:
+        """清空所有附件（会话结束时调用）"""
+        with self._lock:
+            self._attachments.clear()
+            self._reserved_bytes = 0
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._attachments)
@@ -5,13 +5,16 @@
 
 import logging
 import webbrowser
+from typing import Optional
 from urllib.parse import quote
 
 # 配置模块级别的logger
 logger = logging.getLogger(__name__)
 
 
-def open_feedback_browser(port: int, work_summary: str, suggest: str = "") -> None:
+def open_feedback_browser(
+    port: int, work_summary: str, suggest: str = "", inbox_session: Optional[str] = None
+) -> None:
     """
     在浏览器中打开反馈页面
 
@@ -19,13 +22,17 @@ def open_feedback_browser(port: int, work_summary: str, suggest: str = "") -> No
         port: 服务器端口号
         work_summary: 工作摘要
         suggest: 建议内容，默认为空字符串
+        inbox_session: 收件箱中的会话ID，提供时 port 为收件箱端口，打开收件箱并选中该会话
     """
     try:
-        encoded_summary = quote(work_summary)
-        encoded_suggest = quote(suggest) if suggest else ""
-        url = f"http://127.0.0.1:{port}/?work_summary={encoded_summary}"
-        if encoded_suggest:
-            url += f"&suggest={encoded_suggest}"
+        if inbox_session:
+            url = f"http://127.0.0.1:{port}/?session={quote(inbox_session)}"
+        else:
+            encoded_summary = quote(work_summary)
+            encoded_suggest = quote(suggest) if suggest else ""
+            url = f"http://127.0.0.1:{port}/?work_summary={encoded_summary}"
+            if encoded_suggest:
+                url += f"&suggest={encoded_suggest}"
         webbrowser.open(url)
     except (OSError, webbrowser.Error) as e:
         logger.warning(f"无法自动打开浏览器 - 系统或浏览器错误: {e}")
@@ -0,0 +1,82 @@
+"""
+WebSocket 客户端跟踪模块
+记录已连接的客户端，供等待反馈的线程以 O(1) 判断是否有浏览器在线。
+
+客户端存活由 Engine.IO 的 ping/pong 保证：服务器每 ping_interval 秒发送 ping，
+ping_timeout 秒内未收到 pong 时断开连接并触发 disconnect 事件，
+因此"已连接"即"存活"，无需应用层心跳超时。
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class ClientTracker:
+    """
+    线程安全的客户端跟踪器
+
+    Socket.IO 事件处理器（服务器线程）写入，等待反馈的线程和服务器池读取。
+    所有操作在锁内完成，均为 O(1)；不在锁内执行回调或日志。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # client_id -> 连接时间
+        self._clients: Dict[str, float] = {}
+        self._last_seen: Optional[float] = None
+
+    def connect(self, client_id: str) -> bool:
+        """记录客户端连接，返回是否为新客户端"""
+        now = time.time()
+        with self._lock:
+            is_new = client_id not in self._clients
+            if is_new:
+                self._clients[client_id] = now
+            self._last_seen = now
+            return is_new
+
+    def disconnect(self, client_id: str) -> bool:
+        """移除客户端，返回是否确实移除"""
+        with self._lock:
+            removed = self._clients.pop(client_id, None) is not None
+            if removed:
+                self._last_seen = time.time()
+            return removed
+
+    def touch(self, client_id: str) -> bool:
+        """记录客户端活动（任何 Socket.IO 事件），返回客户端是否已连接"""
+        with self._lock:
+            if client_id not in self._clients:
+                return False
+            self._last_seen = time.time()
+            return True
+
+    def has_active(self) -> bool:
+        """是否有已连接的客户端"""
+        with self._lock:
+            return bool(self._clients)
+
+    @property
+    def count(self) -> int:
+        """已连接的客户端数量"""
+        with self._lock:
+            return len(self._clients)
+
+    @property
+    def last_seen(self) -> Optional[float]:
+        """最近一次客户端活动的时间戳（连接、断开或事件），没有过客户端时为 None"""
+        with self._lock:
+            return self._last_seen
+
+    def is_connected(self, client_id: str) -> bool:
+        """客户端是否已连接"""
+        with self._lock:
+            return client_id in self._clients
+
+    def clear(self) -> List[str]:
+        """移除全部客户端，返回被移除的客户端ID"""
+        with self._lock:
+            client_ids = list(self._clients)
+            self._clients.clear()
+            return client_ids
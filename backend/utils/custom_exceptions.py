@@ -26,4 +26,26 @@ class ImageSelectionError(Exception):
     """
     
     def __init__(self, message: str = "未选择图片或操作被取消"):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+
+class SessionAdmissionError(Exception):
+    """
+    会话准入异常
+    
+    同时存活的会话数达到上限，且不排队、排队队列已满或排队超时时抛出此异常
+    """
+    
+    _REASONS = {
+        "capacity": "存活会话数已达上限",
+        "queue_full": "存活会话数已达上限且排队队列已满",
+        "queue_timeout": "排队等待空闲名额超时",
+    }
+    
+    def __init__(self, reason: str, live_sessions: int, max_live_sessions: int):
+        super().__init__(
+            f"{self._REASONS.get(reason, reason)}（当前 {live_sessions}/{max_live_sessions}），请稍后重试"
+        )
+        self.reason = reason
+        self.live_sessions = live_sessions
+        self.max_live_sessions = max_live_sessions
@@ -0,0 +1,243 @@
+"""
+进程级截止时间调度器
+使用单个线程和最小堆管理所有会话截止时间（空闲过期、错误过期、
+总超时等），截止时间到达时精确触发，
+线程数和唤醒次数不随会话数量增长。
+需要阻塞的工作（数据库读写、停止服务器等）交给少量工作线程执行，
+调度线程只负责按时派发。
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 已取消条目超过堆大小的该比例时压缩堆，避免频繁重排导致堆膨胀
+_COMPACT_RATIO: float = 0.5
+_COMPACT_MIN_SIZE: int = 64
+
+# 执行阻塞工作的工作线程数量
+WORKER_THREADS: int = 2
+
+
+class TimerHandle:
+    """已调度截止时间的句柄，可用于取消"""
+
+    __slots__ = ("when", "callback", "args", "cancelled", "_scheduler")
+
+    def __init__(self, when: float, callback: Callable[..., Any], args: Tuple, scheduler):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    def cancel(self) -> None:
+        """取消该截止时间（重复调用无副作用）"""
+        if not self.cancelled:
+            self._scheduler._on_cancel(self)
+
+    def remaining(self) -> float:
+        """距离触发的剩余秒数"""
+        return max(0.0, self.when - time.monotonic())
+
+
+class DeadlineScheduler:
+    """
+    基于最小堆的截止时间调度器
+
+    所有回调在调度线程中串行执行，回调应当快速返回，不应阻塞；
+    需要阻塞的工作通过 run_in_worker / call_later_in_worker 交给工作线程。
+    时间基准为 time.monotonic()。
+    """
+
+    def __init__(self, name: str = "DeadlineScheduler"):
+        self._name = name
+        self._heap: List[Tuple[float, int, TimerHandle]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._cancelled_count = 0
+        self._running = True
+        self._thread: Optional[threading.Thread] = None
+        self._worker: Optional[ThreadPoolExecutor] = None
+
+        # 运行统计
+        self.fired_count = 0
+        self.wakeup_count = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def call_at(self, when: float, callback: Callable[..., Any], *args: Any) -> TimerHandle:
+        """
+        在指定的 monotonic 时间点调用回调
+
+        Args:
+            when: time.monotonic() 时间基准下的触发时间
+            callback: 回调函数
+            *args: 回调参数
+
+        Returns:
+            TimerHandle: 可用于取消的句柄
+        """
+        handle = TimerHandle(when, callback, args, self)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("调度器已关闭")
+            self._ensure_thread()
+            is_earliest = not self._heap or when < self._heap[0][0]
+            heapq.heappush(self._heap, (when, next(self._counter), handle))
+            # 仅当新截止时间早于当前最早截止时间时才唤醒调度线程
+            if is_earliest:
+                self._cond.notify()
+        return handle
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> TimerHandle:
+        """在 delay 秒后调用回调"""
+        return self.call_at(time.monotonic() + max(0.0, delay), callback, *args)
+
+    def call_later_in_worker(self, delay: float, callback: Callable[..., Any], *args: Any) -> TimerHandle:
+        """在 delay 秒后将回调交给工作线程执行，调度线程只负责派发"""
+        return self.call_later(delay, self.run_in_worker, callback, *args)
+
+    def run_in_worker(self, callback: Callable[..., Any], *args: Any) -> Future:
+        """
+        在工作线程中执行可能阻塞的回调，异常只记录日志
+
+        Args:
+            callback: 回调函数
+            *args: 回调参数
+
+        Returns:
+            Future: 回调执行完成时完成（结果恒为None）
+        """
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("调度器已关闭")
+            if self._worker is None:
+                self._worker = ThreadPoolExecutor(
+                    max_workers=WORKER_THREADS, thread_name_prefix=f"{self._name}-Worker"
+                )
+            worker = self._worker
+        return worker.submit(self._run_callback, callback, args)
+
+    def pending_count(self) -> int:
+        """未取消的待触发截止时间数量"""
+        with self._cond:
+            return len(self._heap) - self._cancelled_count
+
+    def thread_alive(self) -> bool:
+        """调度线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """停止调度线程，未触发的截止时间将被丢弃"""
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cancelled_count = 0
+            self._cond.notify()
+            worker, self._worker = self._worker, None
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        if worker:
+            # 已提交的工作继续执行完，不等待
+            worker.shutdown(wait=False)
+
+    def _on_cancel(self, handle: TimerHandle) -> None:
+        """标记取消并记录取消数量，必要时压缩堆
+
+        标记和计数在同一把锁内完成，调度线程不会在计数之前丢弃该条目而使计数偏高。
+        """
+        with self._cond:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            self._cancelled_count += 1
+            heap_size = len(self._heap)
+            if heap_size >= _COMPACT_MIN_SIZE and self._cancelled_count > heap_size * _COMPACT_RATIO:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_count = 0
+
+    def _ensure_thread(self) -> None:
+        """按需启动调度线程（调用方需持有条件变量锁）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name=self._name)
+            self._thread.start()
+
+    def _pop_due(self) -> Optional[TimerHandle]:
+        """
+        等待并弹出下一个到期的截止时间（调用方需持有条件变量锁）
+
+        Returns:
+            Optional[TimerHandle]: 到期句柄；调度器关闭时返回None
+        """
+        while self._running:
+            # 丢弃堆顶已取消的条目
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+                self._cancelled_count = max(0, self._cancelled_count - 1)
+
+            if not self._heap:
+                self._cond.wait()
+                self.wakeup_count += 1
+                continue
+
+            wait_time = self._heap[0][0] - time.monotonic()
+            if wait_time > 0:
+                self._cond.wait(wait_time)
+                self.wakeup_count += 1
+                continue
+
+            _, _, handle = heapq.heappop(self._heap)
+            if handle.cancelled:
+                self._cancelled_count = max(0, self._cancelled_count - 1)
+                continue
+            # 标记为已完成，之后的 cancel() 不再计入取消数量
+            handle.cancelled = True
+            return handle
+        return None
+
+    def _run(self) -> None:
+        """调度线程主循环"""
+        while True:
+            with self._cond:
+                handle = self._pop_due()
+            if handle is None:
+                return
+
+            lag = time.monotonic() - handle.when
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.fired_count += 1
+
+            self._run_callback(handle.callback, handle.args)
+
+    @staticmethod
+    def _run_callback(callback: Callable[..., Any], args: Tuple) -> None:
+        """执行回调，异常只记录日志，不影响调度线程和工作线程"""
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"截止时间回调执行出错: {getattr(callback, '__name__', callback)}: {e}")
+
+
+# 全局调度器实例
+_scheduler: Optional[DeadlineScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> DeadlineScheduler:
+    """获取进程级截止时间调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = DeadlineScheduler()
+    return _scheduler
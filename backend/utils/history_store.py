@@ -0,0 +1,469 @@
+"""
+反馈历史存储
+每次反馈的文字、元数据、超时标记、建议选项和选择结果写入本地 SQLite（WAL 模式），
+图片按 SHA-256 内容寻址保存在状态目录下，相同图片只存一份。
+写入由后台线程批量提交，不占用工具调用的返回路径；查询支持全文检索和基于游标的分页。
+"""
+
+import atexit
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.utils.image_utils import IMAGE_MIME_EXTENSIONS, guess_image_mime
+from backend.utils.persistence import (
+    atomic_write_bytes,
+    get_history_file_path,
+    get_history_images_dir,
+)
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 后台写入参数：单个事务最多写入的条数、等待写入的队列上限
+HISTORY_BATCH_SIZE: int = 64
+HISTORY_QUEUE_SIZE: int = 1000
+# 数据库被其他进程锁定时的等待时间（毫秒）
+HISTORY_BUSY_TIMEOUT_MS: int = 5000
+# 单页查询条数上限
+HISTORY_MAX_PAGE_SIZE: int = 100
+# trigram 分词器按3个字符建立索引，更短的检索词改用 LIKE 匹配
+TRIGRAM_MIN_TERM_LENGTH: int = 3
+
+HISTORY_COLUMNS = (
+    "id",
+    "created_at",
+    "session_id",
+    "work_summary",
+    "text",
+    "suggest",
+    "answers",
+    "is_timeout",
+    "is_timeout_capture",
+    "timeout_reason",
+    "source_event",
+    "metadata",
+    "images",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    session_id TEXT NOT NULL DEFAULT '',
+    work_summary TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    suggest TEXT NOT NULL DEFAULT '[]',
+    answers TEXT,
+    is_timeout INTEGER NOT NULL DEFAULT 0,
+    is_timeout_capture INTEGER NOT NULL DEFAULT 0,
+    timeout_reason TEXT,
+    source_event TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    images TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback (created_at);
+CREATE INDEX IF NOT EXISTS idx_feedback_session ON feedback (session_id, id);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+    text, work_summary, content='feedback', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS feedback_fts_insert AFTER INSERT ON feedback BEGIN
+    INSERT INTO feedback_fts (rowid, text, work_summary) VALUES (new.id, new.text, new.work_summary);
+END;
+CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback BEGIN
+    INSERT INTO feedback_fts (feedback_fts, rowid, text, work_summary)
+    VALUES ('delete', old.id, old.text, old.work_summary);
+END;
+INSERT INTO feedback_fts (feedback_fts) VALUES ('rebuild');
+"""
+
+# 按优先级尝试的全文检索分词器：trigram 支持中文等无空格文本的子串检索
+_FTS_TOKENIZERS = ("trigram", "unicode61")
+
+
+def _split_terms(text: str) -> List[str]:
+    """把检索文本按空白拆分为检索词（全部需要匹配）"""
+    return [term for term in (text or "").split() if term]
+
+
+def _like_pattern(term: str) -> str:
+    """把检索词转换为 LIKE 子串匹配模式（转义通配符）"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class HistoryStore:
+    """基于 SQLite WAL 的反馈历史存储"""
+
+    def __init__(self, path: Optional[str] = None, images_dir: Optional[str] = None):
+        self.path = path or get_history_file_path()
+        self.images_dir = images_dir or get_history_images_dir()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=HISTORY_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,  # 显式管理事务
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute(f"PRAGMA busy_timeout = {HISTORY_BUSY_TIMEOUT_MS}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self.fts_tokenizer = self._init_fts()
+
+        # 后台写入：record() 只入队，写入线程把队列中的条目合并为单个事务
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=HISTORY_QUEUE_SIZE)
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._writer = threading.Thread(target=self._run, name="HistoryStore-Writer", daemon=True)
+        self._writer.start()
+
+    def _init_fts(self) -> Optional[str]:
+        """创建全文索引（需在锁内调用），返回使用的分词器，SQLite 不支持 FTS5 时返回None"""
+        row = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'feedback_fts'"
+        ).fetchone()
+        if row is not None:
+            return "trigram" if "trigram" in row["sql"] else "unicode61"
+        for tokenizer in _FTS_TOKENIZERS:
+            try:
+                self._conn.executescript(_FTS_SCHEMA.format(tokenizer=tokenizer))
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        logger.warning("SQLite 不支持 FTS5 全文索引，历史检索将使用 LIKE 匹配")
+        return None
+
+    # =========================================================================
+    # 写入
+    # =========================================================================
+
+    def record(
+        self,
+        result: Dict[str, Any],
+        session_id: str = "",
+        work_summary: str = "",
+        suggest: Any = None,
+        batch_items: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        记录一次反馈（只入队，由后台线程写入）
+
+        Args:
+            result: wait_for_feedback 返回的反馈结果（图片为 base64）
+            session_id: 会话ID
+            work_summary: 工作汇报
+            suggest: 页面提供的建议选项（列表或 JSON 字符串）
+            batch_items: 批量反馈的问题列表
+
+        Returns:
+            bool: 是否已入队（队列已满时丢弃并返回 False）
+        """
+        entry = {
+            "created_at": time.time(),
+            "session_id": session_id,
+            "work_summary": work_summary,
+            "suggest": suggest,
+            "batch_items": batch_items,
+            "result": result,
+        }
+        with self._pending_cond:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._done(1)
+            logger.warning("反馈历史写入队列已满，本条记录被丢弃")
+            return False
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已入队的记录全部写入，返回是否在超时前完成"""
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def _done(self, count: int) -> None:
+        with self._pending_cond:
+            self._pending -= count
+            if self._pending == 0:
+                self._pending_cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            while len(batch) < HISTORY_BATCH_SIZE:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._write_batch(batch)
+                    return
+                batch.append(entry)
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """把一批记录转换为行，以单个事务写入（图片文件在锁外写入）"""
+        try:
+            rows = []
+            for entry in batch:
+                try:
+                    rows.append(self._build_row(entry))
+                except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+                    logger.warning(f"反馈历史记录无效，已跳过: {e}")
+            if not rows:
+                return
+            columns = HISTORY_COLUMNS[1:]
+            placeholders = ", ".join("?" for _ in columns)
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany(
+                        f"INSERT INTO feedback ({', '.join(columns)}) VALUES ({placeholders})",
+                        [tuple(row[column] for column in columns) for row in rows],
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning(f"写入反馈历史失败: {e}")
+        finally:
+            self._done(len(batch))
+
+    def _build_row(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        result = entry["result"]
+        suggest = entry["suggest"]
+        if isinstance(suggest, str):
+            suggest = json.loads(suggest) if suggest else []
+
+        answers = None
+        if result.get("is_batch") or entry["batch_items"]:
+            items = entry["batch_items"] or []
+            by_index = {answer.get("index"): answer for answer in result.get("answers", [])}
+            answers = [
+                {
+                    "index": index,
+                    "id": item.get("id"),
+                    "question": item.get("summary", ""),
+                    "suggest": item.get("suggest", []),
+                    "selected": list(by_index.get(index, {}).get("selected") or []),
+                    "text": (by_index.get(index, {}).get("text") or "").strip(),
+                    "image_count": len(by_index.get(index, {}).get("images") or []),
+                }
+                for index, item in enumerate(items)
+            ]
+
+        return {
+            "created_at": entry["created_at"],
+            "session_id": entry["session_id"] or "",
+            "work_summary": entry["work_summary"] or "",
+            "text": result.get("text_feedback") or result.get("text") or "",
+            "suggest": json.dumps(suggest or [], ensure_ascii=False),
+            "answers": json.dumps(answers, ensure_ascii=False) if answers is not None else None,
+            "is_timeout": int(bool(result.get("is_timeout"))),
+            "is_timeout_capture": int(bool(result.get("is_timeout_capture"))),
+            "timeout_reason": result.get("timeout_reason"),
+            "source_event": result.get("source_event"),
+            "metadata": json.dumps(result.get("metadata") or {}, ensure_ascii=False),
+            "images": json.dumps(
+                [self._store_image(image) for image in result.get("images") or []], ensure_ascii=False
+            ),
+        }
+
+    def _store_image(self, image: Dict[str, Any]) -> Dict[str, Any]:
+        """按内容哈希保存图片，已存在的相同图片不重复写入"""
+        try:
+            data = base64.b64decode(image["data"], validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise ValueError(f"图片数据无效: {e}") from e
+        mime = guess_image_mime(data, image.get("mime") or "", image.get("filename") or "")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.image_path(digest, mime)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            atomic_write_bytes(path, data)
+        return {"sha256": digest, "mime": mime, "size": len(data), "filename": image.get("filename") or ""}
+
+    def image_path(self, digest: str, mime: str) -> str:
+        """图片在历史目录中的路径（按哈希前两位分目录）"""
+        return os.path.join(self.images_dir, digest[:2], digest + IMAGE_MIME_EXTENSIONS.get(mime, ".png"))
+
+    # =========================================================================
+    # 查询
+    # =========================================================================
+
+    def query(
+        self,
+        text: str = "",
+        session_id: str = "",
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+        cursor: str = "",
+    ) -> Dict[str, Any]:
+        """
+        按写入顺序倒序分页查询反馈历史
+
+        Args:
+            text: 检索文本，按空白拆分，全部检索词都需出现在反馈文字或工作汇报中
+            session_id: 仅返回指定会话的记录
+            since: 起始时间（含，Unix 时间戳）
+            until: 截止时间（不含，Unix 时间戳）
+            limit: 每页条数（最多 HISTORY_MAX_PAGE_SIZE）
+            cursor: 上一页返回的 next_cursor
+
+        Returns:
+            {"items": [...], "next_cursor": 下一页游标，没有更多记录时为None}
+
+        Raises:
+            ValueError: 游标无效
+        """
+        limit = max(1, min(int(limit), HISTORY_MAX_PAGE_SIZE))
+        clauses: List[str] = []
+        params: List[Any] = []
+        if cursor:
+            try:
+                before_id = int(cursor)
+            except ValueError:
+                raise ValueError(f"无效的游标: {cursor!r}")
+            clauses.append("id < ?")
+            params.append(before_id)
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+
+        search_clauses, search_params = self._build_search(_split_terms(text))
+        clauses.extend(search_clauses)
+        params.extend(search_params)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM feedback {where} ORDER BY id DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+
+        has_more = len(rows) > limit
+        items = [self._row_to_item(row) for row in rows[:limit]]
+        return {
+            "items": items,
+            "next_cursor": str(items[-1]["id"]) if has_more else None,
+        }
+
+    def _build_search(self, terms: List[str]) -> Tuple[List[str], List[Any]]:
+        """全文索引可用的检索词合并为一个 MATCH 条件，其余检索词使用 LIKE"""
+        clauses: List[str] = []
+        params: List[Any] = []
+        fts_terms = []
+        for term in terms:
+            if self.fts_tokenizer and (
+                self.fts_tokenizer != "trigram" or len(term) >= TRIGRAM_MIN_TERM_LENGTH
+            ):
+                fts_terms.append(term)
+            else:
+                clauses.append("(text LIKE ? ESCAPE '\\' OR work_summary LIKE ? ESCAPE '\\')")
+                params.extend([_like_pattern(term)] * 2)
+        if fts_terms:
+            # 每个检索词作为短语引用，避免被解析为 FTS5 查询语法
+            clauses.insert(0, "id IN (SELECT rowid FROM feedback_fts WHERE feedback_fts MATCH ?)")
+            params.insert(0, " ".join('"' + term.replace('"', '""') + '"' for term in fts_terms))
+        return clauses, params
+
+    def _row_to_item(self, row: sqlite3.Row) -> Dict[str, Any]:
+        images = json.loads(row["images"])
+        for image in images:
+            image["path"] = self.image_path(image["sha256"], image["mime"])
+        item = {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "created_at_readable": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row["created_at"])),
+            "session_id": row["session_id"],
+            "work_summary": row["work_summary"],
+            "text": row["text"],
+            "suggest": json.loads(row["suggest"]),
+            "is_timeout": bool(row["is_timeout"]),
+            "is_timeout_capture": bool(row["is_timeout_capture"]),
+            "timeout_reason": row["timeout_reason"],
+            "source_event": row["source_event"],
+            "metadata": json.loads(row["metadata"]),
+            "images": images,
+        }
+        if row["answers"] is not None:
+            item["answers"] = json.loads(row["answers"])
+        return item
+
+    def count(self) -> int:
+        """历史记录总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写入剩余记录后停止写入线程并关闭数据库连接"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+        with self._lock:
+            self._conn.close()
+
+
+# 全局历史存储（首次记录或查询时按配置创建）
+_store: Optional[HistoryStore] = None
+_store_initialized = False
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """获取反馈历史存储，历史被禁用或数据库不可用时返回None"""
+    global _store, _store_initialized
+    if _store_initialized:
+        return _store
+    with _store_lock:
+        if not _store_initialized:
+            from backend.config import get_server_config
+
+            if get_server_config().history_enabled:
+                try:
+                    _store = HistoryStore()
+                    atexit.register(_store.close)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"反馈历史数据库不可用，历史记录已禁用: {e}")
+            _store_initialized = True
+    return _store
+
+
+def record_feedback(
+    result: Optional[Dict[str, Any]],
+    session_id: str = "",
+    work_summary: str = "",
+    suggest: Any = None,
+    batch_items: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """记录一次反馈结果到历史（历史不可用或结果为空时忽略）"""
+    if result is None:
+        return
+    store = get_history_store()
+    if store is not None:
+        store.record(result, session_id, work_summary, suggest, batch_items)
@@ -0,0 +1,308 @@
+"""
+图片资源存储
+工具结果可以用 mcp://feedback-server/attachment/{ref} 资源链接代替内联的图片数据：
+图片按 SHA-256 内容寻址保存在状态目录下，客户端只读取真正需要的图片，也可以读取缩小的尺寸变体。
+
+链接在保留期内有效（按文件修改时间计算，同一图片再次返回时续期），
+过期的文件由截止时间调度器的工作线程清理，MCP服务重启后未过期的链接仍然可读。
+尺寸变体在保存图片后由工作线程预先生成，资源读取通常直接返回缓存的文件。
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Dict, Optional, Tuple
+
+from backend.utils.deadline_scheduler import TimerHandle, get_scheduler
+from backend.utils.image_utils import IMAGE_MIME_EXTENSIONS, PIL_AVAILABLE, guess_image_mime
+from backend.utils.persistence import atomic_write_bytes, get_image_resources_dir
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_URI_PREFIX = "mcp://feedback-server/attachment/"
+
+# 资源URI扩展名 -> MIME 类型（每种类型注册一个资源模板，读取时返回对应的 mimeType）
+ATTACHMENT_RESOURCE_TYPES = {extension[1:]: mime for mime, extension in IMAGE_MIME_EXTENSIONS.items()}
+
+# 可读取的尺寸变体（长边像素），只为长边超过该尺寸的图片提供
+VARIANT_SIZES = (256, 1024)
+
+# 超过该像素数的图片不提供尺寸变体，避免解码超大图片
+MAX_VARIANT_PIXELS = 40_000_000
+
+# 读取变体时等待后台生成完成的最长秒数，超时后在读取中生成
+VARIANT_WAIT_SECONDS = 5.0
+
+# 变体保持原格式；GIF、BMP 的变体编码为 PNG
+_VARIANT_FORMATS = {"image/png": "PNG", "image/jpeg": "JPEG", "image/webp": "WEBP"}
+
+_REF_PATTERN = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:-(?P<size>\d+))?$")
+
+
+def _variant_mime(mime: str) -> str:
+    return mime if mime in _VARIANT_FORMATS else "image/png"
+
+
+def _image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """读取图片尺寸（只解析文件头），Pillow 不可用或无法识别时返回None"""
+    if not PIL_AVAILABLE:
+        return None
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.width, img.height
+    except Exception:
+        return None
+
+
+def _make_variant(data: bytes, size: int, mime: str) -> bytes:
+    """生成长边不超过 size 的缩小图片（JPEG 按缩小的尺寸解码，其他格式分步缩小）"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft(img.mode, (size, size))
+        img.thumbnail((size, size), reducing_gap=2.0)
+        if mime == "image/jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        output = io.BytesIO()
+        img.save(output, format=_VARIANT_FORMATS[mime])
+        return output.getvalue()
+
+
+def _variant_sizes(dimensions: Tuple[int, int]) -> Tuple[int, ...]:
+    """图片提供的尺寸变体：长边超过变体尺寸、且像素数不超过上限"""
+    width, height = dimensions
+    if width * height > MAX_VARIANT_PIXELS:
+        return ()
+    return tuple(size for size in VARIANT_SIZES if max(dimensions) > size)
+
+
+class ImageResourceStore:
+    """
+    内容寻址的图片资源存储
+
+    工具调用线程写入，MCP资源读取在事件循环中读取；文件以原子方式写入，
+    读取方不会看到半截文件。尺寸变体在保存图片后由工作线程生成并缓存，
+    读取时尚未生成（例如服务重启后）才在读取中生成。
+    """
+
+    def __init__(self, directory: Optional[str] = None, retention_seconds: float = 3600.0):
+        self.directory = directory or get_image_resources_dir()
+        self.retention_seconds = retention_seconds
+        os.makedirs(self.directory, exist_ok=True)
+        self._scheduler = get_scheduler()
+        self._lock = threading.Lock()
+        self._cleanup_handle: Optional[TimerHandle] = None
+        # 原图SHA-256 -> 正在后台生成变体的任务
+        self._variant_jobs: Dict[str, Future] = {}
+
+    @staticmethod
+    def uri(digest: str, mime: str, size: Optional[int] = None) -> str:
+        """图片（或尺寸变体）的资源URI"""
+        ref = f"{digest}-{size}" if size else digest
+        return f"{ATTACHMENT_URI_PREFIX}{ref}{IMAGE_MIME_EXTENSIONS[mime]}"
+
+    def _path(self, digest: str, mime: str, size: Optional[int] = None) -> str:
+        name = f"{digest}-{size}" if size else digest
+        return os.path.join(self.directory, digest[:2], name + IMAGE_MIME_EXTENSIONS[mime])
+
+    def add(self, data: bytes, mime: str = "", filename: str = "") -> Dict[str, Any]:
+        """
+        保存图片并返回资源链接描述
+
+        Returns:
+            uri、mime_type、size、sha256、expires_at，可识别尺寸时包含 width、height
+            和 variants（长边像素 -> 变体URI），提供文件名时包含 filename
+        """
+        mime = guess_image_mime(data, mime, filename)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, mime)
+        if os.path.exists(path):
+            # 同一图片再次返回时续期
+            os.utime(path, None)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_bytes(path, data)
+
+        link = {
+            "uri": self.uri(digest, mime),
+            "mime_type": mime,
+            "size": len(data),
+            "sha256": digest,
+            "expires_at": time.time() + self.retention_seconds,
+        }
+        if filename:
+            link["filename"] = filename
+        dimensions = _image_dimensions(data)
+        if dimensions:
+            link["width"], link["height"] = dimensions
+            sizes = _variant_sizes(dimensions)
+            link["variants"] = {str(size): self.uri(digest, _variant_mime(mime), size) for size in sizes}
+            if sizes:
+                self._start_variant_job(digest, mime, data, sizes)
+        self._schedule_cleanup(self.retention_seconds)
+        return link
+
+    def _start_variant_job(self, digest: str, mime: str, data: bytes, sizes: Tuple[int, ...]) -> None:
+        """在工作线程中预先生成尺寸变体（同一图片已有任务时不重复提交）"""
+        with self._lock:
+            job = self._variant_jobs.get(digest)
+            if job is not None and not job.done():
+                return
+            job = self._scheduler.run_in_worker(self._generate_variants, digest, mime, data, sizes)
+            self._variant_jobs[digest] = job
+        job.add_done_callback(lambda _: self._finish_variant_job(digest, job))
+
+    def _finish_variant_job(self, digest: str, job: Future) -> None:
+        with self._lock:
+            if self._variant_jobs.get(digest) is job:
+                del self._variant_jobs[digest]
+
+    def _generate_variants(self, digest: str, mime: str, data: bytes, sizes: Tuple[int, ...]) -> None:
+        """生成尚未缓存的尺寸变体（在调度器的工作线程中执行）"""
+        variant_mime = _variant_mime(mime)
+        for size in sizes:
+            path = self._path(digest, variant_mime, size)
+            if not os.path.exists(path):
+                atomic_write_bytes(path, _make_variant(data, size, variant_mime))
+
+    def read(self, ref: str, extension: str) -> Tuple[bytes, str]:
+        """
+        读取资源链接指向的图片
+
+        Args:
+            ref: 资源URI中的引用（SHA-256，或 SHA-256-长边像素 表示尺寸变体）
+            extension: 资源URI的扩展名
+
+        Returns:
+            (图片数据, MIME 类型)
+
+        Raises:
+            ValueError: 引用无效、图片不存在或链接已过期
+        """
+        match = _REF_PATTERN.match(ref)
+        mime = ATTACHMENT_RESOURCE_TYPES.get(extension)
+        if not match or mime is None:
+            raise ValueError(f"无效的附件引用: {ref}.{extension}")
+        digest = match.group("digest")
+        size = int(match.group("size")) if match.group("size") else None
+        if size is not None and size not in VARIANT_SIZES:
+            raise ValueError(f"不支持的尺寸变体: {size}（可选 {', '.join(map(str, VARIANT_SIZES))}）")
+
+        original = self._find_original(digest)
+        if original is None:
+            raise ValueError("附件不存在或已过期")
+        path, original_mime = original
+        expected_mime = original_mime if size is None else _variant_mime(original_mime)
+        if mime != expected_mime:
+            raise ValueError("附件不存在或已过期")
+
+        if size is None:
+            with open(path, "rb") as f:
+                return f.read(), mime
+
+        variant_path = self._path(digest, mime, size)
+        with self._lock:
+            job = self._variant_jobs.get(digest)
+        if job is not None:
+            # 后台正在生成，等待完成后读取缓存，避免重复解码
+            wait([job], timeout=VARIANT_WAIT_SECONDS)
+        try:
+            with open(variant_path, "rb") as f:
+                return f.read(), mime
+        except FileNotFoundError:
+            pass
+        if not PIL_AVAILABLE:
+            raise ValueError("Pillow未安装，无法生成尺寸变体")
+        with open(path, "rb") as f:
+            data = f.read()
+        dimensions = _image_dimensions(data)
+        if not dimensions or size not in _variant_sizes(dimensions):
+            raise ValueError("该图片不提供此尺寸变体")
+        variant = _make_variant(data, size, mime)
+        atomic_write_bytes(variant_path, variant)
+        return variant, mime
+
+    def _find_original(self, digest: str) -> Optional[Tuple[str, str]]:
+        """查找未过期的原图，返回 (路径, MIME 类型)"""
+        for mime in IMAGE_MIME_EXTENSIONS:
+            path = self._path(digest, mime)
+            try:
+                modified = os.path.getmtime(path)
+            except OSError:
+                continue
+            if modified + self.retention_seconds > time.time():
+                return path, mime
+        return None
+
+    def cleanup(self) -> Optional[float]:
+        """
+        删除过期的图片和变体
+
+        Returns:
+            剩余文件中最早的过期时间戳，没有剩余文件时为None
+        """
+        now = time.time()
+        earliest = None
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    expires_at = os.path.getmtime(path) + self.retention_seconds
+                    if expires_at <= now:
+                        os.unlink(path)
+                        removed += 1
+                    elif earliest is None or expires_at < earliest:
+                        earliest = expires_at
+                except OSError:
+                    continue
+        if removed:
+            logger.info(f"已清理 {removed} 个过期的图片资源")
+        return earliest
+
+    def _schedule_cleanup(self, delay: float) -> None:
+        """安排清理（已有待执行的清理时不重复安排）"""
+        with self._lock:
+            if self._cleanup_handle is None:
+                self._cleanup_handle = self._scheduler.call_later_in_worker(delay, self._on_cleanup)
+
+    def _on_cleanup(self) -> None:
+        """清理回调（在调度器的工作线程中执行），仍有文件时按最早的过期时间重新安排"""
+        with self._lock:
+            self._cleanup_handle = None
+        earliest = self.cleanup()
+        if earliest is not None:
+            self._schedule_cleanup(max(0.0, earliest - time.time()))
+
+    def close(self) -> None:
+        """取消待执行的清理"""
+        with self._lock:
+            if self._cleanup_handle is not None:
+                self._cleanup_handle.cancel()
+                self._cleanup_handle = None
+
+
+_store: Optional[ImageResourceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_image_resource_store() -> ImageResourceStore:
+    """获取图片资源存储（首次调用时创建，并清理上次运行遗留的过期文件）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from backend.config import get_feedback_config
+
+                store = ImageResourceStore(retention_seconds=get_feedback_config().image_resource_retention)
+                store._schedule_cleanup(0.0)
+                _store = store
+    return _store
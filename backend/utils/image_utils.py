@@ -4,17 +4,28 @@
 """
 
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
+import importlib.util
 import io
 
-try:
+# Pillow 导入较慢，只检查是否安装，首次处理图片时才导入
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+from backend.security.csrf_handler import SecurityConfig
+
+
+def _pil_image() -> Any:
+    """导入 PIL.Image（首次调用时导入）"""
     from PIL import Image
 
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+    return Image
 
-from backend.security.csrf_handler import SecurityConfig
+
+def __getattr__(name: str) -> Any:
+    # 兼容 backend.utils.image_utils.Image 的访问方式
+    if name == "Image":
+        return _pil_image()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_image_info(image_path: str) -> str:
@@ -35,7 +46,7 @@ def get_image_info(image_path: str) -> str:
         if not PIL_AVAILABLE:
             return "错误：Pillow库未安装，无法获取图片信息"
 
-        with Image.open(path) as img:
+        with _pil_image().open(path) as img:
             info = {
                 "文件名": path.name,
                 "格式": img.format,
@@ -66,7 +77,7 @@ def validate_image_data(image_data: bytes) -> bool:
     # 如果PIL可用，进行更深入的验证
     if PIL_AVAILABLE:
         try:
-            with Image.open(io.BytesIO(image_data)) as img:
+            with _pil_image().open(io.BytesIO(image_data)) as img:
                 img.verify()
             return True
         except Exception:
@@ -76,6 +87,36 @@ def validate_image_data(image_data: bytes) -> bool:
     return _check_image_signature(image_data)
 
 
+# 支持的图片 MIME 类型及其文件扩展名
+IMAGE_MIME_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+}
+_EXTENSION_MIMES = {extension: mime for mime, extension in IMAGE_MIME_EXTENSIONS.items()}
+_EXTENSION_MIMES[".jpeg"] = "image/jpeg"
+
+
+def guess_image_mime(data: bytes, mime: str = "", filename: str = "") -> str:
+    """按 MIME 类型、文件扩展名、文件头魔数的顺序确定图片类型（无法识别时为 image/png）"""
+    if mime in IMAGE_MIME_EXTENSIONS:
+        return mime
+    extension = Path(filename or "").suffix.lower()
+    if extension in _EXTENSION_MIMES:
+        return _EXTENSION_MIMES[extension]
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"BM"):
+        return "image/bmp"
+    return "image/png"
+
+
 def _check_image_signature(data: bytes) -> bool:
     """
     检查图片数据的文件头魔数
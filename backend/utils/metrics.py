@@ -0,0 +1,395 @@
+"""
+进程内指标注册表
+提供计数器、仪表盘和固定分桶直方图，输出 Prometheus 文本格式（0.0.4）。
+记录指标只做一次加锁累加；瞬时值（队列深度、活跃客户端等）通过采集回调
+在抓取时才计算，没有人抓取时不产生额外开销。
+"""
+
+import bisect
+import logging
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认分桶（秒）
+DEFAULT_SECONDS_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# 用户思考时间跨度较大（秒）
+THINK_TIME_BUCKETS: Tuple[float, ...] = (
+    1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0,
+)
+# 提交负载大小（字节）
+PAYLOAD_BYTES_BUCKETS: Tuple[float, ...] = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+)
+IMAGE_COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 10, 20)
+
+LabelValues = Tuple[str, ...]
+# 采集回调返回 (指标名, 标签字典, 值) 序列
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """格式化标签集合"""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        """按声明顺序取出标签值"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_dict(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """增加计数"""
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        """读取当前值"""
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._labels_dict(key))} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表盘"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """设置当前值"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """增加当前值"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """减少当前值"""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: str) -> float:
+        """读取当前值"""
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._labels_dict(key))} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """固定分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # {标签值: [各分桶计数(非累积)..., 溢出计数, 总和]}
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """记录一个观测值"""
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def get_count(self, **labels: str) -> int:
+        """读取观测次数"""
+        with self._lock:
+            state = self._values.get(self._label_values(labels))
+            return int(sum(state[:-1])) if state else 0
+
+    def get_sum(self, **labels: str) -> float:
+        """读取观测值总和"""
+        with self._lock:
+            state = self._values.get(self._label_values(labels))
+            return state[-1] if state else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            labels = self._labels_dict(key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        # 抓取时计算的仪表盘：{指标名: (说明, 采集回调列表)}
+        self._collected: Dict[str, Tuple[str, List[Callable[[], Iterable[Sample]]]]] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"指标 {metric.name} 已注册为 {existing.metric_type}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册（或获取已注册的）计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册（或获取已注册的）仪表盘"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ) -> Histogram:
+        """注册（或获取已注册的）直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(
+        self, names: Dict[str, str], collector: Callable[[], Iterable[Sample]]
+    ) -> None:
+        """
+        注册抓取时调用的采集回调
+
+        Args:
+            names: 回调产出的仪表盘 {指标名: 说明}
+            collector: 返回 (指标名, 标签字典, 值) 序列的回调
+        """
+        with self._lock:
+            for name, documentation in names.items():
+                entry = self._collected.setdefault(name, (documentation, []))
+                entry[1].append(collector)
+
+    def unregister_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """移除采集回调"""
+        with self._lock:
+            for name in list(self._collected):
+                documentation, collectors = self._collected[name]
+                if collector in collectors:
+                    collectors.remove(collector)
+                if not collectors:
+                    del self._collected[name]
+
+    def _collect(self) -> Dict[str, List[str]]:
+        """调用采集回调，按指标名分组样本行"""
+        with self._lock:
+            collectors = []
+            for _, callbacks in self._collected.values():
+                for callback in callbacks:
+                    if callback not in collectors:
+                        collectors.append(callback)
+            names = set(self._collected)
+
+        lines: Dict[str, List[str]] = {name: [] for name in names}
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    if name in lines:
+                        lines[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            except Exception as e:
+                logger.warning(f"指标采集回调执行出错: {e}")
+        return lines
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collected_docs = {name: doc for name, (doc, _) in self._collected.items()}
+
+        output: List[str] = []
+        for metric in metrics:
+            output.extend(metric.header())
+            output.extend(metric.samples())
+
+        for name, lines in sorted(self._collect().items()):
+            output.append(f"# HELP {name} {collected_docs.get(name, '')}")
+            output.append(f"# TYPE {name} gauge")
+            output.extend(lines)
+
+        return "\n".join(output) + "\n"
+
+
+# 全局注册表实例
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取进程级指标注册表"""
+    return _registry
+
+
+# 反馈管道指标
+STARTUP_PHASE_SECONDS = _registry.histogram(
+    "mcp_feedback_startup_phase_seconds",
+    "Web服务器启动各阶段耗时",
+    labelnames=("phase",),
+)
+CONNECT_WAIT_SECONDS = _registry.histogram(
+    "mcp_feedback_connect_wait_seconds",
+    "从开始等待到浏览器建立WebSocket连接的耗时",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0),
+)
+THINK_TIME_SECONDS = _registry.histogram(
+    "mcp_feedback_think_time_seconds",
+    "从浏览器连接到收到用户反馈的耗时",
+    buckets=THINK_TIME_BUCKETS,
+)
+WAIT_OUTCOMES = _registry.counter(
+    "mcp_feedback_wait_outcomes_total",
+    "反馈等待结束的原因",
+    labelnames=("outcome",),
+)
+SUBMIT_PAYLOAD_BYTES = _registry.histogram(
+    "mcp_feedback_submit_payload_bytes",
+    "反馈提交的负载大小（文本与图片数据）",
+    labelnames=("source",),
+    buckets=PAYLOAD_BYTES_BUCKETS,
+)
+SUBMIT_IMAGE_COUNT = _registry.histogram(
+    "mcp_feedback_submit_images",
+    "单次反馈提交包含的图片数量",
+    labelnames=("source",),
+    buckets=IMAGE_COUNT_BUCKETS,
+)
+SESSION_REATTACHES = _registry.counter(
+    "mcp_feedback_session_reattaches_total",
+    "重试的工具调用挂接到已有会话的次数",
+    labelnames=("state",),
+)
+SESSION_RESUMES = _registry.counter(
+    "mcp_feedback_session_resumes_total",
+    "浏览器断开后宽限期的结果（resumed 为重新连接，expired 为宽限期耗尽）",
+    labelnames=("outcome",),
+)
+IMAGE_DELIVERIES = _registry.counter(
+    "mcp_feedback_image_deliveries_total",
+    "工具结果中返回的图片数量（inline 为内联数据，reference 为资源链接）",
+    labelnames=("mode",),
+)
+SESSION_ADMISSIONS = _registry.counter(
+    "mcp_feedback_session_admissions_total",
+    "会话准入结果（admitted 直接准入，queued 排队后准入，其余为拒绝原因）",
+    labelnames=("outcome",),
+)
+SUBMIT_REJECTIONS = _registry.counter(
+    "mcp_feedback_submit_rejections_total",
+    "被拒绝的反馈提交（rate_limited 超出提交速率，queue_full 结果队列已满）",
+    labelnames=("reason",),
+)
+INBOX_DELIVERIES = _registry.counter(
+    "mcp_feedback_inbox_deliveries_total",
+    "新的反馈请求的送达方式（socket 推送到已连接的收件箱，browser 打开浏览器）",
+    labelnames=("delivery",),
+)
+CLEANUP_LAG_SECONDS = _registry.histogram(
+    "mcp_feedback_cleanup_lag_seconds",
+    "会话过期清理相对截止时间的延迟",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
@@ -4,9 +4,10 @@
 """
 
 import logging
+import os
 import socket
 import time
-from typing import Optional
+from typing import List, Optional
 
 # 配置模块级别的logger
 logger = logging.getLogger(__name__)
@@ -16,6 +17,18 @@ MAX_PORT_FIND_RETRIES: int = 5
 PORT_RETRY_INTERVAL: float = 0.1
 PORT_TEST_TIMEOUT: float = 0.1
 
+# /proc/net/tcp 解析相关常量
+PROC_NET_TCP_FILES = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_STATE_LISTEN = "0A"
+# 回环地址和通配地址（十六进制，/proc 中按主机字节序表示）
+LOOPBACK_OR_ANY_ADDRESSES = {
+    "0100007F",                          # 127.0.0.1
+    "00000000",                          # 0.0.0.0
+    "00000000000000000000000001000000",  # ::1
+    "00000000000000000000000000000000",  # ::
+    "0000000000000000FFFF00000100007F",  # ::ffff:127.0.0.1
+}
+
 
 def find_free_port(
     max_retries: Optional[int] = None,
@@ -126,3 +139,45 @@ def _test_port_availability(port: int, timeout: Optional[float] = None) -> bool:
         # 任何其他异常都视为不可用，并记录错误
         logger.error(f"测试端口 {port} 可用性时发生未预期错误: {e}")
         return False
+
+
+def list_listening_ports(uid: Optional[int] = None) -> Optional[List[int]]:
+    """
+    通过解析 /proc/net/tcp(6) 获取本机回环地址上处于监听状态的端口
+
+    只读取内核提供的文本表，不启动子进程，也不遍历其他进程的文件描述符。
+
+    Args:
+        uid: 仅返回该用户拥有的套接字，默认为当前用户
+
+    Returns:
+        Optional[List[int]]: 升序排列的端口列表；当前平台没有 /proc 时返回None
+    """
+    if uid is None and hasattr(os, "getuid"):
+        uid = os.getuid()
+
+    ports = set()
+    found_table = False
+    for table_path in PROC_NET_TCP_FILES:
+        try:
+            with open(table_path, "r", encoding="ascii") as f:
+                lines = f.readlines()[1:]  # 跳过表头
+        except OSError:
+            continue
+        found_table = True
+
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 8 or fields[3] != TCP_STATE_LISTEN:
+                continue
+            address, _, port_hex = fields[1].partition(":")
+            if address not in LOOPBACK_OR_ANY_ADDRESSES:
+                continue
+            if uid is not None and fields[7] != str(uid):
+                continue
+            try:
+                ports.add(int(port_hex, 16))
+            except ValueError:
+                continue
+
+    return sorted(ports) if found_table else None
@@ -0,0 +1,225 @@
+"""
+状态持久化工具模块
+提供稳定的用户状态目录、原子文件写入，以及合并突发变更的后台写入器
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 状态目录和文件名
+STATE_DIR_ENV = "MCP_FEEDBACK_STATE_DIR"
+APP_DIR_NAME = "mcp-feedback-pipe"
+REGISTRY_FILE_NAME = "mcp_sessions.db"
+HISTORY_FILE_NAME = "feedback_history.db"
+HISTORY_IMAGES_DIR_NAME = "history_images"
+IMAGE_RESOURCES_DIR_NAME = "image_resources"
+
+# 后台写入器默认参数
+DEFAULT_DEBOUNCE_SECONDS: float = 0.2
+DEFAULT_MAX_DELAY_SECONDS: float = 1.0
+
+
+def get_state_dir() -> str:
+    """
+    获取当前用户的状态目录（不存在时自动创建）
+
+    优先级：MCP_FEEDBACK_STATE_DIR 环境变量 > 平台惯例目录
+    （Windows: %LOCALAPPDATA%，macOS: ~/Library/Application Support，
+    其他: $XDG_STATE_HOME 或 ~/.local/state）。
+
+    Returns:
+        str: 状态目录的绝对路径
+    """
+    state_dir = os.getenv(STATE_DIR_ENV)
+    if not state_dir:
+        if sys.platform.startswith("win"):
+            base_dir = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+        elif sys.platform == "darwin":
+            base_dir = os.path.expanduser("~/Library/Application Support")
+        else:
+            base_dir = os.getenv("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+        state_dir = os.path.join(base_dir, APP_DIR_NAME)
+
+    state_dir = os.path.abspath(state_dir)
+    os.makedirs(state_dir, mode=0o700, exist_ok=True)
+    return state_dir
+
+
+def get_registry_file_path() -> str:
+    """获取跨进程会话注册表（SQLite）的路径"""
+    return os.path.join(get_state_dir(), REGISTRY_FILE_NAME)
+
+
+def get_history_file_path() -> str:
+    """获取反馈历史数据库（SQLite）的路径"""
+    return os.path.join(get_state_dir(), HISTORY_FILE_NAME)
+
+
+def get_history_images_dir() -> str:
+    """获取反馈历史图片目录的路径（按内容哈希存放图片）"""
+    return os.path.join(get_state_dir(), HISTORY_IMAGES_DIR_NAME)
+
+
+def get_image_resources_dir() -> str:
+    """获取以资源链接返回的图片目录的路径（按内容哈希存放图片）"""
+    return os.path.join(get_state_dir(), IMAGE_RESOURCES_DIR_NAME)
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """
+    原子地写入二进制文件：先写同目录临时文件，再通过 rename 替换
+
+    读取方要么看到旧文件，要么看到完整的新文件，不会读到半截内容。
+
+    Args:
+        path: 目标文件路径
+        data: 要写入的数据
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DebouncedStateWriter:
+    """
+    后台状态写入器
+
+    调用方只需 mark_dirty() 递增脏版本号（O(1)，可在锁内调用）；
+    后台线程在变更静止 debounce 秒后（最迟 max_delay 秒）获取一次快照，
+    交给 write_fn 持久化。版本号未变化时不会写入。
+    """
+
+    def __init__(
+        self,
+        snapshot_fn: Callable[[], Any],
+        write_fn: Callable[[Any], None],
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_delay: float = DEFAULT_MAX_DELAY_SECONDS,
+        name: str = "StateWriter",
+    ):
+        self.name = name
+        self._snapshot_fn = snapshot_fn
+        self._write_fn = write_fn
+        self._debounce = debounce
+        self._max_delay = max(max_delay, debounce)
+        self._cond = threading.Condition()
+        self._dirty_version = 0
+        self._written_version = 0
+        self._last_mark_time = 0.0
+        self._running = True
+        self._write_count = 0
+        self._write_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    @property
+    def dirty_version(self) -> int:
+        """当前脏版本号"""
+        return self._dirty_version
+
+    @property
+    def written_version(self) -> int:
+        """最近一次成功写入对应的版本号"""
+        return self._written_version
+
+    @property
+    def write_count(self) -> int:
+        """实际写入次数（用于监控和测试）"""
+        return self._write_count
+
+    def mark_dirty(self) -> int:
+        """标记状态已变更，返回新的脏版本号"""
+        with self._cond:
+            self._dirty_version += 1
+            self._last_mark_time = time.monotonic()
+            self._cond.notify()
+            return self._dirty_version
+
+    def flush(self) -> bool:
+        """
+        同步写入尚未持久化的变更
+
+        Returns:
+            bool: 是否执行了写入
+        """
+        with self._cond:
+            target_version = self._dirty_version
+            if target_version == self._written_version:
+                return False
+        return self._write(target_version)
+
+    def stop(self, flush: bool = True, timeout: float = 5.0) -> None:
+        """停止后台线程，默认在退出前写入剩余变更"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        if flush:
+            self.flush()
+
+    def _run(self) -> None:
+        """后台线程：等待变更，合并突发写入"""
+        while True:
+            with self._cond:
+                while self._running and self._dirty_version == self._written_version:
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+                # 合并窗口：等待变更静止，但不超过 max_delay
+                first_pending = time.monotonic()
+                while self._running:
+                    now = time.monotonic()
+                    quiet_deadline = self._last_mark_time + self._debounce
+                    hard_deadline = first_pending + self._max_delay
+                    wait_time = min(quiet_deadline, hard_deadline) - now
+                    if wait_time <= 0:
+                        break
+                    self._cond.wait(wait_time)
+                if not self._running:
+                    return
+                target_version = self._dirty_version
+
+            self._write(target_version)
+
+    def _write(self, target_version: int) -> bool:
+        """获取快照并交给 write_fn 持久化，target_version 为快照前的脏版本号"""
+        with self._write_lock:
+            if target_version <= self._written_version:
+                return False
+            try:
+                self._write_fn(self._snapshot_fn())
+            except Exception as e:
+                logger.warning(f"写入状态失败: {self.name}, 错误: {e}")
+                # 标记为已处理，避免对同一版本反复重试；下一次变更会再次触发写入
+                with self._cond:
+                    self._written_version = max(self._written_version, target_version)
+                return False
+
+            with self._cond:
+                self._written_version = max(self._written_version, target_version)
+                self._write_count += 1
+            return True
@@ -0,0 +1,322 @@
+"""
+跨进程会话注册表
+同一主机上的多个MCP服务器进程共享一个 SQLite（WAL 模式）数据库，
+每个会话一行，记录所属进程PID、心跳时间和端口。
+进程只替换自己的行，因此不会互相覆盖；进程退出后其行由存活进程清理。
+反馈收件箱的所有者（监听收件箱端口的进程）也登记在这里，其他进程据此把会话注册到同一个收件箱。
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.utils.persistence import get_registry_file_path
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 心跳间隔（秒），超过 REGISTRY_STALE_SECONDS 未心跳的行视为失效
+REGISTRY_HEARTBEAT_INTERVAL: float = 10.0
+REGISTRY_STALE_SECONDS: float = 30.0
+# 数据库被其他进程锁定时的等待时间（毫秒）
+REGISTRY_BUSY_TIMEOUT_MS: int = 5000
+
+SESSION_COLUMNS = (
+    "pid",
+    "session_id",
+    "port",
+    "status",
+    "work_summary",
+    "timeout_seconds",
+    "error_message",
+    "created_at",
+    "last_activity",
+    "heartbeat",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    pid INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    port INTEGER,
+    status TEXT NOT NULL,
+    work_summary TEXT NOT NULL DEFAULT '',
+    timeout_seconds INTEGER NOT NULL DEFAULT 300,
+    error_message TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    last_activity REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    PRIMARY KEY (pid, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_port ON sessions (port);
+CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions (session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_heartbeat ON sessions (heartbeat);
+CREATE TABLE IF NOT EXISTS inbox_owner (
+    port INTEGER PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    claimed_at REAL NOT NULL
+);
+"""
+
+
+def is_pid_alive(pid: Any) -> bool:
+    """检查进程是否存活"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if sys.platform.startswith("win"):
+        # Windows 上 os.kill(pid, 0) 会发送控制台事件，无法安全探测，依赖心跳判断
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class SessionRegistry:
+    """基于 SQLite WAL 的跨进程会话注册表"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_registry_file_path()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=REGISTRY_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,  # 显式管理事务
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute(f"PRAGMA busy_timeout = {REGISTRY_BUSY_TIMEOUT_MS}")
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def sync_process(self, pid: int, sessions: Iterable[Dict[str, Any]]) -> None:
+        """
+        以单个事务替换指定进程的全部会话行
+
+        Args:
+            pid: 所属进程PID
+            sessions: 会话字典列表，键与 SESSION_COLUMNS 对应（pid、heartbeat 自动填充）
+        """
+        now = time.time()
+        rows = [
+            (
+                pid,
+                session["session_id"],
+                session.get("port"),
+                session.get("status", "idle"),
+                session.get("work_summary", ""),
+                session.get("timeout_seconds", 300),
+                session.get("error_message", ""),
+                session.get("created_at", now),
+                session.get("last_activity", now),
+                now,
+            )
+            for session in sessions
+        ]
+        placeholders = ", ".join("?" for _ in SESSION_COLUMNS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM sessions WHERE pid = ?", (pid,))
+                self._conn.executemany(
+                    f"INSERT INTO sessions ({', '.join(SESSION_COLUMNS)}) VALUES ({placeholders})",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, pid: int) -> int:
+        """
+        刷新指定进程全部会话的心跳时间
+
+        Returns:
+            int: 被刷新的行数（行已被其他进程清理时为0，调用方应重新同步）
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE sessions SET heartbeat = ? WHERE pid = ?", (time.time(), pid)
+            )
+            return cursor.rowcount
+
+    def remove_process(self, pid: int) -> None:
+        """删除指定进程的全部会话行及其收件箱所有权"""
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE pid = ?", (pid,))
+            self._conn.execute("DELETE FROM inbox_owner WHERE pid = ?", (pid,))
+
+    def claim_inbox(self, pid: int, port: int, token: str) -> None:
+        """
+        登记收件箱所有者
+
+        所有权由监听端口决定（同一时间只有一个进程能监听），登记只是让其他进程找到它，
+        因此直接覆盖已退出进程留下的记录。
+
+        Args:
+            pid: 监听收件箱端口的进程PID
+            port: 收件箱端口
+            token: 其他进程注册会话时使用的令牌
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inbox_owner (port, pid, token, claimed_at) VALUES (?, ?, ?, ?)",
+                (port, pid, token, time.time()),
+            )
+
+    def get_inbox_owner(self, port: int) -> Optional[Dict[str, Any]]:
+        """
+        查询收件箱所有者 {"port", "pid", "token", "claimed_at"}
+
+        所有者进程已退出时删除其记录并返回None。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT port, pid, token, claimed_at FROM inbox_owner WHERE port = ?", (port,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not is_pid_alive(row["pid"]):
+                self._conn.execute("DELETE FROM inbox_owner WHERE port = ? AND pid = ?", (port, row["pid"]))
+                return None
+        return dict(row)
+
+    def reap_stale(self, stale_seconds: float = REGISTRY_STALE_SECONDS) -> int:
+        """
+        清理失效的会话行：所属进程已退出，或心跳超时
+
+        Returns:
+            int: 被清理的进程数量
+        """
+        cutoff = time.time() - stale_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pid, MAX(heartbeat) AS heartbeat FROM sessions GROUP BY pid"
+            ).fetchall()
+            stale_pids = [
+                row["pid"] for row in rows
+                if row["heartbeat"] < cutoff or not is_pid_alive(row["pid"])
+            ]
+            if stale_pids:
+                self._conn.executemany(
+                    "DELETE FROM sessions WHERE pid = ?", [(pid,) for pid in stale_pids]
+                )
+        if stale_pids:
+            logger.info(f"已清理失效进程的会话记录: {stale_pids}")
+        return len(stale_pids)
+
+    def list_sessions(
+        self, status: Optional[str] = None, stale_seconds: float = REGISTRY_STALE_SECONDS
+    ) -> List[Dict[str, Any]]:
+        """
+        查询心跳未超时的会话（单次索引查询）
+
+        Args:
+            status: 仅返回指定状态的会话
+            stale_seconds: 心跳超时阈值
+        """
+        query = f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions WHERE heartbeat >= ?"
+        params: List[Any] = [time.time() - stale_seconds]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY port"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def find_by_port(self, port: int) -> Optional[Dict[str, Any]]:
+        """根据端口查找会话"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions "
+                "WHERE port = ? AND heartbeat >= ? ORDER BY heartbeat DESC LIMIT 1",
+                (port, time.time() - REGISTRY_STALE_SECONDS),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_session(self, session_id: str) -> List[Dict[str, Any]]:
+        """根据 session_id 查找会话（不同进程可能使用相同的 session_id）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions "
+                "WHERE session_id = ? AND heartbeat >= ?",
+                (session_id, time.time() - REGISTRY_STALE_SECONDS),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def data_version(self) -> int:
+        """
+        其他连接提交变更时递增的数据版本号（PRAGMA data_version）
+
+        本连接自身的写入不会改变该值，调用方需结合本进程的状态版本判断是否有变化。
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def build_status_summary(self) -> Dict[str, Any]:
+        """汇总所有进程的会话，格式与服务器池状态一致"""
+        now = time.time()
+        sessions = self.list_sessions()
+        servers = []
+        for session in sessions:
+            work_summary = session["work_summary"] or ""
+            server_data = {
+                "session_id": session["session_id"],
+                "pid": session["pid"],
+                "port": session["port"],
+                "status": session["status"],
+                "work_summary": work_summary[:50] + "..." if len(work_summary) > 50 else work_summary,
+                "timeout_seconds": session["timeout_seconds"],
+                "uptime": now - session["created_at"],
+                "idle_time": now - session["last_activity"],
+                "url": f"http://127.0.0.1:{session['port']}" if session["port"] else None,
+            }
+            if session["error_message"]:
+                server_data["error"] = session["error_message"]
+            servers.append(server_data)
+
+        last_updated = max((session["heartbeat"] for session in sessions), default=None)
+        return {
+            "total_servers": len(servers),
+            "active_servers": sum(1 for s in servers if s["status"] == "running"),
+            "ports_in_use": [s["port"] for s in servers if s["port"]],
+            "processes": sorted({s["pid"] for s in servers}),
+            "servers": servers,
+            "last_updated": last_updated,
+            "last_updated_readable": (
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_updated))
+                if last_updated else None
+            ),
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+# 全局注册表实例
+_registry: Optional[SessionRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry() -> SessionRegistry:
+    """获取当前进程共享的会话注册表连接"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SessionRegistry()
+    return _registry
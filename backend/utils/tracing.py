@@ -0,0 +1,341 @@
+"""
+工具调用生命周期跟踪模块
+每次工具调用形成一条跟踪（trace），各阶段为其子跨度（span）。
+跨度结束后以 OpenTelemetry（OTLP JSON）兼容的结构写入本地轮转 JSONL 文件，
+文件写入由后台线程完成，不阻塞调用方。
+"""
+
+import atexit
+import contextvars
+import functools
+import glob
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from backend.utils.persistence import get_state_dir
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+TRACE_FILE_NAME = "traces.jsonl"
+SERVICE_NAME = "mcp-feedback-pipe"
+PERCENTILES = (50, 95, 99)
+
+# 当前上下文中的活动跨度
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "mcp_feedback_current_span", default=None
+)
+
+
+def _to_any_value(value: Any) -> Dict[str, Any]:
+    """转换为 OTLP AnyValue 结构"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """转换为 OTLP KeyValue 列表"""
+    return [{"key": key, "value": _to_any_value(value)} for key, value in attributes.items()]
+
+
+class Span:
+    """跟踪跨度"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id",
+        "start_time_ns", "end_time_ns", "attributes", "events",
+        "status_code", "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent.span_id if parent else ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status_code = "STATUS_CODE_UNSET"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置属性"""
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        """记录跨度内的时间点事件（可在其他线程调用）"""
+        self.events.append({
+            "timeUnixNano": str(time.time_ns()),
+            "name": name,
+            "attributes": _to_attributes(attributes or {}),
+        })
+
+    def set_error(self, error: BaseException) -> None:
+        """标记跨度失败"""
+        self.status_code = "STATUS_CODE_ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration(self) -> Optional[float]:
+        """跨度耗时（秒），未结束时为None"""
+        if self.end_time_ns is None:
+            return None
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def end(self) -> None:
+        """结束跨度并导出（重复调用无副作用）"""
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        exporter = get_span_exporter()
+        if exporter is not None:
+            exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 OTLP JSON 兼容的跨度结构"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": _to_attributes(self.attributes),
+            "events": list(self.events),
+            "status": {"code": self.status_code, "message": self.status_message},
+            "resource": {
+                "attributes": _to_attributes({
+                    "service.name": SERVICE_NAME,
+                    "process.pid": os.getpid(),
+                }),
+            },
+        }
+
+
+class JsonlSpanExporter:
+    """将跨度写入轮转 JSONL 文件的导出器（后台线程写入）"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3):
+        self.path = path
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._handler = handler
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """排队写入一个跨度"""
+        if self._stopped:
+            return
+        try:
+            line = json.dumps(span.to_dict(), ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError) as e:
+            logger.debug(f"跨度序列化失败: {e}")
+            return
+        self._queue.put_nowait(
+            logging.LogRecord("mcp_feedback.trace", logging.INFO, "", 0, line, None, None)
+        )
+
+    def shutdown(self) -> None:
+        """写完已排队的跨度并关闭文件"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self._listener.stop()
+        self._handler.close()
+
+
+# 全局导出器（首次结束跨度时按配置创建）
+_exporter: Optional[JsonlSpanExporter] = None
+_exporter_initialized = False
+_exporter_lock = threading.Lock()
+
+
+def get_span_exporter() -> Optional[JsonlSpanExporter]:
+    """获取跨度导出器，跟踪被禁用或文件不可用时返回None"""
+    global _exporter, _exporter_initialized
+    if _exporter_initialized:
+        return _exporter
+    with _exporter_lock:
+        if not _exporter_initialized:
+            from backend.config import get_server_config
+
+            config = get_server_config()
+            if config.trace_enabled:
+                try:
+                    _exporter = JsonlSpanExporter(
+                        get_trace_file_path(),
+                        max_bytes=config.trace_max_bytes,
+                        backup_count=config.trace_backup_count,
+                    )
+                    atexit.register(_exporter.shutdown)
+                except OSError as e:
+                    logger.warning(f"跟踪文件不可用，调用跟踪已禁用: {e}")
+            _exporter_initialized = True
+    return _exporter
+
+
+def set_span_exporter(exporter: Optional[JsonlSpanExporter]) -> Optional[JsonlSpanExporter]:
+    """替换全局导出器（None 表示禁用），返回原导出器"""
+    global _exporter, _exporter_initialized
+    with _exporter_lock:
+        previous = _exporter
+        _exporter = exporter
+        _exporter_initialized = True
+    return previous
+
+
+def get_trace_file_path() -> str:
+    """获取跟踪文件路径"""
+    return os.path.join(get_state_dir(), TRACE_FILE_NAME)
+
+
+def get_current_span() -> Optional[Span]:
+    """获取当前上下文中的活动跨度"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[Span] = None,
+) -> Iterator[Span]:
+    """
+    开始一个跨度，并在上下文结束时结束它
+
+    Args:
+        name: 跨度名称（阶段名）
+        attributes: 初始属性
+        parent: 父跨度；未指定时使用当前上下文中的跨度，都没有时开始新的跟踪
+    """
+    span = Span(name, parent or _current_span.get(), attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """以跨度包裹函数调用的装饰器"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# 跟踪文件分析
+# =============================================================================
+
+def read_spans(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    读取跟踪文件及其轮转文件中的全部跨度（忽略无法解析的行）
+
+    Args:
+        path: 跟踪文件路径，默认使用状态目录下的跟踪文件
+    """
+    path = path or get_trace_file_path()
+    # 轮转文件为 path.1（较新）… path.N（最旧），按从旧到新的顺序读取
+    rotated = [
+        (int(file_path.rsplit(".", 1)[1]), file_path)
+        for file_path in glob.glob(glob.escape(path) + ".*")
+        if file_path.rsplit(".", 1)[1].isdigit()
+    ]
+    paths = [file_path for _, file_path in sorted(rotated, reverse=True)]
+    if os.path.exists(path):
+        paths.append(path)
+
+    spans = []
+    for file_path in paths:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError as e:
+            logger.warning(f"读取跟踪文件失败 {file_path}: {e}")
+    return spans
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """最近秩法计算百分位数"""
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_spans(
+    spans: Iterable[Dict[str, Any]], root_name: Optional[str] = None
+) -> Dict[str, Dict[str, float]]:
+    """
+    按跨度名称统计耗时百分位
+
+    Args:
+        spans: read_spans 返回的跨度
+        root_name: 仅统计根跨度为该名称的跟踪（例如 tool.collect_feedback）
+
+    Returns:
+        {跨度名称: {"count", "p50", "p95", "p99", "max"}}，耗时单位为秒
+    """
+    spans = list(spans)
+    if root_name is not None:
+        trace_ids = {
+            span.get("traceId") for span in spans
+            if not span.get("parentSpanId") and span.get("name") == root_name
+        }
+        spans = [span for span in spans if span.get("traceId") in trace_ids]
+
+    durations: Dict[str, List[float]] = {}
+    for span in spans:
+        try:
+            duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+        except (KeyError, TypeError, ValueError):
+            continue
+        durations.setdefault(span.get("name", "?"), []).append(duration)
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        stats = {"count": len(values)}
+        for percentile in PERCENTILES:
+            stats[f"p{percentile}"] = _percentile(values, percentile)
+        stats["max"] = values[-1]
+        summary[name] = stats
+    return summary
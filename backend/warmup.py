@@ -0,0 +1,61 @@
+"""
+启动预热模块
+backend.server 只导入响应MCP握手所需的模块，Web服务器栈（Flask、Flask-SocketIO、
+eventlet、Jinja、requests）和 Pillow 在首次工具调用时才导入。
+握手完成后在后台线程预先导入这些模块，首次工具调用通常无需等待。
+"""
+
+import importlib
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+from backend.utils.metrics import STARTUP_PHASE_SECONDS
+
+# 配置模块级别的logger
+logger = logging.getLogger(__name__)
+
+# 预热导入的模块（按依赖顺序）
+WARMUP_MODULES: Tuple[str, ...] = (
+    "backend.server_manager",
+    "engineio.async_drivers.eventlet",
+    "PIL.Image",
+)
+
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_lock = threading.Lock()
+
+
+def _import_modules(modules: Tuple[str, ...]) -> None:
+    started = time.perf_counter()
+    for module_name in modules:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            # 缺少可选依赖时由首次工具调用报告具体错误
+            logger.debug(f"预热导入 {module_name} 失败: {e}")
+    duration = time.perf_counter() - started
+    STARTUP_PHASE_SECONDS.observe(duration, phase="import_warmup")
+    logger.info(f"性能监控: 后台预热导入耗时 {duration:.3f} 秒")
+
+
+def start_warmup(modules: Tuple[str, ...] = WARMUP_MODULES) -> Optional[threading.Thread]:
+    """
+    启动后台预热线程（进程内只启动一次）
+
+    导入在模块导入锁保护下进行，预热未完成时到达的工具调用会等待同一次导入，
+    不会重复加载。
+
+    Returns:
+        预热线程；已经启动过时返回 None
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is not None:
+            return None
+        _warmup_thread = threading.Thread(
+            target=_import_modules, args=(modules,), daemon=True, name="MCP-ImportWarmup"
+        )
+        _warmup_thread.start()
+        return _warmup_thread
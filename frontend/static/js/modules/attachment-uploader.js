@@ -0,0 +1,182 @@
+/**
+ * 附件上传模块 - 遵循SOLID原则
+ * 单一职责：以二进制分块通过WebSocket上传图片
+ * 每个分块带CRC32校验，在途分块数量受窗口限制（背压），断线重连后从最后确认的偏移量继续
+ */
+
+const CRC_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+        }
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+
+/**
+ * CRC32（与服务器端 zlib.crc32 一致）
+ */
+export function crc32(bytes) {
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = CRC_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xFFFFFFFF) >>> 0;
+}
+
+function createUploadId() {
+    return window.crypto && crypto.randomUUID
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+export class AttachmentUploader {
+    /**
+     * @param {WebSocketManager} wsManager WebSocket管理器
+     * @param {Object} options { chunkSize, windowSize }
+     */
+    constructor(wsManager, options = {}) {
+        this.ws = wsManager;
+        this.chunkSize = options.chunkSize || 64 * 1024;
+        this.windowSize = options.windowSize || 4;
+
+        // upload_id -> 上传状态
+        this.uploads = new Map();
+
+        this.ws.on('upload_ready', (data) => this.handleReady(data));
+        this.ws.on('upload_ack', (data) => this.handleAck(data));
+        // 重连后恢复未完成的上传
+        this.ws.on('ready', () => this.resumeAll());
+    }
+
+    /**
+     * 开始上传文件
+     * @param {Blob} blob 图片数据
+     * @param {Object} meta { filename, mime }
+     * @returns {{uploadId: string, done: Promise<string>}} done 在上传完成后返回附件ID
+     */
+    upload(blob, meta = {}) {
+        const uploadId = createUploadId();
+        const done = new Promise((resolve, reject) => {
+            this.uploads.set(uploadId, {
+                id: uploadId,
+                blob,
+                size: blob.size,
+                filename: meta.filename || blob.name || '',
+                mime: meta.mime || blob.type || '',
+                ackedOffset: 0,   // 服务器已确认的偏移量
+                nextOffset: 0,    // 下一个待发送分块的偏移量
+                inFlight: 0,      // 已发送未确认的分块数
+                started: false,   // 服务器是否已就绪（upload_ready）
+                rewinding: false, // 等待在途分块确认后回退重发
+                resolve,
+                reject
+            });
+        });
+        this.begin(uploadId);
+        return { uploadId, done };
+    }
+
+    /**
+     * 取消上传（页面删除图片时）
+     */
+    cancel(uploadId) {
+        const upload = this.uploads.get(uploadId);
+        if (upload) {
+            this.uploads.delete(uploadId);
+            upload.reject(new Error('上传已取消'));
+        }
+    }
+
+    begin(uploadId) {
+        const upload = this.uploads.get(uploadId);
+        if (!upload) return;
+        upload.started = false;
+        upload.inFlight = 0;
+        upload.rewinding = false;
+        this.ws.sendEvent('upload_begin', {
+            upload_id: upload.id,
+            size: upload.size,
+            mime: upload.mime,
+            filename: upload.filename
+        });
+    }
+
+    resumeAll() {
+        for (const uploadId of this.uploads.keys()) {
+            this.begin(uploadId);
+        }
+    }
+
+    handleReady(data) {
+        const upload = this.uploads.get(data.upload_id);
+        if (!upload) return;
+        if (data.error) {
+            this.uploads.delete(upload.id);
+            upload.reject(new Error(data.error));
+            return;
+        }
+        upload.started = true;
+        upload.ackedOffset = data.offset;
+        upload.nextOffset = data.offset;
+        this.pump(upload);
+    }
+
+    handleAck(data) {
+        const upload = this.uploads.get(data.upload_id);
+        if (!upload) return;
+        upload.inFlight = Math.max(0, upload.inFlight - 1);
+        upload.ackedOffset = Math.max(upload.ackedOffset, data.offset);
+
+        if (data.rewind) {
+            upload.rewinding = true;
+        }
+        if (upload.rewinding) {
+            // 等在途分块全部确认后，通过 upload_begin 取得服务器的准确偏移量再继续
+            if (upload.inFlight === 0) {
+                this.begin(upload.id);
+            }
+            return;
+        }
+        if (data.complete) {
+            this.uploads.delete(upload.id);
+            upload.resolve(upload.id);
+            return;
+        }
+        this.pump(upload);
+    }
+
+    /**
+     * 在窗口允许的范围内发送分块
+     */
+    pump(upload) {
+        while (upload.started && !upload.rewinding
+               && upload.inFlight < this.windowSize && upload.nextOffset < upload.size) {
+            const offset = upload.nextOffset;
+            const end = Math.min(offset + this.chunkSize, upload.size);
+            upload.nextOffset = end;
+            upload.inFlight++;
+            this.sendChunk(upload, offset, end);
+        }
+    }
+
+    async sendChunk(upload, offset, end) {
+        const bytes = new Uint8Array(await upload.blob.slice(offset, end).arrayBuffer());
+        if (this.uploads.get(upload.id) !== upload || !upload.started) {
+            return;
+        }
+        const sent = this.ws.sendEvent('upload_chunk', {
+            upload_id: upload.id,
+            offset,
+            data: bytes.buffer,
+            crc32: crc32(bytes)
+        });
+        if (!sent) {
+            // 连接已断开，重连后由 resumeAll 恢复
+            upload.started = false;
+        }
+    }
+}
@@ -0,0 +1,171 @@
+/**
+ * 草稿同步模块 - 遵循SOLID原则
+ * 单一职责：把页面输入以防抖合并的增量同步到服务器端草稿
+ * 超时捕获和重连直接读取服务器草稿，最终提交只需确认草稿版本
+ */
+
+/**
+ * 计算文本增量（公共前缀/后缀之外的替换）
+ * 按码点计算，与服务器端 Python 字符串索引一致
+ */
+export function diffText(previous, next) {
+    const prev = Array.from(previous);
+    const curr = Array.from(next);
+    const max = Math.min(prev.length, curr.length);
+
+    let start = 0;
+    while (start < max && prev[start] === curr[start]) {
+        start++;
+    }
+    let end = 0;
+    while (end < max - start && prev[prev.length - 1 - end] === curr[curr.length - 1 - end]) {
+        end++;
+    }
+
+    return {
+        pos: start,
+        delete: prev.length - start - end,
+        insert: curr.slice(start, curr.length - end).join('')
+    };
+}
+
+export class DraftSync {
+    /**
+     * @param {WebSocketManager} wsManager WebSocket管理器
+     * @param {Function} getState 返回页面当前内容 { text, images: [{ id, attachmentId, filename }] }
+     * @param {Object} options { debounceMs, onRestore(state) }
+     */
+    constructor(wsManager, getState, options = {}) {
+        this.ws = wsManager;
+        this.getState = getState;
+        this.debounceMs = options.debounceMs ?? 500;
+        this.onRestore = options.onRestore || null;
+
+        // 服务器草稿状态（发送后乐观推进，服务器要求重新同步时回退）
+        this.version = 0;
+        this.syncedText = null; // null 表示服务器文本未知，下次发送完整文本
+        this.syncedImageIds = new Set();
+        this.timer = null;
+
+        this.ws.on('draft_state', (state) => this.handleState(state));
+        this.ws.on('draft_ack', (ack) => this.handleAck(ack));
+    }
+
+    /**
+     * 页面内容变化后调用，防抖合并后发送
+     */
+    schedule() {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.flush(), this.debounceMs);
+    }
+
+    /**
+     * 立即发送未同步的变化
+     * @returns {boolean} 服务器草稿是否（乐观地）与页面一致
+     */
+    flush() {
+        clearTimeout(this.timer);
+        this.timer = null;
+
+        const { text, images } = this.getState();
+        const update = { base_version: this.version };
+        let changed = false;
+
+        if (this.syncedText === null) {
+            update.text = text;
+            changed = true;
+        } else if (text !== this.syncedText) {
+            update.text_patch = diffText(this.syncedText, text);
+            changed = true;
+        }
+
+        // 图片以分块上传的附件ID引用，上传完成前不计入草稿
+        const uploaded = images.filter(image => image.attachmentId);
+        const imageIds = new Set(uploaded.map(image => image.id));
+        const added = uploaded.filter(image => !this.syncedImageIds.has(image.id));
+        const removed = [...this.syncedImageIds].filter(id => !imageIds.has(id));
+        if (added.length > 0) {
+            update.add_images = added.map(image => ({
+                id: image.id,
+                attachment_id: image.attachmentId,
+                filename: image.filename || ''
+            }));
+            changed = true;
+        }
+        if (removed.length > 0) {
+            update.remove_images = removed;
+            changed = true;
+        }
+
+        if (!changed) {
+            return true;
+        }
+        if (!this.ws.sendEvent('draft_update', update)) {
+            return false;
+        }
+
+        this.version += 1;
+        this.syncedText = text;
+        this.syncedImageIds = imageIds;
+        return true;
+    }
+
+    /**
+     * 确认式提交的数据：先发送剩余变化，再只提交草稿版本
+     */
+    confirmPayload() {
+        return this.flush() ? { draft_version: this.version } : null;
+    }
+
+    /**
+     * 服务器草稿状态（连接/重连时发送，页面请求恢复时包含图片）
+     */
+    handleState(state) {
+        const local = this.getState();
+        const localEmpty = !local.text.trim() && local.images.length === 0;
+        const serverEmpty = !state.text.trim() && state.image_ids.length === 0;
+
+        if (state.images && this.onRestore) {
+            this.onRestore(state);
+        } else if (localEmpty && !serverEmpty) {
+            // 页面重新加载：先从服务器恢复，避免把空内容同步回去
+            this.ws.sendEvent('draft_restore', {});
+            return;
+        }
+
+        this.adopt(state);
+        this.flush();
+    }
+
+    /**
+     * 处理增量确认
+     */
+    handleAck(ack) {
+        if (ack.error) {
+            console.warn('⚠️ 草稿同步被拒绝:', ack.error);
+            this.adopt(ack);
+            return;
+        }
+        if (ack.resync) {
+            // 基础版本不一致（服务器重启或草稿已清空），以完整文本重新同步
+            this.version = ack.version;
+            this.syncedText = null;
+            this.syncedImageIds = new Set(ack.image_ids);
+            this.flush();
+        }
+    }
+
+    /**
+     * 以服务器草稿为同步基础
+     */
+    adopt(state) {
+        this.version = state.version;
+        this.syncedText = state.text;
+        this.syncedImageIds = new Set(state.image_ids);
+    }
+
+    destroy() {
+        clearTimeout(this.timer);
+        this.timer = null;
+    }
+}
@@ -159,43 +159,10 @@ function _prepareFormData(data) {
  * @private
  */
 function _addImagesToFormData(formData, images) {
-  for (let i = 0; i < images.length; i++) {
-    const imageData = images[i];
-    const file = _convertImageDataToFile(imageData, i);
-    formData.append('images', file);
-  }
-}
-
-/**
- * 将图片数据转换为File对象
- * @private
- */
-function _convertImageDataToFile(imageData, index) {
-  // 从base64数据中提取MIME类型
-  const dataUrlParts = imageData.data.split(',');
-  const mimeMatch = dataUrlParts[0].match(/data:([^;]+);base64/);
-  const mimeType = mimeMatch ? mimeMatch[1] : 'image/jpeg';
-
-  // 根据MIME类型确定文件扩展名
-  const extensionMap = {
-    'image/jpeg': '.jpg',
-    'image/png': '.png',
-    'image/gif': '.gif',
-    'image/webp': '.webp'
-  };
-  const extension = extensionMap[mimeType] || '.jpg';
-
-  // 将base64数据转换为Blob，然后转换为File
-  const byteCharacters = atob(dataUrlParts[1]);
-  const byteNumbers = new Array(byteCharacters.length);
-  for (let j = 0; j < byteCharacters.length; j++) {
-    byteNumbers[j] = byteCharacters.charCodeAt(j);
-  }
-  const byteArray = new Uint8Array(byteNumbers);
-  const blob = new Blob([byteArray], { type: mimeType });
-  const fileName = imageData.name || `image_${index}${extension}`;
-
-  return new File([blob], fileName, { type: mimeType });
+  // 图片已是处理后的 Blob，直接作为文件字段追加
+  images.forEach(image => {
+    formData.append('images', image.blob, image.name);
+  });
 }
 
 /**
@@ -4,8 +4,9 @@
  */
 
 import { compressImage, showAlert } from './utils.js';
+import { fileNameFor } from './image-pipeline.js';
 
-// 全局变量存储选中的图片
+// 全局变量存储选中的图片：{ blob, previewUrl, source, name, size, originalSize }
 let selectedImages = [];
 
 /**
@@ -133,38 +134,27 @@ async function addImage(file, source = '文件') {
     // 显示压缩进度
     showAlert('正在处理图片...', 'info');
 
-    // 压缩图片
+    // 在 Worker 中处理图片，结果保持为 Blob，预览使用对象URL
     const compressedFile = await compressImage(file);
-
-    const reader = new FileReader();
-    reader.onload = function (e) {
-      const imageData = {
-        data: e.target.result,
-        source,
-        name: file.name || '粘贴图片',
-        size: compressedFile.size || file.size,
-        originalSize: file.size
-      };
-
-      selectedImages.push(imageData);
-      updateImagePreview();
-
-      // 显示压缩结果
-      const originalSize = file.size;
-      const compressedSize = compressedFile.size || file.size;
-      const compressionRatio = (((originalSize - compressedSize) / originalSize) * 100).toFixed(1);
-      if (compressionRatio > 0) {
-        showAlert(`图片已添加并压缩 ${compressionRatio}%`, 'success');
-      } else {
-        showAlert('图片已添加', 'success');
-      }
+    const imageData = {
+      blob: compressedFile,
+      previewUrl: URL.createObjectURL(compressedFile),
+      source,
+      name: fileNameFor(file.name || '粘贴图片', compressedFile.type),
+      size: compressedFile.size,
+      originalSize: file.size
     };
 
-    reader.onerror = function () {
-      showAlert('图片读取失败，请重试', 'warning');
-    };
+    selectedImages.push(imageData);
+    updateImagePreview();
 
-    reader.readAsDataURL(compressedFile);
+    // 显示压缩结果
+    const compressionRatio = (((file.size - compressedFile.size) / file.size) * 100).toFixed(1);
+    if (compressionRatio > 0) {
+      showAlert(`图片已添加并压缩 ${compressionRatio}%`, 'success');
+    } else {
+      showAlert('图片已添加', 'success');
+    }
   } catch (error) {
     console.error('图片处理失败:', error);
     showAlert('图片处理失败，请重试', 'warning');
@@ -186,7 +176,7 @@ function updateImagePreview() {
 
     // 使用DOM操作替代innerHTML提升安全性
     const imgElement = document.createElement('img');
-    imgElement.src = img.data;
+    imgElement.src = img.previewUrl;
     imgElement.alt = img.name;
     imgElement.loading = 'lazy'; // 懒加载优化
 
@@ -209,7 +199,8 @@ function updateImagePreview() {
  */
 function removeImage(index) {
   if (index >= 0 && index < selectedImages.length) {
-    selectedImages.splice(index, 1);
+    const [removed] = selectedImages.splice(index, 1);
+    URL.revokeObjectURL(removed.previewUrl);
     updateImagePreview();
     showAlert('图片已删除', 'info');
   }
@@ -221,7 +212,7 @@ function removeImage(index) {
  */
 export function getSelectedImages() {
   return selectedImages.map(img => ({
-    data: img.data,
+    blob: img.blob,
     source: img.source,
     name: img.name,
     size: img.size,
@@ -241,6 +232,7 @@ export function hasSelectedImages() {
  * 清空选中的图片
  */
 export function clearSelectedImages() {
+  selectedImages.forEach(img => URL.revokeObjectURL(img.previewUrl));
   selectedImages = [];
   updateImagePreview();
 }
@@ -0,0 +1,115 @@
+/**
+ * 图片处理管线模块 - 遵循SOLID原则
+ * 单一职责：把粘贴/选择的图片交给 Worker 处理，返回处理后的 Blob
+ * 图片从粘贴到上传始终保持为 Blob，预览使用对象URL，不经过 base64
+ */
+
+// 输出格式对应的文件扩展名
+const EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/webp': '.webp',
+    'image/gif': '.gif'
+};
+
+/**
+ * 按输出格式修正文件名扩展名
+ */
+export function fileNameFor(name, type) {
+    const extension = EXTENSIONS[type];
+    if (!extension) {
+        return name;
+    }
+    const base = (name || 'image').replace(/\.[^./]+$/, '');
+    return `${base}${extension}`;
+}
+
+export class ImagePipeline {
+    /**
+     * @param {Object} options { targetBytes, maxDimension, workerUrl }（目标大小由服务器在页面配置中下发）
+     */
+    constructor(options = {}) {
+        this.targetBytes = options.targetBytes || 1024 * 1024;
+        this.maxDimension = options.maxDimension || 2560;
+        this.workerUrl = options.workerUrl || new URL('./image-worker.js', import.meta.url);
+
+        this.worker = null;
+        this.pending = new Map();
+        this.nextId = 0;
+    }
+
+    /**
+     * 浏览器是否支持在 Worker 中处理图片
+     */
+    static isSupported() {
+        return typeof Worker !== 'undefined'
+            && typeof OffscreenCanvas !== 'undefined'
+            && typeof createImageBitmap !== 'undefined';
+    }
+
+    getWorker() {
+        if (!this.worker) {
+            this.worker = new Worker(this.workerUrl);
+            this.worker.onmessage = (event) => this.handleMessage(event.data);
+            this.worker.onerror = (event) => {
+                console.error('图片处理 Worker 出错:', event.message);
+                this.failAll();
+            };
+        }
+        return this.worker;
+    }
+
+    /**
+     * 处理图片
+     * @param {Blob} blob 原始图片
+     * @returns {Promise<{blob: Blob, kind: string, width?: number, height?: number}>}
+     *          kind 为 screenshot / photo / original；处理失败或不支持时返回原图
+     */
+    process(blob) {
+        if (!ImagePipeline.isSupported()) {
+            return Promise.resolve({ blob, kind: 'original' });
+        }
+
+        const id = ++this.nextId;
+        return new Promise((resolve) => {
+            this.pending.set(id, { blob, resolve });
+            this.getWorker().postMessage({
+                id,
+                blob,
+                targetBytes: this.targetBytes,
+                maxDimension: this.maxDimension
+            });
+        });
+    }
+
+    handleMessage(data) {
+        const request = this.pending.get(data.id);
+        if (!request) return;
+        this.pending.delete(data.id);
+
+        if (data.error) {
+            console.warn('⚠️ 图片处理失败，使用原图:', data.error);
+            request.resolve({ blob: request.blob, kind: 'original' });
+            return;
+        }
+        request.resolve({ blob: data.blob, kind: data.kind, width: data.width, height: data.height });
+    }
+
+    /**
+     * Worker 崩溃时所有等待中的请求回退到原图，下次处理时重新创建 Worker
+     */
+    failAll() {
+        for (const request of this.pending.values()) {
+            request.resolve({ blob: request.blob, kind: 'original' });
+        }
+        this.pending.clear();
+        this.destroy();
+    }
+
+    destroy() {
+        if (this.worker) {
+            this.worker.terminate();
+            this.worker = null;
+        }
+    }
+}
@@ -0,0 +1,122 @@
+/**
+ * 图片处理 Worker
+ * 在主线程之外解码、缩放和编码图片（createImageBitmap + OffscreenCanvas）
+ * 截图类图片（色块多、颜色少）编码为 PNG 保持文字清晰，照片类编码为 WebP/JPEG 并按目标大小调整质量
+ *
+ * 消息：{ id, blob, targetBytes, maxDimension } -> { id, blob, kind, width, height } 或 { id, error }
+ */
+
+// 无需缩放且不超过目标大小时原样保留的格式
+const PASSTHROUGH_TYPES = ['image/png', 'image/jpeg', 'image/webp'];
+// 有损编码的质量梯度
+const LOSSY_QUALITIES = [0.9, 0.8, 0.7, 0.6];
+// 编码后仍超过目标大小时最多缩小的次数
+const MAX_RESIZE_ATTEMPTS = 3;
+// 内容判断的采样区域边长（按原始像素采样，避免缩放模糊色块）
+const SAMPLE_SIZE = 256;
+
+self.onmessage = async (event) => {
+    const { id, blob, targetBytes, maxDimension } = event.data;
+    try {
+        const result = await processImage(blob, targetBytes, maxDimension);
+        self.postMessage({ id, ...result });
+    } catch (error) {
+        self.postMessage({ id, error: String((error && error.message) || error) });
+    }
+};
+
+async function processImage(blob, targetBytes, maxDimension) {
+    // 动图重新编码会丢帧，原样保留
+    if (blob.type === 'image/gif' || typeof OffscreenCanvas === 'undefined') {
+        return { blob, kind: 'original' };
+    }
+
+    const bitmap = await createImageBitmap(blob);
+    try {
+        const { width, height } = bitmap;
+        const scale = Math.min(1, maxDimension / Math.max(width, height));
+        if (scale === 1 && blob.size <= targetBytes && PASSTHROUGH_TYPES.includes(blob.type)) {
+            return { blob, kind: 'original', width, height };
+        }
+
+        const kind = isScreenshot(bitmap) ? 'screenshot' : 'photo';
+        let outWidth = Math.max(1, Math.round(width * scale));
+        let outHeight = Math.max(1, Math.round(height * scale));
+        let output = null;
+
+        for (let attempt = 0; attempt <= MAX_RESIZE_ATTEMPTS; attempt++) {
+            const canvas = new OffscreenCanvas(outWidth, outHeight);
+            const ctx = canvas.getContext('2d');
+            ctx.imageSmoothingQuality = 'high';
+            ctx.drawImage(bitmap, 0, 0, outWidth, outHeight);
+
+            output = kind === 'screenshot'
+                ? await canvas.convertToBlob({ type: 'image/png' })
+                : await encodeLossy(canvas, targetBytes);
+            if (output.size <= targetBytes) {
+                break;
+            }
+            if (attempt < MAX_RESIZE_ATTEMPTS) {
+                // 编码大小约与像素数成正比，按面积比例缩小
+                const shrink = Math.max(0.5, Math.sqrt(targetBytes / output.size) * 0.95);
+                outWidth = Math.max(1, Math.round(outWidth * shrink));
+                outHeight = Math.max(1, Math.round(outHeight * shrink));
+            }
+        }
+
+        // 无需缩放时，重新编码反而更大就保留原图
+        if (scale === 1 && output.size >= blob.size && PASSTHROUGH_TYPES.includes(blob.type)) {
+            return { blob, kind: 'original', width, height };
+        }
+        return { blob: output, kind, width: outWidth, height: outHeight };
+    } finally {
+        bitmap.close();
+    }
+}
+
+/**
+ * 有损编码：优先 WebP（不支持时浏览器返回 PNG，改用 JPEG），按质量梯度找到不超过目标大小的结果
+ */
+async function encodeLossy(canvas, targetBytes) {
+    let type = 'image/webp';
+    let output = null;
+    for (const quality of LOSSY_QUALITIES) {
+        output = await canvas.convertToBlob({ type, quality });
+        if (output.type !== type) {
+            type = 'image/jpeg';
+            output = await canvas.convertToBlob({ type, quality });
+        }
+        if (output.size <= targetBytes) {
+            break;
+        }
+    }
+    return output;
+}
+
+/**
+ * 判断是否为截图类内容：采样中心区域，统计与左邻像素完全相同的比例和颜色数
+ * 截图有大面积纯色和有限的颜色，照片几乎每个像素都不同
+ */
+function isScreenshot(bitmap) {
+    const sampleWidth = Math.min(SAMPLE_SIZE, bitmap.width);
+    const sampleHeight = Math.min(SAMPLE_SIZE, bitmap.height);
+    const sx = Math.floor((bitmap.width - sampleWidth) / 2);
+    const sy = Math.floor((bitmap.height - sampleHeight) / 2);
+
+    const canvas = new OffscreenCanvas(sampleWidth, sampleHeight);
+    const ctx = canvas.getContext('2d', { willReadFrequently: true });
+    ctx.drawImage(bitmap, sx, sy, sampleWidth, sampleHeight, 0, 0, sampleWidth, sampleHeight);
+    const pixels = new Uint32Array(ctx.getImageData(0, 0, sampleWidth, sampleHeight).data.buffer);
+
+    const colors = new Set();
+    let flat = 0;
+    for (let i = 0; i < pixels.length; i++) {
+        if (i % sampleWidth !== 0 && pixels[i] === pixels[i - 1]) {
+            flat++;
+        }
+        if (colors.size <= 4096) {
+            colors.add(pixels[i]);
+        }
+    }
+    return flat / pixels.length >= 0.5 || colors.size <= 1024;
+}
@@ -51,19 +51,24 @@ export class TimeoutManager {
 
     /**
      * 开始超时倒计时
+     * @param {number|null} remainingSeconds 服务器下发的剩余秒数（断线重连或刷新页面后），为空时从完整时长开始
      */
-    start() {
+    start(remainingSeconds = null) {
         if (this.isRunning) {
             console.warn('⚠️ 超时管理器已在运行中');
             return;
         }
 
+        const remaining = Number.isFinite(remainingSeconds)
+            ? Math.min(remainingSeconds, this.config.timeout_seconds)
+            : this.config.timeout_seconds;
         this.isRunning = true;
-        this.startTime = this.getCurrentTime();
-        this.remainingSeconds = this.config.timeout_seconds;
+        // 起点前移已经过的时间，倒计时与服务器截止时间保持一致
+        this.startTime = this.getCurrentTime() - (this.config.timeout_seconds - remaining) * 1000;
+        this.remainingSeconds = remaining;
         this.hasWarned = false;
 
-        console.log(`⏱️ 超时倒计时开始: ${this.config.timeout_seconds}秒`);
+        console.log(`⏱️ 超时倒计时开始: ${remaining}秒`);
         
         // 启动倒计时
         this.countdownInterval = setInterval(() => {
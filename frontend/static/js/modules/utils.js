@@ -3,6 +3,8 @@
  * 提供通用的工具函数，如防抖、图片压缩、HTML转义等
  */
 
+import { ImagePipeline } from './image-pipeline.js';
+
 /**
  * 防抖函数 - 限制函数调用频率
  * @param {Function} func - 要防抖的函数
@@ -21,40 +23,20 @@ export function debounce(func, wait) {
   };
 }
 
+let sharedImagePipeline = null;
+
 /**
- * 压缩图片文件
- * @param {File} file - 原始图片文件
- * @param {number} maxWidth - 最大宽度
- * @param {number} quality - 压缩质量 (0-1)
- * @returns {Promise<Blob>} 压缩后的图片Blob
+ * 压缩图片文件（在 Worker 中处理，截图保持 PNG，照片使用有损格式）
+ * @param {File|Blob} file - 原始图片文件
+ * @param {Object} options - { targetBytes, maxDimension }，首次调用时生效
+ * @returns {Promise<Blob>} 处理后的图片Blob（不支持或失败时为原文件）
  */
-export function compressImage(file, maxWidth = 1920, quality = 0.8) {
-  return new Promise((resolve, reject) => {
-    const canvas = document.createElement('canvas');
-    const ctx = canvas.getContext('2d');
-    const img = new Image();
-
-    img.onload = () => {
-      try {
-        const ratio = Math.min(maxWidth / img.width, maxWidth / img.height, 1);
-        canvas.width = img.width * ratio;
-        canvas.height = img.height * ratio;
-
-        ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
-        canvas.toBlob(resolve, 'image/jpeg', quality);
-      } catch (error) {
-        console.error('图片压缩失败:', error);
-        resolve(file); // 压缩失败时返回原文件
-      }
-    };
-
-    img.onerror = () => {
-      console.error('图片加载失败');
-      resolve(file); // 加载失败时返回原文件
-    };
-
-    img.src = URL.createObjectURL(file);
-  });
+export async function compressImage(file, options = {}) {
+  if (!sharedImagePipeline) {
+    sharedImagePipeline = new ImagePipeline(options);
+  }
+  const { blob } = await sharedImagePipeline.process(file);
+  return blob;
 }
 
 /**
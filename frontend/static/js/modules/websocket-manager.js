@@ -13,6 +13,10 @@ export class WebSocketManager {
             maxReconnectDelay: options.maxReconnectDelay || 30000,
             heartbeatInterval: options.heartbeatInterval || 30000,
             connectionTimeout: options.connectionTimeout || 20000,
+            // 断线后服务器保留会话的时间，连接确认中下发的值优先
+            reconnectGraceSeconds: options.reconnectGraceSeconds || 30,
+            // 连接时附带的认证数据（如收件箱令牌）
+            auth: options.auth || {},
             ...options
         };
 
@@ -23,6 +27,11 @@ export class WebSocketManager {
         this.heartbeatTimer = null;
         this.clientId = null;
 
+        // 会话恢复：重连时携带恢复令牌，宽限期内持续以指数退避重连
+        this.resumeToken = null;
+        this.disconnectedAt = null;
+        this.reconnectTimer = null;
+
         // 事件处理器（依赖注入）
         this.eventHandlers = new Map();
         
@@ -48,12 +57,16 @@ export class WebSocketManager {
 
         try {
             console.log('🔗 建立WebSocket连接...');
+            this.closeSocket();
             
+            // 重连由本模块按宽限期调度，关闭 Socket.IO 自带的重连，避免两套重连并存
             this.socket = io({
                 transports: ['websocket', 'polling'],
                 timeout: this.config.connectionTimeout,
                 forceNew: true,
-                autoConnect: true
+                autoConnect: true,
+                reconnection: false,
+                auth: this.resumeToken ? { ...this.config.auth, resume_token: this.resumeToken } : { ...this.config.auth }
             });
 
             this.setupSocketEvents();
@@ -72,6 +85,7 @@ export class WebSocketManager {
         this.socket.on('connect', () => {
             this.isConnected = true;
             this.reconnectAttempts = 0;
+            this.disconnectedAt = null;
             
             console.log('✅ WebSocket连接已建立');
             this.emit('connected');
@@ -82,9 +96,23 @@ export class WebSocketManager {
             this.clientId = data.client_id;
             
             console.log('🎯 连接确认:', data);
+
+            // 携带了令牌却未被确认：服务器已是新的会话，页面内容已过期
+            if (this.resumeToken && !data.resumed) {
+                console.warn('⚠️ 会话已被替换，需要重新加载页面');
+                this.resumeToken = data.resume_token;
+                this.emit('session_replaced', data);
+                return;
+            }
+            this.resumeToken = data.resume_token || null;
+            if (data.reconnect_grace_seconds !== undefined) {
+                this.config.reconnectGraceSeconds = data.reconnect_grace_seconds;
+            }
             
-            // 启动心跳
-            this.startHeartbeat();
+            // 服务器通过 Engine.IO ping/pong 检测存活，heartbeat_interval 为0时不发送应用层心跳
+            if (data.heartbeat_interval === undefined || data.heartbeat_interval > 0) {
+                this.startHeartbeat();
+            }
             this.emit('ready', data);
         });
 
@@ -103,6 +131,14 @@ export class WebSocketManager {
             this.emit('feedback_received', data);
         });
 
+        // 草稿同步（服务器草稿状态、增量确认、确认式提交被拒绝）、附件分块上传确认和收件箱的会话推送
+        [
+            'draft_state', 'draft_ack', 'submit_rejected', 'upload_ready', 'upload_ack',
+            'inbox_state', 'session_added', 'session_updated', 'session_removed'
+        ].forEach(event => {
+            this.socket.on(event, (data) => this.emit(event, data));
+        });
+
         // 连接错误
         this.socket.on('connect_error', (error) => {
             console.error('🚫 WebSocket连接错误:', error);
@@ -116,6 +152,9 @@ export class WebSocketManager {
     handleDisconnection(reason) {
         this.isConnected = false;
         this.stopHeartbeat();
+        if (this.disconnectedAt === null) {
+            this.disconnectedAt = Date.now();
+        }
         
         console.log('💔 WebSocket连接断开:', reason);
         this.emit('disconnected', reason);
@@ -130,35 +169,76 @@ export class WebSocketManager {
      * 处理连接错误
      */
     handleConnectionError(error) {
+        if (this.disconnectedAt === null) {
+            this.disconnectedAt = Date.now();
+        }
         this.emit('error', error);
         this.scheduleReconnect();
     }
 
     /**
-     * 计划重连
+     * 计划重连：指数退避加随机抖动，服务器保留会话的宽限期内不限次数，
+     * 宽限期之外最多重试 reconnectAttempts 次
      */
     scheduleReconnect() {
-        if (this.reconnectAttempts >= this.config.reconnectAttempts) {
+        if (this.reconnectTimer) {
+            return;
+        }
+
+        const graceEndsAt = (this.disconnectedAt ?? Date.now()) + this.config.reconnectGraceSeconds * 1000;
+        const withinGrace = Date.now() < graceEndsAt;
+        if (!withinGrace && this.reconnectAttempts >= this.config.reconnectAttempts) {
             console.error('❌ 达到最大重连次数');
             this.emit('max_reconnect_reached');
             return;
         }
 
         this.reconnectAttempts++;
-        const delay = Math.min(
+        const backoff = Math.min(
             this.config.reconnectDelay * Math.pow(2, this.reconnectAttempts - 1),
             this.config.maxReconnectDelay
         );
+        let delay = Math.round(backoff * (0.5 + Math.random() * 0.5));
+        // 最后一次尝试不晚于宽限期结束
+        if (withinGrace) {
+            delay = Math.min(delay, Math.max(0, graceEndsAt - Date.now() - 500));
+        }
 
         console.log(`🔄 ${delay}ms后重连... (第${this.reconnectAttempts}次)`);
 
-        setTimeout(() => {
+        this.reconnectTimer = setTimeout(() => {
+            this.reconnectTimer = null;
             if (!this.isConnected) {
                 this.connect();
             }
         }, delay);
     }
 
+    /**
+     * 立即重连（网络恢复或页面重新可见时），跳过剩余的退避等待
+     */
+    reconnectNow() {
+        if (this.isConnected || this.disconnectedAt === null) {
+            return;
+        }
+        if (this.reconnectTimer) {
+            clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = null;
+        }
+        this.connect();
+    }
+
+    /**
+     * 关闭旧的 socket 并移除其事件处理器，避免旧连接的事件干扰新连接
+     */
+    closeSocket() {
+        if (this.socket) {
+            this.socket.off();
+            this.socket.disconnect();
+            this.socket = null;
+        }
+    }
+
     /**
      * 启动心跳
      */
@@ -228,6 +308,17 @@ export class WebSocketManager {
         });
     }
 
+    /**
+     * 发送草稿同步、附件上传等事件（未连接时返回false，由调用方在重连后恢复）
+     */
+    sendEvent(event, data) {
+        if (!this.isConnected || !this.socket) {
+            return false;
+        }
+        this.socket.emit(event, data);
+        return true;
+    }
+
     /**
      * 设置页面处理器
      */
@@ -237,12 +328,17 @@ export class WebSocketManager {
             this.disconnect();
         });
 
+        // 网络恢复（如笔记本从睡眠中唤醒）时立即重连
+        window.addEventListener('online', () => this.reconnectNow());
+
         // 页面可见性变化
         document.addEventListener('visibilitychange', () => {
             if (document.hidden) {
                 this.stopHeartbeat();
             } else if (this.isConnected) {
                 this.startHeartbeat();
+            } else {
+                this.reconnectNow();
             }
         });
     }
@@ -252,11 +348,11 @@ export class WebSocketManager {
      */
     disconnect() {
         this.stopHeartbeat();
-        
-        if (this.socket) {
-            this.socket.disconnect();
-            this.socket = null;
+        if (this.reconnectTimer) {
+            clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = null;
         }
+        this.closeSocket();
         
         this.isConnected = false;
         console.log('🚪 WebSocket已主动断开');
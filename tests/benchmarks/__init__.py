@@ -0,0 +1,4 @@
+"""
+MCP反馈通道基准测试套件
+用法见 tests/benchmarks/README.md
+"""
@@ -0,0 +1,121 @@
+"""
+基准测试命令行入口
+
+    python -m tests.benchmarks run [-k 过滤] [--quick] [--output 路径] [--baseline 基线]
+    python -m tests.benchmarks compare 基线.json 结果.json [--threshold 0.2]
+    python -m tests.benchmarks list
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+
+from tests.benchmarks.harness import (
+    DEFAULT_REGRESSION_THRESHOLD,
+    compare_results,
+    default_output_path,
+    ensure_project_on_path,
+    format_comparison,
+    format_results,
+    get_registered_cases,
+    load_results,
+    run_case,
+    save_results,
+)
+
+BENCH_MODULES = (
+    "tests.benchmarks.bench_startup",
+    "tests.benchmarks.bench_submit",
+    "tests.benchmarks.bench_images",
+    "tests.benchmarks.bench_pool",
+    "tests.benchmarks.bench_resources",
+)
+
+# 快速模式下的重复次数比例
+QUICK_REPEAT_SCALE = 0.2
+
+
+def _load_modules() -> None:
+    for module_name in BENCH_MODULES:
+        importlib.import_module(module_name)
+
+
+def _compare(baseline_path: str, current_path: str, threshold: float) -> int:
+    rows = compare_results(load_results(baseline_path), load_results(current_path), threshold)
+    print(format_comparison(rows, threshold))
+    return 1 if any(row["status"] == "regression" for row in rows) else 0
+
+
+def cmd_run(args) -> int:
+    # 基准测试期间不写入调用跟踪，避免文件写入影响测量
+    os.environ.setdefault("MCP_TRACE_ENABLED", "false")
+    _load_modules()
+    cases = get_registered_cases(args.filter)
+    if not cases:
+        print(f"没有匹配 '{args.filter}' 的基准用例")
+        return 1
+
+    results = []
+    for case in cases:
+        print(f"⏱️  {case.name} ...", flush=True)
+        results.append(run_case(case, QUICK_REPEAT_SCALE if args.quick else 1.0))
+
+    print()
+    print(format_results(results))
+    output = args.output or default_output_path()
+    save_results(results, output)
+    print(f"\n📄 结果已保存: {output}")
+
+    if args.baseline:
+        print()
+        return _compare(args.baseline, output, args.threshold)
+    return 0
+
+
+def cmd_compare(args) -> int:
+    return _compare(args.baseline, args.current, args.threshold)
+
+
+def cmd_list(args) -> int:
+    _load_modules()
+    for case in get_registered_cases(args.filter):
+        print(f"{case.group:<10} {case.name}")
+    return 0
+
+
+def main(argv=None) -> int:
+    ensure_project_on_path()
+
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks", description="MCP反馈通道基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="运行基准测试并保存JSON结果")
+    run_parser.add_argument("-k", "--filter", default=None, help="只运行名称或分组包含该字符串的用例")
+    run_parser.add_argument("--quick", action="store_true", help="减少重复次数，快速检查")
+    run_parser.add_argument("--output", default=None, help="结果文件路径（默认 tests/benchmarks/results/ 下按时间命名）")
+    run_parser.add_argument("--baseline", default=None, help="运行后与该基线比较，出现回退时退出码为1")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="回退阈值（默认0.2）")
+    run_parser.set_defaults(handler=cmd_run)
+
+    compare_parser = subparsers.add_parser("compare", help="比较两个结果文件")
+    compare_parser.add_argument("baseline", help="基线结果文件")
+    compare_parser.add_argument("current", help="当前结果文件")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="回退阈值（默认0.2）")
+    compare_parser.set_defaults(handler=cmd_compare)
+
+    list_parser = subparsers.add_parser("list", help="列出基准用例")
+    list_parser.add_argument("-k", "--filter", default=None)
+    list_parser.set_defaults(handler=cmd_list)
+
+    parser.add_argument("-v", "--verbose", action="store_true", help="保留服务器日志输出（会影响测量结果）")
+
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+图片处理管道吞吐量基准
+按图片大小测量：表单上传（校验 + Base64 编码）到转换为MCP图片内容的完整路径
+"""
+
+import io
+import os
+
+from tests.benchmarks.harness import benchmark
+
+# (名称, 边长)：随机像素的PNG几乎不可压缩，文件大小约为 边长² × 3 字节
+IMAGE_SIZES = (("64kb", 148), ("512kb", 418), ("2mb", 836))
+IMAGES_PER_CALL = 3
+
+
+def _make_png(side: int) -> bytes:
+    from PIL import Image
+
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _make_setup(side: int):
+    def setup():
+        from backend.app import FeedbackApp
+        from backend.feedback_handler import FeedbackHandler
+
+        handler = FeedbackHandler()
+        flask_app = FeedbackApp(handler).create_app()
+        flask_app.config["TESTING"] = True
+        return {"handler": handler, "client": flask_app.test_client(), "png": _make_png(side)}
+    return setup
+
+
+def _make_bench(label: str):
+    def bench(context):
+        data = {
+            "textFeedback": "图片基准",
+            "images": [(io.BytesIO(context["png"]), f"image_{i}.png") for i in range(IMAGES_PER_CALL)],
+        }
+        response = context["client"].post("/submit_feedback", data=data, content_type="multipart/form-data")
+        assert response.status_code == 200
+        handler = context["handler"]
+        result = handler.get_result_nowait()
+        assert len(result["images"]) == IMAGES_PER_CALL
+        handler.process_feedback_to_mcp(result)
+        return {"image_bytes": len(context["png"])}
+    bench.__name__ = f"bench_image_pipeline_{label}"
+    return bench
+
+
+for _label, _side in IMAGE_SIZES:
+    benchmark(f"images.pipeline_{_label}", group="images", setup=_make_setup(_side),
+              warmup=1, repeat=10, items=IMAGES_PER_CALL, unit="images")(_make_bench(_label))
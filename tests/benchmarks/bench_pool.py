@@ -0,0 +1,58 @@
+"""
+服务器池并发启动基准
+Web服务器启动被替换为固定耗时的桩，测量池本身的并发扇出、端口预留和加锁开销
+"""
+
+import time
+from unittest.mock import patch
+
+from tests.benchmarks.harness import benchmark
+
+POOL_SIZES = (1, 8, 32)
+# 桩启动耗时（秒），完全串行时总耗时约为 会话数 × 该值
+STUB_START_SECONDS = 0.02
+
+
+def _setup():
+    import backend.server_pool as server_pool_module
+    from backend.server_manager import ServerManager
+
+    class StubServerManager(ServerManager):
+        def start_server(self, work_summary="", timeout_seconds=300, suggest="", preferred_port=None, **kwargs):
+            time.sleep(STUB_START_SECONDS)
+            self.current_port = preferred_port
+            return preferred_port
+
+    patchers = [patch.object(server_pool_module, "ServerManager", StubServerManager)]
+    for patcher in patchers:
+        patcher.start()
+    pool = server_pool_module.EnhancedServerPool()
+    patchers.append(patch.object(server_pool_module, "get_server_pool", return_value=pool))
+    patchers[-1].start()
+    return {"pool": pool, "patchers": patchers}
+
+
+def _teardown(context):
+    context["pool"].shutdown()
+    for patcher in reversed(context["patchers"]):
+        patcher.stop()
+
+
+def _make_bench(size: int):
+    def bench(context):
+        from backend.server import create_server_pool
+
+        configs = [{"session_id": f"bench_{size}_{i}", "timeout_seconds": 60} for i in range(size)]
+        report = create_server_pool(configs, max_concurrency=size)
+        assert f"成功创建 {size} 个服务器" in report, report
+        pool = context["pool"]
+        for config in configs:
+            pool.release_server(config["session_id"], immediate=True)
+        return {"serial_estimate_seconds": size * STUB_START_SECONDS}
+    bench.__name__ = f"bench_pool_start_{size}"
+    return bench
+
+
+for _size in POOL_SIZES:
+    benchmark(f"pool.start_{_size}_sessions", group="pool", setup=_setup, teardown=_teardown,
+              warmup=1, repeat=10, items=_size, unit="sessions")(_make_bench(_size))
@@ -0,0 +1,97 @@
+"""
+MCP资源与请求安全检查基准
+测量状态/端口资源的读取延迟，以及内存安全检查在不同负载下的开销
+"""
+
+import base64
+import os
+
+from tests.benchmarks.harness import benchmark
+
+# 状态资源读取时池中的会话数量
+STATUS_SESSIONS = 50
+
+
+def _status_setup():
+    import backend.server_pool as server_pool_module
+    from unittest.mock import patch
+
+    pool = server_pool_module.EnhancedServerPool()
+    for i in range(STATUS_SESSIONS):
+        pool.get_server(f"bench_status_{i}")
+    patcher = patch.object(server_pool_module, "get_server_pool", return_value=pool)
+    patcher.start()
+    server_patcher = patch("backend.server.get_server_pool", return_value=pool)
+    server_patcher.start()
+    return {"pool": pool, "patchers": [patcher, server_patcher]}
+
+
+def _status_teardown(context):
+    for patcher in context["patchers"]:
+        patcher.stop()
+    context["pool"].shutdown()
+
+
+@benchmark("resources.status_cached", group="resources", setup=_status_setup,
+           teardown=_status_teardown, warmup=2, repeat=200, unit="reads")
+def bench_status_cached(context):
+    """状态未变化时重复读取状态资源"""
+    from backend.server import get_server_status_resource
+
+    get_server_status_resource()
+
+
+@benchmark("resources.status_changed", group="resources", setup=_status_setup,
+           teardown=_status_teardown, warmup=2, repeat=100, unit="reads")
+def bench_status_changed(context):
+    """每次读取前都有一次状态迁移"""
+    from backend.server import get_server_status_resource
+
+    context["pool"]._mark_state_changed("bench_status_0")
+    get_server_status_resource()
+
+
+@benchmark("resources.ports", group="resources", warmup=1, repeat=50, unit="reads")
+def bench_ports():
+    """读取端口资源（含端口发现缓存）"""
+    from backend.server import get_ports_resource
+
+    get_ports_resource()
+
+
+def _payload(image_count: int, image_bytes: int) -> dict:
+    encoded = base64.b64encode(os.urandom(image_bytes)).decode("ascii")
+    return {
+        "text": "安全检查基准" * 100,
+        "images": [{"filename": f"{i}.png", "data": encoded, "size": image_bytes} for i in range(image_count)],
+        "source_event": "benchmark",
+    }
+
+
+MEMORY_PAYLOADS = (("text_only", 0, 0), ("5x1mb", 5, 1024 * 1024))
+
+
+def _make_memory_bench(label: str, checker: str):
+    def setup():
+        _, image_count, image_bytes = next(p for p in MEMORY_PAYLOADS if p[0] == label)
+        return _payload(image_count, image_bytes)
+
+    def bench(payload):
+        if checker == "validators":
+            from backend.request_processing.validators import check_memory_safety
+
+            assert check_memory_safety(payload)
+        else:
+            from backend.app import FeedbackApp
+
+            assert FeedbackApp(None)._check_memory_safety(payload)
+
+    bench.__name__ = f"bench_memory_safety_{checker}_{label}"
+    return setup, bench
+
+
+for _label, _, _ in MEMORY_PAYLOADS:
+    for _checker in ("validators", "app"):
+        _setup, _bench = _make_memory_bench(_label, _checker)
+        benchmark(f"safety.{_checker}_check_memory_{_label}", group="safety", setup=_setup,
+                  warmup=1, repeat=50, unit="checks")(_bench)
@@ -0,0 +1,75 @@
+"""
+启动与导入耗时基准
+冷启动和导入耗时在独立子进程中测量，热启动在当前进程中重复测量
+"""
+
+import json
+import subprocess
+import sys
+from unittest.mock import patch
+
+from tests.benchmarks.harness import PROJECT_ROOT, benchmark
+
+_COLD_START_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from unittest.mock import patch
+from backend.server_manager import ServerManager
+with patch("backend.server_manager.open_feedback_browser"):
+    manager = ServerManager()
+    imported = time.perf_counter()
+    manager.start_server(work_summary="benchmark", timeout_seconds=30)
+finished = time.perf_counter()
+print(json.dumps({"elapsed": finished - imported, "import_seconds": imported - started}))
+"""
+
+_IMPORT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import backend.server
+print(json.dumps({"elapsed": time.perf_counter() - started}))
+"""
+
+
+def _run_python(script: str) -> dict:
+    """在新的解释器中执行脚本，返回其输出的最后一行JSON"""
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@benchmark("startup.cold_start_server", group="startup", warmup=0, repeat=5)
+def bench_cold_start():
+    """新进程中首次 start_server（不含模块导入）"""
+    return _run_python(_COLD_START_SCRIPT)
+
+
+@benchmark("startup.import_backend_server", group="startup", warmup=1, repeat=5)
+def bench_import_server():
+    """新进程中 import backend.server 的耗时"""
+    return _run_python(_IMPORT_SCRIPT)
+
+
+def _warm_setup():
+    from backend.server_manager import ServerManager
+
+    patcher = patch("backend.server_manager.open_feedback_browser")
+    patcher.start()
+    return {"patcher": patcher, "managers": [], "cls": ServerManager}
+
+
+def _warm_teardown(context):
+    context["patcher"].stop()
+    for manager in context["managers"]:
+        manager.stop_server()
+
+
+@benchmark("startup.warm_start_server", group="startup", setup=_warm_setup,
+           teardown=_warm_teardown, warmup=1, repeat=10)
+def bench_warm_start(context):
+    """模块已导入、进程已运行过 start_server 后的启动耗时"""
+    manager = context["cls"]()
+    context["managers"].append(manager)
+    manager.start_server(work_summary="benchmark", timeout_seconds=30)
@@ -0,0 +1,60 @@
+"""
+反馈提交吞吐量基准
+分别测量 HTTP /submit_feedback 和 WebSocket submit_feedback 事件
+"""
+
+from tests.benchmarks.harness import benchmark
+
+# 每次计时调用提交的反馈数量（小于结果队列上限100）
+SUBMITS_PER_CALL = 50
+
+
+def _app_setup():
+    from backend.app import FeedbackApp
+    from backend.feedback_handler import FeedbackHandler
+
+    handler = FeedbackHandler()
+    feedback_app = FeedbackApp(handler)
+    flask_app = feedback_app.create_app()
+    flask_app.config["TESTING"] = True
+    return {"handler": handler, "app": feedback_app, "flask_app": flask_app}
+
+
+def _http_setup():
+    context = _app_setup()
+    context["client"] = context["flask_app"].test_client()
+    return context
+
+
+@benchmark("submit.http_json", group="submit", setup=_http_setup,
+           warmup=1, repeat=20, items=SUBMITS_PER_CALL, unit="submits")
+def bench_http_submit(context):
+    """通过HTTP提交纯文本反馈"""
+    client = context["client"]
+    for i in range(SUBMITS_PER_CALL):
+        response = client.post("/submit_feedback", json={"textFeedback": f"反馈 {i}", "images": []})
+        assert response.status_code == 200
+    context["handler"].clear_queue()
+
+
+def _websocket_setup():
+    context = _app_setup()
+    feedback_app = context["app"]
+    context["client"] = feedback_app.socketio.test_client(context["flask_app"])
+    return context
+
+
+def _websocket_teardown(context):
+    context["client"].disconnect()
+    context["app"].stop()
+
+
+@benchmark("submit.websocket_event", group="submit", setup=_websocket_setup,
+           teardown=_websocket_teardown, warmup=1, repeat=20, items=SUBMITS_PER_CALL, unit="submits")
+def bench_websocket_submit(context):
+    """通过WebSocket事件提交纯文本反馈"""
+    client = context["client"]
+    for i in range(SUBMITS_PER_CALL):
+        client.emit("submit_feedback", {"text": f"反馈 {i}", "images": []})
+    client.get_received()
+    context["handler"].clear_queue()
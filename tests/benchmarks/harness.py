@@ -0,0 +1,291 @@
+"""
+基准测试框架
+注册基准用例、计时统计、保存 JSON 基线，并与基线比较找出性能回退
+"""
+
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# 基线文件格式版本
+BASELINE_FORMAT_VERSION = 1
+# 默认回退阈值：中位数变慢超过20%视为回退
+DEFAULT_REGRESSION_THRESHOLD = 0.20
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+@dataclass
+class BenchmarkCase:
+    """基准用例定义"""
+
+    name: str
+    group: str
+    func: Callable[[], Any]
+    setup: Optional[Callable[[], Any]] = None
+    teardown: Optional[Callable[[Any], None]] = None
+    warmup: int = 1
+    repeat: int = 20
+    # 单次调用处理的条目数/字节数，用于计算吞吐量
+    items: int = 1
+    unit: str = "ops"
+
+
+@dataclass
+class BenchmarkResult:
+    """单个用例的统计结果（时间单位为秒）"""
+
+    name: str
+    group: str
+    samples: int
+    min: float
+    median: float
+    mean: float
+    p95: float
+    max: float
+    stdev: float
+    throughput: float
+    unit: str
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+# 已注册的用例（按注册顺序）
+_REGISTRY: Dict[str, BenchmarkCase] = {}
+
+
+def benchmark(
+    name: str,
+    group: str,
+    setup: Optional[Callable[[], Any]] = None,
+    teardown: Optional[Callable[[Any], None]] = None,
+    warmup: int = 1,
+    repeat: int = 20,
+    items: int = 1,
+    unit: str = "ops",
+) -> Callable[[Callable], Callable]:
+    """
+    注册基准用例的装饰器
+
+    被装饰函数接收 setup 的返回值（无 setup 时不接收参数），
+    可以返回 dict 作为附加信息写入结果（例如子进程测得的耗时）。
+    """
+    def decorator(func: Callable) -> Callable:
+        if name in _REGISTRY:
+            raise ValueError(f"基准用例重复注册: {name}")
+        _REGISTRY[name] = BenchmarkCase(
+            name=name, group=group, func=func, setup=setup, teardown=teardown,
+            warmup=warmup, repeat=repeat, items=items, unit=unit,
+        )
+        return func
+    return decorator
+
+
+def get_registered_cases(pattern: Optional[str] = None) -> List[BenchmarkCase]:
+    """获取已注册的用例（pattern 为名称或分组的子串）"""
+    cases = list(_REGISTRY.values())
+    if pattern:
+        cases = [case for case in cases if pattern in case.name or pattern in case.group]
+    return cases
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """最近秩法计算百分位数"""
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name: str, group: str, timings: List[float], items: int = 1, unit: str = "ops",
+              extra: Optional[Dict[str, Any]] = None) -> BenchmarkResult:
+    """根据每次调用的耗时计算统计结果"""
+    if not timings:
+        raise ValueError(f"基准用例 {name} 没有有效样本")
+    values = sorted(timings)
+    median = statistics.median(values)
+    return BenchmarkResult(
+        name=name,
+        group=group,
+        samples=len(values),
+        min=values[0],
+        median=median,
+        mean=statistics.fmean(values),
+        p95=_percentile(values, 95),
+        max=values[-1],
+        stdev=statistics.stdev(values) if len(values) > 1 else 0.0,
+        throughput=items / median if median > 0 else float("inf"),
+        unit=unit,
+        extra=extra or {},
+    )
+
+
+def run_case(case: BenchmarkCase, repeat_scale: float = 1.0) -> BenchmarkResult:
+    """
+    执行单个用例
+
+    Args:
+        case: 用例定义
+        repeat_scale: 重复次数缩放（快速模式下小于1）
+    """
+    repeat = max(1, int(case.repeat * repeat_scale))
+    context = case.setup() if case.setup else None
+    call = (lambda: case.func(context)) if case.setup else case.func
+    extra: Dict[str, Any] = {}
+    try:
+        for _ in range(case.warmup):
+            call()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outcome = call()
+            timings.append(time.perf_counter() - started)
+            if isinstance(outcome, dict):
+                # 用例可以上报自身测得的耗时（例如子进程中的冷启动），优先于外层计时
+                if "elapsed" in outcome:
+                    timings[-1] = outcome.pop("elapsed")
+                extra = outcome
+    finally:
+        if case.teardown:
+            case.teardown(context)
+    return summarize(case.name, case.group, timings, case.items, case.unit, extra)
+
+
+def collect_environment() -> Dict[str, Any]:
+    """记录运行环境，便于判断基线是否可比"""
+    commit = ""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=5, check=False,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def save_results(results: List[BenchmarkResult], path: str) -> None:
+    """保存结果为 JSON 基线"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {
+        "format_version": BASELINE_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": collect_environment(),
+        "results": {result.name: asdict(result) for result in results},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """读取 JSON 基线"""
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("format_version") != BASELINE_FORMAT_VERSION:
+        raise ValueError(f"不支持的基线格式版本: {payload.get('format_version')}")
+    return payload
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    按中位数比较两组结果
+
+    Returns:
+        每个共同用例的比较记录，status 为 regression / improvement / ok，
+        仅出现在一侧的用例标记为 missing / new
+    """
+    base_results = baseline["results"]
+    current_results = current["results"]
+    rows = []
+    for name, result in current_results.items():
+        base = base_results.get(name)
+        if base is None:
+            rows.append({"name": name, "status": "new", "current": result["median"]})
+            continue
+        change = (result["median"] - base["median"]) / base["median"] if base["median"] > 0 else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({
+            "name": name,
+            "status": status,
+            "baseline": base["median"],
+            "current": result["median"],
+            "change": change,
+        })
+    for name, base in base_results.items():
+        if name not in current_results:
+            rows.append({"name": name, "status": "missing", "baseline": base["median"]})
+    return rows
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """格式化耗时"""
+    if seconds is None:
+        return "-"
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """格式化结果表"""
+    name_width = max([len("用例")] + [len(result.name) for result in results])
+    header = f"{'用例':<{name_width}}  {'样本':>4}  {'中位数':>10}  {'p95':>10}  {'最小':>10}  {'吞吐量':>16}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.name:<{name_width}}  {result.samples:>4}  {format_duration(result.median):>10}  "
+            f"{format_duration(result.p95):>10}  {format_duration(result.min):>10}  "
+            f"{result.throughput:>10.1f} {result.unit}/s"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows: List[Dict[str, Any]], threshold: float) -> str:
+    """格式化比较结果"""
+    markers = {"regression": "❌", "improvement": "🚀", "ok": "✅", "new": "🆕", "missing": "⚠️"}
+    name_width = max([len("用例")] + [len(row["name"]) for row in rows])
+    lines = [f"回退阈值: 中位数变慢超过 {threshold:.0%}", ""]
+    for row in rows:
+        change = f"{row['change']:+.1%}" if "change" in row else ""
+        lines.append(
+            f"{markers[row['status']]} {row['name']:<{name_width}}  "
+            f"{format_duration(row.get('baseline')):>10} -> {format_duration(row.get('current')):>10}  {change}"
+        )
+    regressions = [row for row in rows if row["status"] == "regression"]
+    lines.append("")
+    lines.append(f"共 {len(regressions)} 个用例出现性能回退" if regressions else "未发现性能回退")
+    return "\n".join(lines)
+
+
+def default_output_path() -> str:
+    """默认结果文件路径"""
+    return os.path.join(DEFAULT_RESULTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+
+def ensure_project_on_path() -> None:
+    """确保项目根目录在模块搜索路径中"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
@@ -3,6 +3,7 @@ MCP反馈通道测试配置
 """
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 import pytest
@@ -10,6 +11,11 @@ import pytest
 # 移除src目录路径添加
 project_root = Path(__file__).parent.parent
 
+# 测试期间使用临时状态目录，避免写入用户真实的状态文件
+os.environ.setdefault("MCP_FEEDBACK_STATE_DIR", tempfile.mkdtemp(prefix="mcp-feedback-test-"))
+# 测试期间不启动反馈收件箱服务器（收件箱测试直接创建 InboxApp）
+os.environ.setdefault("MCP_INBOX_ENABLED", "false")
+
 @pytest.fixture
 def project_root_path():
     """项目根目录路径"""
@@ -0,0 +1,4 @@
+"""
+MCP反馈通道负载与浸泡测试工具
+用法见 tests/load/README.md
+"""
@@ -0,0 +1,242 @@
+"""
+负载测试命令行入口
+
+    python -m tests.load run [--sessions N] [--iterations M] [--url 地址] [--record 录制.jsonl]
+    python -m tests.load replay 录制.jsonl [--speed 60]
+    python -m tests.load convert [--traces traces.jsonl] --output 录制.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+from typing import Callable, List
+from unittest.mock import patch
+
+from tests.benchmarks.harness import ensure_project_on_path, format_duration
+from tests.load.simulator import (
+    SessionPlan,
+    build_synthetic_plan,
+    load_recording,
+    plans_from_traces,
+    run_load,
+    save_recording,
+)
+
+# 进程内服务器的结果队列清空间隔（模拟MCP端取走反馈）
+DRAIN_INTERVAL = 0.5
+
+
+class InProcessServers:
+    """在当前进程中为每个会话启动一个反馈服务器（与真实使用方式一致）"""
+
+    def __init__(self, count: int):
+        from backend.server_manager import ServerManager
+
+        self.managers = []
+        self._stop = threading.Event()
+        with patch("backend.server_manager.open_feedback_browser"):
+            for index in range(count):
+                manager = ServerManager()
+                manager.start_server(work_summary=f"负载测试会话 {index}", timeout_seconds=3600)
+                self.managers.append(manager)
+        self._drainer = threading.Thread(target=self._drain, daemon=True, name="Load-Drainer")
+        self._drainer.start()
+
+    def _drain(self) -> None:
+        while not self._stop.wait(DRAIN_INTERVAL):
+            for manager in self.managers:
+                manager.feedback_handler.clear_queue()
+
+    def url_for(self, index: int, plan: SessionPlan) -> str:
+        return f"http://127.0.0.1:{self.managers[index % len(self.managers)].current_port}"
+
+    def stop(self) -> None:
+        self._stop.set()
+        for manager in self.managers:
+            manager.stop_server()
+
+
+def _repeat_plans(plans: List[SessionPlan], iterations: int) -> List[SessionPlan]:
+    """把每个会话的计划首尾相接重复多轮，用于长时间浸泡测试"""
+    if iterations <= 1:
+        return plans
+    repeated = []
+    for plan in plans:
+        events = []
+        offset = 0.0
+        for _ in range(iterations):
+            for event in plan.events:
+                events.append(type(event)(offset + event.offset, event.action, dict(event.params)))
+            offset += plan.duration
+        repeated.append(SessionPlan(plan.session, events))
+    return repeated
+
+
+def format_report(report: dict) -> str:
+    """格式化延迟分布和资源变化"""
+    lines = [
+        f"会话数: {report['sessions']}  倍速: {report['speed']}x  总耗时: {format_duration(report['elapsed_seconds'])}",
+        "",
+    ]
+    latencies = report["latencies"]
+    if latencies:
+        name_width = max(len("操作"), *(len(name) for name in latencies))
+        header = f"{'操作':<{name_width}}  {'次数':>6}  {'p50':>10}  {'p95':>10}  {'p99':>10}  {'max':>10}"
+        lines += [header, "-" * len(header)]
+        for name, stats in latencies.items():
+            lines.append(
+                f"{name:<{name_width}}  {stats['count']:>6}  {format_duration(stats['p50']):>10}  "
+                f"{format_duration(stats['p95']):>10}  {format_duration(stats['p99']):>10}  "
+                f"{format_duration(stats['max']):>10}"
+            )
+    else:
+        lines.append("没有完成任何操作")
+
+    if report["errors"]:
+        lines.append("")
+        lines.append("错误: " + ", ".join(f"{name}={count}" for name, count in sorted(report["errors"].items())))
+
+    resources = report["resources"]
+    if resources:
+        lines.append("")
+        for key, label in (("rss_kb", "RSS(KB)"), ("threads", "线程数"), ("fds", "文件描述符")):
+            if key in resources:
+                values = resources[key]
+                lines.append(f"{label}: 开始 {values['start']}  结束 {values['end']}  峰值 {values['max']}")
+    return "\n".join(lines)
+
+
+def _execute(plans: List[SessionPlan], args, url_for: Callable = None) -> int:
+    servers = None
+    if url_for is None:
+        if args.url:
+            url_for = lambda index, plan: args.url
+        else:
+            session_count = len(plans)
+            print(f"🚀 启动 {session_count} 个进程内反馈服务器 ...", flush=True)
+            servers = InProcessServers(session_count)
+            url_for = servers.url_for
+
+    duration = max((plan.duration for plan in plans), default=0.0) / args.speed
+    print(f"▶️  运行 {len(plans)} 个模拟会话，预计 {format_duration(duration)} ...", flush=True)
+    try:
+        report = run_load(
+            plans,
+            url_for,
+            speed=args.speed,
+            sample_interval=args.sample_interval,
+            sample_pid=args.pid,
+        )
+    finally:
+        if servers is not None:
+            servers.stop()
+
+    print()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 报告已保存: {args.output}")
+    return 1 if report["errors"] else 0
+
+
+def cmd_run(args) -> int:
+    rng = random.Random(args.seed)
+    plans = [
+        build_synthetic_plan(
+            f"s{index}",
+            rng,
+            start_offset=rng.uniform(0, args.ramp_up),
+            think_time=(args.think_min, args.think_max),
+            heartbeat_interval=args.heartbeat_interval,
+            reconnect_probability=args.reconnect_probability,
+            text_bytes=args.text_bytes,
+            image_count=args.image_count,
+            image_bytes=args.image_kb * 1024,
+        )
+        for index in range(args.sessions)
+    ]
+    plans = _repeat_plans(plans, args.iterations)
+    if args.record:
+        save_recording(plans, args.record)
+        print(f"📼 会话计划已录制: {args.record}")
+    return _execute(plans, args)
+
+
+def cmd_replay(args) -> int:
+    plans = _repeat_plans(load_recording(args.recording), args.iterations)
+    if not plans:
+        print(f"录制文件中没有会话: {args.recording}")
+        return 1
+    return _execute(plans, args)
+
+
+def cmd_convert(args) -> int:
+    from backend.utils.tracing import read_spans
+
+    plans = plans_from_traces(read_spans(args.traces), root_name=args.tool)
+    save_recording(plans, args.output)
+    print(f"📼 从跟踪文件还原了 {len(plans)} 个会话: {args.output}")
+    return 0 if plans else 1
+
+
+def _add_execution_arguments(parser) -> None:
+    parser.add_argument("--url", default=None, help="目标服务器地址（默认在本进程为每个会话启动一个服务器）")
+    parser.add_argument("--speed", type=float, default=1.0, help="时间线倍速，例如 60 表示一小时的会话一分钟跑完")
+    parser.add_argument("--iterations", type=int, default=1, help="每个会话重复的轮数（浸泡测试）")
+    parser.add_argument("--sample-interval", type=float, default=5.0, help="资源采样间隔（秒）")
+    parser.add_argument("--pid", type=int, default=None, help="采样资源的进程PID（默认本进程）")
+    parser.add_argument("--output", default=None, help="保存JSON报告（含资源时间线）")
+
+
+def main(argv=None) -> int:
+    ensure_project_on_path()
+
+    parser = argparse.ArgumentParser(prog="python -m tests.load", description="MCP反馈通道负载与浸泡测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="生成模拟会话并运行")
+    run_parser.add_argument("--sessions", type=int, default=10, help="并发会话数")
+    run_parser.add_argument("--ramp-up", type=float, default=5.0, help="会话在该时间内（秒）随机错开开始")
+    run_parser.add_argument("--think-min", type=float, default=5.0, help="最短思考时间（秒）")
+    run_parser.add_argument("--think-max", type=float, default=30.0, help="最长思考时间（秒）")
+    run_parser.add_argument("--heartbeat-interval", type=float, default=30.0, help="心跳间隔（秒，与前端一致）")
+    run_parser.add_argument("--reconnect-probability", type=float, default=0.0, help="会话中途断线重连的概率")
+    run_parser.add_argument("--text-bytes", type=int, default=200, help="提交文字的字节数")
+    run_parser.add_argument("--image-count", type=int, default=0, help="每次提交的图片数量")
+    run_parser.add_argument("--image-kb", type=int, default=64, help="每张图片的大小（KB）")
+    run_parser.add_argument("--seed", type=int, default=None, help="随机种子（便于复现）")
+    run_parser.add_argument("--record", default=None, help="将生成的会话计划保存为录制文件")
+    _add_execution_arguments(run_parser)
+    run_parser.set_defaults(handler=cmd_run)
+
+    replay_parser = subparsers.add_parser("replay", help="按倍速回放录制的会话时间线")
+    replay_parser.add_argument("recording", help="录制文件（JSONL）")
+    _add_execution_arguments(replay_parser)
+    replay_parser.set_defaults(handler=cmd_replay)
+
+    convert_parser = subparsers.add_parser("convert", help="从调用跟踪文件还原真实会话时间线")
+    convert_parser.add_argument("--traces", default=None, help="跟踪文件路径（默认状态目录下的 traces.jsonl）")
+    convert_parser.add_argument("--tool", default="tool.collect_feedback", help="根跨度名称")
+    convert_parser.add_argument("--output", required=True, help="录制文件输出路径")
+    convert_parser.set_defaults(handler=cmd_convert)
+
+    parser.add_argument("-v", "--verbose", action="store_true", help="保留服务器日志输出")
+
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    if getattr(args, "speed", 1.0) <= 0:
+        parser.error("--speed 必须大于0")
+    # 负载测试期间默认不写入调用跟踪
+    if args.command != "convert":
+        os.environ.setdefault("MCP_TRACE_ENABLED", "false")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,470 @@
+"""
+模拟浏览器负载生成器
+基于 python-socketio 客户端模拟真实反馈页面：加载页面、建立连接、发送心跳、
+断线重连、提交文字和图片。记录各操作的延迟分布，并定期采样进程的
+RSS、线程数和文件描述符数量，用于并发和泄漏验证。
+"""
+
+import base64
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+import socketio
+
+# 模拟客户端等待服务器响应的超时（秒）
+RESPONSE_TIMEOUT = 10.0
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PERCENTILES = (50, 95, 99)
+
+# 可回放的动作
+ACTIONS = ("load_page", "connect", "heartbeat", "disconnect", "submit")
+
+
+@dataclass
+class PlannedEvent:
+    """会话计划中的一个动作（offset 为相对会话开始的秒数）"""
+
+    offset: float
+    action: str
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SessionPlan:
+    """单个模拟会话的动作序列"""
+
+    session: str
+    events: List[PlannedEvent]
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1].offset if self.events else 0.0
+
+
+# =============================================================================
+# 计划生成与录制文件
+# =============================================================================
+
+def build_synthetic_plan(
+    session: str,
+    rng: random.Random,
+    start_offset: float = 0.0,
+    think_time: tuple = (5.0, 30.0),
+    heartbeat_interval: float = 30.0,
+    reconnect_probability: float = 0.0,
+    reconnect_delay: float = 1.0,
+    text_bytes: int = 200,
+    image_count: int = 0,
+    image_bytes: int = 64 * 1024,
+) -> SessionPlan:
+    """
+    生成一个模拟用户会话：加载页面 → 连接 → 思考（期间心跳，可能断线重连）→ 提交 → 断开
+    """
+    events = [
+        PlannedEvent(start_offset, "load_page"),
+        PlannedEvent(start_offset, "connect"),
+    ]
+    think = rng.uniform(*think_time)
+    submit_at = start_offset + think
+
+    reconnect_at = None
+    if rng.random() < reconnect_probability and think > reconnect_delay * 2:
+        reconnect_at = start_offset + rng.uniform(0, think - reconnect_delay)
+        events.append(PlannedEvent(reconnect_at, "disconnect"))
+        events.append(PlannedEvent(reconnect_at + reconnect_delay, "connect"))
+
+    beat = start_offset + heartbeat_interval
+    while beat < submit_at:
+        if reconnect_at is None or not (reconnect_at <= beat < reconnect_at + reconnect_delay):
+            events.append(PlannedEvent(beat, "heartbeat"))
+        beat += heartbeat_interval
+
+    events.append(PlannedEvent(submit_at, "submit", {
+        "text_bytes": text_bytes,
+        "image_count": image_count,
+        "image_bytes": image_bytes,
+    }))
+    events.append(PlannedEvent(submit_at, "disconnect"))
+    events.sort(key=lambda event: event.offset)
+    return SessionPlan(session, events)
+
+
+def save_recording(plans: Iterable[SessionPlan], path: str) -> None:
+    """保存会话计划为 JSONL 录制文件（每行一个动作）"""
+    with open(path, "w", encoding="utf-8") as f:
+        for plan in plans:
+            for event in plan.events:
+                record = {"session": plan.session, "t": round(event.offset, 6), "action": event.action}
+                record.update(event.params)
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_recording(path: str) -> List[SessionPlan]:
+    """读取 JSONL 录制文件"""
+    sessions: Dict[str, List[PlannedEvent]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            action = record.pop("action")
+            if action not in ACTIONS:
+                raise ValueError(f"录制文件包含未知动作: {action}")
+            session = str(record.pop("session"))
+            offset = float(record.pop("t"))
+            sessions.setdefault(session, []).append(PlannedEvent(offset, action, record))
+    return [
+        SessionPlan(session, sorted(events, key=lambda event: event.offset))
+        for session, events in sessions.items()
+    ]
+
+
+def plans_from_traces(spans: Iterable[Dict[str, Any]], root_name: str = "tool.collect_feedback") -> List[SessionPlan]:
+    """
+    从调用跟踪文件（backend.utils.tracing）还原真实会话的时间线
+
+    以工具调用开始为零点：WebSocket 连接/断开事件来自 feedback.wait 跨度，
+    提交来自 feedback.submit 跨度。
+    """
+    by_trace: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        by_trace.setdefault(span.get("traceId"), []).append(span)
+
+    def attribute(span, key, default=0):
+        for item in span.get("attributes", []):
+            if item.get("key") == key:
+                value = item.get("value", {})
+                return int(value.get("intValue", value.get("doubleValue", default)))
+        return default
+
+    plans = []
+    for trace_id, trace_spans in by_trace.items():
+        roots = [s for s in trace_spans if not s.get("parentSpanId") and s.get("name") == root_name]
+        if not roots:
+            continue
+        origin = int(roots[0]["startTimeUnixNano"])
+        events = []
+        for span in trace_spans:
+            for event in span.get("events", []):
+                offset = (int(event["timeUnixNano"]) - origin) / 1e9
+                if event.get("name") == "websocket.connect":
+                    if not any(e.action == "load_page" for e in events):
+                        events.append(PlannedEvent(offset, "load_page"))
+                    events.append(PlannedEvent(offset, "connect"))
+                elif event.get("name") == "websocket.disconnect":
+                    events.append(PlannedEvent(offset, "disconnect"))
+            if span.get("name") == "feedback.submit":
+                offset = (int(span["startTimeUnixNano"]) - origin) / 1e9
+                events.append(PlannedEvent(offset, "submit", {"image_count": attribute(span, "image_count")}))
+        if any(event.action == "submit" for event in events):
+            plans.append(SessionPlan(trace_id[:12], sorted(events, key=lambda e: e.offset)))
+    return plans
+
+
+# =============================================================================
+# 延迟记录与资源采样
+# =============================================================================
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """最近秩法计算百分位数"""
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """线程安全的延迟与错误记录器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(name, []).append(seconds)
+
+    def error(self, name: str) -> None:
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def count(self, name: str) -> int:
+        with self._lock:
+            return len(self._latencies.get(name, []))
+
+    def summary(self) -> Dict[str, Any]:
+        """按操作汇总延迟分布（秒）和错误数"""
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in self._latencies.items()}
+            errors = dict(self._errors)
+        distributions = {}
+        for name, values in latencies.items():
+            stats = {"count": len(values), "mean": sum(values) / len(values)}
+            for percentile in PERCENTILES:
+                stats[f"p{percentile}"] = _percentile(values, percentile)
+            stats["max"] = values[-1]
+            distributions[name] = stats
+        return {"latencies": distributions, "errors": errors}
+
+
+def read_process_stats(pid: int) -> Dict[str, Optional[float]]:
+    """读取进程的 RSS（KB）、线程数和文件描述符数量"""
+    stats: Dict[str, Optional[float]] = {"rss_kb": None, "threads": None, "fds": None}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Threads:"):
+                    stats["threads"] = int(line.split()[1])
+        stats["fds"] = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        # 非 Linux 平台：只能采样当前进程
+        if pid == os.getpid():
+            stats["threads"] = threading.active_count()
+            try:
+                import resource
+
+                max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                stats["rss_kb"] = max_rss // 1024 if sys.platform == "darwin" else max_rss
+            except ImportError:
+                pass
+    return stats
+
+
+class ResourceSampler:
+    """后台定期采样进程资源"""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 5.0):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.samples: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="Load-ResourceSampler")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        self._sample()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        sample = {"t": round(time.monotonic() - self._started_at, 3)}
+        sample.update(read_process_stats(self.pid))
+        self.samples.append(sample)
+
+    def summary(self) -> Dict[str, Any]:
+        """起止值和峰值，用于判断是否泄漏"""
+        result = {}
+        for key in ("rss_kb", "threads", "fds"):
+            values = [sample[key] for sample in self.samples if sample.get(key) is not None]
+            if values:
+                result[key] = {"start": values[0], "end": values[-1], "max": max(values)}
+        return result
+
+
+# =============================================================================
+# 模拟客户端
+# =============================================================================
+
+def make_image_payload(image_bytes: int, index: int = 0) -> Dict[str, Any]:
+    """生成指定大小的图片数据（PNG 文件头 + 随机内容）"""
+    raw = PNG_SIGNATURE + os.urandom(max(0, image_bytes - len(PNG_SIGNATURE)))
+    return {
+        "filename": f"load_{index}.png",
+        "data": base64.b64encode(raw).decode("ascii"),
+        "size": len(raw),
+    }
+
+
+class SimulatedClient:
+    """模拟一个浏览器标签页"""
+
+    def __init__(self, base_url: str, recorder: LatencyRecorder, session: str = ""):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.session = session
+        self.http = requests.Session()
+        self.http.trust_env = False
+        self.sio: Optional[socketio.Client] = None
+        self._established = threading.Event()
+        self._heartbeat_response = threading.Event()
+        self._feedback_received = threading.Event()
+        self._connected_once = False
+
+    def _new_socket(self) -> socketio.Client:
+        # 与页面请求共用 HTTP 会话，如同同一个浏览器标签页
+        sio = socketio.Client(reconnection=False, http_session=self.http)
+        sio.on("connection_established", lambda data: self._established.set())
+        sio.on("heartbeat_response", lambda data: self._heartbeat_response.set())
+        sio.on("feedback_received", lambda data: self._feedback_received.set())
+        return sio
+
+    def _timed_wait(self, name: str, event: threading.Event, started: float) -> bool:
+        if event.wait(RESPONSE_TIMEOUT):
+            self.recorder.record(name, time.perf_counter() - started)
+            return True
+        self.recorder.error(f"{name}_timeout")
+        return False
+
+    def load_page(self) -> None:
+        # 重新加载页面后的连接算作首次连接
+        self._connected_once = False
+        started = time.perf_counter()
+        try:
+            response = self.http.get(self.base_url + "/", timeout=RESPONSE_TIMEOUT)
+            response.raise_for_status()
+            self.recorder.record("page_load", time.perf_counter() - started)
+        except requests.RequestException:
+            self.recorder.error("page_load")
+
+    def connect(self) -> None:
+        if self.sio is not None and self.sio.connected:
+            return
+        name = "reconnect" if self._connected_once else "connect"
+        self._established.clear()
+        self.sio = self._new_socket()
+        started = time.perf_counter()
+        try:
+            self.sio.connect(self.base_url, wait_timeout=RESPONSE_TIMEOUT)
+        except socketio.exceptions.ConnectionError:
+            self.recorder.error(name)
+            return
+        if self._timed_wait(name, self._established, started):
+            self._connected_once = True
+
+    def heartbeat(self) -> None:
+        if self.sio is None or not self.sio.connected:
+            self.recorder.error("heartbeat_not_connected")
+            return
+        self._heartbeat_response.clear()
+        started = time.perf_counter()
+        self.sio.emit("heartbeat", {"timestamp": time.time() * 1000})
+        self._timed_wait("heartbeat_rtt", self._heartbeat_response, started)
+
+    def submit(self, text_bytes: int = 200, image_count: int = 0, image_bytes: int = 64 * 1024) -> None:
+        if self.sio is None or not self.sio.connected:
+            self.recorder.error("submit_not_connected")
+            return
+        payload = {
+            "text": ("负载" * (text_bytes // 6 + 1))[: max(1, text_bytes // 3)],
+            "images": [make_image_payload(image_bytes, i) for i in range(image_count)],
+            "user_agent": "mcp-feedback-load-generator",
+            "timestamp": time.time() * 1000,
+        }
+        self._feedback_received.clear()
+        started = time.perf_counter()
+        self.sio.emit("submit_feedback", payload)
+        self._timed_wait("submit_ack", self._feedback_received, started)
+
+    def disconnect(self) -> None:
+        if self.sio is not None and self.sio.connected:
+            self.sio.disconnect()
+
+    def close(self) -> None:
+        self.disconnect()
+        self.http.close()
+
+    def perform(self, event: PlannedEvent) -> None:
+        """执行计划中的动作"""
+        getattr(self, event.action)(**event.params)
+
+
+def run_plan(
+    plan: SessionPlan,
+    base_url: str,
+    recorder: LatencyRecorder,
+    speed: float = 1.0,
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """
+    按计划时间（除以 speed 加速）执行一个会话
+
+    动作耗时超过计划间隔时顺延，不会并发执行同一会话的动作。
+    """
+    client = SimulatedClient(base_url, recorder, plan.session)
+    started = time.monotonic()
+    try:
+        for event in plan.events:
+            delay = started + event.offset / speed - time.monotonic()
+            if delay > 0 and stop_event is not None:
+                if stop_event.wait(delay):
+                    return
+            elif delay > 0:
+                time.sleep(delay)
+            try:
+                client.perform(event)
+            except Exception as e:
+                recorder.error(f"{event.action}_exception")
+                if os.getenv("MCP_LOAD_DEBUG"):
+                    print(f"[{plan.session}] {event.action} 失败: {e}")
+    finally:
+        client.close()
+
+
+def run_load(
+    plans: List[SessionPlan],
+    url_for_session: Callable[[int, SessionPlan], str],
+    speed: float = 1.0,
+    sample_interval: float = 5.0,
+    sample_pid: Optional[int] = None,
+    stop_event: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    并发执行全部会话计划并生成报告
+
+    Args:
+        plans: 会话计划
+        url_for_session: 根据会话序号返回其服务器地址
+        speed: 回放倍速
+        sample_interval: 资源采样间隔（秒）
+        sample_pid: 采样的进程PID，默认当前进程
+        stop_event: 设置后尽快结束
+    """
+    recorder = LatencyRecorder()
+    sampler = ResourceSampler(sample_pid, sample_interval)
+    sampler.start()
+    started = time.monotonic()
+
+    threads = [
+        threading.Thread(
+            target=run_plan,
+            args=(plan, url_for_session(index, plan), recorder, speed, stop_event),
+            daemon=True,
+            name=f"Load-Session-{index}",
+        )
+        for index, plan in enumerate(plans)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sampler.stop()
+    report = recorder.summary()
+    report.update({
+        "sessions": len(plans),
+        "speed": speed,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "resources": sampler.summary(),
+        "resource_samples": sampler.samples,
+    })
+    return report
@@ -0,0 +1,230 @@
+"""
+准入控制与背压单元测试
+验证存活会话数上限的排队和拒绝、按客户端的提交限速，以及队列已满时的非阻塞提交
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.feedback_handler import FeedbackHandler
+from backend.server_pool import EnhancedServerPool
+from backend.utils.admission import AdmissionController, SubmitRateLimiter, TokenBucket
+from backend.utils.custom_exceptions import SessionAdmissionError
+from backend.utils.deadline_scheduler import DeadlineScheduler
+from backend.utils.metrics import SUBMIT_REJECTIONS
+
+
+def _acquire_async(controller, key, outcomes):
+    def run():
+        try:
+            outcomes.append((key, controller.acquire(key)))
+        except SessionAdmissionError as e:
+            outcomes.append((key, e.reason))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class TestAdmissionController:
+    """测试存活会话准入"""
+
+    def test_queue_admits_in_arrival_order(self):
+        controller = AdmissionController(max_live=1, queue_size=4, queue_timeout=5)
+        assert controller.acquire("a") == 0
+        # 已准入的会话再次申请不占用新名额
+        assert controller.acquire("a") == 0
+
+        outcomes = []
+        threads = []
+        for key in ("b", "c"):
+            threads.append(_acquire_async(controller, key, outcomes))
+            _wait_until(lambda: controller.snapshot()["queued_sessions"] == len(threads))
+
+        assert controller.release("a") is True
+        _wait_until(lambda: len(outcomes) == 1)
+        assert outcomes[0][0] == "b" and outcomes[0][1] > 0
+        controller.release("b")
+        for thread in threads:
+            thread.join(5)
+        assert [key for key, _ in outcomes] == ["b", "c"]
+        assert controller.snapshot()["live_sessions"] == 1
+        assert controller.release("missing") is False
+
+    def test_reject_mode_and_queue_limits(self):
+        controller = AdmissionController(max_live=1, mode="reject")
+        controller.acquire("a")
+        with pytest.raises(SessionAdmissionError) as excinfo:
+            controller.acquire("b")
+        assert excinfo.value.reason == "capacity" and excinfo.value.max_live_sessions == 1
+
+        controller = AdmissionController(max_live=1, queue_size=0)
+        controller.acquire("a")
+        with pytest.raises(SessionAdmissionError) as excinfo:
+            controller.acquire("b")
+        assert excinfo.value.reason == "queue_full"
+
+        controller = AdmissionController(max_live=1, queue_timeout=0.1)
+        controller.acquire("a")
+        with pytest.raises(SessionAdmissionError) as excinfo:
+            controller.acquire("b")
+        assert excinfo.value.reason == "queue_timeout"
+        assert controller.snapshot()["queued_sessions"] == 0
+        assert controller.snapshot()["rejected"] == {"queue_timeout": 1}
+
+    def test_zero_means_unlimited(self):
+        controller = AdmissionController(max_live=0, mode="reject")
+        for index in range(100):
+            controller.acquire(f"s{index}")
+        assert controller.snapshot()["live_sessions"] == 100
+
+
+class TestSubmitRateLimiter:
+    """测试提交限速"""
+
+    def test_token_bucket_refills(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        assert bucket.take() == 0 and bucket.take() == 0
+        assert 0 < bucket.take() <= 0.1
+        time.sleep(0.12)
+        assert bucket.take() == 0
+
+    def test_clients_have_separate_buckets(self):
+        limiter = SubmitRateLimiter(rate=1, burst=1, max_clients=2)
+        assert limiter.check("a") == 0 and limiter.check("b") == 0
+        assert limiter.check("a") > 0
+        assert limiter.rejected_count == 1
+        # 超出客户端数量时淘汰最久未活动的客户端
+        limiter.check("c")
+        assert list(limiter._buckets) == ["a", "c"]
+        assert SubmitRateLimiter(rate=0).check("a") == 0
+
+
+class TestSubmitBackpressure:
+    """测试提交的背压"""
+
+    def test_full_queue_rejects_without_blocking(self):
+        handler = FeedbackHandler(max_queue_size=1)
+        before = SUBMIT_REJECTIONS.get(reason="queue_full")
+        assert handler.submit_feedback({"text": "第一次", "images": []}) is True
+
+        started = time.monotonic()
+        assert handler.submit_feedback({"text": "第二次", "images": []}) is False
+        assert time.monotonic() - started < 1
+        assert handler.overflow_count == 1
+        assert SUBMIT_REJECTIONS.get(reason="queue_full") == before + 1
+        assert handler.get_result_nowait()["text_feedback"] == "第一次"
+
+    @pytest.fixture
+    def feedback_app(self):
+        from backend.app import FeedbackApp
+
+        app = FeedbackApp(FeedbackHandler(), work_summary="测试")
+        app.submit_limiter = SubmitRateLimiter(rate=0.01, burst=1)
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        yield app, flask_app
+        app.stop()
+
+    def test_websocket_submit_is_rate_limited(self, feedback_app):
+        app, flask_app = feedback_app
+        client = app.socketio.test_client(flask_app)
+        for text in ("第一次", "第二次"):
+            client.emit("submit_feedback", {"text": text, "images": []})
+        events = [(m["name"], m["args"][0]) for m in client.get_received()
+                  if m["name"] in ("feedback_received", "submit_rejected")]
+
+        assert events[0][0] == "feedback_received"
+        assert events[1][0] == "submit_rejected"
+        assert events[1][1]["reason"] == "rate_limited" and events[1][1]["retry_after"] > 0
+        client.disconnect()
+
+    def test_http_submit_returns_429(self, feedback_app):
+        _, flask_app = feedback_app
+        client = flask_app.test_client()
+        assert client.post("/submit_feedback", json={"textFeedback": "第一次"}).status_code == 200
+        response = client.post("/submit_feedback", json={"textFeedback": "第二次"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.get_json()["reason"] == "rate_limited"
+
+    def test_http_rate_limit_is_checked_before_parsing(self, feedback_app):
+        _, flask_app = feedback_app
+        client = flask_app.test_client()
+        assert client.post("/submit_feedback", json={"textFeedback": "第一次"}).status_code == 200
+        with patch("backend.routes.feedback_routes.extract_feedback_data") as extract:
+            response = client.post("/submit_feedback", json={"textFeedback": "第二次"})
+        assert response.status_code == 429
+        extract.assert_not_called()
+
+
+class TestPoolAdmission:
+    """测试服务器池的存活会话上限"""
+
+    @pytest.fixture
+    def pool(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        config = MagicMock(idle_timeout=300, preferred_web_port=8765)
+        with patch("backend.server_pool.get_server_config", return_value=config), \
+                patch("backend.server_pool.get_scheduler", return_value=scheduler), \
+                patch.object(EnhancedServerPool, "_load_registry_state"):
+            pool = EnhancedServerPool()
+        pool._admission = AdmissionController(max_live=1, mode="reject", on_change=pool._on_admission_change)
+        yield pool
+        pool.shutdown()
+        scheduler.shutdown()
+
+    def test_pool_rejects_beyond_limit_and_reports_status(self, pool):
+        ports = iter(range(9300, 9400))
+        with patch("backend.server_pool.ServerManager", side_effect=lambda: MagicMock(
+                start_server=MagicMock(side_effect=lambda **kwargs: next(ports)))):
+            pool.start_server_in_pool("a", "汇报")
+            version = pool.get_status_version()
+            with pytest.raises(SessionAdmissionError):
+                pool.start_server_in_pool("b", "汇报")
+            assert pool.get_status_version() > version
+            assert [s["session_id"] for s in pool.get_pool_status()["servers"]] == ["a"]
+
+            admission = pool.get_status_snapshot()["admission"]
+            assert admission["live_sessions"] == 1 and admission["rejected"] == {"capacity": 1}
+
+            # 会话结束后名额立即归还
+            pool.release_server("a")
+            pool.start_server_in_pool("b", "汇报")
+            assert pool.get_pool_status()["admission"]["live_sessions"] == 1
+
+    def test_pool_started_sessions_do_not_hold_slots(self, pool):
+        from backend.server import collect_feedback, create_server_pool
+
+        pool._admission = AdmissionController(max_live=2, queue_timeout=1, on_change=pool._on_admission_change)
+        ports = iter(range(9400, 9500))
+
+        def make_server():
+            server = MagicMock(start_server=MagicMock(side_effect=lambda **kwargs: next(ports)))
+            server.wait_for_feedback.return_value = {"text_feedback": "好的", "images": []}
+            server.feedback_handler.process_feedback_to_mcp.return_value = ["好的"]
+            return server
+
+        configs = [{"session_id": f"pool_{index}"} for index in range(4)]
+        with patch("backend.server_pool.ServerManager", side_effect=make_server), \
+                patch("backend.server_pool.get_server_pool", return_value=pool), \
+                patch("backend.server.get_server_pool", return_value=pool), \
+                patch("backend.server.release_managed_server", side_effect=pool.release_server):
+            report = create_server_pool(configs)
+            assert "成功创建 4 个服务器" in report
+            assert pool.get_pool_status()["admission"]["live_sessions"] == 0
+
+            started = time.monotonic()
+            assert collect_feedback("池之后的反馈") == ["好的"]
+            assert time.monotonic() - started < 1
+        assert pool.get_pool_status()["admission"]["live_sessions"] == 0
@@ -0,0 +1,150 @@
+"""
+附件分块上传单元测试
+验证分块校验、偏移量续传、大小限制，以及 WebSocket 上传后按附件ID提交
+"""
+
+import base64
+import zlib
+
+import pytest
+
+from backend.utils.attachment_store import AttachmentStore
+
+PAYLOAD = bytes(range(256)) * 40  # 10KB
+
+
+def _chunks(data: bytes, size: int):
+    for offset in range(0, len(data), size):
+        yield offset, data[offset:offset + size]
+
+
+class TestAttachmentStore:
+    """测试存储语义"""
+
+    def test_upload_in_chunks(self):
+        store = AttachmentStore()
+        assert store.begin("a", len(PAYLOAD), "image/png", "a.png") == 0
+        for offset, chunk in _chunks(PAYLOAD, 4096):
+            assert store.get("a") is None
+            assert store.append("a", offset, chunk, zlib.crc32(chunk)) == offset + len(chunk)
+
+        attachment = store.get("a")
+        assert attachment is not None and bytes(attachment.data) == PAYLOAD
+        assert attachment.mime == "image/png" and attachment.filename == "a.png"
+
+    def test_resume_from_received_offset(self):
+        store = AttachmentStore()
+        store.begin("a", len(PAYLOAD))
+        store.append("a", 0, PAYLOAD[:4096], zlib.crc32(PAYLOAD[:4096]))
+
+        # 断线重连：重新开始同一上传返回已接收的偏移量，过期分块不写入
+        assert store.begin("a", len(PAYLOAD)) == 4096
+        assert store.append("a", 0, PAYLOAD[:4096], zlib.crc32(PAYLOAD[:4096])) == 4096
+        rest = PAYLOAD[4096:]
+        assert store.append("a", 4096, rest, zlib.crc32(rest)) == len(PAYLOAD)
+        assert bytes(store.get("a").data) == PAYLOAD
+
+    def test_checksum_and_bounds(self):
+        store = AttachmentStore()
+        store.begin("a", 10)
+        with pytest.raises(ValueError):
+            store.append("a", 0, b"x" * 5, zlib.crc32(b"y" * 5))
+        with pytest.raises(ValueError):
+            store.append("a", 0, b"x" * 11, zlib.crc32(b"x" * 11))
+        with pytest.raises(ValueError):
+            store.append("missing", 0, b"x", zlib.crc32(b"x"))
+        with pytest.raises(ValueError):
+            store.begin("a", 20)
+        assert store.offset("a") == 0
+
+    def test_size_limits(self):
+        store = AttachmentStore(max_attachment_bytes=100, max_total_bytes=150)
+        with pytest.raises(ValueError):
+            store.begin("big", 101)
+        store.begin("a", 100)
+        with pytest.raises(ValueError):
+            store.begin("b", 60)
+        assert store.remove("a")
+        assert store.begin("b", 60) == 0
+        store.clear()
+        assert store.count == 0
+
+
+class TestWebSocketUpload:
+    """测试 WebSocket 分块上传和按附件ID提交"""
+
+    @pytest.fixture
+    def client(self):
+        from backend.app import FeedbackApp
+        from backend.feedback_handler import FeedbackHandler
+
+        handler = FeedbackHandler()
+        app = FeedbackApp(handler)
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        client = app.socketio.test_client(flask_app)
+        client.get_received()
+        yield handler, client
+        client.disconnect()
+        app.stop()
+
+    @staticmethod
+    def _events(client, name):
+        return [m["args"][0] for m in client.get_received() if m["name"] == name]
+
+    def _upload(self, client, upload_id, data, chunk_size=4096):
+        client.emit("upload_begin", {"upload_id": upload_id, "size": len(data), "mime": "image/png"})
+        assert self._events(client, "upload_ready") == [{"upload_id": upload_id, "offset": 0}]
+        for offset, chunk in _chunks(data, chunk_size):
+            client.emit("upload_chunk", {
+                "upload_id": upload_id, "offset": offset, "data": chunk, "crc32": zlib.crc32(chunk),
+            })
+        return self._events(client, "upload_ack")
+
+    def test_chunks_are_acked_and_submit_references_ids(self, client):
+        handler, test_client = client
+        acks = self._upload(test_client, "img-1", PAYLOAD)
+        assert [ack["offset"] for ack in acks] == [4096, 8192, len(PAYLOAD)]
+        assert [ack["complete"] for ack in acks] == [False, False, True]
+
+        test_client.emit("submit_feedback", {
+            "text": "see image", "attachments": [{"attachment_id": "img-1", "filename": "shot.png"}],
+        })
+        result = handler.get_result_nowait()
+        assert base64.b64decode(result["images"][0]["data"]) == PAYLOAD
+        assert result["images"][0]["filename"] == "shot.png"
+
+    def test_corrupt_chunk_requests_rewind(self, client):
+        _, test_client = client
+        test_client.emit("upload_begin", {"upload_id": "img", "size": 8})
+        test_client.get_received()
+        test_client.emit("upload_chunk", {"upload_id": "img", "offset": 0, "data": b"abcd", "crc32": 0})
+        ack = self._events(test_client, "upload_ack")[0]
+        assert ack["rewind"] and ack["offset"] == 0 and ack["error"]
+
+        test_client.emit("upload_chunk", {"upload_id": "img", "offset": 4, "data": b"efgh", "crc32": zlib.crc32(b"efgh")})
+        assert self._events(test_client, "upload_ack")[0] == {"upload_id": "img", "offset": 0, "rewind": True, "complete": False}
+
+    def test_draft_and_submit_reject_incomplete_attachment(self, client):
+        handler, test_client = client
+        test_client.emit("upload_begin", {"upload_id": "img", "size": 8})
+        test_client.get_received()
+
+        test_client.emit("draft_update", {"base_version": 0, "add_images": [{"id": "i1", "attachment_id": "img"}]})
+        assert self._events(test_client, "draft_ack")[0]["error"]
+
+        test_client.emit("submit_feedback", {"text": "x", "attachments": [{"attachment_id": "img"}]})
+        assert self._events(test_client, "submit_rejected")[0]["reason"] == "attachment_missing"
+        assert handler.result_queue.empty()
+
+    def test_draft_references_uploaded_attachment(self, client):
+        handler, test_client = client
+        self._upload(test_client, "img-1", PAYLOAD)
+
+        test_client.emit("draft_update", {"base_version": 0, "add_images": [{"id": "i1", "attachment_id": "img-1"}]})
+        assert self._events(test_client, "draft_ack")[0]["image_ids"] == ["i1"]
+
+        result = handler.build_draft_result("total_timeout")
+        assert base64.b64decode(result["images"][0]["data"]) == PAYLOAD
+        state = handler.get_draft_state(include_images=True)
+        assert state["images"][0]["attachment_id"] == "img-1"
@@ -0,0 +1,129 @@
+"""
+批量反馈单元测试
+验证问题列表校验、批量结果的MCP转换，以及批量页面的渲染和 WebSocket 提交
+"""
+
+import base64
+import json
+import zlib
+
+import pytest
+
+from backend.feedback_handler import FeedbackHandler
+from backend.server import MAX_BATCH_ITEMS, _validate_batch_items
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nfake"
+ITEMS = [
+    {"id": "deploy", "summary": "是否部署？", "suggest": ["是", "否"], "request_image": False},
+    {"id": "item_2", "summary": "界面截图有问题吗？", "suggest": [], "request_image": True},
+]
+
+
+class TestValidateBatchItems:
+    """测试问题列表校验"""
+
+    def test_normalizes_items(self):
+        items = _validate_batch_items([
+            {"id": "deploy", "summary": "是否部署？", "suggest": ["是", "否"]},
+            {"summary": "界面截图有问题吗？", "request_image": 1},
+        ])
+        assert items == ITEMS
+
+    def test_rejects_invalid_items(self):
+        with pytest.raises(ValueError):
+            _validate_batch_items([])
+        with pytest.raises(ValueError):
+            _validate_batch_items([{"summary": "q"}] * (MAX_BATCH_ITEMS + 1))
+        with pytest.raises(ValueError) as exc_info:
+            _validate_batch_items([{"summary": " "}, {"summary": "q", "suggest": "是"}])
+        assert "第1项" in str(exc_info.value) and "第2项" in str(exc_info.value)
+        with pytest.raises(ValueError):
+            _validate_batch_items([{"id": "a", "summary": "q"}, {"id": "a", "summary": "q"}])
+
+
+class TestProcessBatchToMcp:
+    """测试批量结果转换为MCP格式"""
+
+    def test_answers_in_question_order(self):
+        handler = FeedbackHandler()
+        handler.submit_batch_feedback({
+            "answers": [
+                {"index": 1, "selected": [], "text": " 有 ", "images": [
+                    {"data": base64.b64encode(PNG_BYTES).decode(), "mime": "image/png", "filename": "a.png"},
+                ]},
+                {"index": 0, "selected": ["是"], "text": "", "images": []},
+            ],
+            "source_event": "websocket_batch_submit",
+        })
+        result = handler.get_result_nowait()
+        assert result["is_batch"] and result["text_feedback"] == "有"
+
+        contents = handler.process_batch_to_mcp(result, ITEMS)
+        assert len(contents) == 3
+        first, second = json.loads(contents[0].text), json.loads(contents[1].text)
+        assert first == {
+            "index": 0, "id": "deploy", "question": "是否部署？", "answered": True,
+            "selected": ["是"], "text": "", "image_count": 0,
+        }
+        assert second["text"] == "有" and second["image_count"] == 1
+        assert contents[2].data == PNG_BYTES
+
+    def test_timeout_marks_items_unanswered(self):
+        handler = FeedbackHandler()
+        contents = handler.process_batch_to_mcp({"is_timeout": True, "timeout_reason": "total_timeout"}, ITEMS)
+        summaries = [json.loads(content.text) for content in contents]
+        assert [summary["answered"] for summary in summaries] == [False, False]
+        assert all(summary["timed_out"] for summary in summaries)
+        assert len(handler.process_batch_to_mcp(None, ITEMS)) == 2
+
+
+class TestBatchPage:
+    """测试批量页面渲染和 WebSocket 提交"""
+
+    @pytest.fixture
+    def app(self):
+        from backend.app import FeedbackApp
+
+        handler = FeedbackHandler()
+        app = FeedbackApp(handler, work_summary="批量确认", batch_items=ITEMS)
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        yield handler, app, flask_app
+        app.stop()
+
+    @staticmethod
+    def _events(client, name):
+        return [m["args"][0] for m in client.get_received() if m["name"] == name]
+
+    def test_index_renders_batch_page(self, app):
+        _, _, flask_app = app
+        page = flask_app.test_client().get("/").get_data(as_text=True)
+        assert "问题 2" in page and "是否部署？" in page
+        assert '"item_count": 2' in page
+        # 只有请求图片的问题提供图片区域
+        assert page.count('class="image-preview item-images"') == 1
+
+    def test_submit_batch_with_attachment(self, app):
+        handler, feedback_app, flask_app = app
+        client = feedback_app.socketio.test_client(flask_app)
+        client.emit("upload_begin", {"upload_id": "img", "size": len(PNG_BYTES), "mime": "image/png"})
+        client.emit("upload_chunk", {
+            "upload_id": "img", "offset": 0, "data": PNG_BYTES, "crc32": zlib.crc32(PNG_BYTES),
+        })
+        client.get_received()
+
+        client.emit("submit_batch_feedback", {"answers": [{"index": "x"}]})
+        assert self._events(client, "submit_rejected")[0]["reason"] == "invalid_answers"
+        assert handler.result_queue.empty()
+
+        client.emit("submit_batch_feedback", {"is_timeout": True, "answers": [
+            {"index": 0, "selected": ["否"], "text": ""},
+            {"index": 1, "text": "见截图", "attachments": [{"attachment_id": "img", "filename": "s.png"}]},
+        ]})
+        assert self._events(client, "feedback_received")
+        client.disconnect()
+
+        result = handler.get_result_nowait()
+        assert result["source_event"] == "websocket_batch_submit" and result["is_timeout_capture"] is True
+        summaries = [json.loads(c.text) for c in handler.process_batch_to_mcp(result, ITEMS) if hasattr(c, "text")]
+        assert summaries[0]["selected"] == ["否"] and summaries[1]["image_count"] == 1
@@ -0,0 +1,105 @@
+"""
+基准测试框架单元测试
+验证统计计算、基线保存与读取，以及回退比较
+"""
+
+import pytest
+
+from tests.benchmarks.harness import (
+    BenchmarkCase,
+    compare_results,
+    load_results,
+    run_case,
+    save_results,
+    summarize,
+)
+
+
+def _payload(**medians):
+    return {"results": {name: {"median": median} for name, median in medians.items()}}
+
+
+class TestSummarize:
+    """测试统计计算"""
+
+    def test_statistics_and_throughput(self):
+        result = summarize("case", "group", [0.4, 0.1, 0.2, 0.3], items=10, unit="submits")
+
+        assert result.samples == 4
+        assert result.min == 0.1
+        assert result.max == 0.4
+        assert result.median == pytest.approx(0.25)
+        assert result.p95 == 0.4
+        assert result.throughput == pytest.approx(40.0)
+
+    def test_empty_timings_raise(self):
+        with pytest.raises(ValueError):
+            summarize("case", "group", [])
+
+
+class TestRunCase:
+    """测试用例执行"""
+
+    def test_setup_teardown_and_reported_elapsed(self):
+        events = []
+
+        def setup():
+            events.append("setup")
+            return {"calls": 0}
+
+        def func(context):
+            context["calls"] += 1
+            return {"elapsed": 0.5, "note": "子进程计时"}
+
+        case = BenchmarkCase(
+            name="case", group="group", func=func, setup=setup,
+            teardown=lambda context: events.append(("teardown", context["calls"])),
+            warmup=2, repeat=3,
+        )
+        result = run_case(case)
+
+        assert events == ["setup", ("teardown", 5)]
+        assert result.samples == 3
+        assert result.median == 0.5
+        assert result.extra == {"note": "子进程计时"}
+
+    def test_repeat_scale_keeps_at_least_one_sample(self):
+        case = BenchmarkCase(name="case", group="group", func=lambda: None, warmup=0, repeat=3)
+
+        assert run_case(case, repeat_scale=0.01).samples == 1
+
+
+class TestBaselines:
+    """测试基线保存与比较"""
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        path = str(tmp_path / "nested" / "baseline.json")
+        save_results([summarize("case", "group", [0.1, 0.2])], path)
+
+        payload = load_results(path)
+        assert payload["results"]["case"]["median"] == pytest.approx(0.15)
+        assert "python" in payload["environment"]
+
+    def test_compare_flags_regressions_beyond_threshold(self):
+        baseline = _payload(slower=1.0, faster=1.0, steady=1.0, removed=1.0)
+        current = _payload(slower=1.5, faster=0.5, steady=1.1, added=1.0)
+
+        rows = {row["name"]: row for row in compare_results(baseline, current, threshold=0.2)}
+
+        assert rows["slower"]["status"] == "regression"
+        assert rows["slower"]["change"] == pytest.approx(0.5)
+        assert rows["faster"]["status"] == "improvement"
+        assert rows["steady"]["status"] == "ok"
+        assert rows["added"]["status"] == "new"
+        assert rows["removed"]["status"] == "missing"
+
+    def test_compare_cli_exit_code(self, tmp_path):
+        from tests.benchmarks.__main__ import main
+
+        baseline = str(tmp_path / "baseline.json")
+        current = str(tmp_path / "current.json")
+        save_results([summarize("case", "group", [0.1])], baseline)
+        save_results([summarize("case", "group", [0.2])], current)
+
+        assert main(["-v", "compare", baseline, baseline]) == 0
+        assert main(["-v", "compare", baseline, current]) == 1
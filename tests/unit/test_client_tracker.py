@@ -0,0 +1,180 @@
+"""
+客户端跟踪器单元测试
+验证连接计数的线程安全（连接/断开风暴）以及 FeedbackApp 的 WebSocket 事件接入
+"""
+
+import random
+import threading
+
+import pytest
+
+from backend.utils.client_tracker import ClientTracker
+
+
+class TestClientTracker:
+    """测试跟踪器基本语义"""
+
+    def test_connect_disconnect(self):
+        tracker = ClientTracker()
+        assert not tracker.has_active()
+        assert tracker.last_seen is None
+
+        assert tracker.connect("a") is True
+        assert tracker.connect("a") is False
+        assert tracker.connect("b") is True
+        assert tracker.count == 2
+        assert tracker.has_active()
+
+        assert tracker.disconnect("a") is True
+        assert tracker.disconnect("a") is False
+        assert tracker.count == 1
+        assert tracker.disconnect("b") is True
+        assert not tracker.has_active()
+
+    def test_touch_only_known_clients(self):
+        tracker = ClientTracker()
+        assert tracker.touch("ghost") is False
+        assert tracker.last_seen is None
+
+        tracker.connect("a")
+        first_seen = tracker.last_seen
+        assert tracker.touch("a") is True
+        assert tracker.last_seen >= first_seen
+
+    def test_clear_returns_removed(self):
+        tracker = ClientTracker()
+        tracker.connect("a")
+        tracker.connect("b")
+
+        assert sorted(tracker.clear()) == ["a", "b"]
+        assert tracker.count == 0
+
+
+class TestConnectionStorm:
+    """测试并发连接/断开风暴下计数的一致性"""
+
+    def test_concurrent_churn_keeps_count_consistent(self):
+        tracker = ClientTracker()
+        workers, rounds = 16, 500
+        survivors = {}
+        errors = []
+        stop_readers = threading.Event()
+
+        def churn(worker: int):
+            rng = random.Random(worker)
+            alive = set()
+            try:
+                for i in range(rounds):
+                    client_id = f"w{worker}-{i % 50}"
+                    if client_id in alive and rng.random() < 0.5:
+                        assert tracker.disconnect(client_id)
+                        alive.discard(client_id)
+                    else:
+                        tracker.connect(client_id)
+                        tracker.touch(client_id)
+                        alive.add(client_id)
+                survivors[worker] = alive
+            except Exception as e:  # pragma: no cover - 失败时报告
+                errors.append(e)
+
+        def read():
+            try:
+                while not stop_readers.is_set():
+                    count = tracker.count
+                    assert count >= 0
+                    tracker.has_active()
+            except Exception as e:  # pragma: no cover - 失败时报告
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writers = [threading.Thread(target=churn, args=(w,)) for w in range(workers)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop_readers.set()
+        for thread in readers:
+            thread.join()
+
+        assert errors == []
+        expected = sum(len(alive) for alive in survivors.values())
+        assert tracker.count == expected
+        assert tracker.has_active() == (expected > 0)
+
+        for alive in survivors.values():
+            for client_id in alive:
+                assert tracker.disconnect(client_id)
+        assert not tracker.has_active()
+
+
+class TestFeedbackAppClients:
+    """测试 FeedbackApp 通过 Socket.IO 事件维护客户端"""
+
+    @pytest.fixture
+    def feedback_app(self):
+        from backend.app import FeedbackApp
+        from backend.feedback_handler import FeedbackHandler
+
+        app = FeedbackApp(FeedbackHandler())
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        yield app, flask_app
+        app.stop()
+
+    def test_connect_and_disconnect_update_tracker(self, feedback_app):
+        app, flask_app = feedback_app
+        changes = []
+        app.add_client_listener(lambda: changes.append(app.get_active_client_count()))
+
+        first = app.socketio.test_client(flask_app)
+        second = app.socketio.test_client(flask_app)
+        assert app.has_active_clients()
+        assert app.get_active_client_count() == 2
+
+        established = [m for m in first.get_received() if m["name"] == "connection_established"]
+        assert established[0]["args"][0]["heartbeat_interval"] == 0
+
+        first.disconnect()
+        assert app.has_active_clients()
+        second.disconnect()
+        assert not app.has_active_clients()
+        assert changes == [1, 2, 1, 0]
+
+    def test_legacy_heartbeat_is_answered(self, feedback_app):
+        app, flask_app = feedback_app
+        client = app.socketio.test_client(flask_app)
+        client.get_received()
+
+        client.emit("heartbeat", {"timestamp": 0})
+        assert [m["name"] for m in client.get_received()] == ["heartbeat_response"]
+        client.disconnect()
+
+    def test_concurrent_test_clients(self, feedback_app):
+        app, flask_app = feedback_app
+        errors = []
+
+        def session():
+            try:
+                for _ in range(10):
+                    client = app.socketio.test_client(flask_app)
+                    client.emit("heartbeat", {})
+                    client.disconnect()
+            except Exception as e:  # pragma: no cover - 失败时报告
+                errors.append(e)
+
+        threads = [threading.Thread(target=session) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert app.get_active_client_count() == 0
+
+    def test_stop_clears_clients(self, feedback_app):
+        app, flask_app = feedback_app
+        app.socketio.test_client(flask_app)
+        assert app.has_active_clients()
+
+        app.stop()
+        assert not app.has_active_clients()
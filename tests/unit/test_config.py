@@ -170,6 +170,42 @@ class TestConfigManager(unittest.TestCase):
             "将使用默认值 8888。"
         )
 
+    @patch('os.getenv')
+    @patch('logging.warning')
+    def test_load_from_env_image_pipeline(self, mock_logging_warning, mock_getenv):
+        """测试页面图片处理配置的环境变量加载"""
+        def mock_env_side_effect(key, default=None):
+            env_vars = {
+                'MCP_IMAGE_TARGET_BYTES': '524288',
+                'MCP_IMAGE_MAX_DIMENSION': '0'  # 无效：必须为正整数
+            }
+            return env_vars.get(key, default)
+
+        mock_getenv.side_effect = mock_env_side_effect
+
+        config_manager = ConfigManager()
+
+        self.assertEqual(config_manager.feedback.image_target_bytes, 524288)
+        self.assertEqual(config_manager.feedback.image_max_dimension, 2560)
+        mock_logging_warning.assert_called_once_with(
+            "环境变量 MCP_IMAGE_MAX_DIMENSION 的值 '0' 不是有效正整数，"
+            "将使用默认值 2560。"
+        )
+
+    @patch('os.getenv')
+    @patch('logging.warning')
+    def test_load_from_env_pool_start_timeout_must_be_positive(self, mock_logging_warning, mock_getenv):
+        """测试批量启动超时必须为正数"""
+        mock_getenv.side_effect = lambda key, default=None: {'MCP_POOL_START_TIMEOUT': '0'}.get(key, default)
+
+        config_manager = ConfigManager()
+
+        self.assertEqual(config_manager.server.pool_start_timeout, 30.0)
+        mock_logging_warning.assert_called_once_with(
+            "环境变量 MCP_POOL_START_TIMEOUT 的值 '0' 不是有效正数，"
+            "将使用默认值 30.0。"
+        )
+
     def test_validate_config_success(self):
         """测试配置验证成功"""
         config_manager = ConfigManager()
@@ -0,0 +1,175 @@
+"""
+create_server_pool 工具单元测试
+验证配置预校验、并发启动和逐条目结果报告
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from backend.server import create_server_pool, _validate_pool_configs
+
+
+def _make_pool(start_delay: float = 0.2, fail_ids=(), hang_ids=(), hang_delay: float = 5):
+    """创建模拟服务器池，记录并发启动峰值"""
+    pool = MagicMock()
+    state = {"active": 0, "peak": 0, "next_port": 9000}
+    lock = threading.Lock()
+
+    def start_server_in_pool(session_id, work_summary="", timeout_seconds=300, suggest="", admit=True):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["next_port"] += 1
+            port = state["next_port"]
+        try:
+            time.sleep(hang_delay if session_id in hang_ids else start_delay)
+            if session_id in fail_ids:
+                raise RuntimeError("端口绑定失败")
+            return MagicMock(), port
+        finally:
+            with lock:
+                state["active"] -= 1
+
+    pool.start_server_in_pool.side_effect = start_server_in_pool
+    return pool, state
+
+
+class TestValidatePoolConfigs:
+    """测试配置预校验"""
+
+    def test_rejects_invalid_entries_up_front(self):
+        configs = [
+            {"session_id": "a"},
+            {"work_summary": "缺少session_id"},
+            {"session_id": "a"},
+            {"session_id": "b", "timeout_seconds": -1},
+            {"session_id": "c", "suggest": ["是", "否"]},
+            "not-a-dict",
+        ]
+
+        valid, failed = _validate_pool_configs(configs)
+
+        assert [c["session_id"] for c in valid] == ["a", "c"]
+        assert valid[1]["suggest"] == '["是", "否"]'
+        assert sorted(f["index"] for f in failed) == [1, 2, 3, 5]
+
+
+class TestCreateServerPool:
+    """测试并发启动"""
+
+    def test_starts_sessions_concurrently(self):
+        pool, state = _make_pool(start_delay=0.3)
+        configs = [{"session_id": f"s{i}"} for i in range(20)]
+
+        with patch("backend.server_pool.get_server_pool", return_value=pool):
+            started = time.perf_counter()
+            report = create_server_pool(configs, max_concurrency=20)
+            elapsed = time.perf_counter() - started
+
+        assert "成功创建 20 个服务器" in report
+        assert state["peak"] == 20
+        # 20个会话的总耗时应接近单个会话的启动时间
+        assert elapsed < 1.5
+
+    def test_default_fan_out_starts_all_sessions_at_once(self):
+        pool, _ = _make_pool(start_delay=0.3)
+        with patch("backend.server_pool.get_server_pool", return_value=pool):
+            started = time.perf_counter()
+            create_server_pool([{"session_id": "single"}])
+            single = time.perf_counter() - started
+
+        pool, state = _make_pool(start_delay=0.3)
+        configs = [{"session_id": f"s{i}"} for i in range(30)]
+        with patch("backend.server_pool.get_server_pool", return_value=pool):
+            started = time.perf_counter()
+            report = create_server_pool(configs)
+            elapsed = time.perf_counter() - started
+
+        assert "成功创建 30 个服务器" in report
+        assert state["peak"] == 30
+        # 不指定并发数时，总耗时应接近单个会话的启动时间
+        assert elapsed < single * 2
+
+    def test_fan_out_limit_is_respected(self):
+        pool, state = _make_pool(start_delay=0.05)
+        configs = [{"session_id": f"s{i}"} for i in range(10)]
+
+        with patch("backend.server_pool.get_server_pool", return_value=pool):
+            create_server_pool(configs, max_concurrency=3)
+
+        assert state["peak"] <= 3
+
+    def test_reports_partial_success_per_entry(self):
+        pool, _ = _make_pool(start_delay=0.01, fail_ids={"bad"})
+        configs = [{"session_id": "good"}, {"session_id": "bad"}, {"no_id": True}]
+
+        with patch("backend.server_pool.get_server_pool", return_value=pool):
+            report = create_server_pool(configs)
+
+        assert "成功创建 1 个服务器" in report
+        assert "失败的服务器 (2 个" in report
+        assert "端口绑定失败" in report
+
+    def test_reports_timeouts_per_entry(self):
+        pool, _ = _make_pool(start_delay=0.01, hang_ids={"slow"})
+        configs = [{"session_id": "fast"}, {"session_id": "slow"}]
+
+        with patch("backend.server_pool.get_server_pool", return_value=pool), \
+                patch("backend.server.get_server_config") as mock_config:
+            mock_config.return_value = MagicMock(
+                pool_start_concurrency=4,
+                pool_start_timeout=0.5,
+                recommended_local_forward_port=8888,
+            )
+            started = time.perf_counter()
+            report = create_server_pool(configs)
+            elapsed = time.perf_counter() - started
+
+        assert "成功创建 1 个服务器" in report
+        assert "其中 1 个超时" in report
+        assert elapsed < 2
+
+    def _timeout_config(self, mock_config, timeout=0.3):
+        mock_config.return_value = MagicMock(
+            pool_start_concurrency=4,
+            pool_start_timeout=timeout,
+            recommended_local_forward_port=8888,
+        )
+
+    def test_late_starts_are_released(self):
+        pool, _ = _make_pool(start_delay=0.01, hang_ids={"slow"}, hang_delay=0.6)
+        configs = [{"session_id": "fast"}, {"session_id": "slow"}]
+
+        with patch("backend.server_pool.get_server_pool", return_value=pool), \
+                patch("backend.server.get_server_config") as mock_config:
+            self._timeout_config(mock_config)
+            report = create_server_pool(configs)
+
+        assert "其中 1 个超时" in report
+        pool.release_server.assert_not_called()
+        # 超时后才完成的启动立即释放，不遗留运行中的会话
+        deadline = time.monotonic() + 3
+        while not pool.release_server.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        pool.release_server.assert_called_once_with("slow", immediate=True)
+
+    def test_starts_finished_during_timeout_are_reported(self):
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        from concurrent.futures import wait
+
+        def as_completed_timing_out(futures, timeout=None):
+            # 模拟全部启动恰好在超时之后、检查之前完成
+            wait(futures)
+            raise FuturesTimeoutError()
+            yield
+
+        pool, _ = _make_pool(start_delay=0.01)
+        configs = [{"session_id": "a"}, {"session_id": "b"}]
+        with patch("backend.server_pool.get_server_pool", return_value=pool), \
+                patch("backend.server.as_completed", side_effect=as_completed_timing_out):
+            report = create_server_pool(configs)
+
+        assert "成功创建 2 个服务器" in report and "失败" not in report
+        pool.release_server.assert_not_called()
@@ -0,0 +1,259 @@
+"""
+截止时间调度器单元测试
+验证按时触发、取消、堆压缩，以及服务器池和等待逻辑的事件驱动行为
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from backend.utils.deadline_scheduler import DeadlineScheduler
+
+
+class TestDeadlineScheduler:
+    """测试调度器本身"""
+
+    def test_fires_in_deadline_order(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        fired = []
+        done = threading.Event()
+        try:
+            scheduler.call_later(0.15, fired.append, "late")
+            scheduler.call_later(0.05, fired.append, "early")
+            scheduler.call_later(0.2, done.set)
+
+            assert done.wait(2)
+            assert fired == ["early", "late"]
+        finally:
+            scheduler.shutdown()
+
+    def test_cancelled_deadline_never_fires(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        fired = []
+        done = threading.Event()
+        try:
+            handle = scheduler.call_later(0.05, fired.append, "cancelled")
+            scheduler.call_later(0.1, done.set)
+            handle.cancel()
+
+            assert done.wait(2)
+            assert fired == []
+        finally:
+            scheduler.shutdown()
+
+    def test_many_deadlines_use_single_thread_and_fire_promptly(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        count = 500
+        fired = []
+        done = threading.Event()
+        lock = threading.Lock()
+
+        def on_fire(_):
+            with lock:
+                fired.append(time.monotonic())
+                if len(fired) == count:
+                    done.set()
+
+        try:
+            threads_before = threading.active_count()
+            for i in range(count):
+                scheduler.call_later(0.05 + (i % 10) * 0.01, on_fire, i)
+
+            assert threading.active_count() <= threads_before + 1
+            assert done.wait(3)
+            assert scheduler.max_lag < 0.5
+            # 500个截止时间集中在10个时间点，唤醒次数应远小于截止时间数量
+            assert scheduler.wakeup_count < count
+        finally:
+            scheduler.shutdown()
+
+    def test_mass_cancellation_compacts_heap(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        try:
+            handles = [scheduler.call_later(60, lambda: None) for _ in range(200)]
+            for handle in handles[:150]:
+                handle.cancel()
+
+            assert scheduler.pending_count() == 50
+            assert len(scheduler._heap) < 200
+        finally:
+            scheduler.shutdown()
+
+    def test_cancel_count_is_exact_while_thread_discards_entries(self):
+        # 调度线程在取消的同时丢弃堆顶的已取消条目，计数不能因竞争而偏差
+        for _ in range(300):
+            scheduler = DeadlineScheduler(name="Test-Scheduler")
+            try:
+                handles = [scheduler.call_later(60, lambda: None) for _ in range(200)]
+                for handle in handles[:150]:
+                    handle.cancel()
+                assert scheduler.pending_count() == 50
+            finally:
+                scheduler.shutdown()
+
+    def test_callback_errors_do_not_stop_scheduler(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        done = threading.Event()
+
+        def boom():
+            raise RuntimeError("回调失败")
+
+        try:
+            scheduler.call_later(0.01, boom)
+            scheduler.call_later(0.05, done.set)
+            assert done.wait(2)
+        finally:
+            scheduler.shutdown()
+
+    def test_blocking_work_runs_in_worker_without_delaying_deadlines(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        release = threading.Event()
+        worker_threads = []
+        on_time = threading.Event()
+
+        def blocking_work():
+            worker_threads.append(threading.current_thread().name)
+            release.wait(2)
+
+        try:
+            scheduler.call_later_in_worker(0.01, blocking_work)
+            scheduler.call_later(0.05, on_time.set)
+
+            assert on_time.wait(1)
+            assert scheduler.max_lag < 0.5
+            assert worker_threads and worker_threads[0].startswith("Test-Scheduler-Worker")
+        finally:
+            release.set()
+            scheduler.shutdown()
+
+
+class TestServerPoolExpiry:
+    """测试服务器池基于截止时间的清理"""
+
+    def _make_pool(self, scheduler, idle_timeout=0.1):
+        from backend.server_pool import EnhancedServerPool
+
+        config = MagicMock(idle_timeout=idle_timeout, preferred_web_port=8765)
+        with patch("backend.server_pool.get_server_config", return_value=config), \
+                patch("backend.server_pool.get_scheduler", return_value=scheduler), \
+                patch.object(EnhancedServerPool, "_load_registry_state"):
+            pool = EnhancedServerPool()
+        return pool
+
+    def test_idle_session_expires_without_cleanup_thread(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        pool = self._make_pool(scheduler)
+        try:
+            assert not hasattr(pool, "_cleanup_thread")
+            pool.get_server("idle_session")
+
+            deadline = time.monotonic() + 2
+            while "idle_session" in pool._servers:
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+        finally:
+            pool.shutdown()
+            scheduler.shutdown()
+
+    def test_running_session_is_not_expired(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        pool = self._make_pool(scheduler)
+        try:
+            with patch("backend.server_pool.ServerManager") as mock_manager:
+                mock_manager.return_value.start_server.return_value = 9100
+                pool.start_server_in_pool("busy_session")
+
+            time.sleep(0.3)
+            assert "busy_session" in pool._servers
+            assert "busy_session" not in pool._expiry_handles
+
+            pool.release_server("busy_session")
+            deadline = time.monotonic() + 2
+            while "busy_session" in pool._servers:
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+        finally:
+            pool.shutdown()
+            scheduler.shutdown()
+
+    def test_expired_session_is_stopped_in_worker(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        pool = self._make_pool(scheduler)
+        stop_threads = []
+        stopped = threading.Event()
+
+        def stop_server():
+            stop_threads.append(threading.current_thread().name)
+            stopped.set()
+
+        try:
+            with patch("backend.server_pool.ServerManager") as mock_manager:
+                mock_manager.return_value.start_server.return_value = 9101
+                mock_manager.return_value.stop_server.side_effect = stop_server
+                pool.start_server_in_pool("finished_session")
+
+            pool.release_server("finished_session")
+            assert stopped.wait(2)
+            assert stop_threads[0].startswith("Test-Scheduler-Worker")
+            assert "finished_session" not in pool._servers
+        finally:
+            pool.shutdown()
+            scheduler.shutdown()
+
+    def test_registry_heartbeat_runs_off_scheduler_thread(self):
+        scheduler = DeadlineScheduler(name="Test-Scheduler")
+        pool = self._make_pool(scheduler)
+        heartbeat_threads = []
+        done = threading.Event()
+
+        def heartbeat(pid):
+            heartbeat_threads.append(threading.current_thread().name)
+            done.set()
+            return 1
+
+        pool._registry = MagicMock(heartbeat=MagicMock(side_effect=heartbeat))
+        try:
+            with patch("backend.server_pool.REGISTRY_HEARTBEAT_INTERVAL", 0.01):
+                pool._heartbeat_handle.cancel()
+                pool._schedule_registry_heartbeat()
+                assert done.wait(2)
+            assert heartbeat_threads[0].startswith("Test-Scheduler-Worker")
+            pool._registry.reap_stale.assert_called()
+        finally:
+            pool.shutdown()
+            scheduler.shutdown()
+
+
+class TestEventDrivenWait:
+    """测试事件驱动的反馈等待"""
+
+    def test_result_wakes_waiter_immediately(self):
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        manager.app = MagicMock()
+        manager.app.has_active_clients.return_value = True
+
+        def submit_later():
+            time.sleep(0.1)
+            manager.feedback_handler.submit_feedback({"text": "完成", "images": []})
+
+        threading.Thread(target=submit_later).start()
+        started = time.monotonic()
+        result = manager.wait_for_feedback(30)
+
+        assert result["text_feedback"] == "完成"
+        assert time.monotonic() - started < 1
+
+    def test_total_timeout_fires_on_deadline(self):
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        manager.app = MagicMock()
+        manager.app.has_active_clients.return_value = True
+
+        started = time.monotonic()
+        result = manager.wait_for_feedback(0.2)
+
+        assert result["timeout_reason"] == "total_timeout"
+        assert time.monotonic() - started < 1
@@ -0,0 +1,163 @@
+"""
+草稿增量同步单元测试
+验证服务器端草稿的增量应用、版本冲突重新同步、超时捕获以及 WebSocket 确认式提交
+"""
+
+import base64
+
+import pytest
+
+from backend.feedback_handler import MAX_DRAFT_IMAGES, FeedbackHandler
+
+PNG_BASE64 = base64.b64encode(b"\x89PNG\r\n\x1a\nfake").decode()
+PNG_DATA_URL = f"data:image/png;base64,{PNG_BASE64}"
+
+
+class TestDraftUpdates:
+    """测试草稿更新语义"""
+
+    def test_text_patches_apply_in_order(self):
+        handler = FeedbackHandler()
+        ack = handler.apply_draft_update({"base_version": 0, "text_patch": {"pos": 0, "delete": 0, "insert": "hello"}})
+        assert ack == {"version": 1, "resync": False, "image_ids": []}
+
+        ack = handler.apply_draft_update({"base_version": 1, "text_patch": {"pos": 5, "delete": 0, "insert": " 世界😀"}})
+        ack = handler.apply_draft_update({"base_version": 2, "text_patch": {"pos": 0, "delete": 5, "insert": "你好"}})
+        assert ack["version"] == 3
+        assert handler.get_draft_state()["text"] == "你好 世界😀"
+
+    def test_stale_patch_requests_resync(self):
+        handler = FeedbackHandler()
+        handler.apply_draft_update({"base_version": 0, "text": "abc", "add_images": [{"id": "i1", "data": PNG_DATA_URL}]})
+
+        ack = handler.apply_draft_update({"base_version": 0, "text_patch": {"pos": 0, "delete": 0, "insert": "x"}})
+        assert ack == {"version": 1, "resync": True, "image_ids": ["i1"]}
+        assert handler.get_draft_state()["text"] == "abc"
+
+        # 越界的增量同样要求重新同步，完整文本不要求版本一致
+        assert handler.apply_draft_update({"base_version": 1, "text_patch": {"pos": 2, "delete": 5}})["resync"]
+        assert handler.apply_draft_update({"base_version": 99, "text": "full"})["version"] == 2
+        assert handler.get_draft_state()["text"] == "full"
+
+    def test_images_by_id(self):
+        handler = FeedbackHandler()
+        handler.apply_draft_update({"base_version": 0, "add_images": [
+            {"id": "a", "data": PNG_DATA_URL, "filename": "a.png"},
+            {"id": "b", "data": "data:image/jpeg;base64,AAAA"},
+        ]})
+        handler.apply_draft_update({"base_version": 1, "remove_images": ["a", "missing"]})
+
+        state = handler.get_draft_state(include_images=True)
+        assert state["image_ids"] == ["b"]
+        assert state["images"] == [
+            {"id": "b", "data": b"\x00\x00\x00", "mime": "image/jpeg", "filename": "", "attachment_id": None}
+        ]
+        assert handler.get_draft_content()["images"] == [{"data": "AAAA", "filename": "", "mime": "image/jpeg"}]
+
+    def test_limits_are_enforced(self):
+        handler = FeedbackHandler()
+        images = [{"id": str(i), "data": PNG_BASE64} for i in range(MAX_DRAFT_IMAGES + 1)]
+        with pytest.raises(ValueError):
+            handler.apply_draft_update({"base_version": 0, "add_images": images})
+        with pytest.raises(ValueError):
+            handler.apply_draft_update({"base_version": 0, "add_images": [{"data": PNG_BASE64}]})
+        with pytest.raises(ValueError):
+            handler.apply_draft_update({"base_version": 0, "add_images": [{"id": "x", "data": "not base64!"}]})
+        assert handler.get_draft_state()["version"] == 0
+
+    def test_submit_clears_draft(self):
+        handler = FeedbackHandler()
+        handler.apply_draft_update({"base_version": 0, "text": "draft"})
+        handler.submit_feedback({"text": "draft"})
+
+        state = handler.get_draft_state()
+        assert state["text"] == "" and state["version"] == 2
+        assert handler.build_draft_result("total_timeout") is None
+
+
+class TestDraftTimeoutCapture:
+    """测试超时捕获直接读取服务器草稿"""
+
+    def test_timeout_result_uses_draft(self):
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        empty = manager._create_timeout_result("total_timeout")
+        assert empty["is_timeout"] and "is_timeout_capture" not in empty
+
+        manager.feedback_handler.apply_draft_update({
+            "base_version": 0, "text": "  unsaved  ", "add_images": [{"id": "i1", "data": PNG_DATA_URL}],
+        })
+        result = manager._create_timeout_result("websocket_disconnected")
+        assert result["is_timeout_capture"] and result["timeout_reason"] == "websocket_disconnected"
+        assert result["text_feedback"] == "unsaved"
+
+        items = manager.feedback_handler.process_feedback_to_mcp(result)
+        assert "超时" in items[0].text
+        assert items[-2].text.startswith("用户文字反馈：unsaved")
+
+
+class TestDraftWebSocket:
+    """测试 WebSocket 草稿事件与确认式提交"""
+
+    @pytest.fixture
+    def client(self):
+        from backend.app import FeedbackApp
+
+        handler = FeedbackHandler()
+        app = FeedbackApp(handler)
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        client = app.socketio.test_client(flask_app)
+        yield handler, client
+        client.disconnect()
+        app.stop()
+
+    @staticmethod
+    def _events(client, name):
+        return [m["args"][0] for m in client.get_received() if m["name"] == name]
+
+    def test_connect_reports_draft_state(self, client):
+        _, test_client = client
+        assert self._events(test_client, "draft_state") == [{"version": 0, "text": "", "image_ids": []}]
+
+    def test_confirm_submit_uses_draft(self, client):
+        handler, test_client = client
+        test_client.get_received()
+
+        test_client.emit("draft_update", {"base_version": 0, "text_patch": {"pos": 0, "delete": 0, "insert": "hi"}})
+        test_client.emit("draft_update", {"base_version": 1, "add_images": [{"id": "i1", "data": PNG_DATA_URL}]})
+        assert [ack["version"] for ack in self._events(test_client, "draft_ack")] == [1, 2]
+
+        test_client.emit("draft_restore", {})
+        restored = self._events(test_client, "draft_state")[0]
+        assert restored["text"] == "hi"
+        assert restored["images"][0]["data"] == base64.b64decode(PNG_BASE64)
+
+        test_client.emit("submit_feedback", {"draft_version": 2, "is_timeout": True})
+        assert self._events(test_client, "feedback_received")
+        result = handler.get_result_nowait()
+        assert result["text_feedback"] == "hi"
+        assert result["images"] == [{"data": PNG_BASE64, "filename": "", "mime": "image/png"}]
+        assert result["is_timeout_capture"] is True
+
+    def test_version_mismatch_rejects_confirm(self, client):
+        handler, test_client = client
+        test_client.emit("draft_update", {"base_version": 0, "text": "hi"})
+        test_client.get_received()
+
+        test_client.emit("submit_feedback", {"draft_version": 0})
+        rejected = self._events(test_client, "submit_rejected")
+        assert rejected[0]["reason"] == "draft_version_mismatch" and rejected[0]["version"] == 1
+        assert handler.result_queue.empty()
+
+        # 页面改为完整提交，data URL 图片转换为 base64 并保留 MIME 类型
+        test_client.emit("submit_feedback", {"text": "hi", "images": [PNG_DATA_URL]})
+        assert handler.get_result_nowait()["images"] == [{"data": PNG_BASE64, "filename": "", "mime": "image/png"}]
+
+    def test_invalid_update_acks_error(self, client):
+        _, test_client = client
+        test_client.get_received()
+        test_client.emit("draft_update", {"base_version": 0, "add_images": [{"id": "x", "data": 1}]})
+        ack = self._events(test_client, "draft_ack")[0]
+        assert ack["error"] and ack["version"] == 0
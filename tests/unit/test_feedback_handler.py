@@ -157,6 +157,29 @@ class TestProcessFeedbackToMcp:
         mock_mcp_image.assert_any_call(data=b'image1_data', format='png')
         mock_mcp_image.assert_any_call(data=b'image2_data', format='png')
     
+    @patch('backend.feedback_handler.MCPImage')
+    def test_process_feedback_keeps_image_format(self, mock_mcp_image):
+        """测试JPEG/WebP图片（包括超时捕获的草稿图片）不被标记为PNG"""
+        import base64
+        handler = FeedbackHandler()
+        webp_data = b'RIFF\x00\x00\x00\x00WEBPVP8 '
+        result = {
+            'success': True,
+            'has_text': False,
+            'has_images': True,
+            'images': [{'data': base64.b64encode(b'\xff\xd8\xff').decode(), 'mime': 'image/jpeg'}]
+        }
+
+        handler.process_feedback_to_mcp(result)
+        mock_mcp_image.assert_called_once_with(data=b'\xff\xd8\xff', format='jpeg')
+
+        mock_mcp_image.reset_mock()
+        handler.apply_draft_update({"base_version": 0, "add_images": [
+            {"id": "a", "data": "data:image/webp;base64," + base64.b64encode(webp_data).decode()}
+        ]})
+        handler.process_feedback_to_mcp(handler.build_draft_result("timeout"))
+        mock_mcp_image.assert_called_once_with(data=webp_data, format='webp')
+
     @patch('backend.feedback_handler.TextContent')
     @patch('backend.feedback_handler.MCPImage')
     def test_process_feedback_complete(self, mock_mcp_image, mock_text_content):
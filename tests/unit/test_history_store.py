@@ -0,0 +1,147 @@
+"""
+反馈历史存储单元测试
+验证后台批量写入、图片内容寻址、全文检索、筛选条件和游标分页
+"""
+
+import base64
+import json
+import os
+import time
+
+import pytest
+
+from backend.utils.history_store import HistoryStore
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nhistory"
+PNG_BASE64 = base64.b64encode(PNG_BYTES).decode()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), str(tmp_path / "images"))
+    yield store
+    store.close()
+
+
+def _feedback(text, **extra):
+    return {"text_feedback": text, "images": [], "source_event": "websocket_submit", **extra}
+
+
+class TestHistoryWrites:
+    """测试写入语义"""
+
+    def test_records_feedback_fields(self, store):
+        store.record(
+            _feedback("同意部署", metadata={"user_agent": "test"}),
+            session_id="s1", work_summary="部署方案", suggest='["同意部署", "暂缓"]',
+        )
+        store.record({"is_timeout": True, "timeout_reason": "total_timeout"}, session_id="s2")
+        assert store.flush()
+
+        timeout_item, item = store.query()["items"]
+        assert item["text"] == "同意部署" and item["suggest"] == ["同意部署", "暂缓"]
+        assert item["work_summary"] == "部署方案" and item["metadata"] == {"user_agent": "test"}
+        assert timeout_item["is_timeout"] and timeout_item["timeout_reason"] == "total_timeout"
+
+    def test_images_are_content_addressed(self, store, tmp_path):
+        image = {"data": PNG_BASE64, "filename": "shot.png"}
+        store.record(_feedback("一", images=[image]))
+        store.record(_feedback("二", images=[image, {"data": PNG_BASE64, "filename": "copy.png"}]))
+        assert store.flush()
+
+        items = store.query()["items"]
+        paths = {image["path"] for item in items for image in item["images"]}
+        assert len(paths) == 1
+        path = paths.pop()
+        assert os.path.basename(path).startswith(items[0]["images"][0]["sha256"])
+        with open(path, "rb") as f:
+            assert f.read() == PNG_BYTES
+
+    def test_batch_answers_keep_choices(self, store):
+        items = [{"id": "q1", "summary": "是否部署？", "suggest": ["是", "否"]}, {"id": "q2", "summary": "备注"}]
+        store.record(
+            {"is_batch": True, "text_feedback": "", "images": [], "answers": [{"index": 0, "selected": ["否"]}]},
+            batch_items=items,
+        )
+        assert store.flush()
+
+        answers = store.query()["items"][0]["answers"]
+        assert answers[0]["selected"] == ["否"] and answers[0]["suggest"] == ["是", "否"]
+        assert answers[1]["selected"] == [] and answers[1]["question"] == "备注"
+
+    def test_invalid_entry_does_not_block_batch(self, store):
+        store.record(_feedback("坏图片", images=[{"data": "not base64!"}]))
+        store.record(_feedback("正常"))
+        assert store.flush()
+        assert [item["text"] for item in store.query()["items"]] == ["正常"]
+
+    def test_history_survives_reopen(self, store, tmp_path):
+        store.record(_feedback("重启后仍在"))
+        assert store.flush()
+        reopened = HistoryStore(store.path, store.images_dir)
+        try:
+            assert reopened.query(text="重启后")["items"][0]["text"] == "重启后仍在"
+        finally:
+            reopened.close()
+
+
+class TestHistoryQueries:
+    """测试检索、筛选与分页"""
+
+    def test_full_text_search(self, store):
+        for text in ("界面布局需要调整", "deploy to production", "同意", "50% done_ok"):
+            store.record(_feedback(text), work_summary="第二轮评审")
+        assert store.flush()
+
+        assert [i["text"] for i in store.query(text="布局需要")["items"]] == ["界面布局需要调整"]
+        assert [i["text"] for i in store.query(text="production deploy")["items"]] == ["deploy to production"]
+        # 少于3个字符的检索词使用 LIKE 子串匹配，通配符按字面匹配
+        assert [i["text"] for i in store.query(text="同意")["items"]] == ["同意"]
+        assert [i["text"] for i in store.query(text="0%")["items"]] == ["50% done_ok"]
+        assert len(store.query(text="评审")["items"]) == 4
+        assert store.query(text='"unbalanced')["items"] == []
+
+    def test_session_and_time_filters(self, store):
+        store.record(_feedback("旧的"), session_id="a")
+        assert store.flush()
+        boundary = time.time()
+        store.record(_feedback("新的"), session_id="a")
+        store.record(_feedback("其他会话"), session_id="b")
+        assert store.flush()
+
+        assert [i["text"] for i in store.query(session_id="a")["items"]] == ["新的", "旧的"]
+        assert [i["text"] for i in store.query(session_id="a", since=boundary)["items"]] == ["新的"]
+        assert [i["text"] for i in store.query(until=boundary)["items"]] == ["旧的"]
+
+    def test_cursor_pagination(self, store):
+        for index in range(7):
+            store.record(_feedback(f"条目 {index}"))
+        assert store.flush()
+
+        seen, cursor = [], ""
+        while True:
+            page = store.query(limit=3, cursor=cursor)
+            seen.extend(item["text"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == [f"条目 {index}" for index in reversed(range(7))]
+        with pytest.raises(ValueError):
+            store.query(cursor="abc")
+
+
+class TestHistoryTool:
+    """测试历史查询工具的参数解析"""
+
+    def test_tool_returns_json_page(self, store):
+        from unittest.mock import patch
+
+        from backend import server
+
+        store.record(_feedback("工具查询"), session_id="tool")
+        assert store.flush()
+        with patch("backend.server.get_history_store", return_value=store):
+            page = json.loads(server.query_feedback_history(query="工具查询", since="2000-01-01T00:00:00"))
+            assert page["items"][0]["session_id"] == "tool"
+            with pytest.raises(ValueError):
+                server.query_feedback_history(since="yesterday")
@@ -0,0 +1,230 @@
+"""
+幂等会话单元测试
+验证会话ID由内容和幂等键确定，重试的调用挂接到原会话，不同调用互相隔离
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.server_pool import EnhancedServerPool, make_session_key
+from backend.utils.deadline_scheduler import DeadlineScheduler
+from backend.utils.metrics import SESSION_REATTACHES
+
+
+@pytest.fixture
+def pool():
+    scheduler = DeadlineScheduler(name="Test-Scheduler")
+    config = MagicMock(idle_timeout=300, preferred_web_port=8765)
+    with patch("backend.server_pool.get_server_config", return_value=config), \
+            patch("backend.server_pool.get_scheduler", return_value=scheduler), \
+            patch.object(EnhancedServerPool, "_load_registry_state"):
+        pool = EnhancedServerPool()
+    yield pool
+    pool.shutdown()
+    scheduler.shutdown()
+
+
+def _manager_factory(results):
+    """创建模拟服务器，wait_for_feedback 阻塞到测试给出结果"""
+    managers = []
+    next_port = iter(range(9100, 9200))
+
+    def create():
+        manager = MagicMock()
+        manager.start_server.return_value = next(next_port)
+        manager.wait_for_feedback.side_effect = lambda timeout: results.get()
+        managers.append(manager)
+        return manager
+
+    return create, managers
+
+
+class _Results:
+    """按顺序交给等待中的模拟服务器的结果"""
+
+    def __init__(self):
+        self._items = []
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._items, timeout=5)
+            return self._items.pop(0)
+
+
+def _run_async(pool, session_id):
+    outcome = {}
+
+    def run():
+        outcome["value"] = pool.run_session(session_id, "汇报", 60)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+class TestSessionKey:
+    """测试会话ID生成"""
+
+    def test_key_depends_on_content_and_idempotency_key(self):
+        content = {"work_summary": "".join(["汇", "报"]), "timeout_seconds": 300}
+        assert make_session_key("feedback", content) == make_session_key(
+            "feedback", {"timeout_seconds": 300, "work_summary": "汇报"}
+        )
+        assert make_session_key("feedback", content) != make_session_key("feedback", {**content, "timeout_seconds": 60})
+        assert make_session_key("feedback", content, "a") != make_session_key("feedback", content, "b")
+        assert make_session_key("feedback", content).startswith("feedback_")
+
+
+class TestRunSession:
+    """测试重试挂接与隔离"""
+
+    def test_retry_attaches_to_pending_session(self, pool):
+        results = _Results()
+        create, managers = _manager_factory(results)
+        before = SESSION_REATTACHES.get(state="pending")
+
+        with patch("backend.server_pool.ServerManager", side_effect=create):
+            first, first_outcome = _run_async(pool, "s1")
+            deadline = time.monotonic() + 2
+            while not managers or not managers[0].wait_for_feedback.called:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            retry, retry_outcome = _run_async(pool, "s1")
+            time.sleep(0.05)
+
+            results.put({"text_feedback": "ok"})
+            first.join(2)
+            retry.join(2)
+
+        assert len(managers) == 1 and managers[0].start_server.call_count == 1
+        assert first_outcome["value"] == retry_outcome["value"] == (managers[0], {"text_feedback": "ok"})
+        assert SESSION_REATTACHES.get(state="pending") == before + 1
+
+    def test_submitted_result_is_retained_but_timeout_is_not(self, pool):
+        results = _Results()
+        create, managers = _manager_factory(results)
+
+        with patch("backend.server_pool.ServerManager", side_effect=create):
+            results.put({"text_feedback": "ok"})
+            server, result = pool.run_session("done", "汇报", 60)
+            assert pool.run_session("done", "汇报", 60) == (server, result)
+
+            results.put({"is_timeout": True, "timeout_reason": "total_timeout"})
+            pool.run_session("timed_out", "汇报", 60)
+            results.put({"text_feedback": "second"})
+            assert pool.run_session("timed_out", "汇报", 60)[1] == {"text_feedback": "second"}
+
+        # 保留的结果不再启动服务器，超时后的调用重新启动
+        assert sum(m.start_server.call_count for m in managers) == 3
+
+    def test_distinct_sessions_run_concurrently(self, pool):
+        results = _Results()
+        create, managers = _manager_factory(results)
+
+        with patch("backend.server_pool.ServerManager", side_effect=create):
+            threads = [_run_async(pool, f"s{i}") for i in range(3)]
+            deadline = time.monotonic() + 2
+            while sum(m.wait_for_feedback.called for m in managers) < 3:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            for i in range(3):
+                results.put({"text_feedback": str(i)})
+            for thread, _ in threads:
+                thread.join(2)
+
+        assert len({outcome["value"][0] for _, outcome in threads}) == 3
+        assert sorted(outcome["value"][1]["text_feedback"] for _, outcome in threads) == ["0", "1", "2"]
+
+    def test_failure_is_not_retained(self, pool):
+        with patch("backend.server_pool.ServerManager") as mock_manager:
+            mock_manager.return_value.start_server.side_effect = OSError("端口绑定失败")
+            with pytest.raises(OSError):
+                pool.run_session("broken", "汇报", 60)
+            assert "broken" not in pool._calls
+
+
+class TestPickImageSession:
+    """测试图片选择工具的幂等会话"""
+
+    def test_retry_reuses_the_picked_image(self, pool):
+        import base64
+
+        from backend.server import pick_image
+
+        results = _Results()
+        create, managers = _manager_factory(results)
+        picked = {"success": True, "has_images": True,
+                  "images": [{"data": base64.b64encode(b"\x89PNG\r\n\x1a\npicked").decode(), "mime": "image/png"}]}
+
+        with patch("backend.server_pool.ServerManager", side_effect=create), \
+                patch("backend.server_pool.record_feedback"), \
+                patch("backend.server.get_server_pool", return_value=pool), \
+                patch("backend.server.release_managed_server", side_effect=pool.release_server):
+            results.put(picked)
+            first = pick_image(idempotency_key="shot-1")
+            assert pick_image(idempotency_key="shot-1").data == first.data == b"\x89PNG\r\n\x1a\npicked"
+            assert len(managers) == 1
+
+            results.put(picked)
+            pick_image(idempotency_key="shot-2")
+
+        assert len(managers) == 2
+        # 图片选择始终打开完整页面，不在收件箱中列出
+        assert managers[0].start_server.call_args.kwargs["use_inbox"] is False
+        # 页面关闭通知按会话ID释放，会话ID随启动参数传给页面
+        assert managers[0].start_server.call_args.kwargs["session_id"].startswith("image_picker_")
+        assert all(session_id.startswith("image_picker_") for session_id in pool._calls)
+
+    def test_keyless_calls_pick_again(self, pool):
+        import base64
+
+        from backend.server import pick_image
+
+        results = _Results()
+        create, managers = _manager_factory(results)
+
+        def picked(data):
+            return {"success": True, "has_images": True,
+                    "images": [{"data": base64.b64encode(data).decode(), "mime": "image/png"}]}
+
+        with patch("backend.server_pool.ServerManager", side_effect=create), \
+                patch("backend.server_pool.record_feedback"), \
+                patch("backend.server.get_server_pool", return_value=pool), \
+                patch("backend.server.release_managed_server", side_effect=pool.release_server):
+            results.put(picked(b"\x89PNG\r\n\x1a\nfirst"))
+            first = pick_image()
+            results.put(picked(b"\x89PNG\r\n\x1a\nsecond"))
+            second = pick_image()
+
+        # 未提供幂等键时每次调用都是独立的会话，返回新选择的图片
+        assert len(managers) == 2 and len(pool._calls) == 2
+        assert (first.data, second.data) == (b"\x89PNG\r\n\x1a\nfirst", b"\x89PNG\r\n\x1a\nsecond")
+
+    def test_picked_image_keeps_its_format(self, pool):
+        import base64
+
+        from backend.server import pick_image
+
+        results = _Results()
+        create, _ = _manager_factory(results)
+        webp = b"RIFF\x1a\x00\x00\x00WEBPVP8 picked"
+
+        with patch("backend.server_pool.ServerManager", side_effect=create), \
+                patch("backend.server_pool.record_feedback"), \
+                patch("backend.server.get_server_pool", return_value=pool), \
+                patch("backend.server.release_managed_server", side_effect=pool.release_server):
+            results.put({"success": True, "has_images": True,
+                         "images": [{"data": base64.b64encode(webp).decode(), "mime": "image/webp"}]})
+            image = pick_image()
+
+        assert image.data == webp
+        assert image.to_image_content().mimeType == "image/webp"
@@ -0,0 +1,136 @@
+"""
+图片资源链接单元测试
+验证图片按内容寻址保存、资源读取与尺寸变体、保留期过期清理，以及 reference 模式的工具结果
+"""
+
+import base64
+import io
+import json
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from mcp.types import TextContent
+
+from backend.feedback_handler import FeedbackHandler, image_to_mcp
+from backend.utils.image_resources import ATTACHMENT_URI_PREFIX, ImageResourceStore
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(width, height):
+    output = io.BytesIO()
+    PIL.new("RGB", (width, height), "red").save(output, format="JPEG")
+    return output.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageResourceStore(str(tmp_path / "resources"), retention_seconds=60)
+    yield store
+    store.close()
+
+
+def _split(uri):
+    ref, _, extension = uri[len(ATTACHMENT_URI_PREFIX):].rpartition(".")
+    return ref, extension
+
+
+class TestImageResourceStore:
+    """测试图片资源存储"""
+
+    def test_add_returns_link_and_read_serves_bytes(self, store):
+        data = _jpeg(2000, 1000)
+        link = store.add(data, filename="shot.jpeg")
+        assert link["uri"].startswith(ATTACHMENT_URI_PREFIX) and link["uri"].endswith(".jpg")
+        assert link["mime_type"] == "image/jpeg" and link["size"] == len(data)
+        assert (link["width"], link["height"]) == (2000, 1000)
+        assert store.add(data)["uri"] == link["uri"]
+
+        assert store.read(*_split(link["uri"])) == (data, "image/jpeg")
+
+    def test_size_variants(self, store):
+        link = store.add(_jpeg(600, 300))
+        # 长边未超过的尺寸不提供变体
+        assert list(link["variants"]) == ["256"]
+
+        variant, mime = store.read(*_split(link["variants"]["256"]))
+        assert mime == "image/jpeg"
+        assert PIL.open(io.BytesIO(variant)).size == (256, 128)
+        ref, _ = _split(link["uri"])
+        with pytest.raises(ValueError):
+            store.read(f"{ref}-999", "jpg")
+
+    def test_variants_are_generated_in_background(self, store):
+        link = store.add(_jpeg(2000, 1000))
+        ref, _ = _split(link["uri"])
+        paths = [store._path(ref, "image/jpeg", size) for size in (256, 1024)]
+        deadline = time.monotonic() + 5
+        while not all(os.path.exists(path) for path in paths):
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+        # 已缓存的变体直接读取，不在资源读取中解码
+        with patch("backend.utils.image_resources._make_variant") as make_variant:
+            variant, _ = store.read(*_split(link["variants"]["1024"]))
+        make_variant.assert_not_called()
+        assert PIL.open(io.BytesIO(variant)).size == (1024, 512)
+
+    def test_oversized_images_have_no_variants(self, store):
+        with patch("backend.utils.image_resources.MAX_VARIANT_PIXELS", 100 * 100):
+            link = store.add(_jpeg(400, 300))
+            assert link["variants"] == {}
+            ref, _ = _split(link["uri"])
+            with pytest.raises(ValueError):
+                store.read(f"{ref}-256", "jpg")
+
+    def test_rejects_unknown_or_mismatched_refs(self, store):
+        link = store.add(_jpeg(10, 10))
+        ref, _ = _split(link["uri"])
+        for args in ((ref, "png"), ("0" * 64, "jpg"), ("../etc/passwd", "jpg"), (ref, "exe")):
+            with pytest.raises(ValueError):
+                store.read(*args)
+
+    def test_links_expire_and_cleanup_removes_files(self, store):
+        link = store.add(_jpeg(10, 10))
+        ref, extension = _split(link["uri"])
+        path = store._path(ref, "image/jpeg")
+        stale = time.time() - 120
+        os.utime(path, (stale, stale))
+
+        with pytest.raises(ValueError):
+            store.read(ref, extension)
+        assert store.cleanup() is None
+        assert not os.path.exists(path)
+
+
+class TestReferenceDelivery:
+    """测试 reference 模式下的工具结果"""
+
+    @pytest.fixture
+    def reference_mode(self, store):
+        config = MagicMock(image_delivery="reference")
+        with patch("backend.feedback_handler.get_feedback_config", return_value=config), \
+                patch("backend.utils.image_resources.get_image_resource_store", return_value=store):
+            yield store
+
+    def test_feedback_images_become_links(self, reference_mode):
+        data = _jpeg(50, 40)
+        handler = FeedbackHandler()
+        handler.submit_feedback({
+            "text": "见截图",
+            "images": [{"data": base64.b64encode(data).decode(), "filename": "a.jpg"}],
+        })
+        contents = handler.process_feedback_to_mcp(handler.get_result_nowait())
+
+        link = json.loads(contents[0].text)
+        assert link["type"] == "image_resource" and link["filename"] == "a.jpg"
+        assert len(contents[0].text) < 1000
+        assert reference_mode.read(*_split(link["uri"]))[0] == data
+
+    def test_inline_is_default(self):
+        config = MagicMock(image_delivery="inline")
+        with patch("backend.feedback_handler.get_feedback_config", return_value=config):
+            item = image_to_mcp(b"\x89PNG\r\n\x1a\nfake")
+        assert not isinstance(item, TextContent) and item.data == b"\x89PNG\r\n\x1a\nfake"
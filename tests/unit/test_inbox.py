@@ -0,0 +1,341 @@
+"""
+反馈收件箱单元测试
+验证会话按截止时间列出、新请求通过收件箱推送、在收件箱中回答，以及只有没有收件箱页面时才打开浏览器
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from backend.app import FeedbackApp
+from backend.feedback_handler import FeedbackHandler
+from backend.inbox import InboxApp, InboxSession, parse_suggest_options
+
+
+def _session(session_id, deadline, handler=None, **kwargs):
+    return InboxSession(
+        session_id=session_id,
+        work_summary=f"汇报-{session_id}",
+        deadline=deadline,
+        url="http://127.0.0.1:8765/",
+        feedback_handler=handler or FeedbackHandler(),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def inbox():
+    inbox = InboxApp()
+    flask_app = inbox.create_app()
+    flask_app.config["TESTING"] = True
+    return inbox, flask_app
+
+
+def _events(client, name):
+    return [m["args"][0] for m in client.get_received() if m["name"] == name]
+
+
+class TestInboxApp:
+    """测试收件箱的会话推送和回答"""
+
+    def test_lists_sessions_by_deadline_and_pushes_changes(self, inbox):
+        inbox, flask_app = inbox
+        now = time.time()
+        inbox.add_session(_session("late", now + 300))
+        inbox.add_session(_session("soon", now + 60))
+        inbox.flush_outbox()
+
+        client = inbox.socketio.test_client(flask_app, auth={"token": inbox.token})
+        state = _events(client, "inbox_state")[0]
+        assert [s["session_id"] for s in state["sessions"]] == ["soon", "late"]
+        assert inbox.has_clients()
+
+        inbox.add_session(_session("new", now + 120, suggest=["好的"]))
+        inbox.update_deadline("late", now + 30)
+        inbox.remove_session("soon")
+        inbox.flush_outbox()
+        received = [(m["name"], m["args"][0]["session_id"]) for m in client.get_received()]
+        assert received == [("session_added", "new"), ("session_updated", "late"), ("session_removed", "soon")]
+        assert [s["session_id"] for s in inbox.list_sessions()] == ["late", "new"]
+
+        client.disconnect()
+        assert not inbox.has_clients()
+
+    def test_submit_answers_the_selected_session(self, inbox):
+        inbox, flask_app = inbox
+        handler = FeedbackHandler()
+        inbox.add_session(_session("s1", time.time() + 60, handler))
+        client = inbox.socketio.test_client(flask_app, auth={"token": inbox.token})
+
+        client.emit("inbox_submit", {"session_id": "s1", "text": "在收件箱中回答"})
+        assert _events(client, "feedback_received") == [{"session_id": "s1", "success": True}]
+        assert handler.get_result_nowait()["text_feedback"] == "在收件箱中回答"
+
+        client.emit("inbox_submit", {"session_id": "missing", "text": "晚了"})
+        assert _events(client, "submit_rejected")[0]["reason"] == "session_closed"
+        client.disconnect()
+
+    def test_browser_opens_only_without_connected_inbox(self, inbox):
+        inbox, flask_app = inbox
+        assert inbox.claim_browser_launch() is True
+        # 刚打开的页面还未连接时，并发到达的请求不再重复打开
+        assert inbox.claim_browser_launch() is False
+
+        inbox._browser_opened_at = None
+        client = inbox.socketio.test_client(flask_app, auth={"token": inbox.token})
+        assert inbox.claim_browser_launch() is False
+        client.disconnect()
+
+    def test_socket_requires_token_and_own_origin(self, inbox):
+        inbox, flask_app = inbox
+        for auth in (None, {}, {"token": "wrong-token"}):
+            client = inbox.socketio.test_client(flask_app, auth=auth)
+            assert not client.is_connected()
+        assert not inbox.has_clients()
+
+        inbox.port = 8764
+        assert inbox._is_allowed_origin("http://127.0.0.1:8764")
+        assert inbox._is_allowed_origin("http://localhost:8764")
+        for origin in ("https://evil.example", "http://127.0.0.1:9999", None):
+            assert not inbox._is_allowed_origin(origin)
+
+    def test_page_carries_the_socket_token(self, inbox):
+        inbox, flask_app = inbox
+        page = flask_app.test_client().get("/").get_data(as_text=True)
+        assert inbox.token in page
+
+    def test_parse_suggest_options(self):
+        assert parse_suggest_options('["是", 2]') == ["是", "2"]
+        assert parse_suggest_options("") == [] and parse_suggest_options("{") == []
+
+
+class TestInboxSessionWait:
+    """测试会话在收件箱中等待和回答"""
+
+    def test_inbox_client_counts_as_session_client(self, inbox):
+        inbox, flask_app = inbox
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        manager.app = FeedbackApp(manager.feedback_handler, work_summary="收件箱会话")
+        manager.current_port = 8765
+        with patch("backend.server_manager.get_inbox", return_value=inbox):
+            assert manager._join_inbox("收件箱会话", 60, '["好的"]') is inbox
+        session_id = manager.inbox_session_id
+        assert inbox.list_sessions()[0]["suggest"] == ["好的"]
+        assert not manager.app.has_active_clients()
+
+        client = inbox.socketio.test_client(flask_app, auth={"token": inbox.token})
+        assert manager.app.has_active_clients()
+        timer = threading.Timer(0.1, client.emit, ("inbox_submit", {"session_id": session_id, "text": "好的"}))
+        timer.start()
+        result = manager.wait_for_feedback(30)
+
+        assert result["text_feedback"] == "好的"
+        # 回答后会话从收件箱中移除，不再关联收件箱
+        assert inbox.list_sessions() == [] and manager.app.inbox is None
+        client.disconnect()
+        manager.app.stop()
+
+    @pytest.mark.parametrize("kwargs", [
+        {"use_inbox": False},
+        {"batch_items": [{"id": "q1", "summary": "问题", "suggest": [], "request_image": False}]},
+    ])
+    def test_image_and_batch_sessions_skip_inbox(self, kwargs):
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        with patch("backend.server_manager.FeedbackApp"), \
+                patch("backend.server_manager.find_free_port", return_value=8080), \
+                patch("backend.server_manager.threading.Thread"), \
+                patch("backend.server_manager.get_inbox") as get_inbox, \
+                patch.object(manager, "_wait_for_server_ready", return_value=True):
+            assert manager.start_server("需要完整页面", 60, **kwargs) == 8080
+        get_inbox.assert_not_called()
+        assert manager.inbox is None
+
+
+class TestInboxStartup:
+    """测试收件箱按需启动和SSH转发提示"""
+
+    def test_start_listens_without_waiting(self):
+        from backend.utils.network_utils import find_free_port
+
+        port = find_free_port(preferred_port=19764)
+        inbox = InboxApp()
+        started = time.monotonic()
+        assert inbox.start(port) == port
+        assert time.monotonic() - started < 1
+
+        import urllib.request
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+            assert "反馈收件箱" in response.read().decode("utf-8")
+        # 端口固定使用，被占用时不顺延
+        with pytest.raises(OSError):
+            InboxApp().start(port)
+
+    def test_disabled_inbox_is_not_started_or_hinted(self):
+        from unittest.mock import MagicMock
+
+        from backend.inbox import get_inbox
+        from backend.port_info import get_inbox_ssh_hint
+
+        with patch("backend.config.get_server_config", return_value=MagicMock(inbox_enabled=False)), \
+                patch("backend.port_info.get_server_config", return_value=MagicMock(inbox_enabled=False)):
+            assert get_inbox() is None
+            assert get_inbox_ssh_hint() is None
+
+        config = MagicMock(inbox_enabled=True, inbox_port=8764)
+        with patch("backend.port_info.get_server_config", return_value=config):
+            assert get_inbox_ssh_hint()["command"] == "ssh -L 8764:127.0.0.1:8764 your_user@your_server"
+
+
+class _SessionPage:
+    """模拟其他进程中的会话页面，处理一次提交并记录转发的回答"""
+
+    def __init__(self):
+        import http.server
+
+        received = self.received = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                import json
+
+                received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        self.server.timeout = 10
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.thread = threading.Thread(target=self.server.handle_request, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.thread.join(10)
+        self.server.server_close()
+
+
+class TestSharedInbox:
+    """测试多个进程共用一个收件箱"""
+
+    @pytest.fixture
+    def owner(self):
+        from backend.utils.network_utils import find_free_port
+
+        inbox = InboxApp()
+        inbox.start(find_free_port(preferred_port=19864))
+        yield inbox, inbox._flask_app
+
+    def test_remote_sessions_are_listed_and_answered(self, owner):
+        from backend.inbox import RemoteInbox
+
+        from backend.utils.network_utils import find_free_port
+
+        inbox, flask_app = owner
+        page = _SessionPage()
+        closed_url = f"http://127.0.0.1:{find_free_port(preferred_port=19870)}/"
+        remote = RemoteInbox(inbox.port, inbox.token)
+        listener_calls = []
+        remote.add_client_listener(lambda: listener_calls.append(remote.has_clients()))
+        try:
+            remote.add_session(InboxSession("remote", "其他进程的汇报", time.time() + 60, page.url, None, ["好的"]))
+            remote.add_session(InboxSession("gone", "已结束", time.time() + 30, closed_url, None))
+            remote.update_deadline("remote", time.time() + 90)
+            assert [s["session_id"] for s in inbox.list_sessions()] == ["gone", "remote"]
+            assert not remote.has_clients()
+
+            client = inbox.socketio.test_client(flask_app, auth={"token": inbox.token})
+            _wait_for(lambda: remote.has_clients())
+            assert listener_calls == [True]
+            # 已有收件箱页面时由收件箱决定不再打开浏览器
+            assert remote.claim_browser_launch() is False
+
+            client.emit("inbox_submit", {"session_id": "remote", "text": "在收件箱中回答"})
+            assert _events(client, "feedback_received") == [{"session_id": "remote", "success": True}]
+            assert page.received == [{"textFeedback": "在收件箱中回答"}]
+
+            # 会话页面已关闭的会话从收件箱中移除
+            client.emit("inbox_submit", {"session_id": "gone", "text": "晚了"})
+            assert _events(client, "submit_rejected")[0]["reason"] == "session_closed"
+            remote.remove_session("remote")
+            assert inbox.list_sessions() == []
+
+            client.disconnect()
+            assert remote.available
+        finally:
+            page.close()
+
+    def test_other_origins_cannot_open_a_socket(self, owner):
+        import urllib.error
+        import urllib.request
+
+        inbox, _ = owner
+        url = f"http://127.0.0.1:{inbox.port}/socket.io/?EIO=4&transport=polling"
+        request = urllib.request.Request(url, headers={"Origin": "https://evil.example"})
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(request, timeout=5)
+        assert excinfo.value.code == 400
+
+        request = urllib.request.Request(url, headers={"Origin": f"http://localhost:{inbox.port}"})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200
+
+    def test_requests_need_the_registered_token(self, owner):
+        from backend.inbox import RemoteInbox
+
+        inbox, _ = owner
+        remote = RemoteInbox(inbox.port, "wrong-token")
+        with pytest.raises(OSError):
+            remote.add_session(InboxSession("s", "汇报", time.time() + 60, "http://127.0.0.1:1/", None))
+        assert not remote.available and inbox.list_sessions() == []
+
+    def test_processes_elect_one_inbox_through_the_registry(self, tmp_path, monkeypatch):
+        import dataclasses
+        import os
+
+        import backend.inbox as inbox_module
+        from backend.config import get_server_config
+        from backend.utils.network_utils import find_free_port
+        from backend.utils.session_registry import SessionRegistry
+
+        registry = SessionRegistry(str(tmp_path / "sessions.db"))
+        port = find_free_port(preferred_port=19964)
+        monkeypatch.setattr(inbox_module, "_inbox", None)
+        monkeypatch.setattr(inbox_module, "get_session_registry", lambda: registry)
+        config = dataclasses.replace(get_server_config(), inbox_enabled=True, inbox_port=port)
+        with patch("backend.config.get_server_config", return_value=config):
+            # 没有所有者时本进程监听收件箱端口并登记
+            owner = inbox_module.get_inbox()
+            assert isinstance(owner, InboxApp) and owner.port == port
+            assert registry.get_inbox_owner(port)["pid"] == os.getpid()
+            assert inbox_module.get_inbox() is owner
+
+            # 其他存活进程已登记时注册到它的收件箱
+            registry.claim_inbox(os.getppid(), port, owner.token)
+            monkeypatch.setattr(inbox_module, "_inbox", None)
+            remote = inbox_module.get_inbox()
+            assert isinstance(remote, inbox_module.RemoteInbox) and remote.port == port
+
+            # 收件箱不可达后重新选择
+            remote.available = False
+            registry.remove_process(os.getppid())
+            with pytest.raises(OSError):
+                # 端口仍被第一个收件箱监听，本进程无法接管
+                InboxApp().start(port)
+            assert inbox_module.get_inbox() is None
+        registry.close()
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
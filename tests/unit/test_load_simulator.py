@@ -0,0 +1,141 @@
+"""
+负载测试工具单元测试
+验证会话计划生成、录制文件读写、跟踪还原，以及对真实服务器的端到端模拟
+"""
+
+import os
+import random
+from unittest.mock import patch
+
+import pytest
+
+from tests.load.simulator import (
+    LatencyRecorder,
+    ResourceSampler,
+    build_synthetic_plan,
+    load_recording,
+    plans_from_traces,
+    run_load,
+    save_recording,
+)
+
+
+class TestPlans:
+    """测试会话计划"""
+
+    def test_synthetic_plan_order(self):
+        plan = build_synthetic_plan(
+            "s0", random.Random(1), think_time=(10, 10), heartbeat_interval=3,
+            reconnect_probability=0.0, image_count=2,
+        )
+
+        actions = [event.action for event in plan.events]
+        assert actions == ["load_page", "connect", "heartbeat", "heartbeat", "heartbeat", "submit", "disconnect"]
+        assert plan.duration == pytest.approx(10)
+        assert plan.events[-2].params["image_count"] == 2
+
+    def test_reconnect_inserted_before_submit(self):
+        plan = build_synthetic_plan(
+            "s0", random.Random(1), think_time=(10, 10), heartbeat_interval=100,
+            reconnect_probability=1.0, reconnect_delay=1.0,
+        )
+
+        actions = [event.action for event in plan.events]
+        assert actions == ["load_page", "connect", "disconnect", "connect", "submit", "disconnect"]
+        offsets = [event.offset for event in plan.events]
+        assert offsets == sorted(offsets)
+
+    def test_recording_roundtrip(self, tmp_path):
+        path = str(tmp_path / "plan.jsonl")
+        plans = [build_synthetic_plan(f"s{i}", random.Random(i), think_time=(1, 2), heartbeat_interval=0.5) for i in range(3)]
+
+        save_recording(plans, path)
+        loaded = {plan.session: plan for plan in load_recording(path)}
+
+        assert set(loaded) == {"s0", "s1", "s2"}
+        for plan in plans:
+            assert [e.action for e in loaded[plan.session].events] == [e.action for e in plan.events]
+            assert loaded[plan.session].duration == pytest.approx(plan.duration, abs=1e-5)
+
+    def test_plans_from_traces(self):
+        origin = 1_000_000_000_000
+        spans = [
+            {"traceId": "a" * 32, "spanId": "r", "parentSpanId": "", "name": "tool.collect_feedback",
+             "startTimeUnixNano": str(origin), "endTimeUnixNano": str(origin + 40 * 10**9)},
+            {"traceId": "a" * 32, "spanId": "w", "parentSpanId": "r", "name": "feedback.wait",
+             "startTimeUnixNano": str(origin), "endTimeUnixNano": str(origin + 40 * 10**9),
+             "events": [
+                 {"timeUnixNano": str(origin + 2 * 10**9), "name": "websocket.connect"},
+                 {"timeUnixNano": str(origin + 39 * 10**9), "name": "websocket.disconnect"},
+             ]},
+            {"traceId": "a" * 32, "spanId": "s", "parentSpanId": "w", "name": "feedback.submit",
+             "startTimeUnixNano": str(origin + 38 * 10**9), "endTimeUnixNano": str(origin + 38 * 10**9),
+             "attributes": [{"key": "image_count", "value": {"intValue": "3"}}]},
+            # 没有提交的跟踪（超时）不会被还原
+            {"traceId": "b" * 32, "spanId": "r2", "parentSpanId": "", "name": "tool.collect_feedback",
+             "startTimeUnixNano": str(origin), "endTimeUnixNano": str(origin)},
+        ]
+
+        plans = plans_from_traces(spans)
+
+        assert len(plans) == 1
+        events = [(event.offset, event.action) for event in plans[0].events]
+        assert events == [(2.0, "load_page"), (2.0, "connect"), (38.0, "submit"), (39.0, "disconnect")]
+        assert plans[0].events[2].params == {"image_count": 3}
+
+
+class TestMeasurements:
+    """测试延迟统计和资源采样"""
+
+    def test_recorder_percentiles(self):
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record("submit_ack", ms / 1000)
+        recorder.error("connect")
+
+        summary = recorder.summary()
+        stats = summary["latencies"]["submit_ack"]
+        assert stats["count"] == 100
+        assert stats["p50"] == pytest.approx(0.050)
+        assert stats["p99"] == pytest.approx(0.099)
+        assert summary["errors"] == {"connect": 1}
+
+    @pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="需要 /proc 文件系统")
+    def test_sampler_reads_process_stats(self):
+        sampler = ResourceSampler(interval=60)
+        sampler.start()
+        sampler.stop()
+
+        summary = sampler.summary()
+        assert summary["rss_kb"]["max"] > 0
+        assert summary["threads"]["start"] >= 1
+        assert summary["fds"]["end"] > 0
+
+
+class TestEndToEnd:
+    """对真实的反馈服务器运行模拟会话"""
+
+    def test_sessions_against_live_server(self):
+        from backend.server_manager import ServerManager
+
+        manager = ServerManager()
+        with patch("backend.server_manager.open_feedback_browser"):
+            port = manager.start_server(work_summary="负载测试", timeout_seconds=60)
+        try:
+            rng = random.Random(7)
+            plans = [
+                build_synthetic_plan(
+                    f"s{i}", rng, think_time=(0.3, 0.5), heartbeat_interval=0.1,
+                    reconnect_probability=1.0, reconnect_delay=0.05, image_count=1, image_bytes=4096,
+                )
+                for i in range(2)
+            ]
+
+            report = run_load(plans, lambda index, plan: f"http://127.0.0.1:{port}", sample_interval=60)
+        finally:
+            manager.stop_server()
+
+        assert report["errors"] == {}
+        for name in ("page_load", "connect", "heartbeat_rtt", "reconnect", "submit_ack"):
+            assert report["latencies"][name]["count"] >= 2, name
+        assert report["resources"]["threads"]["max"] >= 1
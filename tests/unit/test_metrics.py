@@ -0,0 +1,150 @@
+"""
+指标注册表单元测试
+验证 Prometheus 文本格式输出、直方图分桶、抓取时采集，以及 /metrics 端点
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend.utils.metrics import METRICS_CONTENT_TYPE, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """测试指标注册表"""
+
+    def test_counter_and_gauge_render(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_events_total", "事件数量", labelnames=("kind",))
+        gauge = registry.gauge("test_depth", "队列深度")
+
+        counter.inc(kind="a")
+        counter.inc(2, kind="b")
+        gauge.set(3)
+
+        text = registry.render()
+        assert "# TYPE test_events_total counter" in text
+        assert 'test_events_total{kind="a"} 1' in text
+        assert 'test_events_total{kind="b"} 2' in text
+        assert "# TYPE test_depth gauge" in text
+        assert "test_depth 3" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "耗时", buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'test_seconds_bucket{le="0.1"} 2' in text
+        assert 'test_seconds_bucket{le="1"} 3' in text
+        assert 'test_seconds_bucket{le="+Inf"} 4' in text
+        assert "test_seconds_count 4" in text
+        assert histogram.get_count() == 4
+        assert histogram.get_sum() == pytest.approx(5.65)
+
+    def test_label_mismatch_raises(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "计数", labelnames=("kind",))
+
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+
+    def test_register_returns_existing_metric(self):
+        registry = MetricsRegistry()
+        first = registry.counter("test_total", "计数")
+
+        assert registry.counter("test_total", "计数") is first
+        with pytest.raises(ValueError):
+            registry.gauge("test_total", "计数")
+
+    def test_collectors_run_only_on_render(self):
+        registry = MetricsRegistry()
+        collector = MagicMock(return_value=[("test_clients", {"session_id": "s1"}, 2)])
+        registry.register_collector({"test_clients": "客户端数量"}, collector)
+
+        collector.assert_not_called()
+        text = registry.render()
+        collector.assert_called_once()
+        assert 'test_clients{session_id="s1"} 2' in text
+
+        registry.unregister_collector(collector)
+        assert "test_clients" not in registry.render()
+
+    def test_failing_collector_does_not_break_render(self):
+        registry = MetricsRegistry()
+        registry.counter("test_total", "计数").inc()
+        registry.register_collector({"test_broken": "出错"}, MagicMock(side_effect=RuntimeError("采集失败")))
+
+        text = registry.render()
+        assert "test_total 1" in text
+        assert "# TYPE test_broken gauge" in text
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("test_total", "计数", labelnames=("kind",)).inc(kind='a"b\\c')
+
+        assert 'test_total{kind="a\\"b\\\\c"} 1' in registry.render()
+
+
+class TestPipelineMetrics:
+    """测试反馈管道的埋点"""
+
+    def test_submit_records_payload_and_images(self):
+        from backend.feedback_handler import FeedbackHandler
+        from backend.utils.metrics import SUBMIT_IMAGE_COUNT, SUBMIT_PAYLOAD_BYTES
+
+        before_count = SUBMIT_IMAGE_COUNT.get_count(source="websocket")
+        before_bytes = SUBMIT_PAYLOAD_BYTES.get_sum(source="websocket")
+
+        FeedbackHandler().submit_feedback({
+            "text": "好",
+            "images": [{"data": "QUJD"}, {"data": "REVG"}],
+            "source_event": "websocket_submit",
+        })
+
+        assert SUBMIT_IMAGE_COUNT.get_count(source="websocket") == before_count + 1
+        assert SUBMIT_PAYLOAD_BYTES.get_sum(source="websocket") == before_bytes + 3 + 8
+
+    def test_timeout_result_counts_outcome(self):
+        from backend.server_manager import ServerManager
+        from backend.utils.metrics import WAIT_OUTCOMES
+
+        before = WAIT_OUTCOMES.get(outcome="total_timeout")
+        ServerManager()._create_timeout_result("total_timeout")
+
+        assert WAIT_OUTCOMES.get(outcome="total_timeout") == before + 1
+
+    def test_pool_collector_reports_sessions(self):
+        from backend.server_pool import EnhancedServerPool
+        from backend.utils.metrics import get_metrics_registry
+
+        config = MagicMock(idle_timeout=300, preferred_web_port=8765)
+        with patch("backend.server_pool.get_server_config", return_value=config), \
+                patch.object(EnhancedServerPool, "_load_registry_state"):
+            pool = EnhancedServerPool()
+        try:
+            pool.get_server("metrics_session")
+            text = get_metrics_registry().render()
+        finally:
+            pool.shutdown()
+
+        assert 'mcp_feedback_sessions{status="idle"} 1' in text
+        assert 'mcp_feedback_result_queue_depth{session_id="metrics_session"} 0' in text
+        assert "metrics_session" not in get_metrics_registry().render()
+
+
+class TestMetricsEndpoint:
+    """测试 /metrics 端点"""
+
+    def test_metrics_route_serves_text_format(self):
+        from backend.app import FeedbackApp
+        from backend.feedback_handler import FeedbackHandler
+
+        client = FeedbackApp(FeedbackHandler()).create_app().test_client()
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == METRICS_CONTENT_TYPE
+        assert "# TYPE mcp_feedback_startup_phase_seconds histogram" in response.get_data(as_text=True)
@@ -8,7 +8,11 @@ import socket
 import logging
 from unittest.mock import patch, MagicMock, call
 
-from backend.utils.network_utils import find_free_port, _test_port_availability
+from backend.utils.network_utils import (
+    find_free_port,
+    _test_port_availability,
+    list_listening_ports,
+)
 
 
 class TestFindFreePort(unittest.TestCase):
@@ -274,5 +278,34 @@ class TestTestPortAvailability(unittest.TestCase):
         )
 
 
+class TestListListeningPorts(unittest.TestCase):
+    """测试list_listening_ports函数"""
+
+    PROC_NET_TCP = (
+        "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+        "   0: 0100007F:223D 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1 1\n"
+        "   1: 00000000:0016 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 2 1\n"
+        "   2: 0100007F:223E 0100007F:9C40 01 00000000:00000000 00:00000000 00000000  1000        0 3 1\n"
+        "   3: 0200000A:1F90 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 4 1\n"
+    )
+
+    def _mock_open(self, path, *args, **kwargs):
+        if path == "/proc/net/tcp":
+            from io import StringIO
+            return StringIO(self.PROC_NET_TCP)
+        raise FileNotFoundError(path)
+
+    def test_parses_loopback_listeners_of_user(self):
+        """只返回指定用户在回环/通配地址上的监听端口"""
+        with patch('builtins.open', side_effect=self._mock_open):
+            self.assertEqual(list_listening_ports(uid=1000), [0x223D])
+            self.assertEqual(list_listening_ports(uid=0), [0x16])
+
+    def test_returns_none_without_proc(self):
+        """没有 /proc 时返回None以便调用方回退"""
+        with patch('builtins.open', side_effect=FileNotFoundError):
+            self.assertIsNone(list_listening_ports(uid=1000))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
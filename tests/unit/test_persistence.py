@@ -0,0 +1,123 @@
+"""
+状态持久化工具单元测试
+测试原子写入、状态目录和后台写入器的合并行为
+"""
+
+import os
+import threading
+import time
+
+from backend.utils.persistence import (
+    DebouncedStateWriter,
+    atomic_write_bytes,
+    get_state_dir,
+)
+
+
+class TestStateDir:
+    """测试状态目录解析"""
+
+    def test_env_override(self, tmp_path, monkeypatch):
+        target = tmp_path / "state"
+        monkeypatch.setenv("MCP_FEEDBACK_STATE_DIR", str(target))
+
+        assert get_state_dir() == str(target)
+        assert target.is_dir()
+
+
+class TestAtomicWrite:
+    """测试原子写入"""
+
+    def test_replaces_content_without_leftovers(self, tmp_path):
+        path = tmp_path / "image.bin"
+        atomic_write_bytes(str(path), b"first")
+        atomic_write_bytes(str(path), b"second")
+
+        assert path.read_bytes() == b"second"
+        assert os.listdir(tmp_path) == ["image.bin"]
+
+    def test_readers_never_see_torn_files(self, tmp_path):
+        path = str(tmp_path / "image.bin")
+        sizes = [1000 * (i + 1) for i in range(200)]
+        atomic_write_bytes(path, b"x" * sizes[0])
+        stop = threading.Event()
+        torn = []
+
+        def reader():
+            while not stop.is_set():
+                with open(path, "rb") as f:
+                    size = len(f.read())
+                if size not in sizes:
+                    torn.append(size)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for size in sizes:
+            atomic_write_bytes(path, b"x" * size)
+        stop.set()
+        thread.join()
+
+        assert torn == []
+
+
+class TestDebouncedStateWriter:
+    """测试后台写入器"""
+
+    def test_coalesces_bursts(self):
+        counter = {"snapshots": 0}
+        written = []
+
+        def snapshot():
+            counter["snapshots"] += 1
+            return {"value": counter["snapshots"]}
+
+        writer = DebouncedStateWriter(snapshot, written.append, debounce=0.05, max_delay=0.5)
+        try:
+            for _ in range(100):
+                writer.mark_dirty()
+            time.sleep(0.3)
+
+            assert writer.write_count == 1
+            assert writer.written_version == writer.dirty_version
+            assert written == [{"value": 1}]
+        finally:
+            writer.stop()
+
+    def test_failed_write_waits_for_next_change(self):
+        calls = []
+
+        def write(snapshot):
+            calls.append(snapshot)
+            if len(calls) == 1:
+                raise OSError("磁盘已满")
+
+        writer = DebouncedStateWriter(lambda: {}, write, debounce=10, max_delay=10)
+        try:
+            writer.mark_dirty()
+            assert writer.flush() is False
+            # 失败的版本不反复重试，下一次变更再次写入
+            assert writer.flush() is False
+            writer.mark_dirty()
+            assert writer.flush() is True
+            assert len(calls) == 2 and writer.write_count == 1
+        finally:
+            writer.stop()
+
+    def test_skips_write_when_clean(self):
+        writer = DebouncedStateWriter(lambda: {}, lambda snapshot: None, debounce=0.01)
+        try:
+            assert writer.flush() is False
+            writer.mark_dirty()
+            assert writer.flush() is True
+            assert writer.flush() is False
+            assert writer.write_count == 1
+        finally:
+            writer.stop()
+
+    def test_stop_flushes_pending_changes(self):
+        written = []
+        writer = DebouncedStateWriter(lambda: {"final": True}, written.append, debounce=10, max_delay=10)
+        writer.mark_dirty()
+        writer.stop(flush=True)
+
+        assert written == [{"final": True}]
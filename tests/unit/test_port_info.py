@@ -0,0 +1,99 @@
+"""
+port_info模块单元测试
+验证注册表优先的端口发现、回退探测和结果缓存
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from backend import port_info
+from backend.utils.session_registry import get_session_registry
+
+
+class _PingHandler(BaseHTTPRequestHandler):
+    """模拟反馈服务器的 /ping 接口，响应前稍作延迟"""
+
+    def do_GET(self):
+        time.sleep(0.2)
+        body = json.dumps({"status": "ok"}).encode()
+        self.send_response(200 if self.path == "/ping" else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    port_info.invalidate_port_cache()
+    yield
+    port_info.invalidate_port_cache()
+
+
+class TestRegistryDiscovery:
+    """测试注册表优先的端口发现"""
+
+    def test_uses_session_registry_without_probing(self):
+        registry = get_session_registry()
+        registry.sync_process(os.getppid(), [
+            {"session_id": "a", "port": 9301, "status": "running"},
+            {"session_id": "b", "port": 9302, "status": "idle"},
+        ])
+        try:
+            with patch.dict("sys.modules", {"backend.server_pool": None}), \
+                    patch.object(port_info, "probe_feedback_ports") as mock_probe:
+                assert port_info.get_mcp_server_ports() == [9301]
+            mock_probe.assert_not_called()
+        finally:
+            registry.remove_process(os.getppid())
+
+    def test_falls_back_to_probing_without_registry(self):
+        with patch.dict("sys.modules", {"backend.server_pool": None}), \
+                patch.object(port_info, "get_registry_file_path", return_value="/nonexistent/mcp.db"), \
+                patch.object(port_info, "_list_candidate_ports", return_value=[9401, 9402]), \
+                patch.object(port_info, "probe_feedback_ports", return_value=[9402]) as mock_probe:
+            assert port_info.get_mcp_server_ports() == [9402]
+        mock_probe.assert_called_once_with([9401, 9402])
+
+    def test_results_are_cached_with_ttl(self):
+        with patch.object(port_info, "_get_registry_ports", return_value=[9501]) as mock_registry:
+            assert port_info.get_mcp_server_ports() == [9501]
+            assert port_info.get_mcp_server_ports() == [9501]
+            assert mock_registry.call_count == 1
+
+            port_info.invalidate_port_cache()
+            port_info.get_mcp_server_ports()
+            assert mock_registry.call_count == 2
+
+
+class TestProbeFeedbackPorts:
+    """测试并发探测"""
+
+    def test_probes_run_concurrently(self):
+        servers = []
+        for _ in range(5):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _PingHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+        try:
+            ports = [server.server_address[1] for server in servers]
+            started = time.perf_counter()
+            found = port_info.probe_feedback_ports(ports)
+            elapsed = time.perf_counter() - started
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+
+        assert sorted(found) == sorted(ports)
+        # 每个探测耗时约0.2秒，串行需要1秒以上
+        assert elapsed < 0.8
@@ -0,0 +1,130 @@
+"""
+断线重连宽限期单元测试
+验证浏览器短暂断开时等待继续、宽限期耗尽时结束，以及重连时的会话恢复令牌
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from backend.feedback_handler import FeedbackHandler
+from backend.utils.metrics import SESSION_RESUMES
+
+
+class _FakeApp:
+    """可切换连接状态的模拟应用，状态变化时通知等待线程"""
+
+    def __init__(self):
+        self.connected = True
+        self.session_deadline = None
+        self._listeners = []
+
+    def add_client_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_client_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def has_active_clients(self):
+        return self.connected
+
+    def set_connected(self, connected):
+        self.connected = connected
+        for listener in list(self._listeners):
+            listener()
+
+
+@pytest.fixture
+def manager():
+    from backend.server_manager import ServerManager
+
+    manager = ServerManager()
+    manager.app = _FakeApp()
+    return manager
+
+
+def _later(delay, fn, *args):
+    timer = threading.Timer(delay, fn, args)
+    timer.start()
+    return timer
+
+
+class TestReconnectGrace:
+    """测试等待反馈时的断线宽限期"""
+
+    def test_reconnect_within_grace_keeps_session(self, manager, monkeypatch):
+        monkeypatch.setattr(manager._config, "reconnect_grace_seconds", 5)
+        before = SESSION_RESUMES.get(outcome="resumed")
+
+        _later(0.05, manager.app.set_connected, False)
+        _later(0.15, manager.app.set_connected, True)
+        _later(0.25, manager.feedback_handler.submit_feedback, {"text": "重连后提交", "images": []})
+        result = manager.wait_for_feedback(30)
+
+        assert result["text_feedback"] == "重连后提交"
+        assert SESSION_RESUMES.get(outcome="resumed") == before + 1
+        assert manager.app.session_deadline == pytest.approx(time.time() + 30, abs=2)
+
+    def test_grace_expiry_ends_wait(self, manager, monkeypatch):
+        monkeypatch.setattr(manager._config, "reconnect_grace_seconds", 0.2)
+        before = SESSION_RESUMES.get(outcome="expired")
+
+        _later(0.05, manager.app.set_connected, False)
+        started = time.monotonic()
+        result = manager.wait_for_feedback(30)
+
+        assert result["timeout_reason"] == "websocket_disconnected"
+        assert 0.2 <= time.monotonic() - started < 2
+        assert SESSION_RESUMES.get(outcome="expired") == before + 1
+
+    def test_zero_grace_ends_wait_on_disconnect(self, manager, monkeypatch):
+        monkeypatch.setattr(manager._config, "reconnect_grace_seconds", 0)
+        manager.app.connected = False
+        with patch.object(manager, "_wait_for_websocket_connection", return_value=True):
+            started = time.monotonic()
+            result = manager.wait_for_feedback(30)
+
+        assert result["timeout_reason"] == "websocket_disconnected"
+        assert time.monotonic() - started < 1
+
+
+class TestResumeToken:
+    """测试重连时的会话恢复令牌"""
+
+    @pytest.fixture
+    def feedback_app(self):
+        from backend.app import FeedbackApp
+
+        app = FeedbackApp(FeedbackHandler(), work_summary="测试")
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        yield app, flask_app
+        app.stop()
+
+    @staticmethod
+    def _established(client):
+        return [m["args"][0] for m in client.get_received() if m["name"] == "connection_established"][0]
+
+    def test_resume_token_is_confirmed(self, feedback_app):
+        app, flask_app = feedback_app
+        first = app.socketio.test_client(flask_app)
+        established = self._established(first)
+        assert established["resume_token"] == app.resume_token
+        assert established["resumed"] is False and established["remaining_seconds"] is None
+        first.disconnect()
+
+        app.session_deadline = time.time() + 100
+        resumed = app.socketio.test_client(flask_app, auth={"resume_token": established["resume_token"]})
+        established = self._established(resumed)
+        assert established["resumed"] is True
+        assert 98 <= established["remaining_seconds"] <= 100
+        resumed.disconnect()
+
+    def test_foreign_token_is_not_resumed(self, feedback_app):
+        app, flask_app = feedback_app
+        for auth in ({"resume_token": "other-session"}, {"resume_token": "令牌"}, {"resume_token": 1}):
+            client = app.socketio.test_client(flask_app, auth=auth)
+            assert self._established(client)["resumed"] is False
+            client.disconnect()
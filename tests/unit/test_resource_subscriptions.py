@@ -0,0 +1,129 @@
+"""
+资源订阅单元测试
+验证订阅能力声明、通知合并，以及服务器池状态迁移触发的变更通知
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import anyio
+import mcp.types as types
+from mcp.server.lowlevel import Server
+from mcp.shared.memory import create_connected_server_and_client_session
+from pydantic import AnyUrl
+
+from backend.resource_subscriptions import STATUS_RESOURCE_URI, ResourceSubscriptionManager
+
+
+def _make_server():
+    server = Server("test-subscriptions")
+
+    @server.list_resources()
+    async def list_resources():
+        return []
+
+    return server
+
+
+class TestResourceSubscriptionManager:
+    """测试订阅管理器"""
+
+    def test_capabilities_declare_subscribe(self):
+        server = _make_server()
+        ResourceSubscriptionManager(server)
+
+        options = server.create_initialization_options()
+        assert options.capabilities.resources.subscribe is True
+
+    def test_notify_without_subscribers_is_noop(self):
+        manager = ResourceSubscriptionManager(_make_server())
+        with patch("backend.resource_subscriptions.get_scheduler") as mock_scheduler:
+            manager.notify_changed(STATUS_RESOURCE_URI)
+
+        mock_scheduler.assert_not_called()
+        assert manager._pending == set()
+
+    def test_burst_of_changes_is_coalesced(self):
+        server = _make_server()
+        manager = ResourceSubscriptionManager(server, min_interval=0.2)
+        received = []
+
+        async def message_handler(message):
+            if isinstance(message, types.ServerNotification):
+                received.append((time.monotonic(), message.root))
+
+        async def scenario():
+            async with create_connected_server_and_client_session(
+                server, message_handler=message_handler
+            ) as client:
+                await client.subscribe_resource(AnyUrl(STATUS_RESOURCE_URI))
+                assert manager.subscriber_count(STATUS_RESOURCE_URI) == 1
+
+                # 模拟其他线程中的一连串状态迁移
+                def burst():
+                    for _ in range(50):
+                        manager.notify_changed(STATUS_RESOURCE_URI)
+
+                await anyio.to_thread.run_sync(burst)
+                await anyio.sleep(0.5)
+
+                await client.unsubscribe_resource(AnyUrl(STATUS_RESOURCE_URI))
+                assert manager.subscriber_count() == 0
+
+        anyio.run(scenario)
+
+        assert len(received) == 1
+        notification = received[0][1]
+        assert isinstance(notification, types.ResourceUpdatedNotification)
+        assert str(notification.params.uri) == STATUS_RESOURCE_URI
+
+    def test_failed_send_drops_subscription(self):
+        manager = ResourceSubscriptionManager(_make_server(), min_interval=0)
+        session = MagicMock()
+
+        async def broken_send(uri):
+            raise RuntimeError("会话已关闭")
+
+        session.send_resource_updated = broken_send
+        done = threading.Event()
+
+        async def scenario():
+            manager.subscribe(STATUS_RESOURCE_URI, session, asyncio.get_running_loop())
+            manager.notify_changed(STATUS_RESOURCE_URI)
+            deadline = time.monotonic() + 2
+            while manager.subscriber_count() and time.monotonic() < deadline:
+                await anyio.sleep(0.02)
+            done.set()
+
+        anyio.run(scenario)
+
+        assert done.is_set()
+        assert manager.subscriber_count() == 0
+        assert manager.sent_count == 0
+
+
+class TestPoolStateListeners:
+    """测试服务器池状态迁移通知"""
+
+    def test_state_listener_fires_on_transitions(self):
+        from backend.server_pool import EnhancedServerPool, add_state_listener, remove_state_listener
+
+        config = MagicMock(idle_timeout=300, preferred_web_port=8765)
+        with patch("backend.server_pool.get_server_config", return_value=config), \
+                patch.object(EnhancedServerPool, "_load_registry_state"):
+            pool = EnhancedServerPool()
+
+        calls = []
+        listener = lambda: calls.append(pool.get_status_version())
+        add_state_listener(listener)
+        try:
+            pool.get_server("listener_session")
+            pool.release_server("listener_session")
+        finally:
+            remove_state_listener(listener)
+            pool.shutdown()
+
+        assert len(calls) >= 2
+        assert calls == sorted(calls)
@@ -0,0 +1,82 @@
+"""
+路由状态隔离单元测试
+验证同一进程中的多个反馈应用各自持有路由依赖，并发请求之间不会串话
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+from backend.app import FeedbackApp
+from backend.feedback_handler import FeedbackHandler
+from backend.routes import feedback_bp
+
+SESSION_COUNT = 100
+
+
+@pytest.fixture
+def sessions():
+    sessions = []
+    for index in range(SESSION_COUNT):
+        handler = FeedbackHandler()
+        app = FeedbackApp(handler, work_summary=f"会话摘要-{index:03d}", timeout_seconds=100 + index)
+        flask_app = app.create_app()
+        flask_app.config["TESTING"] = True
+        sessions.append((index, handler, app, flask_app))
+    yield sessions
+    for _, _, app, _ in sessions:
+        app.stop()
+
+
+def _exercise(session):
+    index, _, _, flask_app = session
+    client = flask_app.test_client()
+    page = client.get("/").get_data(as_text=True)
+    response = client.post("/submit_feedback", json={"textFeedback": f"回答-{index:03d}"})
+    return index, page, response.get_json()
+
+
+class TestRouteIsolation:
+    """测试并发会话的路由隔离"""
+
+    def test_parallel_sessions_do_not_cross_talk(self, sessions):
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            outcomes = list(executor.map(_exercise, reversed(sessions)))
+
+        for index, page, body in outcomes:
+            assert body["success"] is True
+            assert f"会话摘要-{index:03d}" in page
+            other = (index + 1) % SESSION_COUNT
+            assert f"会话摘要-{other:03d}" not in page
+
+        for index, handler, _, _ in sessions:
+            result = handler.get_result_nowait()
+            assert result["text_feedback"] == f"回答-{index:03d}"
+            assert handler.result_queue.empty()
+
+    def test_blueprint_without_state_fails_clearly(self):
+        app = Flask(__name__)
+        app.register_blueprint(feedback_bp)
+        response = app.test_client().post("/submit_feedback", json={"textFeedback": "x"})
+        assert response.status_code == 500
+        assert "未初始化" in response.get_json()["message"]
+
+    def test_close_notification_releases_its_own_session(self):
+        from unittest.mock import MagicMock, patch
+
+        apps = [FeedbackApp(FeedbackHandler(), session_id=f"pool_{index}") for index in range(2)]
+        pool = MagicMock()
+        try:
+            with patch("backend.server_pool.get_server_pool", return_value=pool):
+                for app in reversed(apps):
+                    flask_app = app.create_app()
+                    flask_app.config["TESTING"] = True
+                    response = flask_app.test_client().post("/submit_feedback", json={"status": "session_closed"})
+                    assert response.get_json()["success"] is True
+        finally:
+            for app in apps:
+                app.stop()
+
+        assert [c.args for c in pool.release_server.call_args_list] == [("pool_1",), ("pool_0",)]
+        assert all(c.kwargs == {"immediate": True} for c in pool.release_server.call_args_list)
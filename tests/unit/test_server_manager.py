@@ -5,6 +5,7 @@ server_manager模块单元测试
 
 import pytest
 import socket
+import threading
 from unittest.mock import MagicMock, patch, Mock
 
 from backend.server_manager import ServerManager
@@ -114,8 +115,10 @@ class TestServerManager:
         # 模拟连接检测和服务器健康检查
         with patch.object(manager, '_check_client_disconnection', return_value=False):
             with patch.object(manager, '_is_server_healthy', return_value=True):
-                # 模拟feedback_handler返回结果
-                manager.feedback_handler.get_result = MagicMock(return_value=expected_result)
+                # 模拟已连接的客户端和feedback_handler返回结果
+                manager.app = MagicMock()
+                manager.app.has_active_clients.return_value = True
+                manager.feedback_handler.get_result_nowait = MagicMock(return_value=expected_result)
                 
                 result = manager.wait_for_feedback(300)
         
@@ -167,3 +170,73 @@ class TestServerManagerIntegration:
         # 停止服务器
         manager.stop_server()
         assert manager.current_port is None
+
+
+class TestServerReadiness:
+    """测试服务器线程的就绪通知和启动异常传递"""
+
+    @patch('backend.server_manager.open_feedback_browser')
+    def test_port_is_accepting_when_start_returns(self, mock_open_browser):
+        """start_server 返回时端口已在监听，无需等待"""
+        manager = ServerManager()
+        port = manager.start_server("就绪测试", 60)
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                pass
+        finally:
+            manager.stop_server()
+
+    @patch('backend.server_manager.open_feedback_browser')
+    @patch('backend.server_manager.find_free_port')
+    def test_bind_error_propagates(self, mock_find_free_port, mock_open_browser):
+        """端口被占用时立即抛出 OSError，不返回无人监听的端口"""
+        occupied = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        occupied.bind(("127.0.0.1", 0))
+        occupied.listen(1)
+        mock_find_free_port.return_value = occupied.getsockname()[1]
+        manager = ServerManager()
+        try:
+            with pytest.raises(OSError):
+                manager.start_server("端口冲突", 60)
+        finally:
+            occupied.close()
+
+        assert manager.current_port is None
+        assert manager.app is None
+        mock_open_browser.assert_not_called()
+
+    @patch('backend.server_manager.open_feedback_browser')
+    @patch('backend.server_manager.FeedbackApp')
+    def test_thread_exception_propagates(self, mock_feedback_app, mock_open_browser):
+        """服务器线程中的启动异常在调用方重新抛出"""
+        mock_feedback_app.return_value.run.side_effect = ImportError("缺少 eventlet")
+        manager = ServerManager()
+
+        with pytest.raises(ImportError, match="缺少 eventlet"):
+            manager.start_server("依赖缺失", 60)
+        mock_open_browser.assert_not_called()
+
+    @patch('backend.server_manager.open_feedback_browser')
+    @patch('backend.server_manager.FeedbackApp')
+    def test_thread_exit_before_listening_fails(self, mock_feedback_app, mock_open_browser):
+        """服务器线程未监听就正常退出时同样视为启动失败"""
+        mock_feedback_app.return_value.run.return_value = None
+        manager = ServerManager()
+
+        with pytest.raises(RuntimeError, match="开始监听前退出"):
+            manager.start_server("提前退出", 60)
+
+    @patch('backend.server_manager.open_feedback_browser')
+    @patch('backend.server_manager.FeedbackApp')
+    def test_startup_timeout(self, mock_feedback_app, mock_open_browser):
+        """服务器线程迟迟不通知就绪时按 server_startup_timeout 失败"""
+        release = threading.Event()
+        mock_feedback_app.return_value.run.side_effect = lambda **kwargs: release.wait(5)
+        manager = ServerManager()
+        manager.server_startup_timeout = 0.1
+        try:
+            with pytest.raises(TimeoutError):
+                manager.start_server("启动超时", 60)
+        finally:
+            release.set()
+        assert manager.current_port is None
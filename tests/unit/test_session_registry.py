@@ -0,0 +1,130 @@
+"""
+跨进程会话注册表单元测试
+验证多进程写入互不覆盖、失效进程清理和索引查询
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from backend.utils.session_registry import SessionRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = SessionRegistry(str(tmp_path / "sessions.db"))
+    yield registry
+    registry.close()
+
+
+def _register_from_subprocess(db_path, session_id, port, wait=False):
+    """在独立进程中注册一个会话，wait=True 时进程保持存活直到 stdin 关闭"""
+    script = textwrap.dedent(f"""
+        import os, sys
+        from backend.utils.session_registry import SessionRegistry
+        registry = SessionRegistry({db_path!r})
+        registry.sync_process(os.getpid(), [
+            {{"session_id": {session_id!r}, "port": {port}, "status": "running"}}
+        ])
+        print(os.getpid(), flush=True)
+        if {wait!r}:
+            sys.stdin.read()
+    """)
+    return subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+
+
+class TestSessionRegistry:
+    """测试注册表读写"""
+
+    def test_processes_do_not_overwrite_each_other(self, registry):
+        registry.sync_process(1001, [{"session_id": "a", "port": 9001, "status": "running"}])
+        registry.sync_process(1002, [{"session_id": "b", "port": 9002, "status": "running"}])
+        registry.sync_process(1001, [
+            {"session_id": "a", "port": 9001, "status": "running"},
+            {"session_id": "c", "port": 9003, "status": "idle"},
+        ])
+
+        sessions = registry.list_sessions()
+        assert [(s["pid"], s["session_id"]) for s in sessions] == [
+            (1001, "a"), (1002, "b"), (1001, "c")
+        ]
+        assert registry.find_by_port(9002)["pid"] == 1002
+        assert [s["port"] for s in registry.list_sessions(status="running")] == [9001, 9002]
+
+    def test_status_summary_aggregates_processes(self, registry):
+        registry.sync_process(1001, [{"session_id": "a", "port": 9001, "status": "running"}])
+        registry.sync_process(1002, [{"session_id": "b", "port": 9002, "status": "error",
+                                      "error_message": "端口被占用"}])
+
+        summary = registry.build_status_summary()
+
+        assert summary["total_servers"] == 2
+        assert summary["active_servers"] == 1
+        assert summary["processes"] == [1001, 1002]
+        assert summary["servers"][1]["error"] == "端口被占用"
+
+    def test_lookups_use_indexes(self, registry):
+        for column in ("port", "session_id", "heartbeat"):
+            plan = registry._conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE {column} = ?", (1,)
+            ).fetchall()
+            assert any("USING INDEX" in row[-1] for row in plan), plan
+
+    def test_stale_heartbeat_rows_are_hidden_and_reaped(self, registry):
+        registry.sync_process(os.getpid(), [{"session_id": "a", "port": 9001, "status": "running"}])
+        registry._conn.execute("UPDATE sessions SET heartbeat = heartbeat - 3600")
+
+        assert registry.list_sessions() == []
+        assert registry.heartbeat(os.getpid()) == 1
+        assert len(registry.list_sessions()) == 1
+
+        registry._conn.execute("UPDATE sessions SET heartbeat = heartbeat - 3600")
+        assert registry.reap_stale() == 1
+        assert registry.heartbeat(os.getpid()) == 0
+
+    def test_inbox_owner_is_dropped_with_its_process(self, registry):
+        registry.claim_inbox(os.getpid(), 8764, "token")
+        assert registry.get_inbox_owner(8764)["token"] == "token"
+        assert registry.get_inbox_owner(8765) is None
+
+        registry.remove_process(os.getpid())
+        assert registry.get_inbox_owner(8764) is None
+
+        # 已退出进程的登记在查询时清理
+        registry.claim_inbox(2 ** 22 + 12345, 8764, "stale")
+        assert registry.get_inbox_owner(8764) is None
+        assert registry._conn.execute("SELECT COUNT(*) FROM inbox_owner").fetchone()[0] == 0
+
+
+class TestCrossProcess:
+    """测试多个进程共享注册表"""
+
+    def test_rows_from_many_processes_and_dead_pid_reaping(self, tmp_path):
+        db_path = str(tmp_path / "sessions.db")
+        SessionRegistry(db_path).close()
+
+        alive = [_register_from_subprocess(db_path, f"live_{i}", 9100 + i, wait=True) for i in range(5)]
+        dead = _register_from_subprocess(db_path, "dead", 9200)
+        try:
+            live_pids = {int(proc.stdout.readline()) for proc in alive}
+            dead_pid = int(dead.stdout.readline())
+            dead.wait(timeout=10)
+
+            registry = SessionRegistry(db_path)
+            assert {s["pid"] for s in registry.list_sessions()} == live_pids | {dead_pid}
+
+            assert registry.reap_stale() == 1
+            assert {s["pid"] for s in registry.list_sessions()} == live_pids
+            assert registry.find_by_port(9200) is None
+            registry.close()
+        finally:
+            for proc in alive:
+                proc.stdin.close()
+                proc.wait(timeout=10)
@@ -0,0 +1,107 @@
+"""
+启动导入单元测试
+验证 MCP 握手前不加载 Web 服务器和图片处理模块（基于 -X importtime），
+以及握手完成后的后台预热
+"""
+
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import anyio
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import backend.warmup as warmup
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# 握手前不应导入的较重依赖
+HEAVY_MODULES = ("flask", "flask_socketio", "eventlet", "jinja2", "PIL", "requests")
+
+# backend.server 自身（不含 mcp SDK）的导入耗时预算（毫秒）
+IMPORT_BUDGET_MS = 150
+
+
+def _import_profile(module: str):
+    """在子进程中以 -X importtime 导入模块，返回 [(深度, 模块名, 累计微秒)]（按输出顺序）"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+
+def _first_party_microseconds(entries) -> int:
+    """backend 包的累计导入耗时，扣除其中 mcp SDK 子树"""
+    total = sum(cumulative for depth, name, cumulative in entries
+                if depth == 0 and name.split(".")[0] == "backend")
+    # 输出为后序遍历：父模块在其子模块之后，深度更小
+    sdk = 0
+    for index, (depth, name, cumulative) in enumerate(entries):
+        if name.split(".")[0] != "mcp":
+            continue
+        parent = next((entry for entry in entries[index + 1:] if entry[0] < depth), None)
+        if parent is not None and parent[1].split(".")[0] == "backend":
+            sdk += cumulative
+    return total - sdk
+
+
+class TestImportTime:
+    """测试 backend.server 的导入开销"""
+
+    def test_heavy_stacks_are_not_imported(self):
+        entries = _import_profile("backend.server")
+
+        imported = {name.split(".")[0] for _, name, _ in entries}
+        assert "backend" in imported
+        assert imported.isdisjoint(HEAVY_MODULES), imported & set(HEAVY_MODULES)
+
+    def test_first_party_import_within_budget(self):
+        # 取多次中的最小值，减少冷缓存和机器负载的影响
+        costs = [_first_party_microseconds(_import_profile("backend.server")) for _ in range(3)]
+        assert min(costs) / 1000 < IMPORT_BUDGET_MS
+
+
+class TestWarmup:
+    """测试后台预热"""
+
+    def test_handshake_starts_warmup(self):
+        from backend.server import mcp
+
+        async def scenario():
+            with patch("backend.server.start_warmup") as mock_start:
+                async with create_connected_server_and_client_session(mcp._mcp_server):
+                    for _ in range(50):
+                        if mock_start.called:
+                            break
+                        await anyio.sleep(0.01)
+            return mock_start.call_count
+
+        assert anyio.run(scenario) == 1
+
+    def test_warmup_runs_once(self, monkeypatch):
+        monkeypatch.setattr(warmup, "_warmup_thread", None)
+
+        thread = warmup.start_warmup(("json", "backend.missing_module_for_test"))
+        assert thread is not None
+        thread.join(timeout=10)
+
+        assert not thread.is_alive()
+        assert warmup.start_warmup() is None
+
+    def test_server_manager_resolved_lazily(self):
+        import backend.server_pool as server_pool
+        from backend.server_manager import ServerManager
+
+        assert server_pool.ServerManager is ServerManager
+        with pytest.raises(AttributeError):
+            server_pool.NotAnAttribute
@@ -0,0 +1,127 @@
+"""
+状态资源单元测试
+验证版本化快照的增量维护、按版本缓存的序列化结果和紧凑输出
+"""
+
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from backend import server
+from backend.server_pool import EnhancedServerPool
+from backend.utils.deadline_scheduler import DeadlineScheduler
+from backend.utils.session_registry import get_session_registry
+
+
+@pytest.fixture
+def pool():
+    scheduler = DeadlineScheduler(name="Test-Scheduler")
+    config = MagicMock(idle_timeout=300, preferred_web_port=8765)
+    with patch("backend.server_pool.get_server_config", return_value=config), \
+            patch("backend.server_pool.get_scheduler", return_value=scheduler), \
+            patch.object(EnhancedServerPool, "_load_registry_state"):
+        pool = EnhancedServerPool()
+    server._status_resource_cache.clear()
+    with patch("backend.server.get_server_pool", return_value=pool):
+        yield pool
+    pool.shutdown()
+    scheduler.shutdown()
+    server._status_resource_cache.clear()
+
+
+class TestStatusSnapshot:
+    """测试版本化快照"""
+
+    def test_snapshot_is_updated_incrementally_on_transitions(self, pool):
+        version = pool.get_status_version()
+        pool.get_server("a")
+        assert pool.get_status_version() == version + 1
+
+        snapshot = pool.get_status_snapshot()
+        assert pool.get_status_snapshot() is snapshot
+        assert [s["session_id"] for s in snapshot["servers"]] == ["a"]
+
+        # 仅刷新活动时间不是状态迁移
+        pool.get_server("a")
+        assert pool.get_status_snapshot() is snapshot
+
+        pool.release_server("a", immediate=True)
+        assert pool.get_status_snapshot()["servers"] == []
+
+
+class TestStatusResource:
+    """测试状态资源的缓存和输出"""
+
+    def test_repeated_reads_reuse_cached_payload(self, pool):
+        pool.get_server("a")
+        first = server.get_server_status_resource()
+
+        with patch.object(server, "_build_status_resource_data") as mock_build:
+            second = server.get_server_status_resource()
+        mock_build.assert_not_called()
+        assert second is first
+
+        pool.get_server("b")
+        third = server.get_server_status_resource()
+        assert third is not first
+        assert {s["session_id"] for s in json.loads(third)["servers"]} == {"a", "b"}
+
+    def test_compact_output(self, pool):
+        pool.get_server("a")
+        compact = server.get_server_status_compact_resource()
+        pretty = server.get_server_status_resource()
+
+        assert "\n" not in compact
+        assert len(compact) < len(pretty)
+        assert json.loads(compact)["servers"] == json.loads(pretty)["servers"]
+
+    def test_registry_version_check_is_rate_limited(self, pool, monkeypatch):
+        registry = MagicMock()
+        registry.data_version.side_effect = [1, 2]
+        monkeypatch.setattr(server, "_registry_version", (float("-inf"), -1))
+        with patch("backend.utils.session_registry.get_session_registry", return_value=registry):
+            first = server._get_status_version_key(pool)
+            for _ in range(100):
+                assert server._get_status_version_key(pool) == first
+            assert registry.data_version.call_count == 1
+
+            # 检查间隔过后重新查询，其他进程的变更使缓存失效
+            with patch.object(server, "REGISTRY_VERSION_CHECK_INTERVAL", 0):
+                assert server._get_status_version_key(pool) == (first[0], 2)
+
+    def test_merges_sessions_from_other_processes(self, pool):
+        registry = get_session_registry()
+        other_pid = os.getppid()
+        registry.sync_process(other_pid, [{"session_id": "remote", "port": 9301, "status": "running"}])
+        try:
+            pool.get_server("local")
+            data = json.loads(server.get_server_status_resource())
+        finally:
+            registry.remove_process(other_pid)
+
+        sources = {s["session_id"]: s["data_source"] for s in data["servers"]}
+        assert sources == {"local": "runtime", "remote": "persistent"}
+        assert data["ssh_commands"][0]["remote_port"] == 9301
+
+    def test_own_reaping_invalidates_cached_status(self, pool):
+        import subprocess
+        import sys
+
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        registry = get_session_registry()
+        registry.sync_process(process.pid, [{"session_id": "dead", "port": 9302, "status": "running"}])
+        try:
+            pool.get_server("local")
+            before = json.loads(server.get_server_status_resource())
+            assert "dead" in {s["session_id"] for s in before["servers"]}
+
+            # 本进程清理的记录不改变注册表数据版本，需由状态版本使缓存失效
+            pool._on_registry_heartbeat()
+            after = json.loads(server.get_server_status_resource())
+        finally:
+            registry.remove_process(process.pid)
+
+        assert {s["session_id"] for s in after["servers"]} == {"local"}
@@ -0,0 +1,196 @@
+"""
+调用跟踪单元测试
+验证跨度嵌套、跨线程归属、JSONL 轮转导出，以及百分位统计与分析工具
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.utils.tracing import (
+    JsonlSpanExporter,
+    get_current_span,
+    read_spans,
+    set_span_exporter,
+    start_span,
+    summarize_spans,
+)
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """将跨度导出到临时文件，返回 (路径, 刷新函数)"""
+    path = str(tmp_path / "traces.jsonl")
+    exporter = JsonlSpanExporter(path)
+    previous = set_span_exporter(exporter)
+    try:
+        yield path, exporter.shutdown
+    finally:
+        exporter.shutdown()
+        set_span_exporter(previous)
+
+
+def _by_name(spans):
+    return {span["name"]: span for span in spans}
+
+
+class TestSpans:
+    """测试跨度生命周期"""
+
+    def test_nested_spans_share_trace(self, trace_file):
+        path, flush = trace_file
+        with start_span("tool.test", {"session_id": "s1"}) as root:
+            with start_span("phase.child") as child:
+                assert get_current_span() is child
+            assert get_current_span() is root
+        assert get_current_span() is None
+        flush()
+
+        spans = _by_name(read_spans(path))
+        assert spans["phase.child"]["traceId"] == spans["tool.test"]["traceId"]
+        assert spans["phase.child"]["parentSpanId"] == spans["tool.test"]["spanId"]
+        assert spans["tool.test"]["parentSpanId"] == ""
+        assert {"key": "session_id", "value": {"stringValue": "s1"}} in spans["tool.test"]["attributes"]
+        assert int(spans["tool.test"]["endTimeUnixNano"]) >= int(spans["tool.test"]["startTimeUnixNano"])
+
+    def test_exception_marks_span_error(self, trace_file):
+        path, flush = trace_file
+        with pytest.raises(RuntimeError):
+            with start_span("phase.failing"):
+                raise RuntimeError("启动失败")
+        flush()
+
+        span = _by_name(read_spans(path))["phase.failing"]
+        assert span["status"]["code"] == "STATUS_CODE_ERROR"
+        assert "启动失败" in span["status"]["message"]
+
+    def test_explicit_parent_from_other_thread(self, trace_file):
+        path, flush = trace_file
+        with start_span("feedback.wait") as wait_span:
+            def web_thread():
+                assert get_current_span() is None
+                with start_span("websocket.submit_feedback", parent=wait_span):
+                    pass
+                wait_span.add_event("websocket.connect", {"client_id": "c1"})
+
+            thread = threading.Thread(target=web_thread)
+            thread.start()
+            thread.join()
+        flush()
+
+        spans = _by_name(read_spans(path))
+        assert spans["websocket.submit_feedback"]["parentSpanId"] == spans["feedback.wait"]["spanId"]
+        assert spans["feedback.wait"]["events"][0]["name"] == "websocket.connect"
+
+    def test_rotated_files_are_read(self, tmp_path):
+        path = str(tmp_path / "traces.jsonl")
+        exporter = JsonlSpanExporter(path, max_bytes=4096, backup_count=20)
+        previous = set_span_exporter(exporter)
+        try:
+            for _ in range(40):
+                with start_span("phase.rotated"):
+                    pass
+        finally:
+            exporter.shutdown()
+            set_span_exporter(previous)
+
+        assert (tmp_path / "traces.jsonl.1").exists()
+        assert len(read_spans(path)) == 40
+
+    def test_disabled_exporter_writes_nothing(self, tmp_path):
+        previous = set_span_exporter(None)
+        try:
+            with start_span("phase.disabled") as span:
+                pass
+        finally:
+            set_span_exporter(previous)
+
+        assert span.duration is not None
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestSummary:
+    """测试百分位统计"""
+
+    def _span(self, name, duration_ms, trace_id="t1", parent="p"):
+        return {
+            "traceId": trace_id,
+            "spanId": name,
+            "parentSpanId": parent,
+            "name": name,
+            "startTimeUnixNano": "0",
+            "endTimeUnixNano": str(int(duration_ms * 1e6)),
+        }
+
+    def test_percentiles_use_nearest_rank(self):
+        spans = [self._span("phase", ms) for ms in range(1, 101)]
+
+        stats = summarize_spans(spans)["phase"]
+        assert stats["count"] == 100
+        assert stats["p50"] == pytest.approx(0.050)
+        assert stats["p95"] == pytest.approx(0.095)
+        assert stats["p99"] == pytest.approx(0.099)
+        assert stats["max"] == pytest.approx(0.100)
+
+    def test_root_filter_selects_traces(self):
+        spans = [
+            self._span("tool.collect_feedback", 10, trace_id="a", parent=""),
+            self._span("server.start", 5, trace_id="a"),
+            self._span("tool.pick_image", 10, trace_id="b", parent=""),
+            self._span("server.start", 50, trace_id="b"),
+        ]
+
+        summary = summarize_spans(spans, root_name="tool.collect_feedback")
+        assert set(summary) == {"tool.collect_feedback", "server.start"}
+        assert summary["server.start"]["count"] == 1
+
+
+class TestPipelineTracing:
+    """测试反馈等待流程的跨度"""
+
+    def test_wait_for_feedback_records_phases(self, trace_file):
+        from backend.server_manager import ServerManager
+
+        path, flush = trace_file
+        manager = ServerManager()
+        manager.app = MagicMock()
+        manager.app.has_active_clients.return_value = True
+
+        def submit_later():
+            with start_span("websocket.submit_feedback", parent=manager.feedback_handler.trace_parent):
+                manager.feedback_handler.submit_feedback({"text": "完成", "images": []})
+
+        with start_span("tool.collect_feedback"):
+            timer = threading.Timer(0.05, submit_later)
+            timer.start()
+            manager.wait_for_feedback(5)
+            timer.join()
+            manager.feedback_handler.process_feedback_to_mcp(
+                {"success": True, "has_text": True, "text_feedback": "完成", "timestamp": "now"}
+            )
+        flush()
+
+        spans = _by_name(read_spans(path))
+        trace_id = spans["tool.collect_feedback"]["traceId"]
+        for name in (
+            "feedback.wait", "feedback.wait_connect", "feedback.wait_user",
+            "websocket.submit_feedback", "feedback.submit", "feedback.convert",
+        ):
+            assert spans[name]["traceId"] == trace_id, name
+        assert spans["feedback.submit"]["parentSpanId"] == spans["websocket.submit_feedback"]["spanId"]
+        assert manager.feedback_handler.trace_parent is None
+
+    def test_trace_report_prints_percentiles(self, trace_file, capsys):
+        from tools.trace_report import main
+
+        path, flush = trace_file
+        with start_span("tool.collect_feedback"):
+            with start_span("server.start"):
+                pass
+        flush()
+
+        assert main(["--file", path, "--tool", "tool.collect_feedback"]) == 0
+        output = capsys.readouterr().out
+        assert "server.start" in output
+        assert "p99(ms)" in output
@@ -6,38 +6,15 @@ MCP反馈服务器状态查看器
 
 import json
 import os
-import subprocess
-import re
 import time
-from backend.server_pool import load_server_status_from_file, STATUS_FILE
+from backend.port_info import get_mcp_server_ports
+from backend.server_pool import load_server_status_from_file, REGISTRY_FILE
 from backend.config import get_server_config
 
-def get_running_servers_by_lsof():
-    """通过lsof命令检测运行中的服务器"""
+def get_running_servers():
+    """检测运行中的服务器（会话注册表优先，/proc 监听端口并发探测兜底）"""
     try:
-        result = subprocess.run(['lsof', '-i', '-P', '-n'], 
-                              capture_output=True, text=True, timeout=10)
-        
-        lines = result.stdout.split('\n')
-        running_servers = []
-        
-        for line in lines:
-            if 'python' in line and 'LISTEN' in line and '127.0.0.1:' in line:
-                # 提取端口号
-                port_match = re.search(r'127\.0\.0\.1:(\d+)', line)
-                if port_match:
-                    port = int(port_match.group(1))
-                    # 检查是否是我们的服务
-                    try:
-                        import requests
-                        response = requests.get(f"http://127.0.0.1:{port}/ping", timeout=2)
-                        if response.status_code == 200:
-                            running_servers.append(port)
-                    except:
-                        continue
-        
-        return running_servers
-        
+        return get_mcp_server_ports(use_cache=False)
     except Exception as e:
         print(f"⚠️ 检测服务器失败: {e}")
         return []
@@ -51,7 +28,7 @@ def format_server_status():
     saved_status = load_server_status_from_file()
     
     # 2. 检测实际运行的服务器
-    running_ports = get_running_servers_by_lsof()
+    running_ports = get_running_servers()
     
     if not saved_status and not running_ports:
         print("❌ 没有找到任何MCP反馈服务器")
@@ -86,6 +63,8 @@ def format_server_status():
                 status_emoji = "🟢" if is_running else "🔴"
                 
                 print(f"   {status_emoji} {server.get('session_id', '未知')}")
+                if server.get('pid'):
+                    print(f"      进程: {server['pid']}")
                 print(f"      端口: {port or 'N/A'}")
                 print(f"      状态: {status_text}")
                 print(f"      任务: {server.get('work_summary', '无描述')}")
@@ -123,10 +102,10 @@ def format_server_status():
             print("   (可能服务器已停止，但状态文件仍存在)")
 
     # 状态文件信息
-    if os.path.exists(STATUS_FILE):
-        file_stat = os.stat(STATUS_FILE)
+    if os.path.exists(REGISTRY_FILE):
+        file_stat = os.stat(REGISTRY_FILE)
         file_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(file_stat.st_mtime))
-        print(f"\n📄 状态文件: {STATUS_FILE}")
+        print(f"\n📄 会话注册表: {REGISTRY_FILE}")
         print(f"   最后修改: {file_time}")
 
 def main():
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+调用跟踪分析工具
+读取本地跟踪文件（含轮转文件），按阶段输出耗时的 p50/p95/p99
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# 确保项目根目录在模块搜索路径中
+_project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from backend.utils.tracing import get_trace_file_path, read_spans, summarize_spans
+
+
+def format_report(summary: dict) -> str:
+    """格式化统计表（毫秒）"""
+    if not summary:
+        return "没有找到跟踪记录"
+
+    name_width = max(len("阶段"), *(len(name) for name in summary))
+    header = f"{'阶段':<{name_width}}  {'次数':>6}  {'p50(ms)':>10}  {'p95(ms)':>10}  {'p99(ms)':>10}  {'max(ms)':>10}"
+    lines = [header, "-" * len(header)]
+    # 按 p50 从大到小排列，耗时最多的阶段排在最前
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["p50"]):
+        lines.append(
+            f"{name:<{name_width}}  {stats['count']:>6}  "
+            f"{stats['p50'] * 1000:>10.1f}  {stats['p95'] * 1000:>10.1f}  "
+            f"{stats['p99'] * 1000:>10.1f}  {stats['max'] * 1000:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    """主入口"""
+    parser = argparse.ArgumentParser(description="按阶段统计工具调用跟踪的耗时百分位")
+    parser.add_argument("--file", default=None, help=f"跟踪文件路径（默认 {get_trace_file_path()}）")
+    parser.add_argument("--tool", default=None, help="仅统计指定根跨度的跟踪，例如 tool.collect_feedback")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args(argv)
+
+    summary = summarize_spans(read_spans(args.file), root_name=args.tool)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())